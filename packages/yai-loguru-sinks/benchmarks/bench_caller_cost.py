@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+调用方开销基准测试
+
+测量应用线程上每次 `SlsSink.__call__` 的耗时，对比：
+
+- eager：在调用方线程上完成字段映射、分类和补充信息（默认模式）
+- deferred：调用方只捕获原始字段，其余工作在后台线程完成（deferred_enrichment=True）
+
+使用真实的 loguru Message 对象，SLS 客户端被替换为 Mock，不产生网络请求。
+
+用法:
+    python benchmarks/bench_caller_cost.py --records 200000
+"""
+
+import argparse
+import time
+from unittest.mock import MagicMock, patch
+
+from loguru import logger
+
+from yai_loguru_sinks.internal.core import SlsSink
+from yai_loguru_sinks.internal.data import SlsConfig
+
+
+def capture_message() -> object:
+    """通过 loguru 生成一条真实的 Message 对象"""
+    messages = []
+    handler_id = logger.add(messages.append, format="{message}")
+    try:
+        logger.bind(extra={'user_id': 'u-1', 'order_id': 'o-42'}).warning(
+            "订单处理完成，耗时 {} ms", 12.5
+        )
+    finally:
+        logger.remove(handler_id)
+    return messages[0]
+
+
+def measure(deferred: bool, records: int) -> float:
+    """返回单次调用的平均耗时（微秒）"""
+    config = SlsConfig(
+        endpoint="https://bench.log.aliyuncs.com",
+        access_key_id="bench",
+        access_key_secret="bench",
+        project="bench",
+        logstore="bench",
+        auto_detect_thread=True,
+        queue_max_size=0,
+        flush_interval=3600,
+        deferred_enrichment=deferred,
+    )
+    with patch('yai_loguru_sinks.internal.core.LogClient', return_value=MagicMock()):
+        sink = SlsSink(config)
+    # 停止后台线程，只测量调用方线程上的开销
+    sink.stop_event.set()
+
+    message = capture_message()
+    for _ in range(1000):
+        sink(message)
+    sink.log_queue.drain(records + 1000)
+
+    start = time.perf_counter()
+    for _ in range(records):
+        sink(message)
+    elapsed = time.perf_counter() - start
+
+    # 顺便验证后台补充的耗时，确保工作只是被转移而不是被省略
+    items = sink.log_queue.drain(records)
+    start = time.perf_counter()
+    sink.async_handler.prepare_messages(items)
+    worker_elapsed = time.perf_counter() - start
+
+    mode = 'deferred' if deferred else 'eager'
+    print(
+        f"{mode:<9} 调用方 {elapsed / records * 1e6:>6.2f} µs/条  "
+        f"后台补充 {worker_elapsed / records * 1e6:>6.2f} µs/条"
+    )
+    return elapsed / records * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SlsSink 调用方开销基准测试")
+    parser.add_argument('--records', type=int, default=200000, help='调用次数')
+    args = parser.parse_args()
+
+    # 移除默认的 stderr handler，避免输出干扰
+    logger.remove()
+
+    eager = measure(False, args.records)
+    deferred = measure(True, args.records)
+    print(f"\n调用方开销降低 {(1 - deferred / eager) * 100:.1f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+请求体压缩基准测试
+
+用 LogGroupEncoder 生成与实际请求相同的 LogGroup 请求体，对比各压缩编码器的
+压缩率和单核压缩速度，并给出 auto 模式在指定带宽和 CPU 预算下的选择。
+
+用法:
+    python benchmarks/bench_compression.py --batch-size 500 --bandwidth 10 --cpu-budget 0.5
+"""
+
+import argparse
+import time
+
+from yai_loguru_sinks.internal.compression import (
+    CompressionSelector,
+    available_codecs,
+    create_codec,
+)
+from yai_loguru_sinks.internal.log_group import LogGroupEncoder
+
+
+def make_body(batch_size: int) -> bytes:
+    """生成一个批次的 LogGroup 请求体"""
+    logs = [
+        (1700000000 + i, [
+            ('level', 'INFO' if i % 10 else 'ERROR'),
+            ('logger', 'app.services.order'),
+            ('message', f'订单 {i} 已创建，金额 {i * 0.5:.2f}'),
+            ('module', 'order'),
+            ('function', 'create_order'),
+            ('line', str(100 + i % 50)),
+            ('hostname', 'web-7f9c6d-abcde'),
+            ('extra', '{"user_id": "u-%d", "trace_id": "%016x"}' % (i % 300, i * 7919)),
+        ])
+        for i in range(batch_size)
+    ]
+    return LogGroupEncoder(topic='python-app', source='yai-loguru').encode(logs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="请求体压缩基准测试")
+    parser.add_argument('--batch-size', type=int, default=500, help='每个批次的记录数')
+    parser.add_argument('--rounds', type=int, default=200, help='每个编码器压缩的次数')
+    parser.add_argument('--bandwidth', type=float, default=10.0, help='auto 模式的上行带宽（MB/秒）')
+    parser.add_argument('--cpu-budget', type=float, default=0.5, help='auto 模式的压缩 CPU 预算（核数）')
+    args = parser.parse_args()
+
+    body = make_body(args.batch_size)
+    print(f"请求体 {len(body) / 1024:.1f} KB（{args.batch_size} 条）\n")
+
+    for name in available_codecs():
+        codec = create_codec(name)
+        codec.compress(body)
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            size = len(codec.compress(body))
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        print(
+            f"{name:<8} 压缩率 {size / len(body):>6.3f}  "
+            f"{len(body) * args.rounds / elapsed / 1e6:>10.1f} MB/秒"
+        )
+
+    selector = CompressionSelector(
+        'auto', min_bytes=0, bandwidth=args.bandwidth, cpu_budget=args.cpu_budget
+    )
+    selector.compress(body)
+    print(f"\nauto（带宽 {args.bandwidth} MB/秒，CPU 预算 {args.cpu_budget} 核）选择: {selector.codec_name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+多进程编码阶段基准测试
+
+多个发送线程同时把批次编码为 LogGroup 并压缩，对比：
+
+- thread：在发送线程中编码和压缩（受 GIL 限制，最多一个核）
+- pool-N：交给 N 个编码进程（EncodingPool）
+
+用法:
+    python benchmarks/bench_encode_pool.py --batches 400 --threads 8 --workers 1,2,4
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Tuple
+
+from yai_loguru_sinks.internal.compression import CompressionSelector
+from yai_loguru_sinks.internal.encode_pool import EncodingPool
+from yai_loguru_sinks.internal.log_group import LogGroupEncoder
+
+Logs = List[Tuple[int, List[Tuple[str, str]]]]
+
+TOPIC = 'python-app'
+SOURCE = 'yai-loguru'
+LOGTAGS = [('__pack_id__', '0123456789ABCDEF-1')]
+
+
+def make_batch(batch_size: int) -> Logs:
+    """生成与 SlsSink.format_log_contents 输出形状相同的批次"""
+    return [
+        (1700000000 + i, [
+            ('level', 'INFO'),
+            ('logger', 'app.services.order'),
+            ('message', f'订单 {i} 已创建，金额 {i * 0.5:.2f}'),
+            ('module', 'order'),
+            ('function', 'create_order'),
+            ('line', str(100 + i % 50)),
+            ('extra', '{"user_id": "u-%d", "trace_id": "%016x"}' % (i, i * 7919)),
+        ])
+        for i in range(batch_size)
+    ]
+
+
+def run(name: str, encode: Callable[[Logs], object], batch: Logs, batches: int, threads: int) -> None:
+    """用多个线程编码指定数量的批次并打印吞吐"""
+    encode(batch)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda _: encode(batch), range(batches)))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<8} {batches * len(batch) / elapsed:>12,.0f} 条/秒  {batches / elapsed:>8.1f} 批/秒")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="多进程编码阶段基准测试")
+    parser.add_argument('--batches', type=int, default=400, help='编码的批次数')
+    parser.add_argument('--batch-size', type=int, default=1000, help='每个批次的记录数')
+    parser.add_argument('--threads', type=int, default=8, help='发送线程数')
+    parser.add_argument('--workers', default='1,2,4', help='编码进程数，逗号分隔')
+    parser.add_argument('--codec', default='lz4', help='压缩方式')
+    args = parser.parse_args()
+
+    print(f"CPU 核数: {os.cpu_count()}\n")
+    batch = make_batch(args.batch_size)
+
+    encoder = LogGroupEncoder(topic=TOPIC, source=SOURCE)
+    selector = CompressionSelector(args.codec, min_bytes=0)
+    run('thread', lambda logs: selector.compress(encoder.encode(logs, LOGTAGS)),
+        batch, args.batches, args.threads)
+
+    for workers in (int(value) for value in args.workers.split(',')):
+        pool = EncodingPool(workers, topic=TOPIC, source=SOURCE, slots=args.threads)
+        try:
+            selector = CompressionSelector(args.codec, min_bytes=0)
+            run(f'pool-{workers}', lambda logs: pool.encode(logs, LOGTAGS, selector),
+                batch, args.batches, args.threads)
+        finally:
+            pool.close()
+
+
+if __name__ == '__main__':
+    main()
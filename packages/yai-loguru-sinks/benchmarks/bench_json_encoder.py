@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+extra 编码器基准测试
+
+对比 worker 线程序列化 extra 字段的吞吐：
+
+- json.dumps：原始实现（ensure_ascii=False，无 default）
+- stdlib：StdlibJsonEncoder，带不可序列化类型的回退
+- orjson：OrjsonEncoder（需要安装 orjson）
+
+用法:
+    python benchmarks/bench_json_encoder.py --records 100000
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+from yai_loguru_sinks.internal.encoders import HAS_ORJSON, OrjsonEncoder, StdlibJsonEncoder
+
+
+def make_extras(records: int, rich: bool) -> List[Dict[str, Any]]:
+    """生成测试用的 extra 字典"""
+    extras = []
+    for i in range(records):
+        extra: Dict[str, Any] = {
+            'user_id': f'u-{i}',
+            'order_id': f'o-{i * 7}',
+            'amount': i * 0.5,
+            'items': [{'sku': f'sku-{j}', 'qty': j} for j in range(5)],
+            'tags': ['checkout', 'web', '移动端'],
+            'trace': {'span_id': f'{i:016x}', 'sampled': True},
+        }
+        if rich:
+            extra['created_at'] = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        extras.append(extra)
+    return extras
+
+
+def run(name: str, dumps: Callable[[Any], str], extras: List[Dict[str, Any]]) -> None:
+    """运行一轮并打印吞吐"""
+    for extra in extras[:1000]:
+        dumps(extra)
+
+    total_bytes = 0
+    start = time.perf_counter()
+    for extra in extras:
+        total_bytes += len(dumps(extra))
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{name:<12} {len(extras) / elapsed:>12,.0f} 条/秒  "
+        f"{total_bytes / elapsed / 1e6:>8.1f} MB/秒  "
+        f"{elapsed / len(extras) * 1e6:>6.2f} µs/条"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="extra JSON 编码器基准测试")
+    parser.add_argument('--records', type=int, default=100000, help='编码的记录数')
+    args = parser.parse_args()
+
+    encoders = [('stdlib', StdlibJsonEncoder().dumps)]
+    if HAS_ORJSON:
+        encoders.append(('orjson', OrjsonEncoder().dumps))
+    else:
+        print("orjson 未安装，跳过 orjson 编码器\n")
+
+    print("== 仅 JSON 原生类型 ==")
+    extras = make_extras(args.records, rich=False)
+    run('json.dumps', lambda value: json.dumps(value, ensure_ascii=False), extras)
+    for name, dumps in encoders:
+        run(name, dumps, extras)
+
+    # 原始实现遇到 datetime 会直接抛异常，这里只对比新的编码器
+    print("\n== 包含 datetime ==")
+    extras = make_extras(args.records, rich=True)
+    for name, dumps in encoders:
+        run(name, dumps, extras)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+LogGroup 编码基准测试
+
+对比一个批次从 (时间戳, contents) 到 protobuf 字节的单核吞吐：
+
+- sdk：与 put_logs 相同，先创建 LogItem，再填充 SDK 的 LogGroup 并序列化
+- native：LogGroupEncoder 直接写入 wire format
+
+用法:
+    python benchmarks/bench_log_group.py --records 100000 --batch-size 500
+"""
+
+import argparse
+import time
+from typing import Callable, List, Tuple
+
+from aliyun.log import LogItem
+from aliyun.log.log_logs_pb2 import LogGroup
+
+from yai_loguru_sinks.internal.log_group import LogGroupEncoder
+
+Logs = List[Tuple[int, List[Tuple[str, str]]]]
+
+TOPIC = 'python-app'
+SOURCE = 'yai-loguru'
+LOGTAGS = [('__pack_id__', '0123456789ABCDEF-1')]
+
+
+def make_batches(records: int, batch_size: int) -> List[Logs]:
+    """生成与 SlsSink.format_log_contents 输出形状相同的批次"""
+    logs = [
+        (1700000000 + i, [
+            ('level', 'INFO'),
+            ('logger', 'app.services.order'),
+            ('message', f'订单 {i} 已创建，金额 {i * 0.5:.2f}'),
+            ('module', 'order'),
+            ('function', 'create_order'),
+            ('line', str(100 + i % 50)),
+            ('process', '12345'),
+            ('thread', '140234'),
+            ('extra', '{"user_id": "u-%d", "trace_id": "%016x"}' % (i, i)),
+        ])
+        for i in range(records)
+    ]
+    return [logs[i:i + batch_size] for i in range(0, len(logs), batch_size)]
+
+
+def sdk_encode(logs: Logs) -> bytes:
+    """put_logs 的构造与序列化过程（不含 Time_ns 和压缩）"""
+    items = []
+    for timestamp, contents in logs:
+        item = LogItem(timestamp=timestamp)
+        item.set_contents(contents)
+        items.append(item)
+
+    group = LogGroup()
+    group.Topic = TOPIC
+    group.Source = SOURCE
+    for item in items:
+        log = group.Logs.add()
+        log.Time = item.get_time()
+        for key, value in item.get_contents():
+            content = log.Contents.add()
+            content.Key = key
+            content.Value = value.encode('utf-8')
+    for key, value in LOGTAGS:
+        tag = group.LogTags.add()
+        tag.Key = key
+        tag.Value = value
+    return group.SerializeToString()
+
+
+def run(name: str, encode: Callable[[Logs], bytes], batches: List[Logs]) -> None:
+    """运行一轮并打印吞吐"""
+    encode(batches[0])
+
+    records = sum(len(batch) for batch in batches)
+    total_bytes = 0
+    start = time.perf_counter()
+    for batch in batches:
+        total_bytes += len(encode(batch))
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{name:<8} {records / elapsed:>12,.0f} 条/秒  "
+        f"{total_bytes / elapsed / 1e6:>8.1f} MB/秒  "
+        f"{elapsed / records * 1e6:>6.2f} µs/条"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="LogGroup 编码基准测试")
+    parser.add_argument('--records', type=int, default=100000, help='编码的记录数')
+    parser.add_argument('--batch-size', type=int, default=500, help='每个批次的记录数')
+    args = parser.parse_args()
+
+    batches = make_batches(args.records, args.batch_size)
+    encoder = LogGroupEncoder(topic=TOPIC, source=SOURCE)
+    assert encoder.encode(batches[0], LOGTAGS) == sdk_encode(batches[0])
+
+    run('sdk', sdk_encode, batches)
+    run('native', lambda logs: encoder.encode(logs, LOGTAGS), batches)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+队列竞争基准测试
+
+模拟多个请求线程同时记录日志、一个 flush worker 批量消费的场景，
+对比以下三种队列的生产者吞吐：
+
+- queue.Queue：原始实现，每条记录 put 都要获取互斥锁并通知条件变量
+- BoundedLogQueue：有界队列，每条记录一次加锁
+- StagedLogQueue：分线程暂存，每攒满一块才与后端队列同步一次
+
+用法:
+    python benchmarks/bench_queue_contention.py --threads 64 --records 5000
+"""
+
+import argparse
+import threading
+import time
+from queue import Empty, Queue
+from typing import Any, Callable, List
+
+from yai_loguru_sinks.internal.log_queue import BoundedLogQueue
+from yai_loguru_sinks.internal.staging import StagedLogQueue
+
+
+BATCH_SIZE = 100
+
+
+def _queue_drain(log_queue: Queue) -> Callable[[float], List[Any]]:
+    """原始 flush_worker 的取数方式：get(timeout) + get_nowait 循环"""
+    def drain(timeout: float) -> List[Any]:
+        try:
+            items = [log_queue.get(timeout=timeout)]
+        except Empty:
+            return []
+        while len(items) < BATCH_SIZE:
+            try:
+                items.append(log_queue.get_nowait())
+            except Empty:
+                break
+        return items
+    return drain
+
+
+def run(name: str, put: Callable[[Any], Any], drain: Callable[[float], List[Any]],
+        threads: int, records: int) -> None:
+    """运行一轮基准测试并打印结果"""
+    total = threads * records
+    consumed = 0
+    done = threading.Event()
+    start_barrier = threading.Barrier(threads + 1)
+
+    def consumer() -> None:
+        nonlocal consumed
+        while consumed < total:
+            consumed += len(drain(0.01))
+        done.set()
+
+    def producer() -> None:
+        record = {'message': 'benchmark record', 'level': 'INFO'}
+        start_barrier.wait()
+        for _ in range(records):
+            put(record)
+
+    consumer_thread = threading.Thread(target=consumer, daemon=True)
+    consumer_thread.start()
+    producers = [threading.Thread(target=producer) for _ in range(threads)]
+    for t in producers:
+        t.start()
+
+    start_barrier.wait()
+    start = time.perf_counter()
+    for t in producers:
+        t.join()
+    produce_elapsed = time.perf_counter() - start
+    done.wait()
+    total_elapsed = time.perf_counter() - start
+
+    print(
+        f"{name:<18} 生产 {total / produce_elapsed:>12,.0f} 条/秒  "
+        f"端到端 {total / total_elapsed:>12,.0f} 条/秒  "
+        f"每线程单次写入 {produce_elapsed / total * 1e6 * threads:>7.2f} µs"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="日志队列多线程竞争基准测试")
+    parser.add_argument('--threads', type=int, default=64, help='生产者线程数')
+    parser.add_argument('--records', type=int, default=5000, help='每个线程写入的记录数')
+    parser.add_argument('--chunk-size', type=int, default=64, help='StagedLogQueue 的块大小')
+    args = parser.parse_args()
+
+    print(f"生产者线程: {args.threads}，每线程记录数: {args.records}\n")
+
+    std_queue: Queue = Queue()
+    run('queue.Queue', std_queue.put, _queue_drain(std_queue), args.threads, args.records)
+
+    bounded = BoundedLogQueue(max_size=0)
+    run('BoundedLogQueue', bounded.put,
+        lambda timeout: bounded.drain(BATCH_SIZE, timeout=timeout),
+        args.threads, args.records)
+
+    staged = StagedLogQueue(BoundedLogQueue(max_size=0), chunk_size=args.chunk_size)
+    run('StagedLogQueue', staged.put,
+        lambda timeout: staged.drain(BATCH_SIZE, timeout=timeout),
+        args.threads, args.records)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+跨进程传输基准测试
+
+模拟多个 worker 进程把已编码的日志交给一个上传进程的场景，对比以下两种传输的吞吐：
+
+- multiprocessing.Queue：每条记录 pickle 后由 feeder 线程写入管道，读方再反序列化
+- SharedRingBuffer：写方在文件锁内预留空间后直接复制到共享内存，读方批量取出
+
+用法:
+    python benchmarks/bench_shm_ring.py --processes 8 --records 20000 --size 256
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from queue import Empty
+from typing import Any, Callable, List
+
+from yai_loguru_sinks.internal.shm_ring import SharedRingBuffer
+
+
+BATCH_SIZE = 256
+
+
+def _queue_producer(queue: Any, records: int, size: int, start: Any) -> None:
+    record = b"r" * size
+    start.wait()
+    for _ in range(records):
+        queue.put(record)
+
+
+def _ring_producer(path: str, records: int, size: int, start: Any) -> None:
+    ring = SharedRingBuffer.attach(path, block_timeout=60.0)
+    record = b"r" * size
+    start.wait()
+    for _ in range(records):
+        ring.put(record)
+    ring.close()
+
+
+def _queue_drain(queue: Any) -> Callable[[], List[Any]]:
+    """一次最多取 BATCH_SIZE 条"""
+    def drain() -> List[Any]:
+        try:
+            items = [queue.get(timeout=0.01)]
+        except Empty:
+            return []
+        while len(items) < BATCH_SIZE:
+            try:
+                items.append(queue.get_nowait())
+            except Empty:
+                break
+        return items
+    return drain
+
+
+def run(name: str, target: Callable[..., None], target_arg: Any, drain: Callable[[], List[Any]],
+        processes: int, records: int, size: int) -> None:
+    """运行一轮基准测试并打印结果"""
+    ctx = multiprocessing.get_context('fork')
+    total = processes * records
+    start = ctx.Event()
+    producers = [
+        ctx.Process(target=target, args=(target_arg, records, size, start))
+        for _ in range(processes)
+    ]
+    for p in producers:
+        p.start()
+
+    began = time.perf_counter()
+    start.set()
+    consumed = 0
+    while consumed < total:
+        consumed += len(drain())
+    elapsed = time.perf_counter() - began
+    for p in producers:
+        p.join()
+
+    print(
+        f"{name:<22} 端到端 {total / elapsed:>12,.0f} 条/秒  "
+        f"{total * size / elapsed / 1024 / 1024:>8.1f} MB/秒"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="跨进程日志传输基准测试")
+    parser.add_argument('--processes', type=int, default=8, help='写方进程数')
+    parser.add_argument('--records', type=int, default=20000, help='每个进程写入的记录数')
+    parser.add_argument('--size', type=int, default=256, help='每条记录的字节数')
+    parser.add_argument('--ring-bytes', type=int, default=16 * 1024 * 1024, help='环形缓冲区大小')
+    args = parser.parse_args()
+
+    print(f"写方进程: {args.processes}，每进程记录数: {args.records}，记录大小: {args.size} 字节\n")
+
+    queue = multiprocessing.get_context('fork').Queue()
+    run('multiprocessing.Queue', _queue_producer, queue, _queue_drain(queue),
+        args.processes, args.records, args.size)
+
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else None
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        path = os.path.join(tmp, 'ring')
+        ring = SharedRingBuffer.create(path, capacity=args.ring_bytes)
+        run('SharedRingBuffer', _ring_producer, path, lambda: ring.drain(BATCH_SIZE, timeout=0.01),
+            args.processes, args.records, args.size)
+        ring.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+本机 SLS 日志采集进程
+
+worker 进程的 sls:// handler 配置 `collector_socket` 后只把批次写入本机 Unix socket，
+由本进程统一组批、压缩和上传::
+
+    python -m yai_loguru_sinks.collector "sls://project/app-log?region=cn-hangzhou&batch_size=4096&linger_time=0.5" \\
+        --socket /run/yai-sls/collector.sock --ring /dev/shm/yai-sls-collector
+
+URL 与 handler 使用的 sls:// URL 相同，project 和访问密钥以采集进程的配置为准。
+收到 SIGTERM / SIGINT 后停止监听，在 shutdown_timeout 内排空剩余日志后退出。
+"""
+
+import argparse
+import os
+import signal
+import sys
+import threading
+from typing import List, Optional
+
+from .internal.collector import DEFAULT_COLLECTOR_SOCKET
+from .internal.collector_server import CollectorServer
+from .internal.factory import create_sls_config
+from .internal.url_parser import parse_sls_url
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(
+        prog="python -m yai_loguru_sinks.collector",
+        description="本机 SLS 日志采集进程：接收 worker 写入 Unix socket 的日志，统一组批、压缩和上传",
+    )
+    parser.add_argument("url", help="sls:// URL，格式与 handler 相同")
+    parser.add_argument(
+        "--socket",
+        default=os.getenv("SLS_COLLECTOR_SOCKET", DEFAULT_COLLECTOR_SOCKET),
+        help=f"监听的 Unix socket 路径，默认取环境变量 SLS_COLLECTOR_SOCKET，否则为 {DEFAULT_COLLECTOR_SOCKET}",
+    )
+    parser.add_argument(
+        "--ring",
+        default=None,
+        help="同时创建共享内存环形缓冲区（文件路径，建议放在 /dev/shm 下），worker 用 collector_ring 写入",
+    )
+    parser.add_argument(
+        "--ring-bytes",
+        type=int,
+        default=16 * 1024 * 1024,
+        help="共享内存环形缓冲区的大小（字节），默认 16MB",
+    )
+    parser.add_argument(
+        "--socket-mode",
+        default="660",
+        help="socket 和缓冲区文件的权限（八进制），默认 660",
+    )
+    args = parser.parse_args(argv)
+
+    options = parse_sls_url(args.url)
+    config = create_sls_config(options.pop('project'), options.pop('logstore'), options.pop('region'), **options)
+    server = CollectorServer.from_config(config, args.socket, ring_path=args.ring, ring_bytes=args.ring_bytes)
+
+    stop_event = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop_event.set())
+
+    server.start()
+    os.chmod(args.socket, int(args.socket_mode, 8))
+    if args.ring:
+        os.chmod(args.ring, int(args.socket_mode, 8))
+    print(f"SLS采集进程已启动: {args.socket}")
+    stop_event.wait()
+
+    report = server.close()
+    print(
+        f"SLS采集进程已退出: 共接收 {server.received_logs} 条，队列满丢弃 {server.rejected_logs} 条；"
+        f"关闭时发送 {report.sent} 条，暂存 {report.spooled} 条，丢弃 {report.dropped} 条"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
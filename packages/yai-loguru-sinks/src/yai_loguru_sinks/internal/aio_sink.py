@@ -0,0 +1,442 @@
+"""
+asyncio 版本的 SLS Sink
+
+注册为 loguru 的协程 sink，在正在运行的事件循环上组批和上传，不启动 flush 线程，
+也不在线程中做阻塞的 HTTP 请求：
+
+- 调用方协程只把记录转换为日志数据并放入待发送列表（与 SlsSink 的热路径相同）
+- 达到 batch_size / batch_max_bytes 或 linger 时间到达时封批；linger_time 为 0 时
+  同一轮事件循环中产生的记录合为一批
+- 字段转换、LogGroup 编码、压缩和签名都在线程池（encode_workers > 0 时在编码进程池）
+  中完成，事件循环上只做网络读写
+- 上传通过 `AsyncPutLogsTransport` 的 keep-alive 连接池完成，在途请求数不超过
+  max_in_flight；可重试的错误在事件循环上退避重试，并经过熔断器
+- 待封批和已封批未上传完成的记录合计不超过 queue_max_size / queue_max_bytes，超过时丢弃
+  新记录并计入 dropped / dropped_bytes（事件循环上不能阻塞，queue_full_policy 不生效）
+- 运行指标与 SlsSink 相同，通过 `stats()` 读取，配置 metrics_port / metrics_socket 时导出
+
+用法（FastAPI lifespan）::
+
+    sink = create_async_sls_sink(project="my-project", logstore="app-logs", region="cn-hangzhou")
+    handler_id = logger.add(sink)
+    yield
+    logger.remove(handler_id)
+    await sink.aclose()
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+try:
+    from aliyun.log import LogClient  # type: ignore
+    HAS_ALIYUN_SDK = True
+except ImportError:
+    HAS_ALIYUN_SDK = False
+    LogClient = None
+
+from .aio_transport import AsyncPutLogsTransport
+from .breaker import BatchFallback, CircuitBreaker
+from .categories import CategoryMatcher
+from .compression import CompressionSelector
+from .data import LogBatch, SlsConfig
+from .encode_pool import EncodingPool
+from .encoders import create_json_encoder
+from .field_plan import FieldPlan, FieldSchema
+from .host_metadata import HostMetadataResolver
+from .log_group import LogGroupEncoder
+from .log_queue import estimate_record_size
+from .metrics import MetricsExporter, SinkMetrics
+from .retry import RetryBudget, full_jitter_backoff, is_retryable_error
+from .sharding import create_batcher
+from .sls_pack_id import create_pack_id_manager
+
+# 线程池中准备好的请求：(批次, 请求路径, 请求头, 请求体)
+PreparedRequest = Tuple[LogBatch, str, Dict[str, str], bytes]
+
+
+class AsyncSlsSink:
+    """asyncio 版本的 SLS Sink"""
+
+    def __init__(
+        self,
+        config: SlsConfig,
+        transport: Optional[AsyncPutLogsTransport] = None,
+        executor: Optional[Executor] = None,
+    ) -> None:
+        """初始化
+
+        Args:
+            config: SLS 配置
+            transport: 上传使用的传输，默认按配置创建
+            executor: 编码使用的线程池，默认创建一个 max_in_flight 大小的线程池
+        """
+        if not HAS_ALIYUN_SDK:
+            raise ImportError(
+                "阿里云 SDK 未安装，请运行: uv add aliyun-log-python-sdk"
+            )
+        if config.breaker_fallback == 'spool':
+            raise ValueError("AsyncSlsSink 不支持 breaker_fallback=spool")
+
+        self.config = config
+        # 只使用 SDK 的鉴权对象签名，不通过 SDK 发送请求
+        self.client = LogClient(
+            config.endpoint,
+            config.access_key_id,
+            config.access_key_secret,
+            source=config.source,
+        )
+        self.transport = transport or AsyncPutLogsTransport.from_config(config, self.client._auth)
+
+        self.pack_id_manager = create_pack_id_manager()
+        self.host_metadata = HostMetadataResolver(ttl=config.host_metadata_ttl)
+        self.category_matcher = CategoryMatcher.from_config(config)
+        self.json_encoder = create_json_encoder(config.json_encoder)
+        self.field_plan = FieldPlan(
+            FieldSchema.from_config(config),
+            category=self.category_matcher.classify,
+            thread_info=self._get_thread_info,
+            app_name=config.app_name,
+            app_version=config.app_version,
+            environment=config.environment,
+            dumps=self.json_encoder.dumps,
+            # 分区和路由需要查找 bind() / contextualize() 的值
+            keep_context=bool(config.hash_key_field or config.routes),
+        )
+
+        self.compression = CompressionSelector.from_config(config)
+        self.log_group_encoder = LogGroupEncoder(topic=config.topic, source=config.source)
+        self.encoding_pool = EncodingPool(
+            config.encode_workers,
+            topic=config.topic,
+            source=config.source,
+            slots=max(config.encode_workers, config.max_in_flight) + 1,
+            slot_bytes=2 * config.batch_max_bytes,
+        ) if config.encode_workers > 0 else None
+        self._own_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=max(1, config.max_in_flight), thread_name_prefix="yai-sls-encode"
+        )
+
+        self.fallback = BatchFallback(config.breaker_fallback, sink=config.fallback_sink)
+        self.breaker = CircuitBreaker(
+            failure_threshold=config.breaker_failure_threshold,
+            reset_timeout=config.breaker_reset_timeout,
+            on_state_change=self._on_breaker_state_change,
+        ) if config.circuit_breaker else None
+        self.retry_budget = RetryBudget(ratio=config.retry_budget_ratio)
+
+        # 以下状态只在事件循环上访问
+        self._pending: List[Dict[str, Any]] = []
+        self._pending_bytes = 0
+        # 已接收但尚未上传完成的记录（待封批 + 上传任务中）
+        self._buffered_logs = 0
+        self._buffered_bytes = 0
+        self._timer: Optional[asyncio.Handle] = None
+        self._tasks: Set["asyncio.Task[None]"] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._closed = False
+        self._requests_in_flight = 0
+        self._retry_waiting = 0
+
+        self.sent_batches = 0
+        self.failed_batches = 0
+        self.dropped = 0
+        self.dropped_bytes = 0
+
+        self.metrics = self._create_metrics()
+        self.metrics_exporter = self._create_metrics_exporter()
+
+    async def __call__(self, message: Any) -> None:
+        """Loguru 协程 sink 调用接口"""
+        self.write(message)
+
+    def write(self, message: Any) -> None:
+        """在事件循环上处理一条记录，不等待任何 I/O"""
+        if self._closed:
+            return
+        record = message.record
+        nbytes = estimate_record_size(record['message'], record.get('extra'))
+        self.metrics.enqueued_records.add(1)
+        self.metrics.enqueued_bytes.add(nbytes)
+        if self._is_full(nbytes):
+            self.dropped += 1
+            self.dropped_bytes += nbytes
+            return
+        try:
+            log_data = self.field_plan.build_log_data(record, self.host_metadata.current)
+        except Exception as e:
+            # 避免日志处理错误影响主程序
+            print(f"SLS日志处理错误: {e}")
+            self.metrics.dropped_records.add(1)
+            self.metrics.dropped_bytes.add(nbytes)
+            return
+
+        self._pending.append(log_data)
+        self._pending_bytes += nbytes
+        self._buffered_logs += 1
+        self._buffered_bytes += nbytes
+        config = self.config
+        if len(self._pending) >= config.batch_size or self._pending_bytes >= config.batch_max_bytes:
+            self._seal()
+        elif self._timer is None:
+            loop = asyncio.get_running_loop()
+            if config.linger_time > 0:
+                self._timer = loop.call_later(config.linger_time, self._seal)
+            else:
+                # 同一轮事件循环中产生的记录合为一批
+                self._timer = loop.call_soon(self._seal)
+
+    @property
+    def pending_logs(self) -> int:
+        """尚未封批的记录数"""
+        return len(self._pending)
+
+    @property
+    def buffered_logs(self) -> int:
+        """已接收但尚未上传完成的记录数"""
+        return self._buffered_logs
+
+    def _is_full(self, nbytes: int) -> bool:
+        """再接收 nbytes 的记录是否超过 queue_max_size / queue_max_bytes"""
+        if not self._buffered_logs:
+            # 与 BoundedLogQueue 相同，空时总是接收
+            return False
+        config = self.config
+        if config.queue_max_size > 0 and self._buffered_logs >= config.queue_max_size:
+            return True
+        return config.queue_max_bytes > 0 and self._buffered_bytes + nbytes > config.queue_max_bytes
+
+    @property
+    def in_flight(self) -> int:
+        """正在编码或上传的批次组数"""
+        return len(self._tasks)
+
+    def _seal(self) -> None:
+        """把待发送的记录交给上传任务"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        messages, nbytes = self._pending, self._pending_bytes
+        self._pending, self._pending_bytes = [], 0
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(max(1, self.config.max_in_flight))
+        task = asyncio.get_running_loop().create_task(self._upload(messages, nbytes))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _upload(self, messages: List[Dict[str, Any]], nbytes: int) -> None:
+        """在线程池中组批、编码并签名，再逐批上传"""
+        loop = asyncio.get_running_loop()
+        try:
+            async with self._semaphore:
+                try:
+                    requests = await loop.run_in_executor(self.executor, self.prepare_requests, messages)
+                except Exception as e:
+                    print(f"SLS日志编码错误: {e}")
+                    self.metrics.dropped_records.add(len(messages))
+                    self.metrics.dropped_bytes.add(nbytes)
+                    return
+                for batch, path, headers, body in requests:
+                    await self._send(batch, path, headers, body)
+        finally:
+            self._buffered_logs -= len(messages)
+            self._buffered_bytes -= nbytes
+
+    def prepare_requests(self, messages: List[Dict[str, Any]]) -> List[PreparedRequest]:
+        """组批并编码、压缩、签名（在线程池中执行）"""
+        batcher = create_batcher(self.config, self.field_plan.to_contents)
+        batches = []
+        for msg in messages:
+            batches.extend(batcher.add(msg))
+        batches.extend(batcher.flush_all())
+        # 组批时按 oversize_policy=drop 丢弃的超大记录
+        self.metrics.dropped_records.add(batcher.dropped)
+        self.metrics.dropped_bytes.add(batcher.dropped_bytes)
+        return [self.prepare_request(batch) for batch in batches]
+
+    def prepare_request(self, batch: LogBatch) -> PreparedRequest:
+        """编码、压缩并签名一个批次（在线程池中执行）"""
+        logtags = self.build_logtags()
+        encoded = None
+        if self.encoding_pool is not None:
+            encoded = self.encoding_pool.encode(batch.logs, logtags, self.compression, batch.topic)
+        if encoded is None:
+            body = self.log_group_encoder.encode(batch.logs, logtags, batch.topic)
+            raw_size = len(body)
+            compress_type, body = self.compression.compress(body)
+        else:
+            compress_type, raw_size, body = encoded
+        path, headers = self.transport.prepare(
+            raw_size, compress_type, body, batch.hash_key, batch.logstore
+        )
+        return batch, path, headers, body
+
+    def build_logtags(self) -> Optional[List[Tuple[str, str]]]:
+        """批次级别的 LogTags，PackId 放在这里"""
+        batch_pack_id = self.pack_id_manager.get_batch_pack_id()
+        if batch_pack_id:
+            return [('__pack_id__', batch_pack_id)]
+        return None
+
+    async def _send(self, batch: LogBatch, path: str, headers: Dict[str, str], body: bytes) -> None:
+        """上传一个批次，可重试的错误退避后重新签名再发送"""
+        metrics = self.metrics
+        loop = asyncio.get_running_loop()
+        self.retry_budget.deposit()
+        while True:
+            if self.breaker is not None and not self.breaker.allow_request():
+                self.fallback(batch)
+                return
+            try:
+                await self._request(batch, path, headers, body)
+            except Exception as e:
+                if self.breaker is not None:
+                    self.breaker.record_error(e)
+                delay = self._retry_delay(batch, e)
+                if delay is None:
+                    self.failed_batches += 1
+                    metrics.dropped_records.add(len(batch.logs))
+                    metrics.dropped_bytes.add(batch.nbytes)
+                    print(f"SLS消息发送错误: {e}")
+                    return
+                self._retry_waiting += 1
+                try:
+                    await asyncio.sleep(delay)
+                finally:
+                    self._retry_waiting -= 1
+                metrics.retried_records.add(len(batch.logs))
+                metrics.retried_bytes.add(batch.nbytes)
+                # Date 和签名需要重新生成
+                raw_size = int(headers['x-log-bodyrawsize'])
+                path, headers = await loop.run_in_executor(
+                    self.executor, self.transport.prepare,
+                    raw_size, headers.get('x-log-compresstype'), body,
+                    batch.hash_key, batch.logstore,
+                )
+            else:
+                if self.breaker is not None:
+                    self.breaker.record_success()
+                self.sent_batches += 1
+                metrics.sent_records.add(len(batch.logs))
+                metrics.sent_bytes.add(batch.nbytes)
+                return
+
+    async def _request(self, batch: LogBatch, path: str, headers: Dict[str, str], body: bytes) -> None:
+        """发送一次请求，记录请求耗时和批次条数"""
+        start = time.monotonic()
+        self._requests_in_flight += 1
+        try:
+            await self.transport.send(path, headers, body)
+        finally:
+            self._requests_in_flight -= 1
+            self.metrics.request_seconds.observe(time.monotonic() - start)
+            self.metrics.batch_records.observe(len(batch.logs))
+
+    def _retry_delay(self, batch: LogBatch, error: BaseException) -> Optional[float]:
+        """下一次重试前的等待时间，不再重试时返回 None（规则与 RetryScheduler 相同）"""
+        config = self.config
+        if not is_retryable_error(error):
+            return None
+        attempt = batch.attempt + 1
+        if attempt > config.max_retries:
+            return None
+        now = time.monotonic()
+        delay = full_jitter_backoff(attempt, config.retry_base_delay, config.retry_max_delay)
+        if config.timeout > 0 and now + delay > batch.created_at + config.timeout:
+            return None
+        if not self.retry_budget.try_withdraw(now):
+            return None
+        batch.attempt = attempt
+        return delay
+
+    async def aflush(self) -> None:
+        """封存待发送的记录，等待所有批次上传完成（含重试）"""
+        self._seal()
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def aclose(self) -> None:
+        """发送剩余日志并释放连接、线程池和编码进程"""
+        await self.aflush()
+        self._closed = True
+        await self.transport.aclose()
+
+        loop = asyncio.get_running_loop()
+        if self.encoding_pool is not None:
+            await loop.run_in_executor(None, self.encoding_pool.close)
+            self.encoding_pool = None
+        if self._own_executor:
+            await loop.run_in_executor(None, self.executor.shutdown)
+        self.host_metadata.close()
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.close()
+            self.metrics_exporter = None
+
+    def _create_metrics(self) -> SinkMetrics:
+        """创建指标，登记水位和其他组件维护的计数（指标含义与 SlsSink 相同）"""
+        config = self.config
+        metrics = SinkMetrics(
+            labels={'project': config.project, 'logstore': config.logstore},
+            dropped_records=(lambda: self.dropped, lambda: self.fallback.dropped_logs),
+            dropped_bytes=(lambda: self.dropped_bytes, lambda: self.fallback.dropped_bytes),
+        )
+        metrics.gauge("queue_depth_records", "已接收但尚未上传完成的日志条数", lambda: self._buffered_logs)
+        metrics.gauge("queue_depth_bytes", "已接收但尚未上传完成的日志估算字节数", lambda: self._buffered_bytes)
+        metrics.gauge("in_flight_requests", "在途的 PutLogs 请求数", lambda: self._requests_in_flight)
+        metrics.gauge("pending_batches", "正在编码或上传的批次组数", lambda: len(self._tasks))
+        metrics.gauge("retry_waiting_batches", "等待重试的批次数", lambda: self._retry_waiting)
+        return metrics
+
+    def _create_metrics_exporter(self) -> Optional[MetricsExporter]:
+        """配置了 metrics_port 或 metrics_socket 时开始导出指标，监听失败时只打印错误"""
+        config = self.config
+        if not config.metrics_port and not config.metrics_socket:
+            return None
+        try:
+            return MetricsExporter(
+                self.render_metrics,
+                port=config.metrics_port,
+                host=config.metrics_host,
+                path=config.metrics_socket,
+            )
+        except OSError as e:
+            print(f"SLS指标导出错误: {e}")
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        """读取 sink 的运行指标
+
+        字段与 `SlsSink.stats()` 相同；没有磁盘暂存，另附压缩、熔断和降级各组件自己的统计。
+        """
+        stats = self.metrics.snapshot()
+        stats['compression'] = self.compression.metrics()
+        stats['fallback'] = self.fallback.metrics()
+        if self.breaker is not None:
+            stats['breaker'] = self.breaker.metrics()
+        return stats
+
+    def render_metrics(self) -> str:
+        """以 Prometheus 文本格式输出指标"""
+        return self.metrics.render_prometheus()
+
+    @staticmethod
+    def _on_breaker_state_change(previous: str, state: str) -> None:
+        """熔断器状态变化时打印提示"""
+        print(f"SLS熔断器状态变化: {previous} -> {state}")
+
+    @staticmethod
+    def _get_thread_info(record: Dict[str, Any]) -> str:
+        """获取线程信息，优先使用 loguru 记录中的线程信息"""
+        try:
+            thread = record.get('thread')
+            if thread is not None:
+                return f"{thread.name}({thread.id})"
+            return f"{threading.current_thread().name}({threading.get_ident()})"
+        except Exception:
+            return "unknown-thread"
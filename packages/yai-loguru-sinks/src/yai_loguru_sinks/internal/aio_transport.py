@@ -0,0 +1,239 @@
+"""
+基于 asyncio 的 PutLogs 传输
+
+在事件循环上直接发送已编码（已压缩）的 LogGroup 请求体，不占用线程：
+
+- 使用 asyncio 的流实现 HTTP/1.1，按 endpoint 维护 keep-alive 连接池
+- 请求头、签名和路由与 SDK 的 `LogClient.put_logs` 相同，签名由 `PutLogsSigner` 完成
+  （支持 STS 等凭证），计算 Content-MD5 和签名在调用方选择的线程中完成（`prepare`），
+  事件循环上只做网络读写（`send`）
+- 失败时抛出与 SDK 相同的 `LogException`，重试、熔断按相同的错误码分类
+"""
+
+import asyncio
+import ssl
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from aliyun.log.logexception import LogException  # type: ignore
+    HAS_ALIYUN_SDK = True
+except ImportError:
+    HAS_ALIYUN_SDK = False
+    LogException = None
+
+from .transport import (
+    USER_AGENT,
+    HttpResponse,
+    PutLogsSigner,
+    parse_endpoint,
+    request_host,
+    response_error,
+)
+
+# 响应头最多读取的行数，防止异常响应导致无限读取
+_MAX_HEADER_LINES = 256
+
+
+class _Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+
+    @property
+    def usable(self) -> bool:
+        return not self.writer.is_closing() and not self.reader.at_eof()
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class AsyncPutLogsTransport:
+    """在事件循环上发送 PutLogs 请求"""
+
+    def __init__(
+        self,
+        endpoint: str,
+        project: str,
+        logstore: str,
+        auth: Any,
+        timeout: float = 30.0,
+        pool_size: int = 4,
+        user_agent: str = USER_AGENT,
+    ) -> None:
+        """初始化
+
+        Args:
+            endpoint: SLS endpoint，如 https://cn-hangzhou.log.aliyuncs.com
+            project / logstore: 写入的项目和日志库
+            auth: SDK 的鉴权对象（`LogClient._auth`），提供 sign_request
+            timeout: 单个请求（含建立连接）的超时（秒）
+            pool_size: 保留的空闲连接数上限
+            user_agent: User-Agent 请求头
+        """
+        self.secure, endpoint_host, self.port = parse_endpoint(endpoint)
+        self.host = request_host(endpoint_host, project)
+        self.signer = PutLogsSigner(auth, logstore, self.host, user_agent)
+        self.timeout = timeout
+        self.pool_size = max(1, pool_size)
+        self._ssl: Optional[ssl.SSLContext] = ssl.create_default_context() if self.secure else None
+        self._idle: List[_Connection] = []
+        self._closed = False
+
+    @classmethod
+    def from_config(cls, config: Any, auth: Any) -> "AsyncPutLogsTransport":
+        """按 SlsConfig 创建，连接池大小与在途请求数上限相同"""
+        return cls(
+            config.endpoint,
+            config.project,
+            config.logstore,
+            auth,
+            timeout=config.timeout,
+            pool_size=config.max_in_flight,
+        )
+
+    def prepare(
+        self,
+        raw_size: int,
+        compress_type: Optional[str],
+        body: bytes,
+        hash_key: Optional[str] = None,
+        logstore: Optional[str] = None,
+    ) -> Tuple[str, Dict[str, str]]:
+        """生成带签名的请求路径和请求头，见 `PutLogsSigner.prepare`
+
+        计算 Content-MD5 和签名，请求体较大时应在线程池中调用。
+        """
+        return self.signer.prepare(raw_size, compress_type, body, hash_key, logstore)
+
+    async def send(self, path: str, headers: Dict[str, str], body: bytes) -> HttpResponse:
+        """发送已签名的请求
+
+        Raises:
+            LogException: 网络错误、超时（LogRequestError）或服务端返回错误
+        """
+        try:
+            response = await asyncio.wait_for(self._request(path, headers, body), self.timeout)
+        except LogException:
+            raise
+        except asyncio.TimeoutError:
+            raise LogException('LogRequestError', f'request timed out after {self.timeout}s')
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            raise LogException('LogRequestError', str(e) or type(e).__name__)
+
+        if response.status == 200:
+            return response
+        raise response_error(response)
+
+    async def post(
+        self,
+        raw_size: int,
+        compress_type: Optional[str],
+        body: bytes,
+        hash_key: Optional[str] = None,
+        logstore: Optional[str] = None,
+    ) -> HttpResponse:
+        """签名并发送请求，签名在事件循环上计算，只适合较小的请求体"""
+        path, headers = self.prepare(raw_size, compress_type, body, hash_key, logstore)
+        return await self.send(path, headers, body)
+
+    async def _request(self, path: str, headers: Dict[str, str], body: bytes) -> HttpResponse:
+        head = ''.join(f'{key}: {value}\r\n' for key, value in headers.items())
+        data = f'POST {path} HTTP/1.1\r\n{head}\r\n'.encode('latin-1') + body
+
+        connection, reused = await self._acquire()
+        try:
+            try:
+                response = await self._exchange(connection, data)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                if not reused:
+                    raise
+                # 空闲连接可能已被服务端关闭，换一个新连接重发一次
+                connection.close()
+                connection = await self._open()
+                response = await self._exchange(connection, data)
+        except BaseException:
+            connection.close()
+            raise
+
+        if response.headers.get('connection', '').lower() == 'close':
+            connection.close()
+        else:
+            self._release(connection)
+        return response
+
+    async def _exchange(self, connection: _Connection, data: bytes) -> HttpResponse:
+        connection.writer.write(data)
+        await connection.writer.drain()
+        return await self._read_response(connection.reader)
+
+    @staticmethod
+    async def _read_response(reader: asyncio.StreamReader) -> HttpResponse:
+        status_line = await reader.readuntil(b'\r\n')
+        parts = status_line.decode('latin-1').split(' ', 2)
+        if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+            raise ValueError(f'invalid status line: {status_line!r}')
+        status = int(parts[1])
+
+        headers: Dict[str, str] = {}
+        for _ in range(_MAX_HEADER_LINES):
+            line = await reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+        else:
+            raise ValueError('too many response headers')
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readuntil(b'\r\n')).split(b';', 1)[0], 16)
+                if size == 0:
+                    # 跳过 trailer
+                    while await reader.readuntil(b'\r\n') != b'\r\n':
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            body = await reader.read()
+            headers['connection'] = 'close'
+        return HttpResponse(status, headers, body)
+
+    async def _acquire(self) -> Tuple[_Connection, bool]:
+        """取一个空闲连接，没有时新建
+
+        Returns:
+            (连接, 是否为复用的连接)
+        """
+        while self._idle:
+            connection = self._idle.pop()
+            if connection.usable:
+                return connection, True
+            connection.close()
+        return await self._open(), False
+
+    async def _open(self) -> _Connection:
+        reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self._ssl)
+        return _Connection(reader, writer)
+
+    def _release(self, connection: _Connection) -> None:
+        if self._closed or len(self._idle) >= self.pool_size or not connection.usable:
+            connection.close()
+        else:
+            self._idle.append(connection)
+
+    async def aclose(self) -> None:
+        """关闭所有空闲连接"""
+        self._closed = True
+        idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+        for connection in idle:
+            try:
+                await connection.writer.wait_closed()
+            except Exception:
+                pass
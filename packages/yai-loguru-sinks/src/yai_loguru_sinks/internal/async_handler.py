@@ -5,17 +5,28 @@ SLS 异步处理模块
 """
 
 import time
-from typing import Dict, Any, List
-from queue import Empty
+from concurrent.futures import BrokenExecutor
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+from .data import LogBatch
+from .batcher import LogBatcher
+from .sharding import PartitionedBatcher, create_batcher
+from .linger import LingerController
+from .log_group import LogGroupEncoder
+from .encode_pool import EncodingPool
+from .transport import PutLogsTransport
+from .collector import CollectorClient, RingCollectorClient
 
 try:
     from aliyun.log.logitem import LogItem  # type: ignore
     from aliyun.log.putlogsrequest import PutLogsRequest  # type: ignore
+    from aliyun.log.putlogsresponse import PutLogsResponse  # type: ignore
     HAS_ALIYUN_SDK = True
 except ImportError:
     HAS_ALIYUN_SDK = False
     LogItem = None
     PutLogsRequest = None
+    PutLogsResponse = None
 
 
 class AsyncHandler:
@@ -28,120 +39,248 @@ class AsyncHandler:
             sink_instance: SlsSink 实例的引用
         """
         self.sink = sink_instance
+        self.batcher = self.create_batcher()
+        self.linger = LingerController(
+            linger_time=self.sink.config.linger_time,
+            adaptive=self.sink.config.adaptive_linger,
+            max_linger_time=self.sink.config.max_linger_time,
+            batch_size=self.sink.config.batch_size,
+        )
+        self.log_group_encoder = self.create_log_group_encoder()
+        self.encoding_pool = self.create_encoding_pool()
+        self.transport = self.create_transport()
+        self.collector = self.create_collector()
+    
+    def create_log_group_encoder(self) -> Optional[LogGroupEncoder]:
+        """按配置创建 LogGroup 编码器，不可用时返回 None（使用 SDK 的 put_logs）
+        
+        直接编码需要调用 SDK 的底层发送方法 `LogClient._send`，SDK 版本不提供时自动回退。
+        """
+        config = self.sink.config
+        if not config.native_encoder or PutLogsResponse is None:
+            return None
+        if not callable(getattr(self.sink.client, '_send', None)):
+            return None
+        # Source 为空时 SDK 会改用本机 IP，这种情况交给 SDK 处理
+        if not config.source:
+            return None
+        return LogGroupEncoder(topic=config.topic, source=config.source)
+    
+    def create_encoding_pool(self) -> Optional[EncodingPool]:
+        """按配置创建编码进程池，未启用或 LogGroup 编码器不可用时返回 None"""
+        config = self.sink.config
+        if config.encode_workers <= 0 or self.log_group_encoder is None:
+            return None
+        return EncodingPool(
+            config.encode_workers,
+            topic=config.topic,
+            source=config.source,
+            slots=max(config.encode_workers, config.max_in_flight) + 1,
+            slot_bytes=2 * config.batch_max_bytes,
+        )
+    
+    def create_transport(self) -> Optional[PutLogsTransport]:
+        """按配置创建内置的 HTTP 传输，未启用或 LogGroup 编码器不可用时返回 None"""
+        config = self.sink.config
+        if not config.native_transport or self.log_group_encoder is None:
+            return None
+        return PutLogsTransport.from_config(config, self.sink.client._auth)
+    
+    def create_collector(self) -> Optional[Union[CollectorClient, RingCollectorClient]]:
+        """配置了 collector_ring 或 collector_socket 时创建本机采集进程的客户端"""
+        config = self.sink.config
+        if config.collector_ring:
+            return RingCollectorClient.from_config(config)
+        if config.collector_socket:
+            return CollectorClient.from_config(config)
+        return None
+    
+    def close(self) -> None:
+        """关闭编码进程池、内置 HTTP 传输和采集进程的连接"""
+        pool, self.encoding_pool = self.encoding_pool, None
+        if pool is not None:
+            pool.close()
+        if self.transport is not None:
+            self.transport.close()
+        if self.collector is not None:
+            self.collector.close()
+    
+    def create_batcher(self) -> Union[LogBatcher, PartitionedBatcher]:
+        """按配置创建组批器，配置了 hash_key_field 或 routes 时按分区组批"""
+        return create_batcher(self.sink.config, self.sink.field_plan.to_contents)
     
     def flush_worker(self) -> None:
         """后台线程工作函数，定期刷新日志"""
-        messages = []
-        
         while not self.sink.stop_event.is_set():
             try:
-                # 收集消息
-                try:
-                    # 等待消息或超时
-                    message = self.sink.log_queue.get(timeout=self.sink.config.flush_interval)
-                    
-                    messages.append(message)
-                    
-                    # 继续收集直到批量大小或队列为空
-                    while len(messages) < self.sink.config.batch_size:
-                        try:
-                            message = self.sink.log_queue.get_nowait()
-                            messages.append(message)
-                        except Empty:
-                            break
-                            
-                except Empty:
-                    # 超时，如果有消息就发送
-                    pass
-                
-                # 发送消息
-                if messages:
-                    self.send_messages(messages)
-                    messages.clear()
-                    
+                self.flush_once()
             except Exception as e:
                 print(f"SLS刷新工作线程错误: {e}")
                 time.sleep(1)  # 避免错误循环
+        # 未封存的批次由关闭流程接管，见 shutdown.ShutdownDrain
     
-    def send_messages(self, messages: List[Dict[str, Any]]) -> None:
-        """发送消息到SLS"""
-        if not messages:
-            return
+    def flush_once(self) -> None:
+        """取一次数并按 linger 时间封批
         
+        当前批次为空时最多等待 flush_interval；已有记录时只等待到批次的 linger 截止时间，
+        截止前达到记录数或字节数上限的批次由组批器提前封存。
+        """
+        config = self.sink.config
+        batcher = self.batcher
+        
+        if batcher.pending_logs:
+            timeout = max(0.0, batcher.opened_at + self.linger.current() - time.monotonic())
+        else:
+            timeout = config.flush_interval
+        
+        messages = self.sink.log_queue.drain(config.batch_size, timeout=timeout)
+        self.linger.observe(len(messages))
+        
+        # 按记录数和字节数组批，交给发送阶段并发发送，不等待请求完成
+        if messages:
+            for msg in self.prepare_messages(messages):
+                for batch in batcher.add(msg):
+                    self.sink.sender.submit(batch)
+        
+        if batcher.pending_logs and time.monotonic() >= batcher.opened_at + self.linger.current():
+            for batch in batcher.flush_all():
+                self.sink.sender.submit(batch)
+    
+    def prepare_messages(self, items: List[Any]) -> List[Dict[str, Any]]:
+        """把队列中取出的记录整理为待发送的日志数据
+        
+        启用 deferred_enrichment 时，队列中是调用方线程捕获的原始字段，
+        字段映射和补充信息在这里（后台线程）完成。
+        """
+        if self.sink.config.deferred_enrichment:
+            return self.sink.enrich_captured(items)
+        return items
+    
+    def send_batch(self, batch: LogBatch) -> Any:
+        """同步发送一个批次，记录请求耗时、批次条数和发送成功的条数
+        
+        由发送阶段的线程池、关闭排空和暂存补发调用，失败时抛出异常（put_logs 失败会抛出
+        LogException），以便并发限制器根据结果调整在途请求数。
+        """
+        metrics = self.sink.metrics
+        start = time.monotonic()
         try:
-            # 获取批次级别的 PackId
-            batch_pack_id = self.sink.pack_id_manager.get_batch_pack_id()
-            
-            # 转换为SLS LogItem格式
-            log_items = []
-            for msg in messages:
-                # 构建日志内容 - 包含所有字段
-                contents = [
-                    ('level', msg['level']),
-                    ('message', msg['message']),
-                    ('module', msg['module']),
-                    ('function', msg['function']),
-                    ('line', str(msg['line'])),
-                    # 新增的必需字段
-                    ('app_name', msg.get('app_name', '')),
-                    ('version', msg.get('version', '')),
-                    ('environment', msg.get('environment', '')),
-                    ('category', msg.get('category', '')),
-                ]
-                
-                # 添加可选的系统信息字段
-                if 'hostname' in msg:
-                    contents.append(('hostname', msg['hostname']))
-                if 'host_ip' in msg:
-                    contents.append(('host_ip', msg['host_ip']))
-                if 'thread' in msg:
-                    contents.append(('thread', msg['thread']))
-                
-                # 添加 extra 字段（如果存在）
-                if 'extra' in msg and msg['extra']:
-                    import json
-                    contents.append(('extra', json.dumps(msg['extra'], ensure_ascii=False)))
-                
-                log_item = LogItem()
-                log_item.set_time(int(msg['timestamp']))
-                log_item.set_contents(contents)
-                log_items.append(log_item)
-            
-            # 准备 LogTags - PackId 应该放在这里
-            logtags = []
-            if batch_pack_id:
-                logtags.append(('__pack_id__', batch_pack_id))
-            
-            # 创建请求 - 添加 logtags 参数
-            request = PutLogsRequest(
-                project=self.sink.config.project,
-                logstore=self.sink.config.logstore,
-                topic=self.sink.config.topic,
-                source=self.sink.config.source,
-                logitems=log_items,
-                compress=self.sink.config.compress,
-                logtags=logtags if logtags else None
-            )
-            
-            # 发送到SLS
-            response = self.sink.client.put_logs(request)
-            
-            # 注意：put_logs 如果成功不会抛出异常，失败会抛出 LogException
-            # 所以这里不需要检查 is_success()，能执行到这里说明发送成功
-                
-        except Exception as e:
-            print(f"SLS消息发送错误: {e}")
-    
-    def flush_remaining_logs(self) -> None:
-        """发送剩余的日志"""
-        messages = []
+            response = self.upload_batch(batch)
+        finally:
+            metrics.request_seconds.observe(time.monotonic() - start)
+            metrics.batch_records.observe(len(batch.logs))
+        metrics.sent_records.add(len(batch.logs))
+        metrics.sent_bytes.add(batch.nbytes)
+        return response
+    
+    def upload_batch(self, batch: LogBatch) -> Any:
+        """上传一个批次
+        
+        启用编码进程池时由编码进程编码和压缩；否则用 LogGroup 编码器在当前线程生成请求体，
+        编码失败时回退到 SDK 的 LogItem 路径。
+        配置了采集进程时先写入采集进程，采集进程未运行时才直接上传。
+        """
+        if self.collector is not None and self.collector.send(batch):
+            return None
+        if self.encoding_pool is not None:
+            encoded = self.encode_in_pool(batch)
+            if encoded is not None:
+                compress_type, raw_size, body = encoded
+                return self.post_body(body, raw_size, compress_type, batch.hash_key, batch.logstore)
+        if self.log_group_encoder is not None:
+            try:
+                body = self.log_group_encoder.encode(batch.logs, self.build_logtags(), batch.topic)
+            except Exception:
+                body = None
+            if body is not None:
+                return self.post_log_group(body, batch.hash_key, batch.logstore)
+        return self.sink.client.put_logs(self.build_request(batch))
+    
+    def encode_in_pool(self, batch: LogBatch) -> Optional[Tuple[Optional[str], int, bytes]]:
+        """用编码进程池编码并压缩批次，失败时返回 None 由当前线程处理
+        
+        编码进程异常退出后进程池不可恢复，关闭进程池并改为在当前线程编码。
+        """
+        pool = self.encoding_pool
         try:
-            while not self.sink.log_queue.empty():
-                message = self.sink.log_queue.get_nowait()
-                enhanced_message = self.sink.pack_id_manager.enhance_log_data(message)
-                messages.append(enhanced_message)
-        except Empty:
+            return pool.encode(batch.logs, self.build_logtags(), self.sink.compression, batch.topic)
+        except BrokenExecutor as e:
+            print(f"SLS编码进程池错误: {e}")
+            self.encoding_pool = None
+            pool.close()
+        except Exception:
             pass
+        return None
+    
+    def build_logtags(self) -> Optional[List[Tuple[str, str]]]:
+        """批次级别的 LogTags，PackId 放在这里"""
+        batch_pack_id = self.sink.pack_id_manager.get_batch_pack_id()
+        if batch_pack_id:
+            return [('__pack_id__', batch_pack_id)]
+        return None
+    
+    def post_log_group(
+        self,
+        body: bytes,
+        hash_key: Optional[str] = None,
+        logstore: Optional[str] = None,
+    ) -> Any:
+        """压缩并发送已编码的 LogGroup，压缩方式由 sink.compression 选择"""
+        raw_size = len(body)
+        compress_type, body = self.sink.compression.compress(body)
+        return self.post_body(body, raw_size, compress_type, hash_key, logstore)
+    
+    def post_body(
+        self,
+        body: bytes,
+        raw_size: int,
+        compress_type: Optional[str],
+        hash_key: Optional[str] = None,
+        logstore: Optional[str] = None,
+    ) -> Any:
+        """发送已压缩的请求体，请求头和路由与 SDK 的 put_logs 相同
         
-        if messages:
-            self.send_messages(messages)
\ No newline at end of file
+        logstore 为 None 时写入配置的日志库。
+        """
+        if self.transport is not None:
+            response = self.transport.post(raw_size, compress_type, body, hash_key, logstore)
+            return PutLogsResponse(response.headers, response.body)
+        
+        config = self.sink.config
+        logstore = logstore or config.logstore
+        headers = {'x-log-bodyrawsize': str(raw_size), 'Content-Type': 'application/x-protobuf'}
+        if compress_type is not None:
+            headers['x-log-compresstype'] = compress_type
+        
+        params = {}
+        if hash_key is not None:
+            resource = '/logstores/' + logstore + "/shards/route"
+            params["key"] = hash_key
+        else:
+            resource = '/logstores/' + logstore + "/shards/lb"
+        
+        resp, header = self.sink.client._send('POST', config.project, body, resource, params, headers)
+        return PutLogsResponse(header, resp)
+    
+    def build_request(self, batch: LogBatch) -> Any:
+        """把批次转换为 PutLogsRequest"""
+        # 转换为SLS LogItem格式 - contents 在组批时已转换完成
+        log_items = []
+        for timestamp, contents in batch.logs:
+            log_item = LogItem()
+            log_item.set_time(timestamp)
+            log_item.set_contents(contents)
+            log_items.append(log_item)
+        
+        # 创建请求 - PackId 放在 logtags 中，路由后的批次写入各自的日志库和 Topic
+        config = self.sink.config
+        return PutLogsRequest(
+            project=config.project,
+            logstore=batch.logstore or config.logstore,
+            topic=config.topic if batch.topic is None else batch.topic,
+            source=config.source,
+            hashKey=batch.hash_key,
+            logitems=log_items,
+            compress=self.sink.compression.codec_name != 'none',
+            logtags=self.build_logtags()
+        )
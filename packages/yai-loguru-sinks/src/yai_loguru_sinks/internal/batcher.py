@@ -0,0 +1,254 @@
+"""
+按字节大小组批
+
+把日志数据逐条转换为 SLS contents 并估算编码后的大小，在以下任一条件满足时封批：
+
+- 记录数达到 batch_size（不超过 SLS 单次请求 4096 条的上限）
+- 估算字节数达到 batch_max_bytes（不超过 SLS 单次请求 5MB 的上限）
+
+单条记录超过 record_max_bytes 时按 oversize_policy 处理，避免一条超大记录
+导致整批请求被服务端拒绝：
+
+- truncate: 从最大的字段开始截断，直到记录大小不超过上限
+- split: 把最大的字段切分到多条日志中，每条附带 log_part 字段（如 "1/3"）
+- drop: 丢弃该记录并计数
+"""
+
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .data import LogBatch
+
+
+# SLS PutLogs 单次请求的限制
+SLS_MAX_LOGS_PER_REQUEST = 4096
+SLS_MAX_REQUEST_BYTES = 5 * 1024 * 1024
+
+# protobuf 编码的估算开销：每条日志（时间、长度前缀）和每个字段（标签、长度前缀）
+LOG_OVERHEAD_BYTES = 16
+CONTENT_OVERHEAD_BYTES = 6
+
+# 超大记录的处理策略
+OVERSIZE_TRUNCATE = "truncate"
+OVERSIZE_SPLIT = "split"
+OVERSIZE_DROP = "drop"
+OVERSIZE_POLICIES = (OVERSIZE_TRUNCATE, OVERSIZE_SPLIT, OVERSIZE_DROP)
+
+# 切分后标记分片序号的字段
+SPLIT_PART_KEY = "log_part"
+
+# 截断后附加的标记，{} 为被截掉的字节数
+TRUNCATED_MARKER = "...[truncated {} bytes]"
+
+Contents = List[Tuple[str, str]]
+
+
+def utf8_len(value: str) -> int:
+    """字符串的 UTF-8 字节数（纯 ASCII 时无需编码）"""
+    return len(value) if value.isascii() else len(value.encode('utf-8'))
+
+
+def truncate_utf8(value: str, max_bytes: int) -> str:
+    """按 UTF-8 字节数截断字符串，不会截断在多字节字符中间"""
+    if utf8_len(value) <= max_bytes:
+        return value
+    return value.encode('utf-8')[:max(0, max_bytes)].decode('utf-8', 'ignore')
+
+
+def estimate_contents_size(contents: Contents) -> int:
+    """估算一条日志编码后的字节数"""
+    size = LOG_OVERHEAD_BYTES
+    for key, value in contents:
+        size += utf8_len(key) + utf8_len(value) + CONTENT_OVERHEAD_BYTES
+    return size
+
+
+class LogBatcher:
+    """按记录数和字节数组批"""
+
+    def __init__(
+        self,
+        to_contents: Callable[[Dict[str, Any]], Contents],
+        max_logs: int = 100,
+        max_bytes: int = 3 * 1024 * 1024,
+        record_max_bytes: int = 1024 * 1024,
+        oversize_policy: str = OVERSIZE_TRUNCATE,
+    ) -> None:
+        """初始化组批器
+
+        Args:
+            to_contents: 日志数据 -> SLS contents 的转换函数
+            max_logs: 每批最大记录数，不超过 4096
+            max_bytes: 每批最大估算字节数，不超过 5MB
+            record_max_bytes: 单条记录的最大估算字节数
+            oversize_policy: 超大记录的处理策略：truncate / split / drop
+
+        Raises:
+            ValueError: 未知的超大记录处理策略
+        """
+        if oversize_policy not in OVERSIZE_POLICIES:
+            raise ValueError(
+                f"未知的超大记录处理策略: {oversize_policy}，可选值: {', '.join(OVERSIZE_POLICIES)}"
+            )
+        self.to_contents = to_contents
+        self.max_logs = max(1, min(max_logs, SLS_MAX_LOGS_PER_REQUEST))
+        self.max_bytes = max(1, min(max_bytes, SLS_MAX_REQUEST_BYTES))
+        self.record_max_bytes = max(1, min(record_max_bytes, self.max_bytes))
+        self.oversize_policy = oversize_policy
+
+        self._logs: List[Tuple[int, Contents]] = []
+        self._nbytes = 0
+        self._opened_at = 0.0
+
+        # 超大记录统计
+        self.truncated = 0
+        self.split = 0
+        self.dropped = 0
+        self.dropped_bytes = 0
+
+    @classmethod
+    def from_config(cls, config: Any, to_contents: Callable[[Dict[str, Any]], Contents]) -> "LogBatcher":
+        """按 SlsConfig 创建组批器"""
+        return cls(
+            to_contents,
+            max_logs=config.batch_size,
+            max_bytes=config.batch_max_bytes,
+            record_max_bytes=config.record_max_bytes,
+            oversize_policy=config.oversize_policy,
+        )
+
+    @property
+    def pending_logs(self) -> int:
+        """当前批次中的记录数"""
+        return len(self._logs)
+
+    @property
+    def pending_bytes(self) -> int:
+        """当前批次的估算字节数"""
+        return self._nbytes
+
+    @property
+    def opened_at(self) -> float:
+        """当前批次第一条记录加入的时间（time.monotonic）"""
+        return self._opened_at
+
+    def add(self, log_data: Dict[str, Any]) -> List[LogBatch]:
+        """加入一条日志数据
+
+        Returns:
+            因达到上限而封好的批次（通常为空或一个）
+        """
+        timestamp = int(log_data['timestamp'])
+        contents = self.to_contents(log_data)
+        size = estimate_contents_size(contents)
+
+        if size <= self.record_max_bytes:
+            return self._append(timestamp, contents, size)
+
+        sealed: List[LogBatch] = []
+        for contents, size in self._fit_oversized(contents, size):
+            sealed.extend(self._append(timestamp, contents, size))
+        return sealed
+
+    def flush(self) -> Optional[LogBatch]:
+        """封存当前批次
+
+        Returns:
+            当前批次，没有记录时返回 None
+        """
+        if not self._logs:
+            return None
+        batch = LogBatch(self._logs, nbytes=self._nbytes)
+        self._logs = []
+        self._nbytes = 0
+        return batch
+
+    def flush_all(self) -> List[LogBatch]:
+        """封存所有未满的批次，与 `PartitionedBatcher.flush_all` 接口相同"""
+        batch = self.flush()
+        return [batch] if batch is not None else []
+
+    def _append(self, timestamp: int, contents: Contents, size: int) -> List[LogBatch]:
+        """追加一条日志，放不下时先封存当前批次"""
+        sealed = []
+        if self._logs and self._nbytes + size > self.max_bytes:
+            sealed.append(self.flush())
+        if not self._logs:
+            self._opened_at = time.monotonic()
+        self._logs.append((timestamp, contents))
+        self._nbytes += size
+        if len(self._logs) >= self.max_logs or self._nbytes >= self.max_bytes:
+            sealed.append(self.flush())
+        return sealed
+
+    def _fit_oversized(self, contents: Contents, size: int) -> List[Tuple[Contents, int]]:
+        """按策略处理超大记录，返回 (contents, 估算大小) 列表"""
+        if self.oversize_policy == OVERSIZE_DROP:
+            self.dropped += 1
+            self.dropped_bytes += size
+            return []
+        if self.oversize_policy == OVERSIZE_SPLIT:
+            parts = self._split(contents, size)
+            if parts:
+                self.split += 1
+                return parts
+        self.truncated += 1
+        contents = self._truncate(contents, size)
+        return [(contents, estimate_contents_size(contents))]
+
+    def _truncate(self, contents: Contents, size: int) -> Contents:
+        """从最大的字段开始截断，直到记录大小不超过上限"""
+        contents = list(contents)
+        excess = size - self.record_max_bytes
+        order = sorted(range(len(contents)), key=lambda i: len(contents[i][1]), reverse=True)
+        for index in order:
+            if excess <= 0:
+                break
+            key, value = contents[index]
+            value_bytes = utf8_len(value)
+            # 标记本身也占空间，按最长的标记预留
+            keep = value_bytes - excess - len(TRUNCATED_MARKER.format(value_bytes))
+            kept = truncate_utf8(value, keep) if keep > 0 else ""
+            new_value = kept + TRUNCATED_MARKER.format(value_bytes - utf8_len(kept))
+            if utf8_len(new_value) >= value_bytes:
+                continue
+            excess -= value_bytes - utf8_len(new_value)
+            contents[index] = (key, new_value)
+        return contents
+
+    def _split(self, contents: Contents, size: int) -> List[Tuple[Contents, int]]:
+        """把最大的字段切分到多条日志中
+
+        Returns:
+            切分结果，其他字段本身就超过上限无法切分时返回空列表
+        """
+        index = max(range(len(contents)), key=lambda i: len(contents[i][1]))
+        key, value = contents[index]
+        rest = contents[:index] + contents[index + 1:]
+        # 每个分片额外包含 log_part 字段和被切分字段的键
+        base_size = (
+            estimate_contents_size(rest)
+            + len(SPLIT_PART_KEY) + 16 + CONTENT_OVERHEAD_BYTES
+            + utf8_len(key) + CONTENT_OVERHEAD_BYTES
+        )
+        chunk_bytes = self.record_max_bytes - base_size
+        if chunk_bytes <= 0:
+            return []
+
+        chunks = []
+        encoded = value.encode('utf-8')
+        start = 0
+        while start < len(encoded):
+            end = min(start + chunk_bytes, len(encoded))
+            # 不在多字节字符中间切分（UTF-8 后续字节形如 10xxxxxx）
+            while end < len(encoded) and end > start + 1 and (encoded[end] & 0xC0) == 0x80:
+                end -= 1
+            chunks.append(encoded[start:end].decode('utf-8'))
+            start = end
+
+        total = len(chunks)
+        parts = []
+        for number, chunk in enumerate(chunks, 1):
+            part = rest + [(key, chunk), (SPLIT_PART_KEY, f"{number}/{total}")]
+            parts.append((part, estimate_contents_size(part)))
+        return parts
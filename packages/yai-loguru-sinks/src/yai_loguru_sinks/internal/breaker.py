@@ -0,0 +1,229 @@
+"""
+SLS 客户端熔断器
+
+SLS 不可用时每个批次都要等满 HTTP 超时才失败，flush worker 和发送线程被拖住，
+队列迅速堆积。熔断器统计连续失败：
+
+- closed：正常发送，连续失败达到 failure_threshold 次后打开
+- open：不发送请求，批次直接交给降级路径；reset_timeout 秒后进入半开
+- half_open：只放行少量探测批次，探测成功则关闭，失败则重新打开
+
+只有表示服务不可用的错误（限流、5xx、网络错误，见 `retry.is_retryable_error`）计为失败；
+鉴权或请求格式错误说明服务端可达，不影响熔断状态。
+
+熔断打开期间的批次由 `BatchFallback` 处理：丢弃并计数、写入磁盘暂存，或交给备用 sink。
+"""
+
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+
+from .data import LogBatch
+from .retry import is_retryable_error
+
+if TYPE_CHECKING:
+    from .spool import DiskSpool
+
+
+# 熔断器状态
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+# 降级策略
+FALLBACK_DROP = "drop"
+FALLBACK_SPOOL = "spool"
+FALLBACK_SINK = "sink"
+FALLBACK_POLICIES = (FALLBACK_DROP, FALLBACK_SPOOL, FALLBACK_SINK)
+
+
+class CircuitBreaker:
+    """连续失败计数的熔断器"""
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        half_open_max_probes: int = 1,
+        on_state_change: Optional[Callable[[str, str], None]] = None,
+    ) -> None:
+        """初始化熔断器
+
+        Args:
+            failure_threshold: 连续失败多少次后打开
+            reset_timeout: 打开后多久（秒）进入半开状态发送探测批次
+            half_open_max_probes: 半开状态下同时在途的探测批次数
+            on_state_change: 状态变化回调，参数为 (旧状态, 新状态)
+        """
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = max(0.0, reset_timeout)
+        self.half_open_max_probes = max(1, half_open_max_probes)
+        self._on_state_change = on_state_change
+
+        self._state = STATE_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._rejected = 0
+        self._transitions: Dict[str, int] = {
+            STATE_OPEN: 0,
+            STATE_HALF_OPEN: 0,
+            STATE_CLOSED: 0,
+        }
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """当前状态"""
+        return self._state
+
+    @property
+    def rejected(self) -> int:
+        """熔断期间被拒绝发送的批次数"""
+        return self._rejected
+
+    def metrics(self) -> Dict[str, Any]:
+        """熔断器指标：当前状态、进入各状态的次数和被拒绝的批次数"""
+        with self._lock:
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'opened': self._transitions[STATE_OPEN],
+                'half_opened': self._transitions[STATE_HALF_OPEN],
+                'closed': self._transitions[STATE_CLOSED],
+                'rejected': self._rejected,
+            }
+
+    def allow_request(self, now: Optional[float] = None) -> bool:
+        """是否允许发送一个批次
+
+        返回 True 时调用方必须在请求结束后调用 `record_success` 或 `record_failure`。
+        """
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            if self._state == STATE_OPEN and now >= self._opened_at + self.reset_timeout:
+                self._transition(STATE_HALF_OPEN)
+            if self._state == STATE_CLOSED:
+                return True
+            if self._state == STATE_HALF_OPEN and self._probes < self.half_open_max_probes:
+                self._probes += 1
+                return True
+            self._rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        """记录一次服务端可达的请求"""
+        with self._lock:
+            self._failures = 0
+            if self._state == STATE_HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+                self._transition(STATE_CLOSED)
+
+    def record_failure(self, now: Optional[float] = None) -> None:
+        """记录一次服务不可用的失败"""
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            self._failures += 1
+            if self._state == STATE_HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+                self._open(now)
+            elif self._state == STATE_CLOSED and self._failures >= self.failure_threshold:
+                self._open(now)
+
+    def record_error(self, error: BaseException) -> None:
+        """按错误类型记录请求结果"""
+        if is_retryable_error(error):
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def _open(self, now: float) -> None:
+        """打开熔断器（调用方持有锁）"""
+        self._opened_at = now
+        self._transition(STATE_OPEN)
+
+    def _transition(self, state: str) -> None:
+        """切换状态并计数（调用方持有锁）"""
+        previous = self._state
+        if previous == state:
+            return
+        self._state = state
+        self._transitions[state] += 1
+        if state == STATE_CLOSED:
+            self._probes = 0
+        if self._on_state_change is not None:
+            try:
+                self._on_state_change(previous, state)
+            except Exception as e:
+                print(f"SLS熔断器回调错误: {e}")
+
+
+class BatchFallback:
+    """熔断期间批次的降级处理"""
+
+    def __init__(
+        self,
+        policy: str = FALLBACK_DROP,
+        sink: Optional[Callable[[LogBatch], Any]] = None,
+        spool: Optional["DiskSpool"] = None,
+    ) -> None:
+        """初始化降级处理
+
+        Args:
+            policy: FALLBACK_DROP（丢弃并计数）、FALLBACK_SPOOL（写入磁盘暂存）
+                或 FALLBACK_SINK（交给备用 sink）
+            sink: 备用 sink，接收 `LogBatch`；policy 为 FALLBACK_SINK 时必填
+            spool: 磁盘暂存；policy 为 FALLBACK_SPOOL 时必填
+        """
+        if policy not in FALLBACK_POLICIES:
+            raise ValueError(
+                f"不支持的降级策略: {policy}，可选值为 {', '.join(FALLBACK_POLICIES)}"
+            )
+        if policy == FALLBACK_SINK and sink is None:
+            raise ValueError("降级策略为 sink 时必须提供 fallback_sink")
+        if policy == FALLBACK_SPOOL and spool is None:
+            raise ValueError("降级策略为 spool 时必须配置 spool_dir")
+        self.policy = policy
+        self._sink = sink
+        self._spool = spool
+        self._lock = threading.Lock()
+        self.dropped_batches = 0
+        self.dropped_logs = 0
+        self.dropped_bytes = 0
+        self.forwarded_batches = 0
+        self.spooled_batches = 0
+
+    def __call__(self, batch: LogBatch) -> None:
+        """处理一个未发送的批次"""
+        if self.policy == FALLBACK_SINK:
+            try:
+                self._sink(batch)  # type: ignore[misc]
+                with self._lock:
+                    self.forwarded_batches += 1
+                return
+            except Exception as e:
+                print(f"SLS备用sink错误: {e}")
+        elif self.policy == FALLBACK_SPOOL:
+            try:
+                if self._spool.append(batch):  # type: ignore[union-attr]
+                    with self._lock:
+                        self.spooled_batches += 1
+                    return
+            except Exception as e:
+                print(f"SLS磁盘暂存错误: {e}")
+        with self._lock:
+            self.dropped_batches += 1
+            self.dropped_logs += len(batch.logs)
+            self.dropped_bytes += batch.nbytes
+
+    def metrics(self) -> Dict[str, int]:
+        """降级处理的计数"""
+        with self._lock:
+            return {
+                'dropped_batches': self.dropped_batches,
+                'dropped_logs': self.dropped_logs,
+                'forwarded_batches': self.forwarded_batches,
+                'spooled_batches': self.spooled_batches,
+            }
@@ -0,0 +1,211 @@
+"""
+日志分类规则引擎
+
+按顺序匹配的分类规则，第一条命中的规则决定日志分类，都不命中时使用默认分类。
+每条规则的条件之间是“与”关系：
+
+- module_prefix: 模块名前缀（可以是多个前缀）
+- module_regex: 模块名正则
+- levels: 级别名集合
+- message_regex: 消息正则
+- extra_keys: extra 中必须存在的键
+
+模块和级别条件只取决于调用点，规则编译后按 (module, function, line, level)
+缓存每个调用点的匹配结果：同一条日志语句再次出现时，只需要检查依赖消息或
+extra 的少数候选规则，没有这类规则时分类就是一次字典查找。
+"""
+
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+
+# 规则字典中允许的键
+RULE_KEYS = frozenset({
+    'category', 'module_prefix', 'module_regex', 'levels', 'message_regex', 'extra_keys',
+})
+
+
+@dataclass(frozen=True)
+class CategoryRule:
+    """一条分类规则
+
+    Attributes:
+        category: 命中时使用的分类
+        module_prefix: 模块名前缀，任意一个匹配即可
+        module_regex: 模块名正则（search 语义）
+        levels: 级别名集合（不区分大小写）
+        message_regex: 消息正则（search 语义）
+        extra_keys: extra 中必须全部存在的键
+    """
+
+    category: str
+    module_prefix: Tuple[str, ...] = ()
+    module_regex: Optional[str] = None
+    levels: frozenset = frozenset()
+    message_regex: Optional[str] = None
+    extra_keys: Tuple[str, ...] = ()
+    _module_pattern: Optional["re.Pattern[str]"] = field(init=False, repr=False, compare=False)
+    _message_pattern: Optional["re.Pattern[str]"] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        """规范化条件并预编译正则
+
+        Raises:
+            ValueError: 缺少分类或正则无效
+        """
+        if not self.category:
+            raise ValueError("分类规则缺少 category")
+        try:
+            module_pattern = re.compile(self.module_regex) if self.module_regex else None
+            message_pattern = re.compile(self.message_regex) if self.message_regex else None
+        except re.error as e:
+            raise ValueError(f"分类规则 {self.category} 的正则无效: {e}") from e
+        object.__setattr__(self, 'levels', frozenset(level.upper() for level in self.levels))
+        object.__setattr__(self, '_module_pattern', module_pattern)
+        object.__setattr__(self, '_message_pattern', message_pattern)
+
+    @classmethod
+    def from_dict(cls, spec: Dict[str, Any]) -> "CategoryRule":
+        """从配置字典创建规则，单个字符串和列表都可以作为多值条件
+
+        Raises:
+            ValueError: 规则包含未知的键、缺少分类或正则无效
+        """
+        unknown = set(spec) - RULE_KEYS
+        if unknown:
+            raise ValueError(f"未知的分类规则字段: {', '.join(sorted(unknown))}")
+
+        def as_tuple(value: Any) -> Tuple[str, ...]:
+            if not value:
+                return ()
+            if isinstance(value, str):
+                return (value,)
+            return tuple(value)
+
+        return cls(
+            category=spec.get('category', ''),
+            module_prefix=as_tuple(spec.get('module_prefix')),
+            module_regex=spec.get('module_regex'),
+            levels=frozenset(as_tuple(spec.get('levels'))),
+            message_regex=spec.get('message_regex'),
+            extra_keys=as_tuple(spec.get('extra_keys')),
+        )
+
+    @property
+    def is_dynamic(self) -> bool:
+        """是否依赖消息或 extra（无法按调用点缓存）"""
+        return self._message_pattern is not None or bool(self.extra_keys)
+
+    def matches_call_site(self, module: str, level: str) -> bool:
+        """检查只取决于调用点的条件"""
+        if self.module_prefix and not module.startswith(self.module_prefix):
+            return False
+        if self._module_pattern is not None and not self._module_pattern.search(module):
+            return False
+        if self.levels and str(level).upper() not in self.levels:
+            return False
+        return True
+
+    def matches_record(self, record: Dict[str, Any]) -> bool:
+        """检查依赖消息和 extra 的条件"""
+        if self._message_pattern is not None:
+            if not self._message_pattern.search(str(record.get('message', ''))):
+                return False
+        if self.extra_keys:
+            extra = record.get('extra') or {}
+            # loguru 将 extra 参数存储在 record['extra']['extra'] 中，bind() 的值在 record['extra'] 中
+            nested = extra.get('extra')
+            if not isinstance(nested, dict):
+                nested = {}
+            for key in self.extra_keys:
+                if key not in extra and key not in nested:
+                    return False
+        return True
+
+
+# 消息中含 exception 的记录归为 error（依赖消息，按调用点缓存后作为候选规则逐条检查）
+EXCEPTION_MESSAGE_RULE: Dict[str, Any] = {'category': 'error', 'message_regex': '(?i)exception'}
+
+# 默认规则，与早期版本的硬编码分类逻辑一致
+DEFAULT_CATEGORY_RULES: List[Dict[str, Any]] = [
+    {'category': 'error', 'levels': ['ERROR']},
+    EXCEPTION_MESSAGE_RULE,
+    {'category': 'api', 'module_regex': '(?i)api'},
+    {'category': 'business', 'module_regex': '(?i)business'},
+]
+
+
+class CategoryMatcher:
+    """编译后的分类匹配器"""
+
+    def __init__(
+        self,
+        rules: Sequence[Union[CategoryRule, Dict[str, Any]]],
+        default_category: str,
+        cache_size: int = 4096,
+    ) -> None:
+        """编译分类规则
+
+        Args:
+            rules: 有序的分类规则（规则对象或配置字典）
+            default_category: 都不命中时的分类
+            cache_size: 调用点缓存的最大条目数，<= 0 表示不缓存
+        """
+        self.rules = tuple(
+            rule if isinstance(rule, CategoryRule) else CategoryRule.from_dict(rule)
+            for rule in rules
+        )
+        self.default_category = default_category
+
+        if cache_size > 0:
+            self._call_site_plan = lru_cache(maxsize=cache_size)(self._resolve_call_site)
+        else:
+            self._call_site_plan = self._resolve_call_site
+
+    @classmethod
+    def from_config(cls, config: Any) -> "CategoryMatcher":
+        """从 SlsConfig 创建匹配器，未配置规则时使用默认规则"""
+        rules = config.category_rules
+        if rules is None:
+            rules = DEFAULT_CATEGORY_RULES
+        return cls(rules, config.default_category, cache_size=config.category_cache_size)
+
+    def _resolve_call_site(
+        self, module: str, function: str, line: int, level: str
+    ) -> Tuple[Tuple[CategoryRule, ...], str]:
+        """计算调用点的匹配计划
+
+        Returns:
+            (候选规则, 兜底分类)：候选规则是调用点条件已满足、但还需要检查消息或
+            extra 的规则，按顺序检查；都不命中时使用兜底分类。
+        """
+        candidates = []
+        for rule in self.rules:
+            if not rule.matches_call_site(module, level):
+                continue
+            if not rule.is_dynamic:
+                return tuple(candidates), rule.category
+            candidates.append(rule)
+        return tuple(candidates), self.default_category
+
+    def classify(self, record: Dict[str, Any]) -> str:
+        """返回记录的分类"""
+        candidates, category = self._call_site_plan(
+            record.get('name', '') or '',
+            record.get('function', ''),
+            record.get('line', 0),
+            record['level'].name,
+        )
+        for rule in candidates:
+            if rule.matches_record(record):
+                return rule.category
+        return category
+
+    __call__ = classify
+
+    def cache_info(self) -> Any:
+        """调用点缓存的命中统计（未启用缓存时返回 None）"""
+        cache_info = getattr(self._call_site_plan, 'cache_info', None)
+        return cache_info() if cache_info else None
@@ -0,0 +1,284 @@
+"""
+本机采集进程
+
+一台机器上运行几十个 gunicorn worker 时，每个 worker 都有自己的 SlsSink、上传线程和连接，
+各自发送的批次又小、压缩率又低。采集模式下 worker 的 sink 只在本地组批，把批次写入本机
+采集进程的 Unix socket；采集进程（`python -m yai_loguru_sinks.collector`）把所有 worker
+的记录重新组成大批次，统一编码、压缩和上传。
+
+线路格式：每个帧为 `<长度:u32><负载>`，负载与磁盘暂存相同（`spool.encode_batch`），
+写入目标总是显式给出：批次未路由时使用 worker 配置的日志库和 Topic。采集进程使用自己
+配置的 project 和访问密钥。
+
+背压：采集进程的队列使用 block 策略，已读取的帧一直等到队列有空间才放入，不按超时丢弃；
+等待期间连接线程不再读取 socket，worker 写入随之阻塞，超过 timeout 仍写不进去时抛出超时
+错误，批次按正常路径重试。写了一半的帧在连接关闭时被丢弃，重试不会重复写入。只有采集进程
+关闭时仍在等待的记录会被拒绝，计入采集进程 sink 的 dropped_records。
+
+回退：worker 连接采集进程失败（未运行或 socket 不存在）时直接上传，之后每隔
+collector_retry_interval 秒再尝试连接。采集进程收到的记录不做确认，采集进程崩溃时
+已写入 socket 而未上传的记录会丢失。
+
+配置 collector_ring 时改为写入采集进程创建的共享内存环形缓冲区（`shm_ring`），记录不经过
+socket 复制，缓冲区满时按 collector_ring_policy 等待最长 timeout 秒（block）或不等待、
+由 worker 直接上传（drop_newest）；缓冲区不存在或读方进程已退出时直接上传。
+
+本模块是 worker 一侧的客户端，采集进程的实现见 `collector_server`。
+"""
+
+import socket
+import struct
+import threading
+import time
+from typing import Any, Optional
+
+from .data import LogBatch
+from .log_queue import POLICY_BLOCK, POLICY_DROP_NEWEST
+from .shm_ring import RING_POLICIES, SharedRingBuffer
+from .spool import encode_batch
+
+
+# 帧头：负载长度
+FRAME_HEADER = struct.Struct('<I')
+
+# 单个帧的负载上限，超过时视为协议错误并断开连接
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+# 未指定时的 socket 路径
+DEFAULT_COLLECTOR_SOCKET = "/tmp/yai-loguru-sinks-collector.sock"
+
+
+def encode_payload(batch: LogBatch, logstore: str, topic: str) -> bytes:
+    """把批次编码为帧负载，未路由的批次写入给定的日志库和 Topic"""
+    return encode_batch(LogBatch(
+        batch.logs,
+        hash_key=batch.hash_key,
+        logstore=batch.logstore or logstore,
+        topic=topic if batch.topic is None else batch.topic,
+    ))
+
+
+def encode_frame(batch: LogBatch, logstore: str, topic: str) -> bytes:
+    """把批次编码为带长度前缀的帧"""
+    payload = encode_payload(batch, logstore, topic)
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+class CollectorClient:
+    """worker 一侧：把批次写入本机采集进程"""
+
+    def __init__(
+        self,
+        path: str,
+        logstore: str,
+        topic: str,
+        timeout: float = 30.0,
+        retry_interval: float = 5.0,
+    ) -> None:
+        """初始化，连接在第一次发送时建立
+
+        Args:
+            path: 采集进程的 Unix socket 路径
+            logstore: 未路由的批次写入的日志库
+            topic: 未路由的批次使用的 Topic
+            timeout: 写入的最长阻塞时间（秒）
+            retry_interval: 连接失败后多久再尝试（秒）
+        """
+        self.path = path
+        self.logstore = logstore
+        self.topic = topic
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self._sock: Optional[socket.socket] = None
+        self._lock = threading.Lock()
+        # 在此之前不再尝试连接（time.monotonic）
+        self._retry_at = 0.0
+
+    @classmethod
+    def from_config(cls, config: Any) -> "CollectorClient":
+        """按 SlsConfig 创建"""
+        return cls(
+            config.collector_socket,
+            config.logstore,
+            config.topic,
+            timeout=config.timeout,
+            retry_interval=config.collector_retry_interval,
+        )
+
+    @property
+    def connected(self) -> bool:
+        """是否已连接采集进程"""
+        return self._sock is not None
+
+    def send(self, batch: LogBatch) -> bool:
+        """把批次写入采集进程
+
+        Returns:
+            是否已写入；采集进程未运行时返回 False，由调用方直接上传
+
+        Raises:
+            OSError: 写入超时或连接中断，批次交给重试
+        """
+        frame = encode_frame(batch, self.logstore, self.topic)
+        with self._lock:
+            if self._sock is None and not self._connect():
+                return False
+            try:
+                self._sock.sendall(frame)
+            except OSError:
+                # 写了一半的帧由采集进程丢弃，重新连接后整批重发
+                self._disconnect()
+                raise
+        return True
+
+    def _connect(self) -> bool:
+        """连接采集进程（调用方持有锁），失败时在 retry_interval 内不再尝试"""
+        now = time.monotonic()
+        if now < self._retry_at or not hasattr(socket, 'AF_UNIX'):
+            return False
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            self._retry_at = now + self.retry_interval
+            return False
+        self._sock = sock
+        return True
+
+    def _disconnect(self) -> None:
+        """关闭连接（调用方持有锁）"""
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def close(self) -> None:
+        """关闭连接"""
+        with self._lock:
+            self._disconnect()
+
+
+class RingCollectorClient:
+    """worker 一侧：把批次写入采集进程的共享内存环形缓冲区
+
+    与 `CollectorClient` 接口相同。缓冲区中的每条记录是一个帧负载，不需要长度前缀。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        logstore: str,
+        topic: str,
+        timeout: float = 30.0,
+        retry_interval: float = 5.0,
+        policy: str = POLICY_BLOCK,
+    ) -> None:
+        """初始化，缓冲区在第一次发送时打开
+
+        Args:
+            path: 缓冲区文件路径
+            logstore: 未路由的批次写入的日志库
+            topic: 未路由的批次使用的 Topic
+            timeout: block 策略下缓冲区满时的最长等待时间（秒）
+            retry_interval: 打开失败后多久再尝试（秒）
+            policy: 缓冲区满时的策略：block（等待，超时后批次交给重试）/
+                drop_newest（不等待，批次不写入缓冲区，由调用方直接上传）
+
+        Raises:
+            ValueError: 未知的缓冲区满时策略
+        """
+        if policy not in RING_POLICIES:
+            raise ValueError(f"无效的缓冲区满时策略: {policy}，可选值: {', '.join(RING_POLICIES)}")
+        self.path = path
+        self.logstore = logstore
+        self.topic = topic
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.policy = policy
+        self._ring: Optional[SharedRingBuffer] = None
+        self._lock = threading.Lock()
+        self._retry_at = 0.0
+
+    @classmethod
+    def from_config(cls, config: Any) -> "RingCollectorClient":
+        """按 SlsConfig 创建"""
+        return cls(
+            config.collector_ring,
+            config.logstore,
+            config.topic,
+            timeout=config.timeout,
+            retry_interval=config.collector_retry_interval,
+            policy=config.collector_ring_policy,
+        )
+
+    @property
+    def connected(self) -> bool:
+        """是否已打开缓冲区"""
+        return self._ring is not None
+
+    def send(self, batch: LogBatch) -> bool:
+        """把批次写入缓冲区
+
+        Returns:
+            是否已写入；采集进程未运行、批次超过缓冲区容量或 drop_newest 策略下缓冲区已满时
+            返回 False，由调用方直接上传
+
+        Raises:
+            TimeoutError: block 策略下缓冲区持续已满，批次交给重试
+        """
+        with self._lock:
+            if self._ring is None and not self._attach():
+                return False
+            ring = self._ring
+            if not ring.consumer_pid:
+                # 采集进程已正常退出
+                self._detach(ring)
+                return False
+        try:
+            if ring.put(encode_payload(batch, self.logstore, self.topic), timeout=self.timeout):
+                return True
+        except ValueError:
+            return False
+        if not ring.consumer_alive():
+            # 采集进程已退出，缓冲区不会再被读取
+            with self._lock:
+                self._detach(ring)
+            return False
+        if self.policy == POLICY_DROP_NEWEST:
+            return False
+        raise TimeoutError("采集进程的共享内存缓冲区已满")
+
+    def _attach(self) -> bool:
+        """打开缓冲区（调用方持有锁），失败时在 retry_interval 内不再尝试"""
+        now = time.monotonic()
+        if now < self._retry_at:
+            return False
+        try:
+            ring = SharedRingBuffer.attach(self.path, policy=self.policy)
+        except (OSError, ValueError):
+            self._retry_at = now + self.retry_interval
+            return False
+        if not ring.consumer_alive():
+            ring.close()
+            self._retry_at = now + self.retry_interval
+            return False
+        self._ring = ring
+        return True
+
+    def _detach(self, ring: SharedRingBuffer) -> None:
+        """关闭缓冲区（调用方持有锁）"""
+        if self._ring is ring:
+            self._ring = None
+            self._retry_at = time.monotonic() + self.retry_interval
+            ring.close()
+
+    def close(self) -> None:
+        """关闭缓冲区"""
+        with self._lock:
+            if self._ring is not None:
+                self._detach(self._ring)
+
@@ -0,0 +1,340 @@
+"""
+采集进程一侧
+
+`CollectorServer` 监听 Unix socket，每个 worker 连接一个读取线程，逐帧解码后把记录放入
+`CollectorSink` 的队列。`CollectorSink` 就是一个 SlsSink：队列、linger 组批、并发发送、
+重试、熔断、磁盘暂存和关闭排空都与普通 sink 相同，只是队列中的记录已由 worker 转换为
+contents，按帧中给出的写入目标和 hashKey 分区组批。线路格式和背压见 `collector` 模块。
+"""
+
+import math
+import os
+import socket
+import stat
+import threading
+import time
+from dataclasses import replace
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Tuple
+
+from .async_handler import AsyncHandler
+from .batcher import LogBatcher
+from .collector import DEFAULT_COLLECTOR_SOCKET, FRAME_HEADER, MAX_FRAME_BYTES
+from .core import SlsSink
+from .data import DrainReport, LogBatch, SlsConfig
+from .log_queue import POLICY_BLOCK
+from .routing import Destination
+from .sharding import PartitionedBatcher
+from .shm_ring import SharedRingBuffer
+from .spool import decode_batch
+
+
+class FrameDestination:
+    """采集进程的分区依据：写入目标和 hashKey 由 worker 在帧中给出
+
+    同时充当 `PartitionedBatcher` 的路由表和 hashKey 路由器。
+    """
+
+    @staticmethod
+    def resolve(record: Dict[str, Any]) -> Destination:
+        return record['destination']
+
+    @staticmethod
+    def hash_key(record: Dict[str, Any]) -> Optional[str]:
+        return record['hash_key']
+
+
+class CollectedRecordHandler(AsyncHandler):
+    """采集进程的异步处理器：队列中是 worker 已转换好 contents 的记录"""
+
+    def create_batcher(self) -> PartitionedBatcher:
+        """按帧中的写入目标和 hashKey 分区组批"""
+        config = self.sink.config
+        to_contents = itemgetter('contents')
+        return PartitionedBatcher(
+            lambda: LogBatcher.from_config(config, to_contents),
+            router=FrameDestination,
+            routes=FrameDestination,
+        )
+
+
+class CollectorSink(SlsSink):
+    """采集进程内的 sink，队列、发送、重试、暂存和关闭排空与 SlsSink 相同"""
+
+    handler_class = CollectedRecordHandler
+
+    @staticmethod
+    def collector_config(config: SlsConfig) -> SlsConfig:
+        """采集进程使用的配置
+
+        队列使用 block 策略，`CollectorServer` 放入记录时一直等到有空间，把背压传回 worker；
+        记录已在 worker 中转换，不再做字段映射；采集进程自己不再转发给采集进程。
+        """
+        return replace(
+            config,
+            queue_full_policy=POLICY_BLOCK,
+            queue_block_timeout=config.timeout,
+            staging=False,
+            deferred_enrichment=False,
+            collector_socket=None,
+            collector_ring=None,
+        )
+
+    def put_batch(self, batch: LogBatch, cancel: Optional[threading.Event] = None) -> int:
+        """把 worker 写入的批次拆成记录放入队列
+
+        worker 已把这些记录当作发送成功，队列满时不按超时丢弃，一直等待到有空间；
+        只有 cancel 被设置（采集进程关闭）时剩余的记录才被拒绝，计入 sink 的丢弃指标。
+
+        Args:
+            batch: worker 写入的批次
+            cancel: 设置后不再等待，None 时最长等待 timeout 秒
+
+        Returns:
+            被接收的记录数
+        """
+        destination = Destination(batch.logstore, batch.topic)
+        size = batch.nbytes // max(1, len(batch.logs))
+        entries: List[Tuple[Any, int, int]] = [
+            (
+                {'timestamp': timestamp, 'contents': contents,
+                 'destination': destination, 'hash_key': batch.hash_key},
+                size,
+                0,
+            )
+            for timestamp, contents in batch.logs
+        ]
+        self.metrics.enqueued_records.add(len(entries))
+        self.metrics.enqueued_bytes.add(batch.nbytes)
+        if cancel is None:
+            return self.log_queue.put_many(entries)
+        return self.log_queue.put_many(entries, timeout=math.inf, cancel=cancel)
+
+
+class CollectorServer:
+    """本机采集进程：接收 worker 写入的帧，统一组批、压缩和上传"""
+
+    def __init__(
+        self,
+        sink: CollectorSink,
+        path: str = DEFAULT_COLLECTOR_SOCKET,
+        ring: Optional[SharedRingBuffer] = None,
+    ) -> None:
+        """初始化
+
+        Args:
+            sink: 负责组批和上传的 sink
+            path: 监听的 Unix socket 路径
+            ring: 同时读取的共享内存环形缓冲区，由本进程创建
+        """
+        self.sink = sink
+        self.path = path
+        self.ring = ring
+        self._ring_thread: Optional[threading.Thread] = None
+        self._listener: Optional[socket.socket] = None
+        self._accept_thread: Optional[threading.Thread] = None
+        self._connections: Dict[socket.socket, threading.Thread] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+        # 统计
+        self.received_frames = 0
+        self.received_logs = 0
+        self.rejected_logs = 0
+
+    @classmethod
+    def from_config(
+        cls,
+        config: SlsConfig,
+        path: str = DEFAULT_COLLECTOR_SOCKET,
+        ring_path: Optional[str] = None,
+        ring_bytes: int = 16 * 1024 * 1024,
+    ) -> "CollectorServer":
+        """按 SlsConfig 创建采集进程
+
+        Args:
+            config: 采集进程的 SLS 配置
+            path: 监听的 Unix socket 路径
+            ring_path: 共享内存环形缓冲区的文件路径，None 表示不创建
+            ring_bytes: 缓冲区数据区大小
+
+        Raises:
+            RuntimeError: 已有采集进程在使用该缓冲区
+        """
+        ring = create_collector_ring(ring_path, ring_bytes) if ring_path else None
+        return cls(CollectorSink(CollectorSink.collector_config(config)), path, ring)
+
+    def start(self) -> None:
+        """开始监听
+
+        Raises:
+            RuntimeError: 已有采集进程在监听同一路径
+        """
+        self._remove_stale_socket()
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.path)
+        listener.listen(128)
+        self._listener = listener
+        self._accept_thread = threading.Thread(
+            target=self._accept_loop, name="yai-sls-collector-accept", daemon=True
+        )
+        self._accept_thread.start()
+        if self.ring is not None:
+            self._ring_thread = threading.Thread(
+                target=self._drain_ring, name="yai-sls-collector-ring", daemon=True
+            )
+            self._ring_thread.start()
+
+    def serve_forever(self) -> None:
+        """监听直到 `close()` 被调用"""
+        if self._listener is None:
+            self.start()
+        self._stop_event.wait()
+
+    def _remove_stale_socket(self) -> None:
+        """删除上次未清理的 socket 文件，已有进程在监听时报错"""
+        try:
+            mode = os.stat(self.path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise RuntimeError(f"采集进程的 socket 路径已被其他文件占用: {self.path}")
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except OSError:
+            os.unlink(self.path)
+            return
+        finally:
+            probe.close()
+        raise RuntimeError(f"已有采集进程在监听: {self.path}")
+
+    def _accept_loop(self) -> None:
+        """接受 worker 的连接，每个连接一个读取线程"""
+        while not self._stop_event.is_set():
+            try:
+                conn, _ = self._listener.accept()
+            except OSError:
+                return
+            thread = threading.Thread(
+                target=self._serve_connection, args=(conn,), name="yai-sls-collector-conn", daemon=True
+            )
+            with self._lock:
+                self._connections[conn] = thread
+            thread.start()
+
+    def _serve_connection(self, conn: socket.socket) -> None:
+        """逐帧读取并放入队列；队列满时放入一直阻塞，不再读取 socket，worker 写入随之阻塞"""
+        reader = conn.makefile('rb')
+        try:
+            while not self._stop_event.is_set():
+                header = reader.read(FRAME_HEADER.size)
+                if len(header) < FRAME_HEADER.size:
+                    return
+                (length,) = FRAME_HEADER.unpack(header)
+                if length > MAX_FRAME_BYTES:
+                    print(f"SLS采集进程错误: 帧长度 {length} 超过上限，断开连接")
+                    return
+                payload = reader.read(length)
+                if len(payload) < length:
+                    # 连接在帧中间断开，worker 会整批重发
+                    return
+                self.handle_payload(payload)
+        except (OSError, ValueError) as e:
+            if not self._stop_event.is_set():
+                print(f"SLS采集进程错误: {e}")
+        finally:
+            reader.close()
+            conn.close()
+            with self._lock:
+                self._connections.pop(conn, None)
+
+    def _drain_ring(self) -> None:
+        """批量读取共享内存缓冲区；队列满时放入阻塞，缓冲区随之写满，写方等待"""
+        while not self._stop_event.is_set():
+            try:
+                for payload in self.ring.drain(256, timeout=0.1):
+                    self.handle_payload(payload)
+            except Exception as e:
+                print(f"SLS采集进程错误: {e}")
+                time.sleep(1)  # 避免错误循环
+
+    def handle_payload(self, payload: bytes, wait: bool = True) -> None:
+        """处理一个帧的负载
+
+        Args:
+            payload: 帧负载
+            wait: 队列满时是否一直等待到关闭，False 时最长等待 timeout 秒
+        """
+        batch = decode_batch(payload)
+        accepted = self.sink.put_batch(batch, cancel=self._stop_event if wait else None)
+        with self._lock:
+            self.received_frames += 1
+            self.received_logs += len(batch.logs)
+            self.rejected_logs += len(batch.logs) - accepted
+
+    def close(self) -> DrainReport:
+        """停止监听，断开所有连接，排空并关闭 sink
+
+        Returns:
+            sink 关闭时的投递统计
+        """
+        self._stop_event.set()
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            try:
+                # 唤醒阻塞在 accept 上的线程
+                listener.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            listener.close()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+        with self._lock:
+            connections = list(self._connections.items())
+        for conn, _ in connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        for _, thread in connections:
+            thread.join(timeout=1.0)
+        if self._accept_thread is not None:
+            self._accept_thread.join(timeout=1.0)
+        if self._ring_thread is not None:
+            self._ring_thread.join(timeout=1.0)
+        if self.ring is not None:
+            # 先标记读方已退出，写方不再写入、改为直接上传；剩余的记录交给 sink 排空
+            self.ring.mark_closed()
+            self.ring.unlink()
+            deadline = time.monotonic() + 0.5
+            while True:
+                for payload in self.ring.drain(1 << 30):
+                    self.handle_payload(payload, wait=False)
+                if not self.ring.used_bytes or time.monotonic() >= deadline:
+                    break
+                time.sleep(0.01)
+            self.ring.close()
+        return self.sink.close()
+
+
+def create_collector_ring(path: str, capacity: int) -> SharedRingBuffer:
+    """创建采集进程读取的共享内存环形缓冲区
+
+    Raises:
+        RuntimeError: 已有存活的采集进程在读取该缓冲区
+    """
+    try:
+        existing = SharedRingBuffer.attach(path)
+    except (OSError, ValueError):
+        existing = None
+    if existing is not None:
+        try:
+            if existing.consumer_alive() and existing.consumer_pid != os.getpid():
+                raise RuntimeError(f"已有采集进程在读取共享内存缓冲区: {path}")
+        finally:
+            existing.close()
+    return SharedRingBuffer.create(path, capacity)
+
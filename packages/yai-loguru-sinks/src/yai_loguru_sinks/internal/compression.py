@@ -0,0 +1,342 @@
+"""
+PutLogs 请求体压缩
+
+提供可插拔的压缩编码器（codec），对应 SLS 的 x-log-compresstype：
+
+- none: 不压缩，始终可用
+- deflate: 标准库 zlib，始终可用
+- lz4: lz4.block（SDK 的依赖），SDK 默认使用的压缩方式
+- zstd: 安装了 zstandard（或 zstd）时可用
+
+`CompressionSelector` 负责：小于 `min_bytes` 的批次不压缩；`auto` 模式下定期用所有
+可用编码器压缩同一个批次采样压缩率和速度，按带宽和 CPU 预算选择吞吐最高的编码器；
+记录每个编码器的压缩率和耗时。
+"""
+
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+try:
+    import lz4.block  # type: ignore
+    HAS_LZ4 = True
+except ImportError:
+    HAS_LZ4 = False
+
+try:
+    import zstandard  # type: ignore
+    HAS_ZSTD = True
+except ImportError:
+    zstandard = None
+    try:
+        import zstd  # type: ignore
+        HAS_ZSTD = True
+    except ImportError:
+        zstd = None
+        HAS_ZSTD = False
+
+
+CODEC_AUTO = "auto"
+
+# 采样结果的指数加权系数，越大越偏向最近的批次
+_EWMA_ALPHA = 0.3
+
+
+class Codec:
+    """压缩编码器基类，默认不压缩"""
+
+    name = "none"
+    header: Optional[str] = None             # x-log-compresstype 请求头的值，None 表示不压缩
+    available = True
+
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+
+class DeflateCodec(Codec):
+    """zlib 格式的 deflate 压缩"""
+
+    name = "deflate"
+    header = "deflate"
+
+    def __init__(self, level: int = 6) -> None:
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+
+class Lz4Codec(Codec):
+    """LZ4 block 压缩（不带长度前缀，原始大小由 x-log-bodyrawsize 给出）"""
+
+    name = "lz4"
+    header = "lz4"
+    available = HAS_LZ4
+
+    def __init__(self) -> None:
+        if not HAS_LZ4:
+            raise ImportError("lz4 未安装，请运行: uv add lz4")
+
+    def compress(self, data: bytes) -> bytes:
+        return lz4.block.compress(data, store_size=False)
+
+
+class ZstdCodec(Codec):
+    """Zstandard 压缩"""
+
+    name = "zstd"
+    header = "zstd"
+    available = HAS_ZSTD
+
+    def __init__(self, level: int = 1) -> None:
+        if not HAS_ZSTD:
+            raise ImportError("zstandard 未安装，请运行: uv add zstandard")
+        self.level = level
+        # ZstdCompressor 不能被多个线程同时使用，每个发送线程各持有一个
+        self._local = threading.local()
+
+    def compress(self, data: bytes) -> bytes:
+        if zstandard is None:
+            return zstd.compress(data, self.level)
+        compressor = getattr(self._local, 'compressor', None)
+        if compressor is None:
+            compressor = self._local.compressor = zstandard.ZstdCompressor(level=self.level)
+        return compressor.compress(data)
+
+
+CODECS: Dict[str, Type[Codec]] = {
+    Codec.name: Codec,
+    DeflateCodec.name: DeflateCodec,
+    Lz4Codec.name: Lz4Codec,
+    ZstdCodec.name: ZstdCodec,
+}
+
+
+def available_codecs() -> List[str]:
+    """当前环境可用的编码器名称"""
+    return [name for name, codec_class in CODECS.items() if codec_class.available]
+
+
+def create_codec(name: str) -> Codec:
+    """按名称创建编码器
+
+    Raises:
+        ValueError: 未知的编码器名称
+        ImportError: 编码器依赖的库未安装
+    """
+    codec_class = CODECS.get(name)
+    if codec_class is None:
+        raise ValueError(
+            f"未知的压缩方式: {name}，可选值: {CODEC_AUTO}, {', '.join(CODECS)}"
+        )
+    return codec_class()
+
+
+def run_codecs(
+    codecs: Dict[str, Codec], names: List[str], body: bytes
+) -> Dict[str, Tuple[bytes, float]]:
+    """用指定的编码器分别压缩请求体
+
+    Returns:
+        编码器名称 -> (压缩结果, 耗时秒数)
+    """
+    results = {}
+    for name in names:
+        start = time.perf_counter()
+        data = codecs[name].compress(body)
+        results[name] = (data, time.perf_counter() - start)
+    return results
+
+
+class CodecStats:
+    """单个编码器的累计统计和采样估计"""
+
+    def __init__(self) -> None:
+        self.batches = 0
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        self.seconds = 0.0
+        # auto 模式的采样估计：压缩后 / 压缩前，以及每秒压缩的原始字节数
+        self.samples = 0
+        self.sampled_ratio: Optional[float] = None
+        self.sampled_speed: Optional[float] = None
+
+    def record(self, raw: int, compressed: int, seconds: float) -> None:
+        self.batches += 1
+        self.raw_bytes += raw
+        self.compressed_bytes += compressed
+        self.seconds += seconds
+
+    def sample(self, raw: int, compressed: int, seconds: float) -> None:
+        self.samples += 1
+        ratio = compressed / raw
+        speed = raw / max(seconds, 1e-9)
+        if self.sampled_ratio is None:
+            self.sampled_ratio, self.sampled_speed = ratio, speed
+        else:
+            self.sampled_ratio += _EWMA_ALPHA * (ratio - self.sampled_ratio)
+            self.sampled_speed += _EWMA_ALPHA * (speed - self.sampled_speed)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            'batches': self.batches,
+            'raw_bytes': self.raw_bytes,
+            'compressed_bytes': self.compressed_bytes,
+            'ratio': self.compressed_bytes / self.raw_bytes if self.raw_bytes else None,
+            'seconds': self.seconds,
+            'mb_per_second': self.raw_bytes / self.seconds / 1e6 if self.seconds else None,
+            'samples': self.samples,
+            'sampled_ratio': self.sampled_ratio,
+            'sampled_mb_per_second': (
+                self.sampled_speed / 1e6 if self.sampled_speed is not None else None
+            ),
+        }
+
+
+class CompressionSelector:
+    """选择请求体的压缩方式并记录统计
+
+    auto 模式下按吞吐模型选择编码器：发送一个原始字节需要网络传输 `ratio` 个字节，
+    并占用 `1 / speed` 秒的压缩 CPU。在 `bandwidth` 字节/秒的上行带宽和 `cpu_budget`
+    个核的压缩预算下，可持续的原始字节吞吐为
+
+        min(bandwidth / ratio, cpu_budget * speed)
+
+    带宽充裕时倾向于快而压缩率低的编码器（或不压缩），带宽紧张时倾向于压缩率高的编码器。
+    """
+
+    def __init__(
+        self,
+        codec: str = Lz4Codec.name,
+        min_bytes: int = 512,
+        bandwidth: float = 10.0,
+        cpu_budget: float = 0.5,
+        sample_interval: int = 100,
+    ) -> None:
+        """初始化
+
+        Args:
+            codec: none / deflate / lz4 / zstd，或 auto（在可用编码器中自动选择）
+            min_bytes: 小于该字节数的请求体不压缩
+            bandwidth: 上行带宽估计（MB/秒），auto 模式使用
+            cpu_budget: 可用于压缩的 CPU（核数），auto 模式使用
+            sample_interval: auto 模式每隔多少个批次重新采样一次
+        """
+        self.auto = codec == CODEC_AUTO
+        if self.auto:
+            self.codecs = {name: create_codec(name) for name in available_codecs()}
+            current = Lz4Codec.name if Lz4Codec.name in self.codecs else DeflateCodec.name
+        else:
+            self.codecs = {codec: create_codec(codec)}
+            current = codec
+        self.current = self.codecs[current]
+        self.min_bytes = max(0, min_bytes)
+        self.bandwidth = bandwidth * 1e6
+        self.cpu_budget = cpu_budget
+        self.sample_interval = max(1, sample_interval)
+        self.skipped_batches = 0
+        self.stats = {name: CodecStats() for name in self.codecs}
+        self._countdown = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Any) -> "CompressionSelector":
+        """按 SlsConfig 创建，compress 为 False 时不压缩"""
+        return cls(
+            codec=config.compress_codec if config.compress else Codec.name,
+            min_bytes=config.compress_min_bytes,
+            bandwidth=config.compress_bandwidth,
+            cpu_budget=config.compress_cpu_budget,
+            sample_interval=config.compress_sample_interval,
+        )
+
+    @property
+    def codec_name(self) -> str:
+        """当前使用的编码器名称"""
+        return self.current.name
+
+    def compress(self, body: bytes) -> Tuple[Optional[str], bytes]:
+        """压缩请求体
+
+        Returns:
+            (x-log-compresstype 请求头的值，不压缩时为 None, 请求体)
+        """
+        raw = len(body)
+        if raw < self.min_bytes or raw == 0:
+            self.skip()
+            return None, body
+
+        results = run_codecs(self.codecs, self.plan(), body)
+        name = self.record(raw, {name: (len(data), elapsed) for name, (data, elapsed) in results.items()})
+        return self.codecs[name].header, results[name][0]
+
+    def plan(self) -> List[str]:
+        """本批次要运行的编码器：通常只有当前编码器，auto 模式到采样间隔时为全部可用编码器"""
+        with self._lock:
+            if self.auto:
+                self._countdown -= 1
+                if self._countdown <= 0:
+                    self._countdown = self.sample_interval
+                    return list(self.codecs)
+            return [self.current.name]
+
+    def record(self, raw: int, results: Dict[str, Tuple[int, float]]) -> str:
+        """记录 `plan` 中编码器的运行结果
+
+        Args:
+            raw: 压缩前的字节数
+            results: 编码器名称 -> (压缩后的字节数, 耗时秒数)
+
+        Returns:
+            本批次应使用的编码器名称（采样后可能切换）
+        """
+        with self._lock:
+            if len(results) > 1:
+                for name, (size, elapsed) in results.items():
+                    if name != Codec.name:
+                        self.stats[name].sample(raw, size, elapsed)
+                self.current = self.codecs[self._choose()]
+            name = self.current.name if self.current.name in results else next(iter(results))
+            size, elapsed = results[name]
+            self.stats[name].record(raw, size, elapsed)
+        return name
+
+    def skip(self) -> None:
+        """记录一个因小于 min_bytes 而未压缩的批次"""
+        with self._lock:
+            self.skipped_batches += 1
+
+    def estimated_throughput(self, name: str) -> Optional[float]:
+        """按采样估计编码器可持续的原始字节吞吐（字节/秒），尚未采样时返回 None"""
+        if name == Codec.name:
+            return self.bandwidth
+        stats = self.stats[name]
+        if stats.sampled_ratio is None:
+            return None
+        network = self.bandwidth / max(stats.sampled_ratio, 1e-9)
+        cpu = self.cpu_budget * stats.sampled_speed
+        return min(network, cpu)
+
+    def _choose(self) -> str:
+        """吞吐最高的编码器，吞吐相同时选择压缩率更高的"""
+        best_name = self.current.name
+        best_key: Optional[Tuple[float, float]] = None
+        for name in self.codecs:
+            throughput = self.estimated_throughput(name)
+            if throughput is None:
+                continue
+            ratio = self.stats[name].sampled_ratio if name != Codec.name else 1.0
+            key = (throughput, -ratio)
+            if best_key is None or key > best_key:
+                best_name, best_key = name, key
+        return best_name
+
+    def metrics(self) -> Dict[str, Any]:
+        """当前编码器、跳过压缩的批次数和各编码器的统计"""
+        with self._lock:
+            return {
+                'codec': self.current.name,
+                'skipped_batches': self.skipped_batches,
+                'codecs': {name: stats.metrics() for name, stats in self.stats.items()},
+            }
@@ -5,25 +5,48 @@ SLS Sink 核心实现
 """
 
 import threading
-import socket
-from typing import Any, Dict
-from queue import Queue, Empty
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
 try:
-    from aliyun.log import LogClient  # type: ignore
+    # SDK 的 LogClient 在内部重试最多 10 次，sink 使用只发送一次的子类，见 sls_client
+    from .sls_client import SingleAttemptLogClient as LogClient
     HAS_ALIYUN_SDK = True
 except ImportError:
     HAS_ALIYUN_SDK = False
     LogClient = None
 
-from .data import SlsConfig
+from .data import DrainReport, SlsConfig
 from .async_handler import AsyncHandler
 from .sls_pack_id import create_pack_id_manager
+from .host_metadata import HostMetadataResolver
+from .field_plan import FieldPlan, FieldSchema
+from .categories import CategoryMatcher
+from .compression import CompressionSelector
+from .encoders import create_json_encoder
+from .log_queue import (
+    RECORD_OVERHEAD_BYTES,
+    BoundedLogQueue,
+    estimate_record_size,
+    resolve_level_no,
+)
+from .staging import StagedLogQueue
+from .sender import AdaptiveConcurrencyLimiter, BatchSender
+from .retry import RetryBudget, RetryScheduler
+from .breaker import BatchFallback, CircuitBreaker
+from .retry import is_retryable_error
+from .spool import DiskSpool, SpoolReplayer
+from .shutdown import ShutdownDrain, register_exit_drain, unregister_exit_drain
+from .forking import fork_spool_dir, orphaned_fork_spool_dirs, register_fork_reset
+from .metrics import MetricsExporter, SinkMetrics
 
 
 class SlsSink:
     """SLS Sink 实现类"""
     
+    # 异步处理器的类型，采集进程替换为处理已转换记录的版本
+    handler_class = AsyncHandler
+    
     def __init__(self, config: SlsConfig) -> None:
         if not HAS_ALIYUN_SDK:
             raise ImportError(
@@ -31,19 +54,128 @@ class SlsSink:
             )
         
         self.config = config
+        
+        # 分类规则编译为匹配器，按调用点缓存结果
+        self.category_matcher = CategoryMatcher.from_config(config)
+        
+        # extra 字段的 JSON 编码器
+        self.json_encoder = create_json_encoder(config.json_encoder)
+        
+        # 字段映射计划在创建时编译一次，运行时不再判断配置
+        self.field_plan = FieldPlan(
+            FieldSchema.from_config(config),
+            category=self.category_matcher.classify,
+            thread_info=self._get_thread_info,
+            app_name=config.app_name,
+            app_version=config.app_version,
+            environment=config.environment,
+            dumps=self.json_encoder.dumps,
+            # 分区和路由需要查找 bind() / contextualize() 的值
+            keep_context=bool(config.hash_key_field or config.routes),
+        )
+        
+        self._start(config.spool_dir)
+        
+        # 关闭只执行一次，结果保存在 drain_report 中
+        self._close_lock = threading.Lock()
+        self.drain_report: Optional[DrainReport] = None
+        if config.drain_on_exit:
+            register_exit_drain(self)
+        
+        # fork 后子进程第一次使用时重建运行时状态，见 forking 模块
+        self._fork_lock = threading.Lock()
+        self._forked = False
+        register_fork_reset(self)
+        
+        # 可选的 Prometheus 指标导出，只在创建 sink 的进程中监听
+        self.metrics_exporter = self._create_metrics_exporter()
+    
+    def _start(self, spool_dir: Optional[str]) -> None:
+        """创建进程内的运行时状态并启动后台线程
+        
+        包括 SLS 客户端连接、PackId、主机元数据、队列、发送阶段和磁盘暂存，
+        构造时和 fork 后的子进程中各调用一次。
+        
+        Args:
+            spool_dir: 磁盘暂存目录，None 表示不启用
+        """
+        config = self.config
         self.client = LogClient(
             config.endpoint,
             config.access_key_id,
             config.access_key_secret
         )
+        if hasattr(self.client, 'timeout'):
+            # SDK 的 HTTP 请求超时
+            self.client.timeout = config.timeout
         
         # 初始化 PackId 管理器
         self.pack_id_manager = create_pack_id_manager()
         
-        # 初始化队列和异步处理器
-        self.log_queue: Queue = Queue()
+        # 主机元数据只在构造时解析，后台按 TTL 刷新
+        self.host_metadata = HostMetadataResolver(ttl=config.host_metadata_ttl)
+        
+        # PutLogs 请求体的压缩方式，auto 模式按采样结果选择
+        self.compression = CompressionSelector.from_config(config)
+        
+        # 初始化有界队列和异步处理器
+        self.log_queue = self._create_log_queue(config)
         self.stop_event = threading.Event()
-        self.async_handler = AsyncHandler(self)
+        self.async_handler = self.handler_class(self)
+        
+        # 可选的磁盘暂存：发送失败、熔断期间和积压超限的批次写入磁盘，恢复后补发
+        self.spool = DiskSpool(
+            spool_dir,
+            segment_bytes=config.spool_segment_bytes,
+            max_bytes=config.spool_max_bytes,
+            max_age=config.spool_max_age,
+        ) if spool_dir else None
+        
+        # 熔断器包住 SLS 客户端，熔断期间的批次交给降级处理
+        self.fallback = BatchFallback(
+            config.breaker_fallback, sink=config.fallback_sink, spool=self.spool
+        )
+        self.breaker = CircuitBreaker(
+            failure_threshold=config.breaker_failure_threshold,
+            reset_timeout=config.breaker_reset_timeout,
+            on_state_change=self._on_breaker_state_change,
+        ) if config.circuit_breaker else None
+        
+        # 并发发送阶段，在途请求数自适应调整；失败批次退避后重新提交
+        self.retry_scheduler = RetryScheduler(
+            self._resubmit,
+            max_retries=config.max_retries,
+            timeout=config.timeout,
+            base_delay=config.retry_base_delay,
+            max_delay=config.retry_max_delay,
+            budget=RetryBudget(ratio=config.retry_budget_ratio),
+        )
+        self.sender = BatchSender(
+            self.async_handler.send_batch,
+            AdaptiveConcurrencyLimiter(
+                max_limit=config.max_in_flight,
+                adaptive=config.adaptive_concurrency,
+            ),
+            # 按字段路由到 shard 时，每个分区一条顺序通道
+            ordered=config.ordered_delivery or bool(config.hash_key_field),
+            retry=self.retry_scheduler,
+            breaker=self.breaker,
+            fallback=self.fallback,
+            on_error=self.handle_failed_batch,
+            overflow=self.spill_batch if self.spool is not None else None,
+        )
+        self.metrics = self._create_metrics()
+        self.spool_replayer = SpoolReplayer(
+            self.spool,
+            self.async_handler.send_batch,
+            breaker=self.breaker,
+            concurrency=config.spool_replay_concurrency,
+            on_drop=self.record_dropped,
+            # 使用 spool_dir 本身的进程负责并入已退出的子进程留下的 fork-<pid> 目录
+            orphans=(
+                lambda: orphaned_fork_spool_dirs(spool_dir)
+            ) if spool_dir == config.spool_dir else None,
+        ) if self.spool is not None else None
         
         # 启动后台线程
         self.flush_thread = threading.Thread(
@@ -52,80 +184,325 @@ class SlsSink:
         )
         self.flush_thread.start()
     
+    def _mark_forked(self) -> None:
+        """fork 钩子在子进程中调用：只做标记，第一次使用时再重建
+        
+        子进程此时只有一个线程，这里重新创建可能被父进程其他线程持有的锁。
+        """
+        self._close_lock = threading.Lock()
+        self._fork_lock = threading.Lock()
+        if self.drain_report is None:
+            self._forked = True
+    
+    def _reinit_after_fork(self) -> None:
+        """在子进程中重建运行时状态
+        
+        继承的队列、线程和连接直接丢弃，不关闭：父进程已缓冲的记录由父进程发送，
+        子进程从空队列开始；关闭继承的连接会影响父进程仍在使用的 socket。
+        指标导出只在父进程中监听，子进程的指标通过 `stats()` 读取。
+        """
+        with self._fork_lock:
+            if not self._forked:
+                return
+            self.metrics_exporter = None
+            spool_dir = fork_spool_dir(self.config.spool_dir) if self.config.spool_dir else None
+            self._start(spool_dir)
+            self._forked = False
+    
+    def _create_metrics(self) -> SinkMetrics:
+        """创建指标，登记水位和其他组件维护的计数"""
+        config = self.config
+        spool = self.spool
+        metrics = SinkMetrics(
+            labels={'project': config.project, 'logstore': config.logstore},
+            dropped_records=(
+                lambda: self.log_queue.dropped,
+                lambda: self.fallback.dropped_logs,
+                lambda: self.async_handler.batcher.dropped,
+            ),
+            dropped_bytes=(
+                lambda: self.log_queue.dropped_bytes,
+                lambda: self.fallback.dropped_bytes,
+                lambda: self.async_handler.batcher.dropped_bytes,
+            ),
+            spooled_records=(lambda: spool.appended_logs,) if spool is not None else (),
+            spooled_bytes=(lambda: spool.appended_bytes,) if spool is not None else (),
+        )
+        metrics.gauge("queue_depth_records", "队列中的日志条数", lambda: self.log_queue.qsize())
+        metrics.gauge("queue_depth_bytes", "队列中的日志估算字节数", lambda: self.log_queue.qbytes())
+        metrics.gauge("oldest_record_age_seconds", "队列和未封存批次中最早一条日志的等待时间（秒）",
+                      self._oldest_record_age)
+        metrics.gauge("in_flight_requests", "在途的 PutLogs 请求数", lambda: self.sender.limiter.in_flight)
+        metrics.gauge("pending_batches", "已提交发送阶段、尚未完成的批次数", lambda: self.sender.pending)
+        metrics.gauge("retry_waiting_batches", "等待重试的批次数", lambda: self.retry_scheduler.waiting)
+        return metrics
+    
+    def _create_metrics_exporter(self) -> Optional[MetricsExporter]:
+        """配置了 metrics_port 或 metrics_socket 时开始导出指标，监听失败时只打印错误"""
+        config = self.config
+        if not config.metrics_port and not config.metrics_socket:
+            return None
+        try:
+            return MetricsExporter(
+                self.render_metrics,
+                port=config.metrics_port,
+                host=config.metrics_host,
+                path=config.metrics_socket,
+            )
+        except OSError as e:
+            print(f"SLS指标导出错误: {e}")
+            return None
+    
+    def _oldest_record_age(self) -> float:
+        """队列头部和未封存批次中最早一条日志的等待时间（秒），没有日志时为 0"""
+        age = 0.0
+        item = self.log_queue.peek()
+        if item is not None:
+            # 队列中是日志数据字典，或 deferred_enrichment 捕获的元组（首项为 datetime）
+            recorded = item['timestamp'] if isinstance(item, dict) else item[0].timestamp()
+            age = max(age, time.time() - recorded)
+        batcher = self.async_handler.batcher
+        if batcher.pending_logs:
+            age = max(age, time.monotonic() - batcher.opened_at)
+        return age
+    
+    def stats(self) -> Dict[str, Any]:
+        """读取 sink 的运行指标
+        
+        计数器为进程内累计值，水位为读取时的当前值；另附压缩、熔断、降级和磁盘暂存
+        各组件自己的统计。字段说明见 `metrics.SinkMetrics`。
+        """
+        stats = self.metrics.snapshot()
+        stats['compression'] = self.compression.metrics()
+        stats['fallback'] = self.fallback.metrics()
+        if self.breaker is not None:
+            stats['breaker'] = self.breaker.metrics()
+        if self.spool is not None:
+            stats['spool'] = self.spool.metrics()
+        return stats
+    
+    def render_metrics(self) -> str:
+        """以 Prometheus 文本格式输出指标"""
+        return self.metrics.render_prometheus()
+    
+    def record_dropped(self, batch: Any) -> None:
+        """记录一个最终被丢弃的批次"""
+        self.metrics.dropped_records.add(len(batch.logs))
+        self.metrics.dropped_bytes.add(batch.nbytes)
+    
+    def _resubmit(self, batch: Any) -> None:
+        """重试调度器把到期的批次交回发送阶段"""
+        self.metrics.retried_records.add(len(batch.logs))
+        self.metrics.retried_bytes.add(batch.nbytes)
+        self.sender.submit(batch)
+    
+    def spill_batch(self, batch: Any) -> bool:
+        """把批次写入磁盘暂存，等待补发
+        
+        Returns:
+            是否写入成功（未启用暂存时为 False）
+        """
+        if self.spool is None:
+            return False
+        try:
+            return self.spool.append(batch)
+        except Exception as e:
+            print(f"SLS磁盘暂存错误: {e}")
+            return False
+    
+    def handle_failed_batch(self, batch: Any, error: BaseException) -> bool:
+        """处理最终发送失败的批次：服务不可用类错误写入磁盘暂存，其余打印错误
+        
+        Returns:
+            是否已写入磁盘暂存
+        """
+        if is_retryable_error(error) and self.spill_batch(batch):
+            return True
+        self.record_dropped(batch)
+        print(f"SLS消息发送错误: {error}")
+        return False
+    
+    @staticmethod
+    def _on_breaker_state_change(previous: str, state: str) -> None:
+        """熔断器状态变化时打印提示"""
+        print(f"SLS熔断器状态变化: {previous} -> {state}")
+    
+    @staticmethod
+    def _create_log_queue(config: SlsConfig) -> Any:
+        """按配置创建日志队列"""
+        log_queue = BoundedLogQueue(
+            max_size=config.queue_max_size,
+            max_bytes=config.queue_max_bytes,
+            policy=config.queue_full_policy,
+            block_timeout=config.queue_block_timeout,
+            drop_level_no=resolve_level_no(config.queue_drop_level),
+        )
+        if config.staging:
+            # 分线程暂存，生产者每攒满一块才与 worker 同步一次
+            return StagedLogQueue(log_queue, chunk_size=config.staging_chunk_size)
+        return log_queue
+    
+    def write(self, message: Any) -> None:
+        """Loguru 流式 sink 接口
+        
+        提供 write / stop 后 loguru 把 sink 当作流处理，`logger.remove()` 时调用 `stop()`。
+        """
+        self(message)
+    
+    def stop(self) -> None:
+        """`logger.remove()` 时由 loguru 调用，关闭 sink 并排空剩余日志"""
+        self.close()
+    
     def __call__(self, message: Any) -> None:
         """Loguru sink 调用接口"""
+        if self._forked:
+            self._reinit_after_fork()
         try:
             record = message.record
             
-            # 基础字段映射
-            log_data = {
-                'timestamp': record['time'].timestamp(),
-                'level': record['level'].name,
-                'message': str(record['message']),
-                'module': record.get('name', ''),
-                'function': record.get('function', ''),
-                'line': record.get('line', 0),
-                
-                # 新增必需字段
-                'app_name': self.config.app_name,
-                'version': self.config.app_version,
-                'environment': self.config.environment,
-                'category': self._get_log_category(record),
-            }
+            if self.config.deferred_enrichment:
+                # 只捕获原始字段，字段映射和补充信息在后台线程完成
+                self._capture(record)
+                return
             
-            # 自动检测系统信息
-            if self.config.auto_detect_hostname:
-                log_data['hostname'] = self._get_hostname()
-            
-            if self.config.auto_detect_host_ip:
-                log_data['host_ip'] = self._get_host_ip()
-                
-            if self.config.auto_detect_thread:
-                log_data['thread'] = self._get_thread_info(record)
-            
-            # 处理 extra 字段 - loguru 将 extra 参数存储在 record['extra']['extra'] 中
-            record_extra = record.get('extra', {})
-            if 'extra' in record_extra and record_extra['extra']:
-                log_data['extra'] = record_extra['extra']
-            
-            self.log_queue.put(log_data)
+            log_data = self.build_log_data(record)
+            nbytes = estimate_record_size(record['message'], record.get('extra'))
+            self.metrics.enqueued_records.add(1)
+            self.metrics.enqueued_bytes.add(nbytes)
+            self.log_queue.put(log_data, nbytes=nbytes, level_no=record['level'].no)
                 
         except Exception as e:
             # 避免日志处理错误影响主程序
             print(f"SLS日志处理错误: {e}")
     
-    def close(self) -> None:
-        """关闭 sink，发送剩余日志"""
-        self.stop_event.set()
+    def _capture(self, record: Dict[str, Any]) -> None:
+        """在调用方线程上只捕获记录的不可变部分
+        
+        捕获的元组为 (time, level, message, name, function, line, extra, thread)：
+        time 是不可变的 datetime，level / thread 是 loguru 的不可变命名元组，
+        extra 是 loguru 为每条记录新建的字典，这里只保留引用不做拷贝。
+        """
+        level = record['level']
+        message = record['message']
+        nbytes = RECORD_OVERHEAD_BYTES + len(message)
+        self.metrics.enqueued_records.add(1)
+        self.metrics.enqueued_bytes.add(nbytes)
+        self.log_queue.put(
+            (
+                record['time'], level, message,
+                record.get('name', ''), record.get('function', ''), record.get('line', 0),
+                record.get('extra'), record.get('thread'),
+            ),
+            nbytes=nbytes,
+            level_no=level.no,
+        )
+    
+    def enrich_captured(self, captured_items: List[Tuple[Any, ...]]) -> List[Dict[str, Any]]:
+        """在后台线程上把捕获的原始字段转换为完整的日志数据
+        
+        Args:
+            captured_items: `_capture` 放入队列的元组列表
+        
+        Returns:
+            与 `build_log_data` 相同格式的日志数据列表，转换失败的记录会被跳过
+        """
+        messages = []
+        for captured in captured_items:
+            record_time, level, message, name, function, line, extra, thread = captured
+            try:
+                messages.append(self.build_log_data({
+                    'time': record_time,
+                    'level': level,
+                    'message': message,
+                    'name': name,
+                    'function': function,
+                    'line': line,
+                    'extra': extra or {},
+                    'thread': thread,
+                }))
+            except Exception as e:
+                print(f"SLS日志处理错误: {e}")
+        return messages
+    
+    def build_log_data(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """把 loguru 记录转换为待发送的日志数据
+        
+        具体字段由编译后的字段映射计划决定，见 `field_plan.FieldPlan`。
+        主机信息读取缓存的元数据快照，不做任何系统调用。
+        """
+        return self.field_plan.build_log_data(record, self.host_metadata.current)
+    
+    def is_congested(self) -> bool:
+        """队列是否拥塞
+        
+        开销极低，应用可在记录大量日志前调用以主动降载::
+        
+            if not sls_sink.is_congested():
+                logger.debug("详细调试信息 ...")
+        """
+        if self._forked:
+            return False
+        return self.log_queue.is_congested()
+    
+    def close(self) -> DrainReport:
+        """关闭 sink，在 shutdown_timeout 内排空剩余日志
         
-        if self.flush_thread.is_alive():
-            self.flush_thread.join(timeout=5.0)
+        ERROR 及以上（shutdown_priority_level）的记录优先发送，截止时仍未发送的批次写入
+        磁盘暂存，见 `shutdown.ShutdownDrain`。重复调用直接返回第一次关闭的结果。
         
-        # 发送剩余的日志
-        self.async_handler.flush_remaining_logs()
+        Returns:
+            关闭时仍在 sink 内的日志的投递统计
+        """
+        with self._close_lock:
+            if self.drain_report is not None:
+                return self.drain_report
+            unregister_exit_drain(self)
+            with self._fork_lock:
+                if self._forked:
+                    # 子进程没有使用过继承的 sink，没有属于本进程的日志需要排空
+                    self._forked = False
+                    self.log_queue = self._create_log_queue(self.config)
+                    self.drain_report = DrainReport()
+                    return self.drain_report
+            
+            # 先停止补发，把带宽留给排空；未补发的数据留在磁盘上，下次启动时继续补发
+            if self.spool_replayer is not None:
+                self.spool_replayer.close(timeout=1.0)
+            report = ShutdownDrain.from_sink(self).run()
+            if self.spool is not None:
+                self.spool.close()
+            
+            self.async_handler.close()
+            self.host_metadata.close()
+            if self.metrics_exporter is not None:
+                self.metrics_exporter.close()
+            
+            if report.dropped or report.in_flight:
+                print(
+                    f"SLS关闭时未能投递的日志: 丢弃 {report.dropped} 条，"
+                    f"截止时仍在发送 {report.in_flight} 条"
+                )
+            self.drain_report = report
+            return report
     
     def _get_hostname(self) -> str:
-        """获取主机名"""
-        try:
-            return socket.gethostname()
-        except Exception:
-            return "unknown-host"
+        """获取主机名（来自缓存的元数据快照）"""
+        return self.host_metadata.current.hostname
     
     def _get_host_ip(self) -> str:
-        """获取主机IP"""
-        try:
-            # 获取本机IP
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.connect(("8.8.8.8", 80))
-            ip = s.getsockname()[0]
-            s.close()
-            return ip
-        except Exception:
-            return "unknown-ip"
+        """获取主机IP（来自缓存的元数据快照）"""
+        return self.host_metadata.current.host_ip
     
     def _get_thread_info(self, record: Dict[str, Any]) -> str:
-        """获取线程信息"""
+        """获取线程信息
+        
+        优先使用 loguru 记录中的线程信息（后台线程补充字段时也能拿到调用方线程），
+        记录中没有时回退到当前线程。
+        """
         try:
+            thread = record.get('thread')
+            if thread is not None:
+                return f"{thread.name}({thread.id})"
             thread_name = threading.current_thread().name
             thread_id = threading.get_ident()
             return f"{thread_name}({thread_id})"
@@ -133,17 +510,8 @@ class SlsSink:
             return "unknown-thread"
     
     def _get_log_category(self, record: Dict[str, Any]) -> str:
-        """获取日志分类"""
-        # 可以根据模块名、级别等自动分类
-        module_name = record.get('name', '')
-        level = record['level'].name
-        
-        # 简单的分类逻辑
-        if 'error' in level.lower() or 'exception' in str(record.get('message', '')).lower():
-            return "error"
-        elif 'api' in module_name.lower():
-            return "api"
-        elif 'business' in module_name.lower():
-            return "business"
-        else:
-            return self.config.default_category
\ No newline at end of file
+        """获取日志分类
+        
+        按 `category_rules` 顺序匹配，见 `categories.CategoryMatcher`。
+        """
+        return self.category_matcher.classify(record)
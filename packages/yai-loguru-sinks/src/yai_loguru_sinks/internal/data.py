@@ -1,11 +1,12 @@
 """
 SLS Sink 配置类
 
-定义 SLS 连接、批量发送和 PackId 相关的配置。
+定义 SLS 连接、批量发送和 PackId 相关的配置，以及在发送阶段之间传递的批次。
 """
 
-from typing import Optional
-from dataclasses import dataclass
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
 
 
 @dataclass
@@ -26,8 +27,8 @@ class SlsConfig:
     # 批量发送配置
     batch_size: int = 100
     flush_interval: float = 5.0
-    max_retries: int = 3
-    timeout: float = 30.0
+    max_retries: int = 3                     # 可重试错误（限流、5xx、网络错误）的最大重试次数
+    timeout: float = 30.0                    # 单次请求超时，同时也是批次从创建起允许重试的时长（秒）
     
     # PackId 功能默认启用，无需配置
     
@@ -40,9 +41,125 @@ class SlsConfig:
     auto_detect_hostname: bool = True
     auto_detect_host_ip: bool = True
     auto_detect_thread: bool = False
+    host_metadata_ttl: float = 300.0  # 主机元数据刷新间隔（秒），<= 0 表示不刷新
     
     # 日志分类配置
     default_category: str = "application"
+    category_rules: Optional[List[Dict[str, Any]]] = None  # 有序的分类规则，None 表示使用内置规则
+    category_cache_size: int = 4096                        # 按调用点缓存分类结果的条目数，<= 0 表示不缓存
+    
+    # 多日志库路由：有序的路由规则，按级别、分类、模块前缀或 extra 键写入不同的日志库或 Topic
+    routes: Optional[List[Dict[str, Any]]] = None
+    
+    # 字段映射配置（在 sink 创建时编译为专用转换函数）
+    include_fields: Optional[List[str]] = None               # 写入的内置字段，None 表示按 auto_detect_* 决定
+    field_rename: Dict[str, str] = field(default_factory=dict)     # 字段重命名，如 {'message': 'msg'}
+    constant_fields: Dict[str, str] = field(default_factory=dict)  # 每条日志附带的常量字段
+    flatten_extra: bool = False                              # 是否把 extra 展开为独立字段
+    extra_prefix: str = ""                                   # 展开 extra 时的字段名前缀
+    json_encoder: str = "auto"                               # extra 的 JSON 编码器：auto / stdlib / orjson
+    
+    # 队列与背压配置
+    queue_max_size: int = 10000              # 队列最大记录数，<= 0 表示不限
+    queue_max_bytes: int = 0                 # 队列最大估算字节数，<= 0 表示不限
+    queue_full_policy: str = "drop_oldest"   # block / drop_newest / drop_oldest / drop_below_level
+    queue_block_timeout: float = 0.1         # block 策略下的最长等待时间（秒）
+    queue_drop_level: str = "WARNING"        # drop_below_level 策略保留的最低级别
+    staging: bool = False                    # 是否启用分线程暂存缓冲（高并发写入时降低锁竞争）
+    staging_chunk_size: int = 64             # 每个线程本地缓冲攒满多少条后整块移交
+    deferred_enrichment: bool = False        # 调用方只捕获原始字段，字段映射和补充信息在后台线程完成
+    
+    # 组批配置（记录数上限为 batch_size）
+    batch_max_bytes: int = 3 * 1024 * 1024   # 每批最大估算字节数，不超过 SLS 单次请求 5MB 的上限
+    record_max_bytes: int = 1024 * 1024      # 单条日志的最大估算字节数
+    oversize_policy: str = "truncate"        # 超大日志的处理策略：truncate / split / drop
+    
+    # 批次等待配置
+    linger_time: float = 0.0                 # 批次第一条记录到达后最多再等待的时间（秒），0 表示立即封批
+    adaptive_linger: bool = False            # 根据到达速率自适应选择等待时间
+    max_linger_time: float = 1.0             # 自适应模式下等待时间的上限（秒）
+    
+    # 并发发送配置
+    max_in_flight: int = 4                   # 同时在途的 PutLogs 请求数上限，1 表示串行发送
+    adaptive_concurrency: bool = True        # 根据延迟和限流响应自适应调整在途请求数（AIMD）
+    ordered_delivery: bool = False           # 相同 hash_key 的批次按顺序串行发送
+    hash_key_field: str = ""                 # 按该字段（或 extra 中的键）计算 hashKey 路由到 shard，空表示不路由
+    hash_key_partitions: int = 16            # 路由字段取值映射到的分区（hashKey）数，应不小于 shard 数
+    
+    # 重试配置（重试次数为 max_retries，截止时间为 timeout）
+    retry_base_delay: float = 0.5            # 第一次重试的退避上限（秒），之后每次翻倍并随机抖动
+    retry_max_delay: float = 10.0            # 单次退避的上限（秒）
+    retry_budget_ratio: float = 0.2          # 全局重试预算：重试请求最多占首次请求的比例
+    
+    # 熔断配置
+    circuit_breaker: bool = True             # 连续失败后熔断，熔断期间批次不发送请求，直接降级
+    breaker_failure_threshold: int = 5       # 连续多少次服务不可用的失败后打开熔断器
+    breaker_reset_timeout: float = 30.0      # 熔断打开后多久（秒）发送半开探测批次
+    breaker_fallback: str = "drop"           # 熔断期间的降级策略：drop（丢弃并计数）/ spool（写入磁盘暂存）/ sink（交给 fallback_sink）
+    fallback_sink: Optional[Callable[['LogBatch'], Any]] = None  # 备用 sink，接收 LogBatch（仅支持关键字参数）
+    
+    # 磁盘暂存配置
+    spool_dir: Optional[str] = None          # 暂存目录，None 表示不启用；发送失败和积压超限的批次写入磁盘，恢复后补发
+    spool_segment_bytes: int = 16 * 1024 * 1024   # 单个段文件的预分配大小
+    spool_max_bytes: int = 256 * 1024 * 1024      # 暂存总大小上限，超过时删除最旧的段
+    spool_max_age: float = 3 * 24 * 3600.0        # 段文件的最长保留时间（秒）
+    spool_replay_concurrency: int = 2        # 补发时并发发送的批次数
+    
+    # 关闭配置
+    shutdown_timeout: float = 10.0           # 关闭时排空剩余日志的截止时间（秒），到期未发送的批次写入磁盘暂存
+    shutdown_priority_level: str = "ERROR"   # 关闭时优先发送的最低级别
+    drain_on_exit: bool = True               # 进程退出时自动关闭 sink 并排空剩余日志
     
     # 其他配置
-    compress: bool = True
\ No newline at end of file
+    compress: bool = True
+    compress_codec: str = "lz4"              # 压缩方式：none / deflate / lz4 / zstd / auto
+    compress_min_bytes: int = 512            # 小于该字节数的请求体不压缩
+    compress_bandwidth: float = 10.0         # 上行带宽估计（MB/秒），auto 模式按它和 CPU 预算选择编码器
+    compress_cpu_budget: float = 0.5         # 可用于压缩的 CPU（核数），auto 模式使用
+    compress_sample_interval: int = 100      # auto 模式每隔多少个批次重新采样各编码器
+    native_encoder: bool = True              # 直接编码 LogGroup protobuf，不经过 SDK 的 LogItem 对象
+    encode_workers: int = 0                  # 编码和压缩使用的进程数，0 表示在发送线程中完成
+    native_transport: bool = False           # 使用内置的 keep-alive HTTP 传输发送，不经过 SDK 的请求路径
+    
+    # 本机采集进程配置
+    collector_socket: Optional[str] = None   # 采集进程的 Unix socket 路径，配置后批次交给采集进程上传，采集进程未运行时直接上传
+    collector_ring: Optional[str] = None     # 采集进程共享内存环形缓冲区的文件路径，配置后代替 collector_socket（仅 x86）
+    collector_ring_policy: str = "block"     # 共享内存缓冲区满时：block（等待最长 timeout 秒）/ drop_newest（不等待，直接上传）
+    collector_retry_interval: float = 5.0    # 连接采集进程失败后多久（秒）再尝试，期间直接上传
+    
+    # 指标导出
+    metrics_port: int = 0                    # 以 Prometheus 文本格式导出指标的本机端口，0 表示不导出
+    metrics_host: str = "127.0.0.1"          # 指标导出监听的地址
+    metrics_socket: Optional[str] = None     # 指标导出监听的 Unix socket 路径，优先于 metrics_port
+
+
+@dataclass
+class LogBatch:
+    """待发送的一批日志
+    
+    logs 中每一项为 (unix 时间戳, SLS contents)，contents 已由字段映射计划转换完成。
+    """
+    
+    logs: List[Tuple[int, List[Tuple[str, str]]]]
+    nbytes: int = 0                          # 估算的编码后字节数
+    hash_key: Optional[str] = None
+    attempt: int = 0                         # 已重试的次数
+    created_at: float = field(default_factory=time.monotonic)
+    logstore: Optional[str] = None           # 路由到的日志库，None 表示使用配置的 logstore
+    topic: Optional[str] = None              # 路由到的 Topic，None 表示使用配置的 topic
+
+
+@dataclass
+class DrainReport:
+    """关闭时排空的投递统计（单位为日志条数）
+    
+    统计范围是关闭时仍在 sink 内的日志：队列、未封存的批次、等待重试和排队等待发送的批次。
+    关闭前已经在途的请求在截止时间内等待完成，失败时按正常路径写入磁盘暂存，不计入
+    sent / spooled / dropped；截止时仍未完成的计入 in_flight。
+    """
+    
+    sent: int = 0                            # 发送成功
+    spooled: int = 0                         # 写入磁盘暂存，下次启动时补发
+    dropped: int = 0                         # 发送失败且无法暂存
+    in_flight: int = 0                       # 截止时仍在发送、结果未知
+    elapsed: float = 0.0                     # 排空耗时（秒）
@@ -0,0 +1,175 @@
+"""
+多进程编码阶段
+
+LogGroup 编码和压缩是纯 CPU 工作，在发送线程中执行时受 GIL 限制，整个 sink 最多用满
+一个核，还会与应用线程争抢。启用后，发送线程把批次交给独立的编码进程编码和压缩，
+等待期间释放 GIL，拿回压缩好的请求体后直接上传：
+
+- 批次以 marshal 格式写入共享内存槽位，进程池只传递槽位名称和长度；压缩结果也写回
+  同一个槽位，批次和请求体都不经过 pickle 和管道复制
+- 槽位数量限制了同时在编码的批次数，槽位用完时发送线程等待
+- 批次超过槽位大小时返回 None，由调用方在当前线程编码
+- auto 压缩的采样在编码进程中执行，选择和统计仍由本进程的 CompressionSelector 负责
+"""
+
+import marshal
+import multiprocessing
+import queue
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+from .compression import CODECS, Codec, CompressionSelector, create_codec, run_codecs
+from .log_group import LogGroupEncoder
+
+
+# 编码进程中的状态，由 _init_worker 初始化
+_worker_encoder: Optional[LogGroupEncoder] = None
+_worker_codecs: Dict[str, Codec] = {}
+_worker_slots: Dict[str, shared_memory.SharedMemory] = {}
+
+
+def _init_worker(topic: str, source: str) -> None:
+    global _worker_encoder
+    _worker_encoder = LogGroupEncoder(topic=topic, source=source)
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """打开父进程创建的槽位，每个编码进程只打开一次"""
+    slot = _worker_slots.get(name)
+    if slot is None:
+        # 编码进程与父进程共用同一个 resource_tracker，槽位只由父进程在 close 时删除
+        slot = shared_memory.SharedMemory(name=name)
+        _worker_slots[name] = slot
+    return slot
+
+
+def _encode_in_worker(
+    slot_name: str,
+    size: int,
+    logtags: Optional[List[Tuple[str, str]]],
+    codec_names: List[str],
+    min_bytes: int,
+    topic: Optional[str] = None,
+) -> Tuple[int, Optional[Dict[str, Tuple[int, float]]], Optional[Dict[str, bytes]]]:
+    """在编码进程中编码并压缩一个批次
+
+    Returns:
+        (压缩前字节数, 各编码器的 (压缩后字节数, 耗时)，未压缩时为 None, 内联结果)。
+        只有一个结果且能放进槽位时写回槽位，内联结果为 None；否则按编码器名称返回
+        全部结果（未压缩时名称为 none）。
+    """
+    slot = _attach(slot_name)
+    logs = marshal.loads(slot.buf[:size])
+    body = _worker_encoder.encode(logs, logtags, topic)
+    raw = len(body)
+
+    if raw < min_bytes or raw == 0:
+        outputs = {Codec.name: body}
+        timings = None
+    else:
+        for name in codec_names:
+            if name not in _worker_codecs:
+                _worker_codecs[name] = create_codec(name)
+        results = run_codecs(_worker_codecs, codec_names, body)
+        outputs = {name: data for name, (data, _) in results.items()}
+        timings = {name: (len(data), elapsed) for name, (data, elapsed) in results.items()}
+
+    if len(outputs) == 1:
+        data = next(iter(outputs.values()))
+        if len(data) <= slot.size:
+            slot.buf[:len(data)] = data
+            return raw, timings, None
+    return raw, timings, outputs
+
+
+class EncodingPool:
+    """把批次交给编码进程池编码和压缩"""
+
+    def __init__(
+        self,
+        workers: int,
+        topic: str = "",
+        source: str = "",
+        slots: int = 4,
+        slot_bytes: int = 8 * 1024 * 1024,
+    ) -> None:
+        """初始化
+
+        Args:
+            workers: 编码进程数
+            topic / source: LogGroup 的 Topic 和 Source
+            slots: 共享内存槽位数，即同时在编码的批次数上限
+            slot_bytes: 每个槽位的大小，超过的批次在调用方线程编码
+        """
+        # fork 会复制父进程中其他线程持有的锁，优先使用 forkserver
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        self.workers = workers
+        self.slot_bytes = slot_bytes
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(topic, source),
+        )
+        self._slots: List[shared_memory.SharedMemory] = []
+        self._free: "queue.Queue[shared_memory.SharedMemory]" = queue.Queue()
+        for _ in range(max(1, slots)):
+            slot = shared_memory.SharedMemory(create=True, size=slot_bytes)
+            self._slots.append(slot)
+            self._free.put(slot)
+
+    def encode(
+        self,
+        logs: List[Tuple[int, List[Tuple[str, str]]]],
+        logtags: Optional[List[Tuple[str, str]]],
+        compression: CompressionSelector,
+        topic: Optional[str] = None,
+    ) -> Optional[Tuple[Optional[str], int, bytes]]:
+        """在编码进程中编码并压缩一个批次
+
+        topic 不为 None 时覆盖初始化时的 Topic。
+
+        Returns:
+            (x-log-compresstype 请求头的值，不压缩时为 None, 压缩前字节数, 请求体)；
+            批次超过槽位大小时返回 None
+
+        Raises:
+            编码失败（如非字符串的值）或编码进程异常退出时抛出异常
+        """
+        data = marshal.dumps(logs)
+        if len(data) > self.slot_bytes:
+            return None
+
+        slot = self._free.get()
+        try:
+            slot.buf[:len(data)] = data
+            future = self._executor.submit(
+                _encode_in_worker, slot.name, len(data), logtags,
+                compression.plan(), compression.min_bytes, topic,
+            )
+            raw, timings, outputs = future.result()
+
+            if timings is None:
+                compression.skip()
+                name = Codec.name
+                size = raw
+            else:
+                name = compression.record(raw, timings)
+                size = timings[name][0]
+            body = outputs[name] if outputs is not None else bytes(slot.buf[:size])
+        finally:
+            self._free.put(slot)
+        return CODECS[name].header, raw, body
+
+    def close(self) -> None:
+        """关闭编码进程并释放共享内存"""
+        self._executor.shutdown(wait=True)
+        for slot in self._slots:
+            slot.close()
+            try:
+                slot.unlink()
+            except FileNotFoundError:
+                pass
+        self._slots = []
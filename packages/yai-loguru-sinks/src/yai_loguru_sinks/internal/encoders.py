@@ -0,0 +1,135 @@
+"""
+extra 字段的 JSON 编码器
+
+提供可插拔的编码器实现：
+
+- stdlib: 标准库 json，始终可用
+- orjson: 基于 orjson 的加速实现，安装了 orjson 时 auto 模式自动启用
+
+所有编码器对无法直接序列化的类型（datetime、Decimal、UUID、bytes 等）使用统一的
+`json_default` 转换；编码仍然失败时依次回退到标准库和 repr，保证一条记录的
+extra 无法序列化时不会导致整批日志发送失败。
+"""
+
+import base64
+import json
+from abc import ABC, abstractmethod
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from pathlib import PurePath
+from typing import Any, Dict, Type
+from uuid import UUID
+
+try:
+    import orjson  # type: ignore
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+    orjson = None
+
+
+def json_default(value: Any) -> Any:
+    """把 JSON 无法直接表示的对象转换为可序列化的值
+
+    - datetime / date / time: ISO 8601 字符串
+    - Decimal / UUID / Path: 字符串
+    - bytes / bytearray: UTF-8 文本，非 UTF-8 内容使用 "base64:" 前缀的 Base64
+    - Enum: 其 value
+    - set / frozenset / tuple: 列表
+    - 其他对象: repr()
+    """
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID, PurePath)):
+        return str(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        raw = bytes(value)
+        try:
+            return raw.decode('utf-8')
+        except UnicodeDecodeError:
+            return "base64:" + base64.b64encode(raw).decode('ascii')
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    return repr(value)
+
+
+class JsonEncoder(ABC):
+    """JSON 编码器基类
+
+    子类实现 `encode`，`dumps` 负责失败时的回退链。
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def encode(self, value: Any) -> str:
+        """编码为 JSON 字符串，失败时抛出异常"""
+
+    def dumps(self, value: Any) -> str:
+        """编码为 JSON 字符串，不会抛出异常"""
+        try:
+            return self.encode(value)
+        except Exception:
+            pass
+        try:
+            # 标准库可以处理 orjson 不支持的情况（如超过 64 位的整数）
+            return json.dumps(value, ensure_ascii=False, default=json_default)
+        except Exception:
+            # 循环引用等无法修复的情况，退化为字符串
+            return json.dumps(repr(value), ensure_ascii=False)
+
+
+class StdlibJsonEncoder(JsonEncoder):
+    """标准库 json 编码器"""
+
+    name = "stdlib"
+
+    def encode(self, value: Any) -> str:
+        return json.dumps(value, ensure_ascii=False, default=json_default)
+
+
+class OrjsonEncoder(JsonEncoder):
+    """orjson 编码器
+
+    输出为紧凑格式（无多余空格），非字符串的键会被转换为字符串。
+    """
+
+    name = "orjson"
+
+    def __init__(self) -> None:
+        if not HAS_ORJSON:
+            raise ImportError("orjson 未安装，请运行: uv add orjson")
+        self._dumps = orjson.dumps
+        self._option = orjson.OPT_NON_STR_KEYS
+
+    def encode(self, value: Any) -> str:
+        return self._dumps(value, default=json_default, option=self._option).decode('utf-8')
+
+
+JSON_ENCODERS: Dict[str, Type[JsonEncoder]] = {
+    StdlibJsonEncoder.name: StdlibJsonEncoder,
+    OrjsonEncoder.name: OrjsonEncoder,
+}
+
+
+def create_json_encoder(name: str = "auto") -> JsonEncoder:
+    """按名称创建编码器
+
+    Args:
+        name: auto（优先 orjson，未安装时使用 stdlib）、stdlib 或 orjson
+
+    Raises:
+        ValueError: 未知的编码器名称
+        ImportError: 指定了 orjson 但未安装
+    """
+    if name == "auto":
+        name = OrjsonEncoder.name if HAS_ORJSON else StdlibJsonEncoder.name
+    encoder_class = JSON_ENCODERS.get(name)
+    if encoder_class is None:
+        raise ValueError(
+            f"未知的 JSON 编码器: {name}，可选值: auto, {', '.join(JSON_ENCODERS)}"
+        )
+    return encoder_class()
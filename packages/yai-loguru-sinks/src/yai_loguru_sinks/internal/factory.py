@@ -5,13 +5,15 @@ SLS Sink 工厂函数
 """
 
 import os
+from dataclasses import fields
 from typing import Optional, Callable, Dict, Any
 
 from .data import SlsConfig
 from .core import SlsSink
+from .aio_sink import AsyncSlsSink
 
 
-def create_sls_sink(
+def create_sls_config(
     project: str,
     logstore: str,
     region: str,
@@ -33,8 +35,8 @@ def create_sls_sink(
     # 日志分类参数
     default_category: Optional[str] = None,
     **kwargs: Any
-) -> Callable[[Dict[str, Any]], None]:
-    """创建 SLS sink 函数
+) -> SlsConfig:
+    """创建 SLS 配置，参数默认值从环境变量获取
     
     Args:
         project: SLS 项目名
@@ -54,10 +56,10 @@ def create_sls_sink(
         auto_detect_host_ip: 是否自动检测主机IP
         auto_detect_thread: 是否自动检测线程信息
         default_category: 默认日志分类
-        **kwargs: 其他配置参数
+        **kwargs: 其他配置参数，与 SlsConfig 字段同名的参数会直接透传
     
     Returns:
-        可调用的 sink 函数
+        SLS 配置
     """
     from .url_parser import resolve_sls_credentials
     
@@ -85,6 +87,13 @@ def create_sls_sink(
     # 构造 endpoint
     endpoint = f"https://{region}.log.aliyuncs.com"
     
+    # 与 SlsConfig 字段同名的其他参数（高级调优参数）直接透传
+    config_fields = {f.name for f in fields(SlsConfig)}
+    extra_config = {
+        key: value for key, value in kwargs.items()
+        if key in config_fields and key != 'endpoint'
+    }
+    
     config = SlsConfig(
         endpoint=endpoint,
         access_key_id=access_key_id,
@@ -104,6 +113,74 @@ def create_sls_sink(
         auto_detect_host_ip=auto_detect_host_ip,
         auto_detect_thread=auto_detect_thread,
         default_category=default_category,
+        **extra_config,
     )
     
-    return SlsSink(config)
\ No newline at end of file
+    return config
+
+
+def create_sls_sink(
+    project: str,
+    logstore: str,
+    region: str,
+    access_key_id: Optional[str] = None,
+    access_key_secret: Optional[str] = None,
+    topic: str = "python-app",
+    source: str = "yai-loguru",
+    batch_size: int = 100,
+    flush_interval: float = 5.0,
+    compress: bool = True,
+    # 新增应用信息参数
+    app_name: Optional[str] = None,
+    app_version: Optional[str] = None,
+    environment: Optional[str] = None,
+    # 系统信息检测参数
+    auto_detect_hostname: Optional[bool] = None,
+    auto_detect_host_ip: Optional[bool] = None,
+    auto_detect_thread: Optional[bool] = None,
+    # 日志分类参数
+    default_category: Optional[str] = None,
+    **kwargs: Any
+) -> Callable[[Dict[str, Any]], None]:
+    """创建 SLS sink 函数
+    
+    参数见 `create_sls_config`。
+    
+    Returns:
+        可调用的 sink 函数
+    """
+    return SlsSink(create_sls_config(
+        project, logstore, region,
+        access_key_id=access_key_id,
+        access_key_secret=access_key_secret,
+        topic=topic,
+        source=source,
+        batch_size=batch_size,
+        flush_interval=flush_interval,
+        compress=compress,
+        app_name=app_name,
+        app_version=app_version,
+        environment=environment,
+        auto_detect_hostname=auto_detect_hostname,
+        auto_detect_host_ip=auto_detect_host_ip,
+        auto_detect_thread=auto_detect_thread,
+        default_category=default_category,
+        **kwargs,
+    ))
+
+
+def create_async_sls_sink(
+    project: str,
+    logstore: str,
+    region: str,
+    **kwargs: Any
+) -> AsyncSlsSink:
+    """创建 asyncio 版本的 SLS sink
+    
+    参数与 `create_sls_sink` 相同。返回的 sink 需要在事件循环中使用，
+    关闭时调用 `await sink.aclose()`。
+    
+    Returns:
+        AsyncSlsSink 实例
+    """
+    return AsyncSlsSink(create_sls_config(project, logstore, region, **kwargs))
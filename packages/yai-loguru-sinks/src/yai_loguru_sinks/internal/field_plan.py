@@ -0,0 +1,264 @@
+"""
+字段映射计划
+
+把声明式的字段配置（包含哪些字段、如何重命名、常量字段、是否展开 extra）
+在 sink 创建时编译为两个专用函数：
+
+- `build_log_data(record, host_metadata)`：loguru 记录 -> 待发送的日志数据字典
+- `to_contents(log_data)`：日志数据字典 -> SLS contents 列表
+
+编译结果中只包含启用的字段，运行时不再对配置做任何分支判断，
+未启用的字段（如 function / line）完全没有开销。
+
+按 extra 中的键分区或路由时（hash_key_field / routes），日志数据还在 `CONTEXT_KEY` 下保留
+loguru 的整个 extra 字典（`bind()` / `contextualize()` 的值和 extra 参数），不写入 SLS，
+用 `lookup_extra` 查找。
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .encoders import StdlibJsonEncoder
+
+
+# 内置字段，顺序即写入 SLS 的顺序
+BUILTIN_FIELDS = (
+    'level', 'message', 'module', 'function', 'line',
+    'app_name', 'version', 'environment', 'category',
+    'hostname', 'host_ip', 'pod_name', 'namespace', 'container_id', 'thread',
+    'extra',
+)
+
+# 始终包含的基础字段
+BASE_FIELDS = (
+    'level', 'message', 'module', 'function', 'line',
+    'app_name', 'version', 'environment', 'category',
+)
+
+# 与主机名一起启用的容器环境字段，值为空时不写入
+CONTAINER_FIELDS = ('pod_name', 'namespace', 'container_id')
+
+# 字段 -> 从 loguru 记录取值的表达式（r: 记录，meta: 主机元数据快照）
+_RECORD_EXPRESSIONS: Dict[str, str] = {
+    'level': "r['level'].name",
+    'message': "str(r['message'])",
+    'module': "r.get('name', '')",
+    'function': "r.get('function', '')",
+    'line': "r.get('line', 0)",
+    'app_name': "app_name",
+    'version': "app_version",
+    'environment': "environment",
+    'category': "category(r)",
+    'hostname': "meta.hostname",
+    'host_ip': "meta.host_ip",
+    'thread': "thread_info(r)",
+}
+
+# 需要转换为字符串的字段
+_NON_STRING_FIELDS = frozenset({'line'})
+
+# 日志数据中保留 loguru 整个 extra 字典的键（只用于分区和路由，不写入 SLS）
+CONTEXT_KEY = '_context'
+
+
+def lookup_extra(log_data: Dict[str, Any], key: str, default: Any = None) -> Any:
+    """在日志数据的 extra 中查找键
+
+    先查 `bind()` / `contextualize()` 的值（loguru 记录 extra 的顶层），再查 extra 参数
+    （loguru 存储在 record['extra']['extra'] 中）。没有保留整个 extra 的日志数据只查 extra 参数。
+    """
+    context = log_data.get(CONTEXT_KEY)
+    if context:
+        if key in context:
+            return context[key]
+        nested = context.get('extra')
+    else:
+        nested = log_data.get('extra')
+    if isinstance(nested, dict) and key in nested:
+        return nested[key]
+    return default
+
+
+@dataclass
+class FieldSchema:
+    """声明式字段配置
+
+    Attributes:
+        include: 写入 SLS 的内置字段，None 表示按 auto_detect_* 开关决定
+        rename: 字段重命名，如 {'message': 'msg'}
+        constants: 每条日志都附带的常量字段
+        flatten_extra: 是否把 extra 展开为独立字段（否则序列化为一个 JSON 字段）
+        extra_prefix: 展开 extra 时字段名的前缀
+    """
+
+    include: Optional[List[str]] = None
+    rename: Dict[str, str] = field(default_factory=dict)
+    constants: Dict[str, str] = field(default_factory=dict)
+    flatten_extra: bool = False
+    extra_prefix: str = ""
+
+    @classmethod
+    def from_config(cls, config: Any) -> "FieldSchema":
+        """从 SlsConfig 创建字段配置"""
+        include = config.include_fields
+        if include is None:
+            include = list(BASE_FIELDS)
+            if config.auto_detect_hostname:
+                include.append('hostname')
+                include.extend(CONTAINER_FIELDS)
+            if config.auto_detect_host_ip:
+                include.append('host_ip')
+            if config.auto_detect_thread:
+                include.append('thread')
+            include.append('extra')
+
+        return cls(
+            include=list(include),
+            rename=dict(config.field_rename),
+            constants=dict(config.constant_fields),
+            flatten_extra=config.flatten_extra,
+            extra_prefix=config.extra_prefix,
+        )
+
+    def resolved_fields(self) -> List[str]:
+        """按内置顺序返回启用的字段
+
+        Raises:
+            ValueError: 包含未知字段
+        """
+        include = list(BUILTIN_FIELDS) if self.include is None else self.include
+        unknown = [name for name in include if name not in BUILTIN_FIELDS]
+        if unknown:
+            raise ValueError(
+                f"未知的字段: {', '.join(unknown)}，可选值: {', '.join(BUILTIN_FIELDS)}"
+            )
+        return [name for name in BUILTIN_FIELDS if name in include]
+
+
+def _compile(name: str, source: str, namespace: Dict[str, Any]) -> Callable:
+    """编译生成的函数源码"""
+    code = compile(source, f"<yai-field-plan:{name}>", "exec")
+    exec(code, namespace)
+    return namespace[name]
+
+
+class FieldPlan:
+    """编译后的字段映射计划"""
+
+    def __init__(
+        self,
+        schema: FieldSchema,
+        category: Callable[[Dict[str, Any]], str],
+        thread_info: Callable[[Dict[str, Any]], str],
+        app_name: str = "",
+        app_version: str = "",
+        environment: str = "",
+        dumps: Optional[Callable[[Any], str]] = None,
+        keep_context: bool = False,
+    ) -> None:
+        """编译字段映射计划
+
+        Args:
+            schema: 字段配置
+            category: 计算日志分类的函数
+            thread_info: 计算线程信息的函数
+            app_name: 应用名称
+            app_version: 应用版本
+            environment: 运行环境
+            dumps: extra 字段的序列化函数，默认使用标准库编码器
+            keep_context: 是否在 CONTEXT_KEY 下保留整个 extra，供分区和路由查找
+        """
+        self.schema = schema
+        self.fields = schema.resolved_fields()
+        self.keep_context = keep_context
+
+        namespace: Dict[str, Any] = {
+            'category': category,
+            'thread_info': thread_info,
+            'app_name': app_name,
+            'app_version': app_version,
+            'environment': environment,
+            'dumps': dumps or StdlibJsonEncoder().dumps,
+            'constants': [(key, str(value)) for key, value in schema.constants.items()],
+        }
+
+        self.build_source = self._generate_build_source()
+        self.contents_source = self._generate_contents_source()
+        self.build_log_data: Callable[[Dict[str, Any], Any], Dict[str, Any]] = _compile(
+            'build_log_data', self.build_source, dict(namespace)
+        )
+        self.to_contents: Callable[[Dict[str, Any]], List[Tuple[str, str]]] = _compile(
+            'to_contents', self.contents_source, dict(namespace)
+        )
+
+    def _generate_build_source(self) -> str:
+        """生成 build_log_data 的源码"""
+        lines = [
+            "def build_log_data(r, meta):",
+            "    d = {",
+            "        'timestamp': r['time'].timestamp(),",
+        ]
+        for name in self.fields:
+            if name in _RECORD_EXPRESSIONS:
+                lines.append(f"        {name!r}: {_RECORD_EXPRESSIONS[name]},")
+        lines.append("    }")
+
+        for name in self.fields:
+            if name in CONTAINER_FIELDS:
+                lines.append(f"    if meta.{name}:")
+                lines.append(f"        d[{name!r}] = meta.{name}")
+
+        if 'extra' in self.fields:
+            # loguru 将 extra 参数存储在 record['extra']['extra'] 中
+            lines.append("    e = r.get('extra', {})")
+            lines.append("    if 'extra' in e and e['extra']:")
+            lines.append("        d['extra'] = e['extra']")
+
+        if self.keep_context:
+            lines.append(f"    d[{CONTEXT_KEY!r}] = r.get('extra') or {{}}")
+
+        lines.append("    return d")
+        return "\n".join(lines) + "\n"
+
+    def _generate_contents_source(self) -> str:
+        """生成 to_contents 的源码"""
+        rename = self.schema.rename
+        lines = [
+            "def to_contents(d):",
+            "    c = [",
+        ]
+        for name in self.fields:
+            if name in _RECORD_EXPRESSIONS:
+                key = rename.get(name, name)
+                value = f"d[{name!r}]"
+                if name in _NON_STRING_FIELDS:
+                    value = f"str({value})"
+                lines.append(f"        ({key!r}, {value}),")
+        lines.append("    ]")
+
+        for name in self.fields:
+            if name in CONTAINER_FIELDS:
+                key = rename.get(name, name)
+                lines.append(f"    v = d.get({name!r})")
+                lines.append("    if v:")
+                lines.append(f"        c.append(({key!r}, v))")
+
+        if self.schema.constants:
+            lines.append("    c += constants")
+
+        if 'extra' in self.fields:
+            lines.append("    e = d.get('extra')")
+            lines.append("    if e:")
+            if self.schema.flatten_extra:
+                prefix = self.schema.extra_prefix
+                lines.append("        for k, v in e.items():")
+                lines.append(
+                    f"            c.append(({prefix!r} + str(k), "
+                    "v if isinstance(v, str) else dumps(v)))"
+                )
+            else:
+                key = rename.get('extra', 'extra')
+                lines.append(f"        c.append(({key!r}, dumps(e)))")
+
+        lines.append("    return c")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,71 @@
+"""
+fork 安全
+
+gunicorn / uWSGI 等 pre-fork 服务器在导入应用、配置好日志之后才 fork 工作进程。子进程只有
+调用 fork 的那个线程，继承的 sink 没有 flush 线程、发送线程池和补发线程，日志在队列里越积
+越多；LogClient 和内置传输的连接也与父进程共用同一个 socket。
+
+`os.register_at_fork` 的钩子只在子进程中执行，把存活的 sink 标记为已 fork，子进程第一次写
+日志时再重建进程内的运行时状态（`SlsSink._reinit_after_fork`）：
+
+- 新的队列：父进程已缓冲的记录由父进程发送，子进程从空队列开始，不会重复发送
+- 新的 flush 线程、发送阶段、重试调度和熔断器
+- 新的 LogClient 和内置传输的连接池，继承的连接直接丢弃，不关闭
+- 新的 PackId 上下文前缀（由子进程 pid 生成）
+- 配置了磁盘暂存时改用 `spool_dir/fork-<pid>` 子目录，一个目录只能由一个进程写入。
+  子进程退出后，使用 `spool_dir` 本身的进程（通常是 master）的补发线程把进程已不存在的
+  `fork-<pid>` 子目录并入自己的暂存并删除该子目录（`orphaned_fork_spool_dirs`）
+
+父进程 fork 时没有额外开销，写日志的热路径只多一次属性检查；没有写过日志的子进程不会启动
+任何线程。
+"""
+
+import os
+import weakref
+from typing import Any, List, Optional
+
+from .shm_ring import pid_alive
+
+
+# 需要在子进程中重建的 sink
+_fork_sinks: "weakref.WeakSet[Any]" = weakref.WeakSet()
+
+
+def register_fork_reset(sink: Any) -> None:
+    """fork 后在子进程中标记 sink，等待重建"""
+    _fork_sinks.add(sink)
+
+
+def fork_spool_dir(spool_dir: str, pid: Optional[int] = None) -> str:
+    """子进程使用的磁盘暂存目录"""
+    return os.path.join(spool_dir, f"fork-{pid if pid is not None else os.getpid()}")
+
+
+def orphaned_fork_spool_dirs(spool_dir: str) -> List[str]:
+    """进程已退出的子进程留下的磁盘暂存目录"""
+    try:
+        names = os.listdir(spool_dir)
+    except OSError:
+        return []
+    orphans = []
+    for name in sorted(names):
+        prefix, _, pid = name.partition('-')
+        if prefix != 'fork' or not pid.isdigit() or pid_alive(int(pid)):
+            continue
+        path = os.path.join(spool_dir, name)
+        if os.path.isdir(path):
+            orphans.append(path)
+    return orphans
+
+
+def _after_fork_in_child() -> None:
+    """fork 钩子：子进程中标记所有存活的 sink"""
+    for sink in list(_fork_sinks):
+        try:
+            sink._mark_forked()
+        except Exception as e:
+            print(f"SLS fork 重置错误: {e}")
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,177 @@
+"""
+主机元数据解析
+
+在 sink 构造时一次性解析主机名、主机 IP、Pod 名称、命名空间和容器 ID，
+之后由后台线程按 TTL 刷新。热路径只读取 `HostMetadataResolver.current`
+这个不可变快照，引用替换是原子的，因此读取无需加锁。
+"""
+
+import os
+import re
+import socket
+import threading
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+
+# Kubernetes ServiceAccount 挂载的命名空间文件
+K8S_NAMESPACE_FILE = "/var/run/secrets/kubernetes.io/serviceaccount/namespace"
+
+# cgroup 文件路径，容器 ID 从中解析
+CGROUP_FILE = "/proc/self/cgroup"
+
+# docker / containerd / cri-o 的容器 ID 都是 64 位十六进制
+_CONTAINER_ID_PATTERN = re.compile(r"([0-9a-f]{64})")
+
+
+@dataclass(frozen=True)
+class HostMetadata:
+    """主机元数据快照（不可变）"""
+
+    hostname: str
+    host_ip: str
+    pod_name: str = ""
+    namespace: str = ""
+    container_id: str = ""
+
+
+def resolve_hostname() -> str:
+    """获取主机名"""
+    try:
+        return socket.gethostname()
+    except Exception:
+        return "unknown-host"
+
+
+def resolve_host_ip() -> str:
+    """获取主机IP
+
+    优先使用环境变量（Kubernetes downward API 常用 POD_IP / HOST_IP），
+    否则通过 UDP socket 的路由查询获取出口网卡地址。UDP connect 不会真正发包，
+    且只在解析时执行一次，不再出现在每条日志的热路径上。
+    """
+    env_ip = os.getenv("POD_IP") or os.getenv("HOST_IP")
+    if env_ip:
+        return env_ip
+
+    try:
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            s.connect(("8.8.8.8", 80))
+            return s.getsockname()[0]
+        finally:
+            s.close()
+    except Exception:
+        return "unknown-ip"
+
+
+def resolve_pod_name(hostname: str) -> str:
+    """获取 Pod 名称
+
+    优先读取 POD_NAME 环境变量；在 Kubernetes 中未显式注入时，
+    Pod 的主机名即为 Pod 名称。非 Kubernetes 环境返回空字符串。
+    """
+    pod_name = os.getenv("POD_NAME")
+    if pod_name:
+        return pod_name
+    if os.getenv("KUBERNETES_SERVICE_HOST"):
+        return hostname
+    return ""
+
+
+def resolve_namespace(namespace_file: str = K8S_NAMESPACE_FILE) -> str:
+    """获取 Kubernetes 命名空间"""
+    namespace = os.getenv("POD_NAMESPACE")
+    if namespace:
+        return namespace
+    try:
+        with open(namespace_file, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except Exception:
+        return ""
+
+
+def resolve_container_id(cgroup_file: str = CGROUP_FILE) -> str:
+    """从 cgroup 文件解析容器 ID
+
+    兼容 cgroup v1（`12:memory:/docker/<id>`）和常见的 v2 / systemd 路径
+    （`0::/kubepods.slice/.../cri-containerd-<id>.scope`）。
+    """
+    try:
+        with open(cgroup_file, "r", encoding="utf-8") as f:
+            for line in f:
+                match = _CONTAINER_ID_PATTERN.search(line)
+                if match:
+                    return match.group(1)
+    except Exception:
+        pass
+    return ""
+
+
+def resolve_host_metadata() -> HostMetadata:
+    """解析完整的主机元数据"""
+    hostname = resolve_hostname()
+    return HostMetadata(
+        hostname=hostname,
+        host_ip=resolve_host_ip(),
+        pod_name=resolve_pod_name(hostname),
+        namespace=resolve_namespace(),
+        container_id=resolve_container_id(),
+    )
+
+
+class HostMetadataResolver:
+    """带 TTL 刷新的主机元数据解析器
+
+    - 构造时同步解析一次，保证第一条日志就有完整元数据
+    - ttl > 0 时启动后台守护线程定期刷新（如 DHCP 更换 IP）
+    - `current` 属性始终指向一个完整的 `HostMetadata`，热路径直接读取
+    """
+
+    def __init__(
+        self,
+        ttl: float = 300.0,
+        resolver: Callable[[], HostMetadata] = resolve_host_metadata,
+    ) -> None:
+        """初始化解析器
+
+        Args:
+            ttl: 刷新间隔（秒），小于等于 0 时不刷新
+            resolver: 元数据解析函数
+        """
+        self.ttl = ttl
+        self._resolver = resolver
+        self.current: HostMetadata = resolver()
+
+        self._stop_event = threading.Event()
+        self._refresh_thread: Optional[threading.Thread] = None
+        if ttl > 0:
+            self._refresh_thread = threading.Thread(
+                target=self._refresh_worker,
+                name="yai-sls-host-metadata",
+                daemon=True,
+            )
+            self._refresh_thread.start()
+
+    def refresh(self) -> HostMetadata:
+        """立即重新解析元数据
+
+        解析失败时保留旧快照。
+
+        Returns:
+            当前生效的元数据快照
+        """
+        try:
+            self.current = self._resolver()
+        except Exception as e:
+            print(f"SLS主机元数据刷新错误: {e}")
+        return self.current
+
+    def _refresh_worker(self) -> None:
+        """后台刷新线程"""
+        while not self._stop_event.wait(self.ttl):
+            self.refresh()
+
+    def close(self) -> None:
+        """停止后台刷新"""
+        self._stop_event.set()
@@ -0,0 +1,81 @@
+"""
+批次等待时间（linger）
+
+类似 Kafka 的 `linger.ms`：批次中第一条记录到达后最多再等待 linger 时间，
+期间到达的记录合入同一批次，达到记录数或字节数上限时提前封批。
+
+- 固定模式：linger 为配置值，0 表示取到记录后立即封批（默认行为）
+- 自适应模式：根据测得的到达速率选择 linger，在 max_linger_time 的延迟上限内
+  尽量减少请求数：
+    - 上限时间内预计到达不足一条记录时不等待，等待只会增加延迟
+    - 否则等待到批次预计装满为止，但不超过 max_linger_time
+"""
+
+import time
+from typing import Optional
+
+
+class LingerController:
+    """计算当前批次的等待时间"""
+
+    def __init__(
+        self,
+        linger_time: float = 0.0,
+        adaptive: bool = False,
+        max_linger_time: float = 1.0,
+        batch_size: int = 100,
+        window: float = 0.5,
+        smoothing: float = 0.3,
+    ) -> None:
+        """初始化 linger 控制器
+
+        Args:
+            linger_time: 固定模式下的等待时间（秒）
+            adaptive: 是否根据到达速率自适应选择等待时间
+            max_linger_time: 自适应模式下等待时间的上限（秒）
+            batch_size: 批次的记录数目标
+            window: 到达速率的统计窗口（秒）
+            smoothing: 到达速率的指数平滑系数，越大越偏向最近的窗口
+        """
+        self.linger_time = max(0.0, linger_time)
+        self.adaptive = adaptive
+        self.max_linger_time = max(0.0, max_linger_time)
+        self.batch_size = max(1, batch_size)
+        self.window = window
+        self.smoothing = smoothing
+
+        self._rate = 0.0
+        self._window_start: Optional[float] = None
+        self._window_count = 0
+
+    @property
+    def arrival_rate(self) -> float:
+        """平滑后的到达速率（条/秒）"""
+        return self._rate
+
+    def observe(self, count: int, now: Optional[float] = None) -> None:
+        """记录一次取数得到的记录数"""
+        if not self.adaptive:
+            return
+        if now is None:
+            now = time.monotonic()
+        if self._window_start is None:
+            self._window_start = now
+        self._window_count += count
+
+        elapsed = now - self._window_start
+        if elapsed >= self.window:
+            instant = self._window_count / elapsed
+            self._rate += (instant - self._rate) * self.smoothing
+            self._window_start = now
+            self._window_count = 0
+
+    def current(self) -> float:
+        """当前批次的等待时间（秒）"""
+        if not self.adaptive:
+            return self.linger_time
+
+        rate = self._rate
+        if rate * self.max_linger_time < 1.0:
+            return 0.0
+        return min(self.max_linger_time, self.batch_size / rate)
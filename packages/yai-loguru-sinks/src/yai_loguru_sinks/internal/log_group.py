@@ -0,0 +1,153 @@
+"""
+LogGroup protobuf 编码器
+
+SDK 的 put_logs 需要先为每条日志创建 `LogItem`（set_contents 会深拷贝一次），
+再逐条填充 protobuf 对象后序列化。这里直接按 SLS LogGroup 的 wire format
+把批次中的 (时间戳, contents) 写入可复用的 bytearray：
+
+    LogGroup { repeated Log Logs = 1; optional string Topic = 3;
+               optional string Source = 4; repeated LogTag LogTags = 6; }
+    Log      { required uint32 Time = 1; repeated Content Contents = 2; }
+    Content  { required string Key = 1; required string Value = 2; }
+    LogTag   { required string Key = 1; required string Value = 2; }
+
+- 字段标签字节预先计算，小于 16384 的长度直接查表得到 varint 编码
+- 字段名（绝大多数是固定的几个）的 UTF-8 编码及其标签、长度前缀按名称缓存
+- 输出与 SDK 按相同字段构造的 LogGroup 序列化结果逐字节一致（不写可选的 Time_ns）
+"""
+
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# 字段标签：(field_number << 3) | wire_type，wire_type 0 为 varint，2 为长度前缀
+TAG_LOG = b'\x0a'            # LogGroup.Logs = 1
+TAG_TOPIC = b'\x1a'          # LogGroup.Topic = 3
+TAG_SOURCE = b'\x22'         # LogGroup.Source = 4
+TAG_LOG_TAG = b'\x32'        # LogGroup.LogTags = 6
+TAG_TIME = b'\x08'           # Log.Time = 1
+TAG_CONTENT = b'\x12'        # Log.Contents = 2
+TAG_KEY = b'\x0a'            # Content.Key / LogTag.Key = 1
+TAG_VALUE = b'\x12'          # Content.Value / LogTag.Value = 2
+
+# 预先编码的小整数 varint
+_VARINT_TABLE_SIZE = 1 << 14
+_KEY_CACHE_SIZE = 1024
+
+
+def encode_varint(value: int) -> bytes:
+    """编码无符号 varint"""
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+_VARINTS: Tuple[bytes, ...] = tuple(encode_varint(i) for i in range(_VARINT_TABLE_SIZE))
+
+
+def _varint(value: int) -> bytes:
+    if value < _VARINT_TABLE_SIZE:
+        return _VARINTS[value]
+    return encode_varint(value)
+
+
+class LogGroupEncoder:
+    """把批次直接编码为 LogGroup 的 protobuf 字节"""
+
+    def __init__(self, topic: str = "", source: str = "") -> None:
+        """初始化编码器
+
+        Args:
+            topic: LogGroup 的 Topic，总是写入（与 SDK 一致，空字符串也会写入）
+            source: LogGroup 的 Source，为空时不写入
+        """
+        # Topic / Source 在每个请求中都相同，预先编码；路由到其他 Topic 时按 Topic 缓存
+        self._source = self._string_field(TAG_SOURCE, source) if source else b''
+        self._header = self._string_field(TAG_TOPIC, topic) + self._source
+        self._topic_headers: Dict[str, bytes] = {}
+        # 字段名 -> Content.Key 的完整编码（标签 + 长度 + UTF-8）
+        self._keys: Dict[str, bytes] = {}
+        self._local = threading.local()
+
+    @staticmethod
+    def _string_field(tag: bytes, value: str) -> bytes:
+        data = str.encode(value, 'utf-8')
+        return tag + _varint(len(data)) + data
+
+    def _encode_key(self, key: str) -> bytes:
+        encoded = self._keys.get(key)
+        if encoded is None:
+            encoded = self._string_field(TAG_KEY, key)
+            if len(self._keys) < _KEY_CACHE_SIZE:
+                self._keys[key] = encoded
+        return encoded
+
+    def _topic_header(self, topic: str) -> bytes:
+        header = self._topic_headers.get(topic)
+        if header is None:
+            header = self._string_field(TAG_TOPIC, topic) + self._source
+            if len(self._topic_headers) < _KEY_CACHE_SIZE:
+                self._topic_headers[topic] = header
+        return header
+
+    def _buffers(self) -> Tuple[bytearray, bytearray]:
+        """当前线程复用的输出缓冲和单条日志缓冲"""
+        local = self._local
+        buffers = getattr(local, 'buffers', None)
+        if buffers is None:
+            buffers = local.buffers = (bytearray(), bytearray())
+        return buffers
+
+    def encode(
+        self,
+        logs: Sequence[Tuple[int, Sequence[Tuple[str, str]]]],
+        logtags: Optional[List[Tuple[str, str]]] = None,
+        topic: Optional[str] = None,
+    ) -> bytes:
+        """编码一个批次
+
+        Args:
+            logs: (unix 时间戳, [(字段名, 值), ...]) 列表，值必须是字符串
+            logtags: LogGroup 的 LogTags，如 [('__pack_id__', '...')]
+            topic: 覆盖初始化时的 Topic，None 表示使用初始化时的 Topic
+
+        Returns:
+            LogGroup 序列化后的字节
+        """
+        out, log_buf = self._buffers()
+        del out[:]
+        encode_key = self._encode_key
+        varint = _varint
+        str_encode = str.encode
+
+        for timestamp, contents in logs:
+            del log_buf[:]
+            log_buf += TAG_TIME
+            log_buf += varint(int(timestamp))
+            for key, value in contents:
+                key_bytes = encode_key(key)
+                # 非字符串的值直接抛出 TypeError，由调用方回退到 SDK 路径
+                value_bytes = str_encode(value, 'utf-8')
+                value_len = len(value_bytes)
+                value_len_bytes = varint(value_len)
+                log_buf += TAG_CONTENT
+                log_buf += varint(len(key_bytes) + 1 + len(value_len_bytes) + value_len)
+                log_buf += key_bytes
+                log_buf += TAG_VALUE
+                log_buf += value_len_bytes
+                log_buf += value_bytes
+            out += TAG_LOG
+            out += varint(len(log_buf))
+            out += log_buf
+
+        out += self._header if topic is None else self._topic_header(topic)
+        if logtags:
+            for key, value in logtags:
+                tag = self._string_field(TAG_KEY, key) + self._string_field(TAG_VALUE, value)
+                out += TAG_LOG_TAG
+                out += varint(len(tag))
+                out += tag
+        return bytes(out)
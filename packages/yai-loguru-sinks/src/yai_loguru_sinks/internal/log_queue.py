@@ -0,0 +1,408 @@
+"""
+有界日志队列
+
+为 SlsSink 提供按记录数或估算字节数限制的有界队列，
+队列满时按配置的背压策略处理，并统计丢弃的记录数。
+接口与 `queue.Queue` 保持兼容（put / get / get_nowait / empty / qsize）。
+"""
+
+import threading
+import time
+from collections import deque
+from queue import Empty
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+
+# 队列满时的背压策略
+POLICY_BLOCK = "block"                        # 阻塞等待，超时后丢弃新记录
+POLICY_DROP_NEWEST = "drop_newest"            # 丢弃新记录
+POLICY_DROP_OLDEST = "drop_oldest"            # 丢弃最旧的记录
+POLICY_DROP_BELOW_LEVEL = "drop_below_level"  # 丢弃低于指定级别的记录
+
+QUEUE_FULL_POLICIES = (
+    POLICY_BLOCK, POLICY_DROP_NEWEST, POLICY_DROP_OLDEST, POLICY_DROP_BELOW_LEVEL,
+)
+
+# block 策略带 cancel 等待时检查 cancel 的间隔（秒）
+CANCEL_POLL_INTERVAL = 0.1
+
+# 单条记录的固定开销估算（字段名、系统字段、协议开销等）
+RECORD_OVERHEAD_BYTES = 256
+# extra 中每个字段的估算开销
+EXTRA_FIELD_BYTES = 64
+
+# loguru 内置级别，避免在热路径之外也依赖 logger 实例
+_BUILTIN_LEVELS: Dict[str, int] = {
+    "TRACE": 5,
+    "DEBUG": 10,
+    "INFO": 20,
+    "SUCCESS": 25,
+    "WARNING": 30,
+    "ERROR": 40,
+    "CRITICAL": 50,
+}
+
+
+def resolve_level_no(level: Union[str, int]) -> int:
+    """将级别名称解析为数值
+
+    Args:
+        level: 级别名称（如 "WARNING"）或级别数值
+
+    Returns:
+        级别数值
+
+    Raises:
+        ValueError: 未知的级别名称
+    """
+    if isinstance(level, int):
+        return level
+    name = level.upper()
+    if name in _BUILTIN_LEVELS:
+        return _BUILTIN_LEVELS[name]
+    try:
+        from loguru import logger
+        return logger.level(name).no
+    except Exception:
+        raise ValueError(f"未知的日志级别: {level}")
+
+
+def estimate_record_size(message: str, extra: Optional[Dict[str, Any]] = None) -> int:
+    """粗略估算一条日志编码后的字节数
+
+    只使用 O(1) 的长度信息，不做任何序列化。
+    """
+    size = RECORD_OVERHEAD_BYTES + len(message)
+    if extra:
+        size += EXTRA_FIELD_BYTES * len(extra)
+    return size
+
+
+class BoundedLogQueue:
+    """有界日志队列
+
+    - `max_size` / `max_bytes` 任一达到上限即视为队列已满（<= 0 表示不限）
+    - 队列满时按 `policy` 处理，被丢弃的记录计入 `dropped` / `dropped_bytes`
+    - `is_congested()` 无锁读取当前水位，供应用层在记录日志前主动降载
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        max_bytes: int = 0,
+        policy: str = POLICY_DROP_OLDEST,
+        block_timeout: float = 0.1,
+        drop_level_no: int = 30,
+        congestion_ratio: float = 0.8,
+    ) -> None:
+        """初始化有界队列
+
+        Args:
+            max_size: 最大记录数
+            max_bytes: 最大估算字节数
+            policy: 队列满时的背压策略
+            block_timeout: block 策略的最长等待时间（秒）
+            drop_level_no: drop_below_level 策略保留的最低级别数值
+            congestion_ratio: 水位达到上限的该比例时视为拥塞
+        """
+        if policy not in QUEUE_FULL_POLICIES:
+            raise ValueError(
+                f"无效的队列背压策略: {policy}，可选值: {', '.join(QUEUE_FULL_POLICIES)}"
+            )
+
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.drop_level_no = drop_level_no
+
+        self._congested_size = int(max_size * congestion_ratio) if max_size > 0 else 0
+        self._congested_bytes = int(max_bytes * congestion_ratio) if max_bytes > 0 else 0
+
+        # 队列元素: (item, nbytes, level_no)
+        self._queue: Deque[Tuple[Any, int, int]] = deque()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        # 关闭后 drain 不再等待
+        self._closed = False
+
+        # 丢弃统计
+        self.dropped = 0
+        self.dropped_bytes = 0
+
+    def _is_full(self, nbytes: int) -> bool:
+        """判断放入 nbytes 后是否超限（调用方需持有锁）"""
+        return self._exceeds(len(self._queue), self._bytes, nbytes)
+
+    def _exceeds(self, size: int, total_bytes: int, nbytes: int) -> bool:
+        """判断队列有 size 条、total_bytes 字节时再放入 nbytes 是否超限"""
+        if not size:
+            # 空队列总是接收，避免超大单条记录永远无法入队
+            return False
+        if self.max_size > 0 and size >= self.max_size:
+            return True
+        if self.max_bytes > 0 and total_bytes + nbytes > self.max_bytes:
+            return True
+        return False
+
+    def _append(self, item: Any, nbytes: int, level_no: int) -> None:
+        """入队（调用方需持有锁）"""
+        self._queue.append((item, nbytes, level_no))
+        self._bytes += nbytes
+        self._not_empty.notify()
+
+    def _drop(self, nbytes: int) -> None:
+        """记录一次丢弃（调用方需持有锁）"""
+        self.dropped += 1
+        self.dropped_bytes += nbytes
+
+    def _evict(self, index: int = 0) -> None:
+        """驱逐队列中指定位置的记录（调用方需持有锁）"""
+        if index == 0:
+            _, nbytes, _ = self._queue.popleft()
+        else:
+            _, nbytes, _ = self._queue[index]
+            del self._queue[index]
+        self._bytes -= nbytes
+        self._drop(nbytes)
+
+    def put(
+        self,
+        item: Any,
+        block: bool = True,
+        timeout: Optional[float] = None,
+        nbytes: int = 0,
+        level_no: int = 0,
+    ) -> bool:
+        """放入一条记录
+
+        Args:
+            item: 日志记录
+            block: 仅对 block 策略生效，False 时队列满直接丢弃
+            timeout: block 策略的等待时间，默认使用 `block_timeout`
+            nbytes: 记录的估算字节数
+            level_no: 记录的级别数值
+
+        Returns:
+            记录是否被接收
+        """
+        with self._lock:
+            return self._put_locked(item, nbytes, level_no, self._deadline(block, timeout))
+
+    def put_many(
+        self,
+        entries: List[Tuple[Any, int, int]],
+        block: bool = True,
+        timeout: Optional[float] = None,
+        cancel: Optional[threading.Event] = None,
+    ) -> int:
+        """批量放入记录，整批只加一次锁
+
+        Args:
+            entries: (item, nbytes, level_no) 列表
+            block: 仅对 block 策略生效
+            timeout: block 策略下整批的等待时间，默认使用 `block_timeout`，
+                传入 cancel 时可以为 `math.inf`（一直等待直到 cancel 被设置）
+            cancel: 设置后不再等待，剩余的记录计入丢弃
+
+        Returns:
+            被接收的记录数
+        """
+        with self._lock:
+            deadline = self._deadline(block, timeout)
+            accepted = 0
+            for item, nbytes, level_no in entries:
+                accepted += self._put_locked(item, nbytes, level_no, deadline, cancel)
+            return accepted
+
+    def _deadline(self, block: bool, timeout: Optional[float]) -> Optional[float]:
+        """计算 block 策略的等待截止时间，None 表示不等待"""
+        if self.policy != POLICY_BLOCK or not block:
+            return None
+        wait = self.block_timeout if timeout is None else timeout
+        return time.monotonic() + wait
+
+    def _put_locked(
+        self,
+        item: Any,
+        nbytes: int,
+        level_no: int,
+        deadline: Optional[float],
+        cancel: Optional[threading.Event] = None,
+    ) -> bool:
+        """按背压策略入队（调用方需持有锁）"""
+        if not self._is_full(nbytes):
+            self._append(item, nbytes, level_no)
+            return True
+
+        if self.policy == POLICY_DROP_NEWEST:
+            self._drop(nbytes)
+            return False
+
+        if self.policy == POLICY_DROP_OLDEST:
+            while self._is_full(nbytes):
+                self._evict()
+            self._append(item, nbytes, level_no)
+            return True
+
+        if self.policy == POLICY_DROP_BELOW_LEVEL:
+            if level_no < self.drop_level_no:
+                self._drop(nbytes)
+                return False
+            # 高级别记录只驱逐队列中的低级别记录（从最旧的开始），
+            # 低级别记录不足以腾出空间时丢弃新记录，不驱逐队列中的高级别记录
+            victims = self._below_level_victims(nbytes)
+            if victims is None:
+                self._drop(nbytes)
+                return False
+            for index in reversed(victims):
+                self._evict(index)
+            self._append(item, nbytes, level_no)
+            return True
+
+        # POLICY_BLOCK
+        if deadline is not None:
+            while self._is_full(nbytes):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if cancel is not None:
+                    if cancel.is_set():
+                        break
+                    # cancel 没有通知机制，分段等待以便及时发现
+                    remaining = min(remaining, CANCEL_POLL_INTERVAL)
+                self._not_full.wait(remaining)
+            if not self._is_full(nbytes):
+                self._append(item, nbytes, level_no)
+                return True
+        self._drop(nbytes)
+        return False
+
+    def _below_level_victims(self, nbytes: int) -> Optional[List[int]]:
+        """放入 nbytes 需要驱逐的低级别记录位置（从旧到新）
+
+        低级别记录全部驱逐后仍放不下时返回 None（调用方需持有锁）。
+        """
+        size, total_bytes = len(self._queue), self._bytes
+        victims: List[int] = []
+        for index, (_, item_bytes, level_no) in enumerate(self._queue):
+            if not self._exceeds(size, total_bytes, nbytes):
+                break
+            if level_no < self.drop_level_no:
+                victims.append(index)
+                size -= 1
+                total_bytes -= item_bytes
+        if self._exceeds(size, total_bytes, nbytes):
+            return None
+        return victims
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> Any:
+        """取出一条记录
+
+        Raises:
+            queue.Empty: 队列为空（非阻塞或等待超时）
+        """
+        with self._not_empty:
+            if not block:
+                if not self._queue:
+                    raise Empty
+            elif timeout is None:
+                while not self._queue:
+                    self._not_empty.wait()
+            else:
+                deadline = time.monotonic() + timeout
+                while not self._queue:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise Empty
+                    self._not_empty.wait(remaining)
+
+            item, nbytes, _ = self._queue.popleft()
+            self._bytes -= nbytes
+            self._not_full.notify()
+            return item
+
+    def drain(self, max_items: int, timeout: Optional[float] = None) -> List[Any]:
+        """批量取出记录，整批只加一次锁
+
+        Args:
+            max_items: 最多取出的记录数
+            timeout: 队列为空时的最长等待时间，None 表示不等待
+
+        Returns:
+            取出的记录列表，超时返回空列表
+        """
+        with self._not_empty:
+            if timeout is not None and not self._queue:
+                deadline = time.monotonic() + timeout
+                while not self._queue and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return []
+                    self._not_empty.wait(remaining)
+
+            count = min(max_items, len(self._queue))
+            items = []
+            popleft = self._queue.popleft
+            for _ in range(count):
+                item, nbytes, _ = popleft()
+                self._bytes -= nbytes
+                items.append(item)
+            if count:
+                self._not_full.notify_all()
+            return items
+
+    def drain_entries(self) -> List[Tuple[Any, int, int]]:
+        """取出全部记录，不等待
+
+        Returns:
+            (item, nbytes, level_no) 列表
+        """
+        with self._lock:
+            entries = list(self._queue)
+            self._queue.clear()
+            self._bytes = 0
+            self._not_full.notify_all()
+            return entries
+
+    def close(self) -> None:
+        """唤醒等待中的 drain，之后 drain 在队列为空时立即返回"""
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+
+    def peek(self) -> Any:
+        """无锁读取队列头部（最早入队）的记录，队列为空时返回 None"""
+        try:
+            return self._queue[0][0]
+        except IndexError:
+            return None
+
+    def get_nowait(self) -> Any:
+        """非阻塞取出一条记录"""
+        return self.get(block=False)
+
+    def qsize(self) -> int:
+        """当前记录数"""
+        return len(self._queue)
+
+    def qbytes(self) -> int:
+        """当前估算字节数"""
+        return self._bytes
+
+    def empty(self) -> bool:
+        """队列是否为空"""
+        return not self._queue
+
+    def is_congested(self) -> bool:
+        """队列是否拥塞
+
+        无锁读取，开销与一次属性访问相当，适合在记录日志前调用。
+        """
+        if self._congested_size and len(self._queue) >= self._congested_size:
+            return True
+        if self._congested_bytes and self._bytes >= self._congested_bytes:
+            return True
+        return False
@@ -0,0 +1,381 @@
+"""
+sink 的运行指标
+
+`SinkMetrics` 记录 sink 各环节的计数、水位和分布，通过 `SlsSink.stats()` 或
+`AsyncSlsSink.stats()` 读取，配置 metrics_port 或 metrics_socket 时由 `MetricsExporter`
+以 Prometheus 文本格式对外提供。
+
+- 计数器（`StripedCounter`）按线程分片：每个线程只累加自己的格子，不取锁，读取时才汇总。
+  应用线程每写一条日志都要累加，分片后多个线程之间没有竞争
+- 水位（gauge）在读取时调用回调计算，热路径上没有任何开销
+- 分布（`Histogram`）按请求记录，频率远低于日志条数，使用一把锁
+
+已由其他组件维护的计数（队列满丢弃的条数、磁盘暂存写入的条数等）作为计数器的
+`sources` 在读取时累加，不重复记录。
+"""
+
+import bisect
+import os
+import socket
+import socketserver
+import stat
+import threading
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+
+# 请求耗时的分桶上限（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# 批次条数的分桶上限
+BATCH_SIZE_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Prometheus 文本格式的 Content-Type
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+METRIC_COUNTER = "counter"
+METRIC_GAUGE = "gauge"
+METRIC_HISTOGRAM = "histogram"
+
+
+class StripedCounter:
+    """按线程分片的计数器
+
+    每个线程第一次累加时注册一个只属于自己的格子，之后 `add` 只读写这个格子。
+    已退出线程的格子在读取时并入 `_retired`。
+    """
+
+    def __init__(self, sources: Sequence[Callable[[], int]] = ()) -> None:
+        """初始化
+
+        Args:
+            sources: 由其他组件维护的计数，读取时累加
+        """
+        self.sources = tuple(sources)
+        self._local = threading.local()
+        # 已注册的格子: (线程弱引用, [计数])
+        self._cells: List[Tuple[weakref.ref, List[int]]] = []
+        self._retired = 0
+        self._lock = threading.Lock()
+
+    def add(self, amount: int = 1) -> None:
+        """累加（只写当前线程的格子）"""
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._register()
+        cell[0] += amount
+
+    def _register(self) -> List[int]:
+        cell = [0]
+        with self._lock:
+            self._cells.append((weakref.ref(threading.current_thread()), cell))
+        self._local.cell = cell
+        return cell
+
+    @property
+    def value(self) -> int:
+        """汇总所有格子和 sources"""
+        with self._lock:
+            total = self._retired
+            live = []
+            for thread_ref, cell in self._cells:
+                thread = thread_ref()
+                if thread is None or not thread.is_alive():
+                    # 线程已退出，不会再写这个格子
+                    self._retired += cell[0]
+                    total += cell[0]
+                else:
+                    total += cell[0]
+                    live.append((thread_ref, cell))
+            self._cells = live
+        return total + sum(source() for source in self.sources)
+
+
+class Histogram:
+    """固定分桶的分布"""
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        """初始化
+
+        Args:
+            buckets: 各分桶的上限（包含），之外还有一个 +Inf 分桶
+        """
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """记录一次观测值"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    @property
+    def value(self) -> Dict[str, Any]:
+        """累计分布：{'buckets': [(上限, 不超过上限的次数), ...], 'sum', 'count'}"""
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative = []
+        running = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            running += bucket_count
+            cumulative.append((bound, running))
+        return {'buckets': cumulative, 'sum': total, 'count': count}
+
+
+class Gauge:
+    """读取时由回调计算的水位"""
+
+    def __init__(self, read: Callable[[], float]) -> None:
+        self._read = read
+
+    @property
+    def value(self) -> float:
+        return self._read()
+
+
+Metric = Union[StripedCounter, Gauge, Histogram]
+
+
+class MetricsRegistry:
+    """按名称登记的一组指标"""
+
+    def __init__(self, prefix: str = "yai_sls", labels: Optional[Dict[str, str]] = None) -> None:
+        """初始化
+
+        Args:
+            prefix: Prometheus 指标名的前缀
+            labels: 附加在每个样本上的标签
+        """
+        self.prefix = prefix
+        self.labels = dict(labels or {})
+        # 名称 -> (类型, 说明, 指标)，按登记顺序输出
+        self._metrics: Dict[str, Tuple[str, str, Metric]] = {}
+
+    def counter(self, name: str, help_text: str, sources: Sequence[Callable[[], int]] = ()) -> StripedCounter:
+        """登记计数器"""
+        return self._register(name, METRIC_COUNTER, help_text, StripedCounter(sources))
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float]) -> Gauge:
+        """登记水位"""
+        return self._register(name, METRIC_GAUGE, help_text, Gauge(read))
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float]) -> Histogram:
+        """登记分布"""
+        return self._register(name, METRIC_HISTOGRAM, help_text, Histogram(buckets))
+
+    def _register(self, name: str, kind: str, help_text: str, metric: Any) -> Any:
+        if name in self._metrics:
+            raise ValueError(f"指标已存在: {name}")
+        self._metrics[name] = (kind, help_text, metric)
+        return metric
+
+    def snapshot(self) -> Dict[str, Any]:
+        """读取全部指标，水位回调出错时该项为 None"""
+        values: Dict[str, Any] = {}
+        for name, (_, _, metric) in self._metrics.items():
+            try:
+                values[name] = metric.value
+            except Exception:
+                values[name] = None
+        return values
+
+    def render_prometheus(self) -> str:
+        """输出 Prometheus 文本格式"""
+        lines = []
+        for name, (kind, help_text, metric) in self._metrics.items():
+            try:
+                value = metric.value
+            except Exception:
+                continue
+            if value is None:
+                continue
+            full_name = f"{self.prefix}_{name}"
+            if kind == METRIC_COUNTER:
+                full_name += "_total"
+            lines.append(f"# HELP {full_name} {_escape_help(help_text)}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            if kind == METRIC_HISTOGRAM:
+                for bound, count in value['buckets']:
+                    lines.append(f"{full_name}_bucket{self._labels(le=_format_value(bound))} {count}")
+                lines.append(f"{full_name}_bucket{self._labels(le='+Inf')} {value['count']}")
+                lines.append(f"{full_name}_sum{self._labels()} {_format_value(value['sum'])}")
+                lines.append(f"{full_name}_count{self._labels()} {value['count']}")
+            else:
+                lines.append(f"{full_name}{self._labels()} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _labels(self, **extra: str) -> str:
+        labels = {**self.labels, **extra}
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels.items()) + "}"
+
+
+class SinkMetrics(MetricsRegistry):
+    """SlsSink 和 AsyncSlsSink 的指标
+
+    计数器由 sink 各环节直接累加，水位和其他组件维护的计数由 sink 创建时登记
+    （见 `SlsSink._create_metrics`、`AsyncSlsSink._create_metrics`）。
+    """
+
+    def __init__(
+        self,
+        labels: Optional[Dict[str, str]] = None,
+        dropped_records: Sequence[Callable[[], int]] = (),
+        dropped_bytes: Sequence[Callable[[], int]] = (),
+        spooled_records: Sequence[Callable[[], int]] = (),
+        spooled_bytes: Sequence[Callable[[], int]] = (),
+    ) -> None:
+        """初始化
+
+        Args:
+            labels: 附加在每个样本上的标签
+            dropped_records / dropped_bytes: 其他组件维护的丢弃计数
+            spooled_records / spooled_bytes: 其他组件维护的暂存计数
+        """
+        super().__init__(labels=labels)
+        self.enqueued_records = self.counter("enqueued_records", "写入 sink 的日志条数（包括随后被丢弃的）")
+        self.enqueued_bytes = self.counter("enqueued_bytes", "写入 sink 的日志估算字节数")
+        self.sent_records = self.counter("sent_records", "发送成功的日志条数")
+        self.sent_bytes = self.counter("sent_bytes", "发送成功的日志估算字节数")
+        self.retried_records = self.counter("retried_records", "重新提交发送的日志条数")
+        self.retried_bytes = self.counter("retried_bytes", "重新提交发送的日志估算字节数")
+        self.spooled_records = self.counter("spooled_records", "写入磁盘暂存的日志条数", spooled_records)
+        self.spooled_bytes = self.counter("spooled_bytes", "写入磁盘暂存的字节数", spooled_bytes)
+        self.dropped_records = self.counter("dropped_records", "丢弃的日志条数", dropped_records)
+        self.dropped_bytes = self.counter("dropped_bytes", "丢弃的日志估算字节数", dropped_bytes)
+        self.request_seconds = self.histogram("request_duration_seconds", "发送一个批次的耗时（秒）", LATENCY_BUCKETS)
+        self.batch_records = self.histogram("batch_size_records", "每次发送的批次条数", BATCH_SIZE_BUCKETS)
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    """GET /metrics 返回 Prometheus 文本格式"""
+
+    def do_GET(self) -> None:
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        try:
+            body = self.server.render().encode('utf-8')
+        except Exception as e:
+            print(f"SLS指标导出错误: {e}")
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # 不输出访问日志
+        pass
+
+
+class _TcpMetricsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _UnixMetricsServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self) -> Tuple[socket.socket, Any]:
+        # Unix socket 没有对端地址，BaseHTTPRequestHandler 需要一个 (host, port) 元组
+        conn, _ = super().get_request()
+        return conn, ('unix', 0)
+
+
+class MetricsExporter:
+    """在本机端口或 Unix socket 上提供 Prometheus 文本格式的指标"""
+
+    def __init__(
+        self,
+        render: Callable[[], str],
+        port: int = 0,
+        host: str = "127.0.0.1",
+        path: Optional[str] = None,
+    ) -> None:
+        """初始化并开始监听
+
+        Args:
+            render: 生成指标文本的函数
+            port: 监听的 TCP 端口，path 为空时使用
+            host: 监听的地址
+            path: 监听的 Unix socket 路径，优先于 port
+
+        Raises:
+            OSError: 端口被占用、socket 路径被其他文件占用或已有进程在监听
+        """
+        self.path = path
+        if path:
+            self._remove_stale_socket(path)
+            self._server: socketserver.BaseServer = _UnixMetricsServer(path, _MetricsRequestHandler)
+        else:
+            self._server = _TcpMetricsServer((host, port), _MetricsRequestHandler)
+        self._server.render = render  # type: ignore[attr-defined]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="yai-sls-metrics", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def address(self) -> Any:
+        """实际监听的地址：(host, port) 或 socket 路径"""
+        return self._server.server_address
+
+    @staticmethod
+    def _remove_stale_socket(path: str) -> None:
+        """删除上次未清理的 socket 文件，路径被其他文件占用或已有进程在监听时报错"""
+        try:
+            mode = os.stat(path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise FileExistsError(f"指标导出的 socket 路径已被其他文件占用: {path}")
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except OSError:
+            os.unlink(path)
+            return
+        finally:
+            probe.close()
+        raise FileExistsError(f"已有进程在该路径导出指标: {path}")
+
+    def close(self) -> None:
+        """停止监听"""
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join(timeout=1.0)
+        if self.path:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, int):
+        return str(value)
+    if value != value:
+        return "NaN"
+    if value in (float('inf'), float('-inf')):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _escape_help(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
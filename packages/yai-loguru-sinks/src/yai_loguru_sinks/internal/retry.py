@@ -0,0 +1,246 @@
+"""
+失败批次的重试调度
+
+发送失败的批次先按错误分类：
+
+- 可重试：限流 / 配额超限、429、5xx、网络错误（连接失败、超时等）
+- 不可重试：鉴权失败、请求体或参数错误、Project / Logstore 不存在等，重试也不会成功
+
+可重试的批次按指数退避加抖动（full jitter）等待后重新提交给发送阶段，最多重试
+max_retries 次，且不晚于批次创建后 timeout 秒。等待中的批次由调度线程持有，
+不占用发送线程和在途名额，因此不会阻塞新批次的组批和发送。按 hash_key 保证顺序时，
+等待重试的批次占住所属通道，重新提交后仍排在同一通道的后续批次之前（见 `BatchSender`）。
+
+全局重试预算限制重试请求占正常请求的比例：每个首次发送的批次存入 ratio 个令牌，
+每次重试消耗一个，另按 min_per_second 保底补充。SLS 故障恢复期间，
+重试请求不会成倍放大写入压力。
+"""
+
+import heapq
+import itertools
+import random
+import threading
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+from .data import LogBatch
+from .sender import THROTTLING_ERROR_CODES, is_throttling_error
+
+
+# 可重试的 SLS 错误码（LogRequestError 为 SDK 在请求未完成时抛出的网络错误）
+RETRYABLE_ERROR_CODES = THROTTLING_ERROR_CODES | frozenset({
+    'InternalServerError',
+    'RequestTimeout',
+    'LogRequestError',
+})
+
+# 不可重试的 SLS 错误码
+NON_RETRYABLE_ERROR_CODES = frozenset({
+    'Unauthorized',
+    'InvalidAccessKeyId',
+    'SignatureNotMatch',
+    'PostBodyInvalid',
+    'PostBodyTooLarge',
+    'PostBodyUncompressError',
+    'InvalidParameter',
+    'InvalidTimestamp',
+    'ProjectNotExist',
+    'LogStoreNotExist',
+})
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """发送失败的批次是否值得重试"""
+    if is_throttling_error(error):
+        return True
+
+    get_error_code = getattr(error, 'get_error_code', None)
+    if get_error_code is None:
+        # 非 SDK 异常：只有网络错误可重试（requests 的异常也继承自 OSError）
+        return isinstance(error, OSError)
+
+    code = get_error_code()
+    if code in NON_RETRYABLE_ERROR_CODES:
+        return False
+    if code in RETRYABLE_ERROR_CODES:
+        return True
+    status = getattr(error, 'resp_status', None)
+    return isinstance(status, int) and status >= 500
+
+
+def full_jitter_backoff(attempt: int, base_delay: float, max_delay: float) -> float:
+    """第 attempt 次重试前的等待时间（秒）：上限从 base_delay 起每次翻倍，不超过 max_delay，
+    实际等待时间在 [0, 上限] 内均匀抖动"""
+    ceiling = min(max_delay, base_delay * (2 ** (attempt - 1)))
+    return random.uniform(0.0, ceiling)
+
+
+class RetryBudget:
+    """全局重试预算（令牌桶）"""
+
+    def __init__(
+        self,
+        ratio: float = 0.2,
+        min_per_second: float = 1.0,
+        max_tokens: float = 100.0,
+    ) -> None:
+        """初始化重试预算
+
+        Args:
+            ratio: 每个首次请求允许的重试次数，0.2 表示重试最多占请求量的 20%
+            min_per_second: 每秒保底补充的重试次数，流量很低时也能重试
+            max_tokens: 令牌上限，限制故障开始时一次性放出的重试数
+        """
+        self.ratio = max(0.0, ratio)
+        self.min_per_second = max(0.0, min_per_second)
+        self.max_tokens = max(1.0, max_tokens)
+        self._tokens = self.max_tokens
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self) -> float:
+        """当前可用的重试次数"""
+        return self._tokens
+
+    def deposit(self) -> None:
+        """记录一次首次请求"""
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_withdraw(self, now: Optional[float] = None) -> bool:
+        """尝试为一次重试扣除令牌
+
+        Returns:
+            预算是否允许这次重试
+        """
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            elapsed = max(0.0, now - self._updated_at)
+            self._updated_at = now
+            self._tokens = min(self.max_tokens, self._tokens + elapsed * self.min_per_second)
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+
+class RetryScheduler:
+    """按退避时间把失败批次重新提交给发送阶段"""
+
+    def __init__(
+        self,
+        resubmit: Callable[[LogBatch], Any],
+        max_retries: int = 3,
+        timeout: float = 30.0,
+        base_delay: float = 0.5,
+        max_delay: float = 10.0,
+        budget: Optional[RetryBudget] = None,
+    ) -> None:
+        """初始化重试调度器
+
+        Args:
+            resubmit: 把批次重新提交给发送阶段的函数
+            max_retries: 每个批次的最大重试次数，<= 0 表示不重试
+            timeout: 批次创建后超过该时间（秒）不再重试，<= 0 表示不限
+            base_delay: 第一次重试的退避上限（秒），之后每次翻倍
+            max_delay: 单次退避的上限（秒）
+            budget: 全局重试预算，None 表示不限
+        """
+        self._resubmit = resubmit
+        self.max_retries = max(0, max_retries)
+        self.timeout = timeout
+        self.base_delay = max(0.0, base_delay)
+        self.max_delay = max(self.base_delay, max_delay)
+        self.budget = budget
+
+        self._waiting: List[Tuple[float, int, LogBatch]] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="yai-sls-retry", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def waiting(self) -> int:
+        """等待重试的批次数"""
+        return len(self._waiting)
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次重试前的等待时间（秒），在 [0, 指数上限] 内均匀抖动"""
+        return full_jitter_backoff(attempt, self.base_delay, self.max_delay)
+
+    def record_attempt(self, batch: LogBatch) -> None:
+        """发送阶段每提交一个批次调用一次，首次提交的批次为重试预算存入令牌"""
+        if batch.attempt == 0 and self.budget is not None:
+            self.budget.deposit()
+
+    def schedule(self, batch: LogBatch, error: BaseException) -> bool:
+        """为发送失败的批次安排重试
+
+        Returns:
+            是否已安排重试；False 表示调用方应按最终失败处理
+        """
+        if self._closed or not is_retryable_error(error):
+            return False
+        attempt = batch.attempt + 1
+        if attempt > self.max_retries:
+            return False
+
+        now = time.monotonic()
+        due = now + self.backoff(attempt)
+        if self.timeout > 0 and due > batch.created_at + self.timeout:
+            return False
+        if self.budget is not None and not self.budget.try_withdraw(now):
+            return False
+
+        batch.attempt = attempt
+        with self._condition:
+            if self._closed:
+                return False
+            heapq.heappush(self._waiting, (due, next(self._sequence), batch))
+            self._condition.notify()
+        return True
+
+    def _run(self) -> None:
+        """调度线程：到期的批次重新提交给发送阶段"""
+        while True:
+            with self._condition:
+                while not self._closed:
+                    if self._waiting:
+                        delay = self._waiting[0][0] - time.monotonic()
+                        if delay <= 0:
+                            break
+                        self._condition.wait(delay)
+                    else:
+                        self._condition.wait()
+                if self._closed:
+                    return
+                _, _, batch = heapq.heappop(self._waiting)
+
+            # 在锁外提交：发送阶段已满时只阻塞调度线程，不影响 flush worker
+            try:
+                self._resubmit(batch)
+            except Exception as e:
+                print(f"SLS重试提交错误: {e}")
+
+    def take_waiting(self) -> List[LogBatch]:
+        """停止调度并取出仍在等待的批次（按到期顺序），之后的失败批次不再重试"""
+        with self._condition:
+            self._closed = True
+            waiting = [batch for _, _, batch in sorted(self._waiting)]
+            self._waiting.clear()
+            self._condition.notify_all()
+        self._thread.join(timeout=1.0)
+        return waiting
+
+    def close(self) -> None:
+        """停止调度，仍在等待的批次立即重新提交一次，不再继续重试"""
+        for batch in self.take_waiting():
+            try:
+                self._resubmit(batch)
+            except Exception as e:
+                print(f"SLS重试提交错误: {e}")
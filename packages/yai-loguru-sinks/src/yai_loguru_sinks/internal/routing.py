@@ -0,0 +1,181 @@
+"""
+多日志库路由
+
+一个 sink 按有序的路由表把记录写入不同的日志库或 Topic，不需要为 app / audit / error
+各注册一个 handler（各自的 LogClient、线程、队列，且每条记录被 loguru 过滤多次）。
+所有目标共用同一个队列、编码流程、连接池和发送线程，组批按目标分别进行。
+
+路由规则按顺序匹配，第一条命中的规则决定目标，都不命中时写入 sink 配置的日志库和
+Topic。每条规则的条件之间是“与”关系：
+
+- levels: 级别名集合
+- categories: 分类集合（category 字段，见 `categories.CategoryMatcher`）
+- module_prefix: 模块名前缀（可以是多个前缀）
+- extra_keys: extra 中必须存在的键（`bind()` / `contextualize()` 的值或 extra 参数，
+  与分类规则相同，见 `field_plan.lookup_extra`）
+
+规则在后台线程中对日志数据匹配，依赖的 level / category / module 字段需要包含在
+写入的字段中。级别、分类和模块条件按 (module, level, category) 缓存匹配计划，
+只有依赖 extra 的规则需要逐条检查。
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from .field_plan import lookup_extra
+
+
+# lookup_extra 找不到键时的返回值（键存在、值为 None 时仍视为存在）
+_MISSING = object()
+
+# 路由规则字典中允许的键
+ROUTE_KEYS = frozenset({
+    'logstore', 'topic', 'levels', 'categories', 'module_prefix', 'extra_keys',
+})
+
+
+class Destination(NamedTuple):
+    """写入目标，None 表示使用 sink 配置的日志库或 Topic"""
+
+    logstore: Optional[str]
+    topic: Optional[str]
+
+
+def _as_tuple(value: Any) -> Tuple[str, ...]:
+    if not value:
+        return ()
+    if isinstance(value, str):
+        return (value,)
+    return tuple(value)
+
+
+@dataclass(frozen=True)
+class RouteRule:
+    """一条路由规则
+
+    Attributes:
+        logstore: 命中时写入的日志库，None 表示使用 sink 的日志库
+        topic: 命中时使用的 Topic，None 表示使用 sink 的 Topic
+        levels: 级别名集合（不区分大小写）
+        categories: 分类集合
+        module_prefix: 模块名前缀，任意一个匹配即可
+        extra_keys: extra 中必须全部存在的键
+    """
+
+    logstore: Optional[str] = None
+    topic: Optional[str] = None
+    levels: frozenset = frozenset()
+    categories: frozenset = frozenset()
+    module_prefix: Tuple[str, ...] = ()
+    extra_keys: Tuple[str, ...] = ()
+
+    def __post_init__(self) -> None:
+        """规范化条件
+
+        Raises:
+            ValueError: 没有指定日志库或 Topic
+        """
+        if not self.logstore and self.topic is None:
+            raise ValueError("路由规则需要指定 logstore 或 topic")
+        object.__setattr__(self, 'levels', frozenset(level.upper() for level in self.levels))
+
+    @classmethod
+    def from_dict(cls, spec: Dict[str, Any]) -> "RouteRule":
+        """从配置字典创建规则，单个字符串和列表都可以作为多值条件
+
+        Raises:
+            ValueError: 规则包含未知的键，或没有指定日志库或 Topic
+        """
+        unknown = set(spec) - ROUTE_KEYS
+        if unknown:
+            raise ValueError(f"未知的路由规则字段: {', '.join(sorted(unknown))}")
+        return cls(
+            logstore=spec.get('logstore') or None,
+            topic=spec.get('topic'),
+            levels=frozenset(_as_tuple(spec.get('levels'))),
+            categories=frozenset(_as_tuple(spec.get('categories'))),
+            module_prefix=_as_tuple(spec.get('module_prefix')),
+            extra_keys=_as_tuple(spec.get('extra_keys')),
+        )
+
+    @property
+    def destination(self) -> Destination:
+        """命中时的写入目标"""
+        return Destination(self.logstore, self.topic)
+
+    def matches_call_site(self, module: str, level: str, category: str) -> bool:
+        """检查只取决于调用点的条件"""
+        if self.levels and level.upper() not in self.levels:
+            return False
+        if self.categories and category not in self.categories:
+            return False
+        if self.module_prefix and not module.startswith(self.module_prefix):
+            return False
+        return True
+
+    def matches_extra(self, log_data: Dict[str, Any]) -> bool:
+        """检查 extra 条件"""
+        return all(lookup_extra(log_data, key, _MISSING) is not _MISSING for key in self.extra_keys)
+
+
+class RouteTable:
+    """编译后的路由表"""
+
+    def __init__(
+        self,
+        rules: Sequence[Union[RouteRule, Dict[str, Any]]],
+        cache_size: int = 4096,
+    ) -> None:
+        """编译路由规则
+
+        Args:
+            rules: 有序的路由规则（规则对象或配置字典）
+            cache_size: 调用点缓存的最大条目数，<= 0 表示不缓存
+        """
+        self.rules = tuple(
+            rule if isinstance(rule, RouteRule) else RouteRule.from_dict(rule)
+            for rule in rules
+        )
+        if cache_size > 0:
+            self._call_site_plan = lru_cache(maxsize=cache_size)(self._resolve_call_site)
+        else:
+            self._call_site_plan = self._resolve_call_site
+
+    @classmethod
+    def from_config(cls, config: Any) -> Optional["RouteTable"]:
+        """从 SlsConfig 创建路由表，未配置路由规则时返回 None"""
+        if not config.routes:
+            return None
+        return cls(config.routes, cache_size=config.category_cache_size)
+
+    @property
+    def logstores(self) -> List[str]:
+        """路由规则中出现的日志库（不含 sink 自身的日志库）"""
+        return list(dict.fromkeys(rule.logstore for rule in self.rules if rule.logstore))
+
+    def _resolve_call_site(self, module: str, level: str, category: str) -> Tuple[RouteRule, ...]:
+        """计算调用点的候选规则：到第一条不依赖 extra 的命中规则为止"""
+        candidates = []
+        for rule in self.rules:
+            if rule.matches_call_site(module, level, category):
+                candidates.append(rule)
+                if not rule.extra_keys:
+                    break
+        return tuple(candidates)
+
+    def resolve(self, log_data: Dict[str, Any]) -> Optional[Destination]:
+        """计算记录的写入目标
+
+        Returns:
+            命中规则的目标，都不命中时返回 None（写入 sink 配置的日志库和 Topic）
+        """
+        candidates = self._call_site_plan(
+            str(log_data.get('module', '')),
+            str(log_data.get('level', '')),
+            str(log_data.get('category', '')),
+        )
+        for rule in candidates:
+            if rule.matches_extra(log_data):
+                return rule.destination
+        return None
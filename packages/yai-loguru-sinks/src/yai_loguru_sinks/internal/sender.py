@@ -0,0 +1,435 @@
+"""
+并发发送阶段
+
+flush worker 组装好的批次交给 `BatchSender`，由线程池并发执行 PutLogs，
+同时在途的请求数由 `AdaptiveConcurrencyLimiter` 控制：
+
+- 请求成功且延迟接近基线时加性增加并发上限（每个 RTT 约 +1）
+- 延迟明显高于基线时小幅收缩，遇到限流（配额超限、429、503）时乘性减半
+
+启用 ordered_delivery 时，相同 hash_key 的批次按提交顺序串行发送，
+不同 hash_key 之间仍然并发；未设置 hash_key 的批次共用一条顺序通道。通道中的后续批次
+先占用名额再取出：线程池线程只在不等待的情况下接着发送，没有名额时把通道交给调度线程
+等待，线程池线程不会阻塞在名额上（否则并发上限收缩后，全部线程都可能卡在通道里，
+flush worker 提交的批次再也没有线程执行）。
+
+配置了 `RetryScheduler` 时，可重试的失败批次交给调度器退避后重新提交。顺序通道中的
+失败批次在重试结束前占住通道，重新提交后仍排在通道最前面，后续批次不会越过它。配置了 `CircuitBreaker` 时，熔断打开期间的批次
+不发送请求，直接交给降级处理。配置了 overflow 时，发送阶段积压已满的批次
+交给 overflow（如写入磁盘暂存），而不是阻塞 flush worker。
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, List, Optional
+
+from .data import LogBatch
+
+if TYPE_CHECKING:
+    from .breaker import CircuitBreaker
+    from .retry import RetryScheduler
+
+
+# 表示写入限流的 SLS 错误码
+THROTTLING_ERROR_CODES = frozenset({
+    'WriteQuotaExceed',
+    'ShardWriteQuotaExceed',
+    'ProjectQuotaExceed',
+    'ExceedQuota',
+    'ServerBusy',
+})
+
+# 请求结果
+OUTCOME_OK = "ok"
+OUTCOME_THROTTLED = "throttled"
+OUTCOME_ERROR = "error"
+OUTCOME_REJECTED = "rejected"  # 熔断打开，未发送请求
+
+
+def is_throttling_error(error: BaseException) -> bool:
+    """是否为服务端限流错误"""
+    get_error_code = getattr(error, 'get_error_code', None)
+    if get_error_code is not None and get_error_code() in THROTTLING_ERROR_CODES:
+        return True
+    return getattr(error, 'resp_status', None) in (429, 503)
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD 自适应并发限制器"""
+
+    def __init__(
+        self,
+        max_limit: int = 4,
+        min_limit: int = 1,
+        initial_limit: Optional[int] = None,
+        adaptive: bool = True,
+        latency_tolerance: float = 2.0,
+        backoff_ratio: float = 0.5,
+    ) -> None:
+        """初始化并发限制器
+
+        Args:
+            max_limit: 并发上限的最大值
+            min_limit: 并发上限的最小值
+            initial_limit: 初始并发上限，默认自适应时从 min_limit 开始，否则为 max_limit
+            adaptive: 是否根据延迟和限流调整并发上限，False 时固定为 max_limit
+            latency_tolerance: 延迟超过基线的多少倍视为拥塞
+            backoff_ratio: 遇到限流时并发上限的收缩比例
+        """
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.adaptive = adaptive
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+        if initial_limit is None:
+            initial_limit = self.min_limit if adaptive else self.max_limit
+        self._limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self._in_flight = 0
+        self._baseline_latency: Optional[float] = None
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        """当前并发上限"""
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        """当前在途请求数"""
+        return self._in_flight
+
+    @property
+    def baseline_latency(self) -> Optional[float]:
+        """观测到的基线延迟（秒）"""
+        return self._baseline_latency
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """占用一个并发名额，已满时等待
+
+        Returns:
+            是否在超时前获得名额
+        """
+        with self._condition:
+            if not self._condition.wait_for(
+                lambda: self._in_flight < int(self._limit), timeout=timeout
+            ):
+                return False
+            self._in_flight += 1
+            return True
+
+    def cancel(self) -> None:
+        """归还未使用的名额，不调整并发上限"""
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def release(self, latency: float, outcome: str = OUTCOME_OK) -> None:
+        """归还名额并根据请求结果调整并发上限
+
+        Args:
+            latency: 请求耗时（秒）
+            outcome: OUTCOME_OK / OUTCOME_THROTTLED / OUTCOME_ERROR / OUTCOME_REJECTED
+        """
+        with self._condition:
+            self._in_flight -= 1
+            if self.adaptive:
+                self._adjust(latency, outcome)
+            self._condition.notify_all()
+
+    def _adjust(self, latency: float, outcome: str) -> None:
+        """调整并发上限（调用方持有锁）"""
+        if outcome == OUTCOME_THROTTLED:
+            self._limit = max(self.min_limit, self._limit * self.backoff_ratio)
+            return
+        if outcome != OUTCOME_OK:
+            # 其他错误不代表拥塞，也不作为扩容依据
+            return
+
+        baseline = self._baseline_latency
+        if baseline is None or latency < baseline:
+            self._baseline_latency = latency
+        else:
+            # 基线缓慢上漂，适应网络路径的变化
+            self._baseline_latency = baseline + (latency - baseline) * 0.01
+
+        if baseline is not None and latency > baseline * self.latency_tolerance:
+            self._limit = max(self.min_limit, self._limit * 0.9)
+        else:
+            self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+
+
+class BatchSender:
+    """并发发送批次的线程池"""
+
+    def __init__(
+        self,
+        send: Callable[[LogBatch], Any],
+        limiter: AdaptiveConcurrencyLimiter,
+        ordered: bool = False,
+        on_error: Optional[Callable[[LogBatch, BaseException], None]] = None,
+        retry: Optional["RetryScheduler"] = None,
+        breaker: Optional["CircuitBreaker"] = None,
+        fallback: Optional[Callable[[LogBatch], None]] = None,
+        overflow: Optional[Callable[[LogBatch], bool]] = None,
+    ) -> None:
+        """初始化发送器
+
+        Args:
+            send: 同步发送一个批次的函数，失败时抛出异常
+            limiter: 并发限制器
+            ordered: 是否按 hash_key 保证发送顺序
+            on_error: 发送最终失败（不再重试）时的回调
+            retry: 失败批次的重试调度器，None 表示不重试
+            breaker: 熔断器，None 表示不熔断
+            fallback: 熔断打开时处理批次的降级函数，None 时按发送失败报告
+            overflow: 积压已满时接收批次的函数，返回 False 时仍然阻塞等待
+        """
+        self._send = send
+        self.limiter = limiter
+        self.ordered = ordered
+        self._on_error = on_error
+        self.retry = retry
+        self.breaker = breaker
+        self._fallback = fallback
+        self._overflow = overflow
+        self._executor = ThreadPoolExecutor(
+            max_workers=limiter.max_limit,
+            thread_name_prefix="yai-sls-sender",
+        )
+        # 已提交但未完成的批次数（包含在顺序通道中排队的），超过上限时 submit 阻塞
+        self._max_pending = limiter.max_limit * 2
+        self._pending = 0
+        self._pending_logs = 0
+        self._pending_condition = threading.Condition()
+        # hash_key -> 等待发送的批次，键存在表示该通道有批次在途（或在等待名额、等待重试）
+        self._lanes: Dict[Optional[str], Deque[LogBatch]] = {}
+        self._lanes_lock = threading.Lock()
+        # hash_key -> 等待重试的批次，重新提交时回到通道最前面
+        self._parked: Dict[Optional[str], LogBatch] = {}
+        # 等待名额才能继续发送的通道，由调度线程处理
+        self._ready: Deque[Optional[str]] = deque()
+        self._ready_condition = threading.Condition(self._lanes_lock)
+        self._closed = False
+        self._dispatcher: Optional[threading.Thread] = None
+        if ordered:
+            self._dispatcher = threading.Thread(
+                target=self._dispatch_lanes, name="yai-sls-lanes", daemon=True
+            )
+            self._dispatcher.start()
+
+    @property
+    def pending(self) -> int:
+        """已提交但未完成的批次数"""
+        return self._pending
+
+    @property
+    def pending_logs(self) -> int:
+        """已提交但未完成的批次中的日志条数"""
+        return self._pending_logs
+
+    def submit(self, batch: LogBatch) -> None:
+        """提交批次，发送器已满时交给 overflow 或阻塞直到有空位"""
+        if self.ordered and self._resume_parked(batch):
+            # 重试的批次回到通道最前面，通道继续由它占住。它已经占住通道，不受积压上限限制：
+            # 积压可能全是排在它后面的批次，等待空位会永远等不到
+            with self._pending_condition:
+                self._pending += 1
+                self._pending_logs += len(batch.logs)
+            self.limiter.acquire()
+            self._executor.submit(self._run, batch)
+            return
+
+        if self._overflow is not None:
+            with self._pending_condition:
+                full = self._pending >= self._max_pending
+            if full and self._overflow(batch):
+                return
+
+        with self._pending_condition:
+            self._pending_condition.wait_for(lambda: self._pending < self._max_pending)
+            self._pending += 1
+            self._pending_logs += len(batch.logs)
+
+        if self.retry is not None:
+            self.retry.record_attempt(batch)
+
+        if self.ordered:
+            with self._lanes_lock:
+                lane = self._lanes.get(batch.hash_key)
+                if lane is not None:
+                    # 同一通道已有批次在途，排队等它完成后接着发送
+                    lane.append(batch)
+                    return
+                self._lanes[batch.hash_key] = deque()
+
+        self.limiter.acquire()
+        self._executor.submit(self._run, batch)
+
+    def _resume_parked(self, batch: LogBatch) -> bool:
+        """批次是否为占住通道等待重试的批次（是则取消登记）"""
+        with self._lanes_lock:
+            if self._parked.get(batch.hash_key) is not batch:
+                return False
+            del self._parked[batch.hash_key]
+            return True
+
+    def _run(self, batch: Optional[LogBatch]) -> None:
+        """在线程池中发送批次（顺序通道中的后续批次有名额时也在这里接着发送）"""
+        while batch is not None:
+            parked = self._send_one(batch)
+            if parked or not self.ordered:
+                return
+            batch = self._next_in_lane(batch.hash_key)
+
+    def _send_one(self, batch: LogBatch) -> bool:
+        """发送一个批次并更新并发限制器（调用前已占用名额）
+
+        Returns:
+            批次是否在顺序通道中等待重试（通道由重试的批次继续占住）
+        """
+        start = time.monotonic()
+        outcome = OUTCOME_OK
+        parked = False
+        try:
+            if self.breaker is not None and not self.breaker.allow_request():
+                # 熔断打开：不等待注定超时的请求，直接走降级路径
+                outcome = OUTCOME_REJECTED
+                self._reject(batch)
+                return parked
+            self._send(batch)
+            if self.breaker is not None:
+                self.breaker.record_success()
+        except Exception as e:
+            outcome = OUTCOME_THROTTLED if is_throttling_error(e) else OUTCOME_ERROR
+            if self.breaker is not None:
+                self.breaker.record_error(e)
+            if self.retry is not None and self._schedule_retry(self.retry, batch, e):
+                parked = self.ordered
+            else:
+                self._report_error(batch, e)
+        finally:
+            self.limiter.release(time.monotonic() - start, outcome)
+            with self._pending_condition:
+                self._pending -= 1
+                self._pending_logs -= len(batch.logs)
+                self._pending_condition.notify_all()
+        return parked
+
+    def _schedule_retry(self, retry: "RetryScheduler", batch: LogBatch, error: BaseException) -> bool:
+        """安排重试，顺序通道中的批次在重试结束前占住通道
+
+        Returns:
+            是否已安排重试
+        """
+        if not self.ordered:
+            return retry.schedule(batch, error)
+        # 先登记再安排：退避可能为 0，重新提交可能先于 schedule 返回
+        with self._lanes_lock:
+            self._parked[batch.hash_key] = batch
+        if retry.schedule(batch, error):
+            return True
+        with self._lanes_lock:
+            del self._parked[batch.hash_key]
+        return False
+
+    def _reject(self, batch: LogBatch) -> None:
+        """处理熔断期间未发送的批次"""
+        if self._fallback is not None:
+            try:
+                self._fallback(batch)
+            except Exception as e:
+                print(f"SLS降级处理错误: {e}")
+        else:
+            self._report_error(batch, RuntimeError("SLS 熔断器已打开，批次未发送"))
+
+    def _report_error(self, batch: LogBatch, error: BaseException) -> None:
+        """报告最终发送失败的批次"""
+        if self._on_error is not None:
+            self._on_error(batch, error)
+        else:
+            print(f"SLS消息发送错误: {error}")
+
+    def _next_in_lane(self, hash_key: Optional[str], acquired: bool = False) -> Optional[LogBatch]:
+        """占用名额后取出通道中的下一个批次，通道为空时释放通道
+
+        Args:
+            hash_key: 通道
+            acquired: 调用方是否已占用名额；未占用时只尝试不等待地占用，
+                没有名额就把通道交给调度线程并返回 None
+        """
+        with self._lanes_lock:
+            lane = self._lanes[hash_key]
+            if not lane:
+                del self._lanes[hash_key]
+                if acquired:
+                    self.limiter.cancel()
+                return None
+            if not acquired and not self.limiter.acquire(timeout=0):
+                self._ready.append(hash_key)
+                self._ready_condition.notify()
+                return None
+            return lane.popleft()
+
+    def _dispatch_lanes(self) -> None:
+        """调度线程：为等待名额的通道占用名额，再把下一个批次交给线程池"""
+        while True:
+            with self._ready_condition:
+                self._ready_condition.wait_for(lambda: self._ready or self._closed)
+                if self._closed:
+                    return
+                hash_key = self._ready.popleft()
+            self.limiter.acquire()
+            batch = self._next_in_lane(hash_key, acquired=True)
+            if batch is None:
+                continue
+            try:
+                self._executor.submit(self._run, batch)
+            except RuntimeError as e:
+                # 线程池已关闭
+                self.limiter.cancel()
+                with self._pending_condition:
+                    self._pending -= 1
+                    self._pending_logs -= len(batch.logs)
+                    self._pending_condition.notify_all()
+                self._report_error(batch, e)
+
+    def take_queued(self) -> List[LogBatch]:
+        """取出顺序通道中排队、尚未开始发送的批次（关闭时由调用方接管）
+
+        在途的批次不受影响，完成后发现通道为空即释放通道。
+        """
+        with self._lanes_lock:
+            taken = []
+            for lane in self._lanes.values():
+                taken.extend(lane)
+                lane.clear()
+        if taken:
+            with self._pending_condition:
+                self._pending -= len(taken)
+                self._pending_logs -= sum(len(batch.logs) for batch in taken)
+                self._pending_condition.notify_all()
+        return taken
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """等待所有已提交的批次完成
+
+        Returns:
+            是否在超时前全部完成
+        """
+        with self._pending_condition:
+            return self._pending_condition.wait_for(lambda: self._pending == 0, timeout=timeout)
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """等待在途批次完成并关闭线程池
+
+        Returns:
+            是否在超时前全部完成
+        """
+        idle = self.wait_idle(timeout)
+        with self._ready_condition:
+            self._closed = True
+            self._ready_condition.notify_all()
+        self._executor.shutdown(wait=False)
+        return idle
@@ -0,0 +1,200 @@
+"""
+按记录字段路由到 SLS shard
+
+不带 hashKey 的 PutLogs 请求由 SLS 在 shard 之间任意负载均衡，同一个租户或 trace
+的记录可能落到不同 shard、被不同的消费者乱序读取。配置 hash_key_field 后：
+
+- `ShardRouter` 从日志数据（或其 extra）中取出该字段，用稳定的 CRC32 把取值映射到
+  hash_key_partitions 个分区之一；每个分区对应 MD5 空间中均匀分布的一个 hashKey
+  （分区区间的中点），相同取值的记录总是写入同一个 shard
+- `PartitionedBatcher` 为每个分区维护独立的批次，封好的批次带上分区的 hashKey
+- 发送阶段为每个 hashKey 建立顺序通道：同一分区的批次按顺序串行发送，
+  不同分区的批次并发发送（受 max_in_flight 限制）
+
+没有该字段的记录不带 hashKey，由 SLS 负载均衡，共用一条顺序通道。
+分区数不小于 logstore 的 shard 数时，写入才能分散到所有 shard。
+
+配置了 routes 时（见 `routing.RouteTable`），组批器同时按写入目标（日志库和 Topic）
+分开组批，每个批次只写入一个目标。
+"""
+
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from .batcher import Contents, LogBatcher
+from .data import LogBatch
+from .field_plan import lookup_extra
+from .routing import Destination, RouteTable
+
+
+# SLS hashKey 为 128 位 MD5 空间中的位置，以 32 位十六进制表示
+HASH_KEY_BITS = 128
+
+
+def partition_hash_keys(partitions: int) -> List[str]:
+    """把 MD5 空间均分为若干区间，返回每个区间中点的 hashKey"""
+    return [
+        format(((2 * i + 1) << HASH_KEY_BITS) // (2 * partitions), '032x')
+        for i in range(partitions)
+    ]
+
+
+class ShardRouter:
+    """根据记录字段计算 hashKey"""
+
+    def __init__(self, field: str, partitions: int = 16) -> None:
+        """初始化
+
+        Args:
+            field: 路由字段，先在日志数据中查找，再在 extra 中查找（`bind()` /
+                `contextualize()` 的值和 extra 参数，见 `field_plan.lookup_extra`）
+            partitions: 分区数，即最多使用的不同 hashKey 数
+
+        Raises:
+            ValueError: 字段为空或分区数小于 1
+        """
+        if not field:
+            raise ValueError("路由字段不能为空")
+        if partitions < 1:
+            raise ValueError(f"分区数必须大于 0: {partitions}")
+        self.field = field
+        self.partitions = partitions
+        self.hash_keys = partition_hash_keys(partitions)
+
+    @classmethod
+    def from_config(cls, config: Any) -> "ShardRouter":
+        """按 SlsConfig 创建"""
+        return cls(config.hash_key_field, partitions=config.hash_key_partitions)
+
+    def value_of(self, log_data: Dict[str, Any]) -> Any:
+        """取出路由字段的值，没有时返回 None"""
+        value = log_data.get(self.field)
+        if value is None:
+            value = lookup_extra(log_data, self.field)
+        return value
+
+    def hash_key(self, log_data: Dict[str, Any]) -> Optional[str]:
+        """记录所属分区的 hashKey，没有路由字段时返回 None"""
+        value = self.value_of(log_data)
+        if value is None:
+            return None
+        data: Union[str, bytes] = value if isinstance(value, (str, bytes)) else str(value)
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        return self.hash_keys[zlib.crc32(data) % self.partitions]
+
+
+# (写入目标，None 表示默认目标, hashKey)
+PartitionKey = Tuple[Optional[Destination], Optional[str]]
+
+
+def _stamp(batch: LogBatch, key: PartitionKey) -> None:
+    destination, batch.hash_key = key
+    if destination is not None:
+        batch.logstore, batch.topic = destination
+
+
+class PartitionedBatcher:
+    """按分区（写入目标和 hashKey）分别组批，接口与 LogBatcher 相同"""
+
+    def __init__(
+        self,
+        create_batcher: Callable[[], LogBatcher],
+        router: Optional[ShardRouter] = None,
+        routes: Optional[RouteTable] = None,
+    ) -> None:
+        """初始化
+
+        Args:
+            create_batcher: 为新分区创建组批器的函数
+            router: 计算记录 hashKey 的路由器，None 表示不带 hashKey
+            routes: 计算记录写入目标的路由表，None 表示都写入默认目标
+        """
+        self.create_batcher = create_batcher
+        self.router = router
+        self.routes = routes
+        self._batchers: Dict[PartitionKey, LogBatcher] = {}
+
+    @classmethod
+    def from_config(
+        cls, config: Any, to_contents: Callable[[Dict[str, Any]], Contents]
+    ) -> "PartitionedBatcher":
+        """按 SlsConfig 创建"""
+        router = ShardRouter.from_config(config) if config.hash_key_field else None
+        return cls(
+            lambda: LogBatcher.from_config(config, to_contents), router, RouteTable.from_config(config)
+        )
+
+    def add(self, log_data: Dict[str, Any]) -> List[LogBatch]:
+        """加入一条日志数据
+
+        Returns:
+            因达到上限而封好的批次，带有所属分区的 hash_key 和写入目标
+        """
+        key = (
+            self.routes.resolve(log_data) if self.routes is not None else None,
+            self.router.hash_key(log_data) if self.router is not None else None,
+        )
+        batcher = self._batchers.get(key)
+        if batcher is None:
+            batcher = self._batchers[key] = self.create_batcher()
+        sealed = batcher.add(log_data)
+        for batch in sealed:
+            _stamp(batch, key)
+        return sealed
+
+    def flush_all(self) -> List[LogBatch]:
+        """封存所有分区中未满的批次"""
+        sealed = []
+        for key, batcher in self._batchers.items():
+            batch = batcher.flush()
+            if batch is not None:
+                _stamp(batch, key)
+                sealed.append(batch)
+        return sealed
+
+    @property
+    def pending_logs(self) -> int:
+        """所有分区中未封存的记录数"""
+        return sum(batcher.pending_logs for batcher in self._batchers.values())
+
+    @property
+    def pending_bytes(self) -> int:
+        """所有分区中未封存的估算字节数"""
+        return sum(batcher.pending_bytes for batcher in self._batchers.values())
+
+    @property
+    def opened_at(self) -> float:
+        """最早的未封存批次第一条记录加入的时间（time.monotonic）"""
+        opened = [batcher.opened_at for batcher in self._batchers.values() if batcher.pending_logs]
+        return min(opened) if opened else 0.0
+
+    @property
+    def truncated(self) -> int:
+        """被截断的超大记录数"""
+        return sum(batcher.truncated for batcher in self._batchers.values())
+
+    @property
+    def split(self) -> int:
+        """被切分的超大记录数"""
+        return sum(batcher.split for batcher in self._batchers.values())
+
+    @property
+    def dropped(self) -> int:
+        """被丢弃的超大记录数"""
+        # 指标线程读取时 flush 线程可能正在新建分区
+        return sum(batcher.dropped for batcher in list(self._batchers.values()))
+
+    @property
+    def dropped_bytes(self) -> int:
+        """被丢弃的超大记录的估算字节数"""
+        return sum(batcher.dropped_bytes for batcher in list(self._batchers.values()))
+
+
+def create_batcher(
+    config: Any, to_contents: Callable[[Dict[str, Any]], Contents]
+) -> Union[LogBatcher, PartitionedBatcher]:
+    """按配置创建组批器，配置了 hash_key_field 或 routes 时按分区组批"""
+    if config.hash_key_field or config.routes:
+        return PartitionedBatcher.from_config(config, to_contents)
+    return LogBatcher.from_config(config, to_contents)
@@ -0,0 +1,349 @@
+"""
+共享内存多生产者环形缓冲区
+
+worker 通过 `multiprocessing.Queue` 或 loguru 的 `enqueue=True` 把记录交给上传进程时，每条
+记录都要 pickle，再经过 feeder 线程和管道复制。`SharedRingBuffer` 把已编码的记录直接写入
+`/dev/shm` 下 mmap 的文件，多个进程写入，一个进程批量读取。
+
+内存布局（小端）::
+
+    0    magic:u32 version:u32
+    8    capacity:u64          数据区大小（16 的倍数）
+    16   reserved:u64         已预留到的位置（单调递增，只在文件锁内修改）
+    24   dropped:u64          缓冲区满被丢弃的记录数（只在文件锁内修改）
+    64   released:u64         读方已释放到的位置（只由读方修改）
+    72   consumer_pid:u64     读方进程号，写方据此判断读方是否存活；读方退出时清零
+    128  数据区
+
+每条记录为 `<长度:u32><状态:u32><写方进程号:u32><保留:u32><负载>`，按 16 字节对齐
+（数据区尾部总能放下一个记录头）。写入分三步：
+
+1. 预留：在文件锁（`fcntl.flock`，同一进程内的线程再用线程锁互斥）内检查剩余空间，写入
+   记录头（状态为 RESERVED，带上写方进程号）并推进 reserved。放不进数据区尾部时，尾部写
+   一条 PADDING 记录，从头开始放。锁内只有几次整数读写，Python 标准库没有跨进程的 CAS，这是最短的原子预留方式
+2. 复制：在锁外把负载复制到预留的位置，多个写方可以同时复制
+3. 提交：把状态改为 COMMITTED
+
+读方按位置顺序读取已提交的记录，一次取出多条后才推进 released。遇到仍是 RESERVED 的记录时
+停下等待；同一条记录超过 stall_timeout 仍未提交、且记录头中的写方进程已不存在（预留后崩溃）
+时才跳过并计数。写方进程仍存活时只是复制得慢，继续等待，不会释放它还在写入的空间。
+
+提交标志在负载之后写入，依赖 CPU 按写入顺序对其他核可见。Python 无法插入内存屏障，只有 x86
+（TSO 内存模型）保证这一点；ARM、POWER 等弱内存序的平台上读方可能先看到提交标志、后看到负载，
+读到不完整的数据，因此 `create` / `attach` 在这些平台上直接拒绝（`HAS_TSO`）。等待数据或空间时
+按退避间隔轮询，不使用跨进程的通知原语。
+
+缓冲区满时的策略：block（等待读方释放空间，超时后丢弃）或 drop_newest（直接丢弃新记录），
+丢弃数记录在共享的 dropped 中。
+"""
+
+import mmap
+import os
+import platform
+import struct
+import threading
+import time
+from typing import List, Optional
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+    fcntl = None
+
+from .log_queue import POLICY_BLOCK, POLICY_DROP_NEWEST
+
+# 写入按程序顺序对其他核可见（TSO）的平台，见模块说明
+TSO_MACHINES = ('x86_64', 'amd64', 'i386', 'i686', 'x86')
+HAS_TSO = platform.machine().lower() in TSO_MACHINES
+
+
+MAGIC = 0x59525347  # "GSRY"
+VERSION = 2
+
+# 头部字段
+PREAMBLE = struct.Struct('<IIQ')   # magic, version, capacity
+U64 = struct.Struct('<Q')
+RESERVED_OFFSET = 16
+DROPPED_OFFSET = 24
+RELEASED_OFFSET = 64
+CONSUMER_PID_OFFSET = 72
+DATA_OFFSET = 128
+
+# 记录头：负载长度、状态、写方进程号
+RECORD_HEADER = struct.Struct('<III4x')
+STATE_RESERVED = 1
+STATE_COMMITTED = 2
+STATE_PADDING = 3
+
+RING_POLICIES = (POLICY_BLOCK, POLICY_DROP_NEWEST)
+
+
+def _align(size: int) -> int:
+    return (size + 15) & ~15
+
+
+def pid_alive(pid: int) -> bool:
+    """进程是否存在"""
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # 进程存在，只是属于其他用户
+        return True
+    return True
+
+
+class SharedRingBuffer:
+    """mmap 文件上的多生产者、单消费者环形缓冲区"""
+
+    def __init__(
+        self,
+        path: str,
+        fd: int,
+        policy: str = POLICY_BLOCK,
+        block_timeout: float = 0.1,
+        stall_timeout: float = 5.0,
+    ) -> None:
+        """打开已初始化的缓冲区文件，请使用 `create` 或 `attach`
+
+        Raises:
+            ValueError: 文件不是有效的缓冲区，或未知的满时策略
+        """
+        if policy not in RING_POLICIES:
+            raise ValueError(f"无效的缓冲区满时策略: {policy}，可选值: {', '.join(RING_POLICIES)}")
+        self.path = path
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.stall_timeout = stall_timeout
+        self._fd = fd
+        self._map = mmap.mmap(fd, 0)
+        magic, version, capacity = PREAMBLE.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION or DATA_OFFSET + capacity > len(self._map):
+            self._map.close()
+            raise ValueError(f"不是有效的共享内存环形缓冲区: {path}")
+        self.capacity = capacity
+        self._lock = threading.Lock()
+
+        # 读方状态
+        self._read_pos = U64.unpack_from(self._map, RELEASED_OFFSET)[0]
+        self._stalled_at: Optional[int] = None
+        self._stalled_since = 0.0
+        self.stalled = 0
+
+    @classmethod
+    def create(cls, path: str, capacity: int = 16 * 1024 * 1024, **kwargs: object) -> "SharedRingBuffer":
+        """创建（或重建）缓冲区文件，当前进程作为读方
+
+        Args:
+            path: 缓冲区文件路径，建议放在 /dev/shm 下
+            capacity: 数据区大小（字节），向上取整到 16 的倍数
+            **kwargs: 见 `__init__`
+        """
+        _require_platform()
+        capacity = _align(max(capacity, 64))
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o660)
+        try:
+            os.ftruncate(fd, DATA_OFFSET + capacity)
+            with mmap.mmap(fd, DATA_OFFSET + capacity) as view:
+                PREAMBLE.pack_into(view, 0, MAGIC, VERSION, capacity)
+                U64.pack_into(view, CONSUMER_PID_OFFSET, os.getpid())
+            # 写好头部后再替换，写方不会打开到未初始化的文件
+            os.replace(tmp_path, path)
+            return cls(path, fd, **kwargs)
+        except BaseException:
+            os.close(fd)
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    @classmethod
+    def attach(cls, path: str, **kwargs: object) -> "SharedRingBuffer":
+        """作为写方打开已有的缓冲区
+
+        Raises:
+            FileNotFoundError: 缓冲区不存在（读方未运行）
+            ValueError: 文件不是有效的缓冲区
+        """
+        _require_platform()
+        fd = os.open(path, os.O_RDWR)
+        try:
+            return cls(path, fd, **kwargs)
+        except BaseException:
+            os.close(fd)
+            raise
+
+    @property
+    def dropped(self) -> int:
+        """缓冲区满被丢弃的记录数（所有写方合计）"""
+        return U64.unpack_from(self._map, DROPPED_OFFSET)[0]
+
+    @property
+    def used_bytes(self) -> int:
+        """已预留、尚未释放的字节数"""
+        return self._reserved() - U64.unpack_from(self._map, RELEASED_OFFSET)[0]
+
+    @property
+    def consumer_pid(self) -> int:
+        """读方进程号"""
+        return U64.unpack_from(self._map, CONSUMER_PID_OFFSET)[0]
+
+    def consumer_alive(self) -> bool:
+        """读方进程是否存在"""
+        return pid_alive(self.consumer_pid)
+
+    def mark_closed(self) -> None:
+        """读方退出前调用：清除读方进程号，写方据此停止写入"""
+        U64.pack_into(self._map, CONSUMER_PID_OFFSET, 0)
+
+    def _reserved(self) -> int:
+        return U64.unpack_from(self._map, RESERVED_OFFSET)[0]
+
+    def put(self, data: bytes, timeout: Optional[float] = None) -> bool:
+        """写入一条记录
+
+        Args:
+            data: 已编码的记录
+            timeout: block 策略下等待空间的最长时间，默认使用 block_timeout
+
+        Returns:
+            是否写入；缓冲区满（block 策略下等待超时）时丢弃并返回 False
+
+        Raises:
+            ValueError: 记录超过缓冲区容量
+        """
+        size = _align(RECORD_HEADER.size + len(data))
+        if size > self.capacity:
+            raise ValueError(f"记录长度 {len(data)} 超过缓冲区容量 {self.capacity}")
+
+        offset = self._reserve(len(data), size, timeout)
+        if offset is None:
+            return False
+        start = DATA_OFFSET + offset + RECORD_HEADER.size
+        self._map[start:start + len(data)] = data
+        RECORD_HEADER.pack_into(self._map, DATA_OFFSET + offset, len(data), STATE_COMMITTED, 0)
+        return True
+
+    def _reserve(self, length: int, size: int, timeout: Optional[float]) -> Optional[int]:
+        """预留空间，返回记录在数据区的偏移，缓冲区满时返回 None"""
+        deadline = None
+        if self.policy == POLICY_BLOCK:
+            deadline = time.monotonic() + (self.block_timeout if timeout is None else timeout)
+        delay = 0.0001
+        while True:
+            with self._lock:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+                try:
+                    offset = self._try_reserve(length, size)
+                    if offset is not None:
+                        return offset
+                    if deadline is None or time.monotonic() >= deadline:
+                        view = self._map
+                        U64.pack_into(view, DROPPED_OFFSET, U64.unpack_from(view, DROPPED_OFFSET)[0] + 1)
+                        return None
+                finally:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+            time.sleep(delay)
+            delay = min(delay * 2, 0.01)
+
+    def _try_reserve(self, length: int, size: int) -> Optional[int]:
+        """在文件锁内预留空间，空间不足时返回 None"""
+        view = self._map
+        reserved = U64.unpack_from(view, RESERVED_OFFSET)[0]
+        released = U64.unpack_from(view, RELEASED_OFFSET)[0]
+        offset = reserved % self.capacity
+        tail = self.capacity - offset
+        padding = tail if tail < size else 0
+        if reserved + padding + size - released > self.capacity:
+            return None
+        if padding:
+            RECORD_HEADER.pack_into(view, DATA_OFFSET + offset, 0, STATE_PADDING, 0)
+            offset = 0
+        RECORD_HEADER.pack_into(view, DATA_OFFSET + offset, length, STATE_RESERVED, os.getpid())
+        U64.pack_into(view, RESERVED_OFFSET, reserved + padding + size)
+        return offset
+
+    def drain(self, max_items: int, timeout: Optional[float] = None) -> List[bytes]:
+        """读方：按顺序取出已提交的记录，整批取完后才释放空间
+
+        Args:
+            max_items: 最多取出的记录数
+            timeout: 没有记录时的最长等待时间，None 表示不等待
+
+        Returns:
+            记录列表，超时返回空列表
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delay = 0.0001
+        while True:
+            items = self._read(max_items)
+            if items or deadline is None or time.monotonic() >= deadline:
+                return items
+            time.sleep(delay)
+            delay = min(delay * 2, 0.01)
+
+    def _read(self, max_items: int) -> List[bytes]:
+        view = self._map
+        capacity = self.capacity
+        reserved = self._reserved()
+        pos = self._read_pos
+        items: List[bytes] = []
+        while pos < reserved and len(items) < max_items:
+            offset = pos % capacity
+            length, state, writer_pid = RECORD_HEADER.unpack_from(view, DATA_OFFSET + offset)
+            if state == STATE_PADDING:
+                pos += capacity - offset
+                continue
+            size = _align(RECORD_HEADER.size + length)
+            if state != STATE_COMMITTED:
+                if not self._stall_expired(pos) or pid_alive(writer_pid):
+                    break
+                # 写方预留后没有提交就退出了，跳过这条记录
+                self.stalled += 1
+                pos += size
+                continue
+            start = DATA_OFFSET + offset + RECORD_HEADER.size
+            items.append(view[start:start + length])
+            pos += size
+        if pos != self._read_pos:
+            self._read_pos = pos
+            self._stalled_at = None
+            U64.pack_into(view, RELEASED_OFFSET, pos)
+        return items
+
+    def _stall_expired(self, pos: int) -> bool:
+        """同一位置的记录等待提交是否已超过 stall_timeout"""
+        now = time.monotonic()
+        if self._stalled_at != pos:
+            self._stalled_at = pos
+            self._stalled_since = now
+            return False
+        return now - self._stalled_since >= self.stall_timeout
+
+    def close(self) -> None:
+        """关闭映射和文件"""
+        self._map.close()
+        os.close(self._fd)
+
+    def unlink(self) -> None:
+        """删除缓冲区文件（读方退出时调用）"""
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _require_platform() -> None:
+    if not HAS_FCNTL:
+        raise OSError("共享内存环形缓冲区需要 fcntl 文件锁，仅支持 Unix")
+    if not HAS_TSO:
+        raise OSError(
+            f"共享内存环形缓冲区依赖 x86 的写入顺序，不支持当前平台: {platform.machine()}"
+        )
@@ -0,0 +1,276 @@
+"""
+关闭时按截止时间排空 sink
+
+`SlsSink.close()` 把关闭时仍在 sink 内的日志交给 `ShutdownDrain`：
+
+1. 停止 flush worker：设置停止标志并唤醒正在等待队列的 drain，不再等满 flush_interval
+2. 接管所有尚未发出的数据：队列中的记录、未封存的批次、等待重试的批次，以及顺序通道中
+   排队的批次
+3. 队列中 shutdown_priority_level 及以上的记录单独组批，排在最前面
+4. 用 max_in_flight 个线程并发发送（按 hashKey 保证顺序时同一通道串行），失败的批次
+   不再重试；截止时间到达后不再发送新批次，剩余批次写入磁盘暂存，未配置暂存时丢弃
+5. 在剩余时间内等待关闭前已在途的请求完成
+
+发送线程由这里创建，不依赖发送阶段的线程池，进程退出时同样可用。
+
+进程退出时 `drain_live_sinks` 关闭仍未关闭的 sink（drain_on_exit）。Python 3.9 起钩子
+注册在 `threading._register_atexit` 上（私有接口，取不到时退回 `atexit`），原因见
+`register_exit_drain`。
+"""
+
+import atexit
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .data import DrainReport, LogBatch
+from .log_queue import resolve_level_no
+
+
+# 等待 flush worker 退出最多占用截止时间的比例和秒数，其余时间留给发送
+FLUSH_JOIN_SHARE = 0.1
+FLUSH_JOIN_MAX_WAIT = 1.0
+
+
+class ShutdownDrain:
+    """按截止时间排空一个 SlsSink"""
+
+    def __init__(self, sink: Any, timeout: float, priority_level_no: int = 40, workers: int = 4) -> None:
+        """初始化
+
+        Args:
+            sink: 要排空的 SlsSink
+            timeout: 从开始排空起的截止时间（秒）
+            priority_level_no: 优先发送的最低级别数值
+            workers: 并发发送的线程数
+        """
+        self.sink = sink
+        self.timeout = max(0.0, timeout)
+        self.priority_level_no = priority_level_no
+        self.workers = max(1, workers)
+        self._lock = threading.Lock()
+        self._lanes: Deque[List[LogBatch]] = deque()
+        self._sent = 0
+        self._spooled = 0
+        self._dropped = 0
+        # 正在发送的日志条数
+        self._sending = 0
+
+    @classmethod
+    def from_sink(cls, sink: Any) -> "ShutdownDrain":
+        """按 sink 的配置创建"""
+        config = sink.config
+        return cls(
+            sink,
+            config.shutdown_timeout,
+            priority_level_no=resolve_level_no(config.shutdown_priority_level),
+            workers=config.max_in_flight,
+        )
+
+    def run(self) -> DrainReport:
+        """排空 sink，返回投递统计"""
+        sink = self.sink
+        start = time.monotonic()
+        deadline = start + self.timeout
+
+        # 停止 flush worker，唤醒正在等待队列的 drain
+        sink.stop_event.set()
+        sink.log_queue.close()
+        # worker 正在上传时不会马上退出，不能为它耗尽截止时间；未退出时不接管未封存的批次
+        sink.flush_thread.join(timeout=min(self.timeout * FLUSH_JOIN_SHARE, FLUSH_JOIN_MAX_WAIT))
+
+        batches = self.collect_batches(include_open=not sink.flush_thread.is_alive())
+        self._lanes.extend(self.plan_lanes(batches))
+
+        threads = [
+            threading.Thread(target=self._send_lanes, args=(deadline,), name="yai-sls-drain", daemon=True)
+            for _ in range(min(self.workers, len(self._lanes)))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=max(0.0, deadline - time.monotonic()))
+
+        # 截止时仍未开始发送的通道
+        with self._lock:
+            left = [batch for lane in self._lanes for batch in lane]
+            self._lanes.clear()
+        for batch in left:
+            self._give_up(batch)
+
+        idle = sink.sender.close(timeout=max(0.0, deadline - time.monotonic()))
+        with self._lock:
+            return DrainReport(
+                sent=self._sent,
+                spooled=self._spooled,
+                dropped=self._dropped,
+                in_flight=self._sending + (0 if idle else sink.sender.pending_logs),
+                elapsed=time.monotonic() - start,
+            )
+
+    def collect_batches(self, include_open: bool = True) -> List[LogBatch]:
+        """接管 sink 内尚未发出的数据，按发送顺序排列
+
+        Args:
+            include_open: 是否封存 flush worker 未封存的批次（worker 未退出时不能访问组批器）
+
+        Returns:
+            优先级别的记录组成的批次，然后是等待重试、排队和未封存的批次，最后是其余记录
+        """
+        sink = self.sink
+        handler = sink.async_handler
+        earlier = sink.retry_scheduler.take_waiting() + sink.sender.take_queued()
+        if include_open:
+            earlier.extend(handler.batcher.flush_all())
+
+        urgent: List[Any] = []
+        normal: List[Any] = []
+        for item, _, level_no in sink.log_queue.drain_entries():
+            (urgent if level_no >= self.priority_level_no else normal).append(item)
+        return self.build_batches(urgent) + earlier + self.build_batches(normal)
+
+    def build_batches(self, items: List[Any]) -> List[LogBatch]:
+        """把队列中取出的记录组成批次"""
+        if not items:
+            return []
+        handler = self.sink.async_handler
+        batcher = handler.create_batcher()
+        batches = []
+        for msg in handler.prepare_messages(items):
+            batches.extend(batcher.add(msg))
+        batches.extend(batcher.flush_all())
+        return batches
+
+    def plan_lanes(self, batches: List[LogBatch]) -> List[List[LogBatch]]:
+        """划分发送通道：保证顺序时同一 hashKey 的批次在同一通道中串行发送"""
+        if not self.sink.sender.ordered:
+            return [[batch] for batch in batches]
+        lanes: Dict[Optional[str], List[LogBatch]] = {}
+        for batch in batches:
+            lanes.setdefault(batch.hash_key, []).append(batch)
+        return list(lanes.values())
+
+    def _send_lanes(self, deadline: float) -> None:
+        """发送线程：逐个取出通道发送，截止时间到达后放弃剩余批次"""
+        while True:
+            with self._lock:
+                if not self._lanes:
+                    return
+                lane = self._lanes.popleft()
+            for index, batch in enumerate(lane):
+                if time.monotonic() >= deadline:
+                    for rest in lane[index:]:
+                        self._give_up(rest)
+                    break
+                self._send(batch)
+
+    def _send(self, batch: LogBatch) -> None:
+        """发送一个批次，不再重试，失败时按 sink 的失败处理写入磁盘暂存"""
+        sink = self.sink
+        count = len(batch.logs)
+        breaker = sink.breaker
+        if breaker is not None and not breaker.allow_request():
+            self._give_up(batch)
+            return
+
+        with self._lock:
+            self._sending += count
+        try:
+            sink.async_handler.send_batch(batch)
+        except Exception as e:
+            if breaker is not None:
+                breaker.record_error(e)
+            spooled = sink.handle_failed_batch(batch, e)
+            outcome = 'spooled' if spooled else 'dropped'
+        else:
+            if breaker is not None:
+                breaker.record_success()
+            outcome = 'sent'
+        with self._lock:
+            self._sending -= count
+            self._count(outcome, count)
+
+    def _give_up(self, batch: LogBatch) -> None:
+        """不再发送的批次写入磁盘暂存，未启用暂存时丢弃"""
+        if self.sink.spill_batch(batch):
+            outcome = 'spooled'
+        else:
+            outcome = 'dropped'
+            self.sink.record_dropped(batch)
+        with self._lock:
+            self._count(outcome, len(batch.logs))
+
+    def _count(self, outcome: str, count: int) -> None:
+        """累加统计（调用方持有锁）"""
+        if outcome == 'sent':
+            self._sent += count
+        elif outcome == 'spooled':
+            self._spooled += count
+        else:
+            self._dropped += count
+
+
+# 进程退出时需要排空的 sink
+_live_sinks: "weakref.WeakSet[Any]" = weakref.WeakSet()
+_exit_hook_lock = threading.Lock()
+_exit_hook_registered = False
+
+
+def _reset_exit_hook_lock() -> None:
+    """fork 后父进程的其他线程可能正持有锁，子进程重新创建"""
+    global _exit_hook_lock
+    _exit_hook_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_exit_hook_lock)
+
+
+def register_exit_drain(sink: Any) -> None:
+    """进程退出时关闭 sink（只注册一次退出钩子）"""
+    global _exit_hook_registered
+    with _exit_hook_lock:
+        _live_sinks.add(sink)
+        if _exit_hook_registered:
+            return
+        _exit_hook_registered = True
+    # atexit 钩子在 threading._shutdown 等待非守护线程之后、concurrent.futures 自己的退出钩子
+    # 停止线程池之后才执行：此时发送线程池已不接收新任务，在途请求也已被等待或放弃，
+    # 排空只能串行重发。threading._register_atexit（3.9 起，私有接口）的钩子在等待
+    # 非守护线程之前执行，线程池仍可用。取不到或解释器已开始退出时退回 atexit。
+    register = getattr(threading, '_register_atexit', None) if sys.version_info >= (3, 9) else None
+    if register is not None:
+        try:
+            register(drain_live_sinks)
+            return
+        except RuntimeError:
+            # 解释器已经开始退出
+            pass
+    atexit.register(drain_live_sinks)
+
+
+def unregister_exit_drain(sink: Any) -> None:
+    """sink 已关闭，退出时不再处理"""
+    with _exit_hook_lock:
+        _live_sinks.discard(sink)
+
+
+def drain_live_sinks() -> List[Tuple[Any, DrainReport]]:
+    """关闭所有仍未关闭的 sink
+
+    Returns:
+        (sink, 投递统计) 列表
+    """
+    with _exit_hook_lock:
+        sinks = list(_live_sinks)
+    reports = []
+    for sink in sinks:
+        try:
+            reports.append((sink, sink.close()))
+        except Exception as e:
+            print(f"SLS退出排空错误: {e}")
+    return reports
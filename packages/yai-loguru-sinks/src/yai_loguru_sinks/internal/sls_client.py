@@ -0,0 +1,79 @@
+"""
+每次调用只发送一次请求的 SLS 客户端
+
+SDK 的 `LogClient._send` 遇到 5xx、超时和连接错误时在内部重试最多 10 次，每次间隔 1 秒。
+sink 自己的重试调度（max_retries、retry_budget_ratio、timeout 截止时间）和熔断器都以
+“一次调用就是一次请求”为前提：内部重试会让一次失败耗时 10×(timeout+1) 秒，发送线程
+全部卡在 sleep 里，故障期间反而放大请求量。
+
+`SingleAttemptLogClient` 不复制 SDK 的请求构造和签名，只在两处挂钩：
+
+- `_sendRequest`（SDK 的重试循环每次尝试调用一次）失败时把 `LogException` 包装成
+  `_SingleAttemptError`。SDK 的重试循环只捕获 `LogException`，包装后的异常直接穿出
+- `_send` 把包装拆开，调用方看到的仍是 SDK 原来的 `LogException`
+
+可以通过刷新临时凭证恢复的鉴权错误第一次不包装，由 SDK 刷新凭证后再发送一次。`put_logs` 等
+SDK 方法都经过 `_send`，同样只发送一次。
+
+两处挂钩依赖的 SDK 私有接口由 `tests/unit/test_sls_client.py` 检查签名，升级 SDK 时
+接口变化会直接导致测试失败。
+"""
+
+import threading
+from typing import Any
+
+from aliyun.log import LogClient as SdkLogClient  # type: ignore
+from aliyun.log.logexception import LogException  # type: ignore
+
+try:
+    from aliyun.log.logclient import _is_auth_err  # type: ignore
+except ImportError:
+    _is_auth_err = None
+
+
+class _SingleAttemptError(Exception):
+    """携带 LogException 穿过 SDK 的重试循环"""
+
+    def __init__(self, error: LogException) -> None:
+        super().__init__(error)
+        self.error = error
+
+
+class SingleAttemptLogClient(SdkLogClient):
+    """不在内部重试的 LogClient"""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        # 当前线程的这次调用是否已经刷新过凭证
+        self._attempt_state = threading.local()
+
+    def _send(self, *args: Any, **kwargs: Any) -> Any:
+        """发送一次请求，请求头和签名由 SDK 的 `_send` 构造
+
+        配置了自动刷新的临时凭证过期时由 SDK 刷新凭证后再发送一次，其余失败直接抛出。
+
+        Raises:
+            LogException: 请求失败
+        """
+        self._attempt_state.refreshed = False
+        try:
+            return super()._send(*args, **kwargs)
+        except _SingleAttemptError as e:
+            raise e.error from None
+
+    def _sendRequest(self, *args: Any, **kwargs: Any) -> Any:
+        """SDK 重试循环中的一次尝试，失败时不让 SDK 重试"""
+        try:
+            return super()._sendRequest(*args, **kwargs)
+        except LogException as ex:
+            state = self._attempt_state
+            if not getattr(state, 'refreshed', True) and self._should_refresh_credentials(ex):
+                state.refreshed = True
+                raise
+            raise _SingleAttemptError(ex) from None
+
+    def _should_refresh_credentials(self, ex: Any) -> bool:
+        """是否为可通过刷新临时凭证恢复的鉴权错误"""
+        if _is_auth_err is None or not getattr(self, '_credentials_auto_refresher', None):
+            return False
+        return _is_auth_err(ex.resp_status, ex.get_error_code(), ex.get_error_message())
@@ -0,0 +1,595 @@
+"""
+磁盘暂存（spool）
+
+SLS 不可达或进程被杀时，内存中的批次会全部丢失。启用 spool 后，发送失败、
+熔断期间和发送阶段积压超限的批次写入本地磁盘，连接恢复或进程重启后按顺序补发。
+
+磁盘格式：
+
+- 目录中是按序号命名的段文件（`00000000000000000001.seg`），只追加写入。
+  活动段按 segment_bytes 预分配后整体 mmap，追加只是一次内存拷贝；写满后封存并截断到实际长度。
+  补发直接从活动段的 mmap 读取，不为读取而封存；活动段的帧全部确认后直接删除，下次写入时新建。
+  进程被杀时活动段没有封存，重新打开时截断到最后一个有效帧的结尾
+- 每个帧为 `<长度:u32><CRC32:u32><负载>`，负载是 JSON 编码的批次。
+  读取时遇到长度为 0、越界或 CRC 不匹配的帧即视为该段结尾，进程被杀时写了一半的帧会被丢弃
+- `checkpoint.json` 记录第一个未确认帧的位置（段序号、偏移），先写临时文件再原子替换。
+  崩溃重启后从检查点继续补发，已确认的帧不会重复发送；检查点之前的段会被删除
+
+保留策略：总大小超过 max_bytes 或段文件超过 max_age 时，从最旧的段开始删除，删除量计入统计。
+
+`SpoolReplayer` 在后台线程中按顺序读取帧，每轮最多并发发送 concurrency 个批次，
+全部成功后推进检查点；有可重试的失败时只确认已送达的前缀，从检查点重新开始并退避等待，
+前缀之后已送达的帧记在内存中，重新读取时不再发送。不可重试的错误（鉴权失败、参数错误等）
+重发也不会成功，该帧视为已处理并计入丢弃，不阻塞之后的帧。
+配置了熔断器时，补发请求同样经过熔断器，熔断打开期间不补发。
+"""
+
+import json
+import mmap
+import os
+import shutil
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from .data import LogBatch
+from .retry import is_retryable_error
+
+if TYPE_CHECKING:
+    from .breaker import CircuitBreaker
+
+
+# 帧头：负载长度、负载的 CRC32
+FRAME_HEADER = struct.Struct('<II')
+
+SEGMENT_SUFFIX = '.seg'
+CHECKPOINT_FILE = 'checkpoint.json'
+
+# 暂存位置：(段序号, 段内偏移)
+SpoolPosition = Tuple[int, int]
+
+# 补发一个批次的结果
+REPLAY_SENT = 'sent'
+REPLAY_DROPPED = 'dropped'    # 不可重试的错误，不再补发
+REPLAY_FAILED = 'failed'      # 可重试的错误或熔断打开，稍后重新补发
+
+
+def encode_batch(batch: LogBatch) -> bytes:
+    """把批次编码为帧负载，路由后的批次同时记录写入目标"""
+    data: Dict[str, Any] = {'k': batch.hash_key, 'l': batch.logs}
+    if batch.logstore is not None or batch.topic is not None:
+        data['d'] = [batch.logstore, batch.topic]
+    return json.dumps(
+        data,
+        ensure_ascii=False,
+        separators=(',', ':'),
+    ).encode('utf-8')
+
+
+def decode_batch(payload: bytes) -> LogBatch:
+    """从帧负载还原批次"""
+    data = json.loads(payload.decode('utf-8'))
+    logs = [
+        (timestamp, [(key, value) for key, value in contents])
+        for timestamp, contents in data['l']
+    ]
+    logstore, topic = data.get('d') or (None, None)
+    return LogBatch(logs, nbytes=len(payload), hash_key=data.get('k'), logstore=logstore, topic=topic)
+
+
+def _segment_name(seq: int) -> str:
+    return f"{seq:020d}{SEGMENT_SUFFIX}"
+
+
+def _scan_frames(data: Any, offset: int, size: int, limit: int) -> List[Tuple[int, bytes]]:
+    """读取 data 中从 offset 开始、不超过 size 的有效帧，最多 limit 个
+
+    Returns:
+        (帧结束偏移, 负载) 列表
+    """
+    frames: List[Tuple[int, bytes]] = []
+    while len(frames) < limit and offset + FRAME_HEADER.size <= size:
+        length, crc = FRAME_HEADER.unpack_from(data, offset)
+        start = offset + FRAME_HEADER.size
+        if length == 0 or start + length > size:
+            break
+        payload = data[start:start + length]
+        if zlib.crc32(payload) != crc:
+            # 写了一半的帧，之后的内容不可信
+            break
+        offset = start + length
+        frames.append((offset, payload))
+    return frames
+
+
+class _ActiveSegment:
+    """正在追加写入的段，预分配后整体 mmap"""
+
+    def __init__(self, path: str, seq: int, capacity: int) -> None:
+        self.path = path
+        self.seq = seq
+        self.capacity = capacity
+        self.size = 0
+        self.created_at = time.time()
+        self._file = open(path, 'w+b')
+        self._file.truncate(capacity)
+        self._map = mmap.mmap(self._file.fileno(), capacity)
+
+    def fits(self, nbytes: int) -> bool:
+        return self.size + nbytes <= self.capacity
+
+    def append(self, frame: bytes) -> None:
+        self._map[self.size:self.size + len(frame)] = frame
+        self.size += len(frame)
+
+    def seal(self) -> None:
+        """刷盘并截断到实际长度"""
+        self._map.flush()
+        self._map.close()
+        self._file.truncate(self.size)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+    def discard(self) -> None:
+        """删除内容已全部确认的段，不刷盘"""
+        self._map.close()
+        self._file.close()
+        os.remove(self.path)
+
+    @property
+    def data(self) -> mmap.mmap:
+        """段内容（有效长度为 size）"""
+        return self._map
+
+
+class DiskSpool:
+    """基于 mmap 段文件的磁盘暂存"""
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = 16 * 1024 * 1024,
+        max_bytes: int = 256 * 1024 * 1024,
+        max_age: float = 3 * 24 * 3600.0,
+    ) -> None:
+        """初始化磁盘暂存，目录中已有的段会在之后被补发
+
+        Args:
+            directory: 暂存目录，不存在时自动创建
+            segment_bytes: 单个段文件的预分配大小
+            max_bytes: 所有段文件的总大小上限，超过时删除最旧的段，<= 0 表示不限
+            max_age: 段文件的最长保留时间（秒），<= 0 表示不限
+        """
+        self.directory = directory
+        self.segment_bytes = max(FRAME_HEADER.size + 1, segment_bytes)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # 已封存的段：序号 -> (文件大小, 修改时间)
+        self._sealed: Dict[int, Tuple[int, float]] = {}
+        for name in os.listdir(directory):
+            if name.endswith(SEGMENT_SUFFIX):
+                seq = int(name[:-len(SEGMENT_SUFFIX)])
+                stat = os.stat(self._path(seq))
+                self._sealed[seq] = (stat.st_size, stat.st_mtime)
+        if self._sealed:
+            # 只有最新的段可能是进程被杀时没有封存的活动段
+            self._trim_locked(max(self._sealed))
+        self._active: Optional[_ActiveSegment] = None
+        self._next_seq = max(self._sealed, default=0) + 1
+
+        self._checkpoint = self._load_checkpoint()
+        self._cursor = self._checkpoint
+        # 上次退出前已确认但未来得及删除的段
+        for seq in [s for s in self._sealed if s < self._checkpoint[0]]:
+            self._remove_locked(seq)
+
+        self.appended_batches = 0
+        self.appended_logs = 0
+        self.appended_bytes = 0
+        self.replayed_batches = 0
+        self.rejected_batches = 0     # 单帧超过总大小上限等原因未能写入的批次
+        self.expired_segments = 0     # 因保留策略被删除的段
+        self.expired_bytes = 0
+
+    # ---- 写入 ----
+
+    def append(self, batch: LogBatch) -> bool:
+        """追加一个批次
+
+        Returns:
+            是否写入成功
+        """
+        payload = encode_batch(batch)
+        frame = FRAME_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._lock:
+            self._expire_locked(extra_bytes=len(frame))
+            if 0 < self.max_bytes < self._total_bytes_locked() + len(frame):
+                self.rejected_batches += 1
+                return False
+            active = self._active
+            if active is None or not active.fits(len(frame)):
+                if active is not None:
+                    self._seal_locked()
+                active = self._open_segment_locked(max(self.segment_bytes, len(frame)))
+            active.append(frame)
+            self.appended_batches += 1
+            self.appended_logs += len(batch.logs)
+            self.appended_bytes += len(frame)
+            return True
+
+    def _open_segment_locked(self, capacity: int) -> _ActiveSegment:
+        seq = self._next_seq
+        self._next_seq += 1
+        self._active = _ActiveSegment(self._path(seq), seq, capacity)
+        return self._active
+
+    def _seal_locked(self) -> None:
+        active = self._active
+        if active is None:
+            return
+        active.seal()
+        self._active = None
+        if active.size:
+            self._sealed[active.seq] = (active.size, time.time())
+        else:
+            os.remove(active.path)
+
+    def _trim_locked(self, seq: int) -> None:
+        """把未封存的预分配段截断到最后一个有效帧的结尾，没有有效帧时删除"""
+        size, mtime = self._sealed[seq]
+        end = 0
+        if size:
+            with open(self._path(seq), 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    frames = _scan_frames(data, 0, size, size)
+            end = frames[-1][0] if frames else 0
+        if end == size:
+            return
+        if end == 0:
+            self._remove_locked(seq)
+            return
+        with open(self._path(seq), 'r+b') as f:
+            f.truncate(end)
+            os.fsync(f.fileno())
+        self._sealed[seq] = (end, mtime)
+
+    # ---- 读取与确认 ----
+
+    @property
+    def has_pending(self) -> bool:
+        """读取游标之后是否还有未读取的数据"""
+        with self._lock:
+            seq, offset = self._cursor
+            active = self._active
+            if active is not None and (
+                active.seq > seq or (active.seq == seq and active.size > offset)
+            ) and active.size:
+                return True
+            return any(
+                s > seq or (s == seq and size > offset)
+                for s, (size, _) in self._sealed.items()
+            )
+
+    def read(self, max_batches: int) -> List[Tuple[SpoolPosition, LogBatch]]:
+        """从读取游标开始按顺序读取批次
+
+        Returns:
+            (帧结束位置, 批次) 列表，确认某个位置即确认它及之前的所有帧
+        """
+        result: List[Tuple[SpoolPosition, LogBatch]] = []
+        with self._lock:
+            self._expire_locked()
+            active = self._active
+            seqs = sorted(s for s in self._sealed if s >= self._cursor[0])
+            if active is not None and active.seq >= self._cursor[0]:
+                # 活动段总是最新的段，直接从 mmap 读取
+                seqs.append(active.seq)
+            remaining = max_batches
+            for seq in seqs:
+                offset = self._cursor[1] if seq == self._cursor[0] else 0
+                frames = self._read_frames(seq, offset, remaining)
+                for end, payload in frames:
+                    self._cursor = (seq, end)
+                    try:
+                        result.append(((seq, end), decode_batch(payload)))
+                    except (ValueError, KeyError, TypeError) as e:
+                        print(f"SLS暂存帧解码错误: {e}")
+                remaining -= len(frames)
+                if remaining <= 0 or (active is not None and seq == active.seq):
+                    # 活动段还会继续写入，游标停在已读取的位置
+                    break
+                # 本段已读完，游标移到下一段开头
+                self._cursor = (seq + 1, 0)
+        return result
+
+    def _read_frames(self, seq: int, offset: int, limit: int) -> List[Tuple[int, bytes]]:
+        """读取段中从 offset 开始的有效帧（调用方持有锁）"""
+        active = self._active
+        if active is not None and seq == active.seq:
+            return _scan_frames(active.data, offset, active.size, limit)
+        size = self._sealed[seq][0]
+        if limit <= 0 or offset + FRAME_HEADER.size > size:
+            return []
+        with open(self._path(seq), 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return _scan_frames(data, offset, size, limit)
+
+    def commit(self, position: SpoolPosition, count: int = 0) -> None:
+        """确认 position 及之前的帧已送达，推进检查点并删除不再需要的段"""
+        with self._lock:
+            if position <= self._checkpoint:
+                return
+            self._checkpoint = position
+            self.replayed_batches += count
+            self._save_checkpoint_locked()
+            for seq in [s for s in self._sealed if s < position[0]]:
+                self._remove_locked(seq)
+            size = self._sealed.get(position[0], (None, 0.0))[0]
+            if size is not None and position[1] >= size:
+                self._remove_locked(position[0])
+            active = self._active
+            if active is not None and position[0] == active.seq and position[1] >= active.size:
+                active.discard()
+                self._active = None
+
+    def rewind(self) -> None:
+        """把读取游标退回检查点，未确认的帧将重新读取"""
+        with self._lock:
+            self._cursor = self._checkpoint
+
+    def adopt(self, directory: str, max_batches: int = 256) -> int:
+        """把另一个已不再写入的暂存目录中未确认的批次并入本暂存，然后删除该目录
+
+        并入之后、删除之前进程退出时，这些批次下次会被再次并入，可能重复发送一次。
+
+        Returns:
+            并入的批次数（超过总大小上限未能写入的计入 rejected_batches）
+        """
+        orphan = DiskSpool(directory, max_bytes=0, max_age=self.max_age)
+        adopted = 0
+        while True:
+            frames = orphan.read(max_batches)
+            if not frames:
+                break
+            for _, batch in frames:
+                if self.append(batch):
+                    adopted += 1
+        shutil.rmtree(directory, ignore_errors=True)
+        return adopted
+
+    # ---- 保留策略 ----
+
+    def _total_bytes_locked(self) -> int:
+        total = sum(size for size, _ in self._sealed.values())
+        if self._active is not None:
+            total += self._active.size
+        return total
+
+    def _expire_locked(self, extra_bytes: int = 0) -> None:
+        """按年龄和总大小删除最旧的段"""
+        now = time.time()
+        for seq in sorted(self._sealed):
+            size, mtime = self._sealed[seq]
+            too_old = self.max_age > 0 and now - mtime > self.max_age
+            too_big = 0 < self.max_bytes < self._total_bytes_locked() + extra_bytes
+            if not (too_old or too_big):
+                break
+            self.expired_segments += 1
+            self.expired_bytes += size
+            self._remove_locked(seq)
+            if self._checkpoint[0] <= seq:
+                self._checkpoint = (seq + 1, 0)
+                self._save_checkpoint_locked()
+            if self._cursor[0] <= seq:
+                self._cursor = (seq + 1, 0)
+
+    def _remove_locked(self, seq: int) -> None:
+        self._sealed.pop(seq, None)
+        try:
+            os.remove(self._path(seq))
+        except FileNotFoundError:
+            pass
+
+    # ---- 检查点 ----
+
+    def _load_checkpoint(self) -> SpoolPosition:
+        try:
+            with open(os.path.join(self.directory, CHECKPOINT_FILE), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return (int(data['segment']), int(data['offset']))
+        except (OSError, ValueError, KeyError, TypeError):
+            return (0, 0)
+
+    def _save_checkpoint_locked(self) -> None:
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'segment': self._checkpoint[0], 'offset': self._checkpoint[1]}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _path(self, seq: int) -> str:
+        return os.path.join(self.directory, _segment_name(seq))
+
+    def metrics(self) -> Dict[str, int]:
+        """暂存的计数"""
+        with self._lock:
+            return {
+                'bytes': self._total_bytes_locked(),
+                'segments': len(self._sealed) + (1 if self._active is not None else 0),
+                'appended_batches': self.appended_batches,
+                'appended_logs': self.appended_logs,
+                'appended_bytes': self.appended_bytes,
+                'replayed_batches': self.replayed_batches,
+                'rejected_batches': self.rejected_batches,
+                'expired_segments': self.expired_segments,
+                'expired_bytes': self.expired_bytes,
+            }
+
+    def close(self) -> None:
+        """封存活动段"""
+        with self._lock:
+            self._seal_locked()
+
+
+class SpoolReplayer:
+    """后台补发磁盘暂存中的批次"""
+
+    def __init__(
+        self,
+        spool: DiskSpool,
+        send: Callable[[LogBatch], Any],
+        breaker: Optional["CircuitBreaker"] = None,
+        concurrency: int = 2,
+        interval: float = 1.0,
+        max_backoff: float = 30.0,
+        background: bool = True,
+        on_drop: Optional[Callable[[LogBatch], None]] = None,
+        orphans: Optional[Callable[[], List[str]]] = None,
+        orphan_scan_interval: float = 60.0,
+    ) -> None:
+        """初始化补发器
+
+        Args:
+            spool: 磁盘暂存
+            send: 同步发送一个批次的函数，失败时抛出异常
+            breaker: 熔断器，熔断打开期间不补发
+            concurrency: 每轮并发发送的批次数
+            interval: 没有待补发数据时的检查间隔（秒）
+            max_backoff: 补发失败后退避等待的上限（秒）
+            background: 是否启动后台补发线程，False 时由调用方调用 `replay_once`
+            on_drop: 批次因不可重试的错误被丢弃时调用
+            orphans: 返回需要并入本暂存的目录（已退出的子进程留下的暂存），None 表示不检查
+            orphan_scan_interval: 检查 orphans 的间隔（秒）
+        """
+        self.spool = spool
+        self._send = send
+        self.breaker = breaker
+        self._on_drop = on_drop
+        self._orphans = orphans
+        self.orphan_scan_interval = orphan_scan_interval
+        self._next_orphan_scan = 0.0
+        self.dropped_batches = 0
+        self.adopted_batches = 0
+        # 已送达（True）或已丢弃（False）但还不能推进检查点的帧，重新读取时跳过
+        self._done: Dict[SpoolPosition, bool] = {}
+        self.concurrency = max(1, concurrency)
+        self.interval = interval
+        self.max_backoff = max(interval, max_backoff)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="yai-sls-replay"
+        )
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if background:
+            self._thread = threading.Thread(target=self._run, name="yai-sls-spool", daemon=True)
+            self._thread.start()
+
+    def notify(self) -> None:
+        """有新数据写入暂存时唤醒补发线程"""
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        backoff = self.interval
+        while not self._stopped.is_set():
+            if self._orphans is not None and time.monotonic() >= self._next_orphan_scan:
+                self._next_orphan_scan = time.monotonic() + self.orphan_scan_interval
+                self.adopt_orphans()
+            if not self.spool.has_pending:
+                self._wakeup.wait(self.interval)
+                self._wakeup.clear()
+                continue
+            if self.replay_once():
+                backoff = self.interval
+            else:
+                self._stopped.wait(backoff)
+                backoff = min(self.max_backoff, backoff * 2)
+
+    def adopt_orphans(self) -> int:
+        """把 orphans 返回的目录并入本暂存
+
+        Returns:
+            并入的批次数
+        """
+        if self._orphans is None:
+            return 0
+        adopted = 0
+        for directory in self._orphans():
+            try:
+                adopted += self.spool.adopt(directory)
+            except Exception as e:
+                print(f"SLS暂存目录并入错误: {e}")
+        self.adopted_batches += adopted
+        return adopted
+
+    def replay_once(self) -> bool:
+        """补发一轮
+
+        Returns:
+            本轮是否没有可重试的失败
+        """
+        frames = self.spool.read(self.concurrency)
+        if not frames:
+            return True
+        done = self._done
+        pending = [(position, batch) for position, batch in frames if position not in done]
+        results = self._executor.map(self._send_one, [batch for _, batch in pending])
+        for (position, batch), result in zip(pending, results):
+            if result == REPLAY_FAILED:
+                continue
+            done[position] = result == REPLAY_SENT
+            if result == REPLAY_DROPPED:
+                self.dropped_batches += 1
+                if self._on_drop is not None:
+                    self._on_drop(batch)
+
+        # 只能确认连续的前缀，前缀之后已处理的帧留在 done 中
+        acked = 0
+        for position, _ in frames:
+            if position not in done:
+                break
+            acked += 1
+        if acked:
+            sent = sum(done.pop(position) for position, _ in frames[:acked])
+            self.spool.commit(frames[acked - 1][0], count=sent)
+        if acked < len(frames):
+            # 检查点之前的记录已不再需要（例如所在段已按保留策略删除）
+            first = frames[0][0]
+            self._done = {position: ok for position, ok in done.items() if position >= first}
+            self.spool.rewind()
+            return False
+        return True
+
+    def _send_one(self, batch: LogBatch) -> str:
+        breaker = self.breaker
+        if breaker is not None and not breaker.allow_request():
+            return REPLAY_FAILED
+        try:
+            self._send(batch)
+        except Exception as e:
+            if breaker is not None:
+                breaker.record_error(e)
+            if is_retryable_error(e):
+                return REPLAY_FAILED
+            print(f"SLS暂存补发错误（不可重试，已丢弃）: {e}")
+            return REPLAY_DROPPED
+        if breaker is not None:
+            breaker.record_success()
+        return REPLAY_SENT
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """停止补发线程，未补发的数据留在磁盘上等待下次启动"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,211 @@
+"""
+分线程暂存缓冲
+
+在有界队列前增加一层按线程划分的暂存缓冲：
+- 生产者线程只向自己的 deque 追加记录，`deque.append` 在 GIL 下是原子操作，不取任何锁
+- 本地缓冲攒满 `chunk_size` 条后整块交给后端 BoundedLogQueue，每块只加一次锁
+- flush worker 通过 `drain()` 取后端队列中的整块，并窃取各线程未攒满的缓冲
+
+worker 唤醒使用一个 Event：生产者只在 Event 未置位时调用 `set()`，
+worker 忙碌期间 Event 保持置位，生产者只做一次无锁的 `is_set()` 读取。
+
+同一线程的记录在整块移交与 worker 窃取并发发生时可能轻微乱序，
+SLS 按记录自带的时间戳排序展示，不受影响。
+"""
+
+import threading
+import weakref
+from collections import deque
+from queue import Empty
+from typing import Any, Deque, List, Optional, Tuple
+
+from .log_queue import BoundedLogQueue
+
+
+# 暂存缓冲元素: (item, nbytes, level_no)
+StagedEntry = Tuple[Any, int, int]
+
+
+class StagedLogQueue:
+    """带分线程暂存缓冲的日志队列
+
+    对外提供与 BoundedLogQueue 相同的 put / drain / get_nowait / empty / qsize /
+    is_congested 接口，可直接替换 SlsSink.log_queue。
+    """
+
+    def __init__(self, backend: BoundedLogQueue, chunk_size: int = 64) -> None:
+        """初始化暂存队列
+
+        Args:
+            backend: 承接整块记录的有界队列，负责容量限制和背压策略
+            chunk_size: 每个线程本地缓冲攒满多少条后整块移交
+        """
+        self.backend = backend
+        self.chunk_size = max(1, chunk_size)
+
+        self._local = threading.local()
+        self._ready = threading.Event()
+        self._closed = False
+
+        # 已注册的线程缓冲: (线程弱引用, 缓冲)，仅在首次写入和清理时加锁
+        self._buffers: List[Tuple[weakref.ref, Deque[StagedEntry]]] = []
+        self._registry_lock = threading.Lock()
+
+    @property
+    def dropped(self) -> int:
+        """被背压策略丢弃的记录数"""
+        return self.backend.dropped
+
+    @property
+    def dropped_bytes(self) -> int:
+        """被背压策略丢弃的估算字节数"""
+        return self.backend.dropped_bytes
+
+    def _register_buffer(self) -> Deque[StagedEntry]:
+        """为当前线程创建并注册本地缓冲"""
+        buffer: Deque[StagedEntry] = deque()
+        with self._registry_lock:
+            self._buffers.append((weakref.ref(threading.current_thread()), buffer))
+        self._local.buffer = buffer
+        return buffer
+
+    def put(
+        self,
+        item: Any,
+        block: bool = True,
+        timeout: Optional[float] = None,
+        nbytes: int = 0,
+        level_no: int = 0,
+    ) -> bool:
+        """写入当前线程的本地缓冲
+
+        Returns:
+            记录是否被接收（本地暂存总是接收，整块移交时才可能被背压策略丢弃）
+        """
+        try:
+            buffer = self._local.buffer
+        except AttributeError:
+            buffer = self._register_buffer()
+
+        buffer.append((item, nbytes, level_no))
+
+        if len(buffer) >= self.chunk_size:
+            self._hand_off(buffer, block, timeout)
+
+        if not self._ready.is_set():
+            self._ready.set()
+        return True
+
+    def _hand_off(
+        self, buffer: Deque[StagedEntry], block: bool, timeout: Optional[float]
+    ) -> None:
+        """把本地缓冲整块移交给后端队列"""
+        chunk = []
+        popleft = buffer.popleft
+        try:
+            for _ in range(len(buffer)):
+                chunk.append(popleft())
+        except IndexError:
+            # worker 同时在窃取该缓冲
+            pass
+        if chunk:
+            self.backend.put_many(chunk, block=block, timeout=timeout)
+
+    def _steal(self, max_items: int) -> List[StagedEntry]:
+        """窃取各线程未攒满的缓冲（仅由 worker 调用）"""
+        items: List[StagedEntry] = []
+        dead = []
+        for entry in list(self._buffers):
+            thread_ref, buffer = entry
+            popleft = buffer.popleft
+            try:
+                while len(items) < max_items and buffer:
+                    items.append(popleft())
+            except IndexError:
+                # 生产者同时在移交该缓冲
+                pass
+            if not buffer and thread_ref() is None:
+                dead.append(entry)
+            if len(items) >= max_items:
+                break
+
+        if dead:
+            dead_ids = {id(entry) for entry in dead}
+            with self._registry_lock:
+                self._buffers = [e for e in self._buffers if id(e) not in dead_ids]
+        return items
+
+    def drain(self, max_items: int, timeout: Optional[float] = None) -> List[Any]:
+        """批量取出记录
+
+        先取后端队列中已移交的整块，再窃取各线程的零散记录。
+
+        Args:
+            max_items: 最多取出的记录数
+            timeout: 没有任何记录时的最长等待时间，None 表示不等待
+
+        Returns:
+            取出的记录列表，超时返回空列表
+        """
+        items = self._collect(max_items)
+        if items or timeout is None:
+            return items
+
+        # 先清除再复查，避免清除前生产者已写入而丢失唤醒
+        self._ready.clear()
+        items = self._collect(max_items)
+        if items or self._closed:
+            return items
+
+        self._ready.wait(timeout)
+        return self._collect(max_items)
+
+    def _collect(self, max_items: int) -> List[Any]:
+        """从后端队列和线程缓冲收集记录"""
+        items = self.backend.drain(max_items)
+        if len(items) < max_items:
+            items.extend(entry[0] for entry in self._steal(max_items - len(items)))
+        return items
+
+    def drain_entries(self) -> List[StagedEntry]:
+        """取出全部记录（包含各线程暂存的记录），不等待
+
+        Returns:
+            (item, nbytes, level_no) 列表
+        """
+        entries = self.backend.drain_entries()
+        entries.extend(self._steal(self.qsize()))
+        return entries
+
+    def close(self) -> None:
+        """唤醒等待中的 drain，之后 drain 没有记录时立即返回"""
+        self._closed = True
+        self._ready.set()
+        self.backend.close()
+
+    def get_nowait(self) -> Any:
+        """非阻塞取出一条记录"""
+        items = self.drain(1)
+        if not items:
+            raise Empty
+        return items[0]
+
+    def qsize(self) -> int:
+        """当前记录数（包含各线程暂存的记录）"""
+        return self.backend.qsize() + sum(len(buffer) for _, buffer in self._buffers)
+
+    def qbytes(self) -> int:
+        """后端队列的估算字节数（不含各线程暂存的记录）"""
+        return self.backend.qbytes()
+
+    def peek(self) -> Any:
+        """后端队列头部的记录，见 `BoundedLogQueue.peek`"""
+        return self.backend.peek()
+
+    def empty(self) -> bool:
+        """队列是否为空"""
+        return self.qsize() == 0
+
+    def is_congested(self) -> bool:
+        """队列是否拥塞（由后端有界队列判断）"""
+        return self.backend.is_congested()
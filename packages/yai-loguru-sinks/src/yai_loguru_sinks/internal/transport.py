@@ -0,0 +1,386 @@
+"""
+内置的 PutLogs HTTP 传输
+
+SDK 的 `LogClient._send` 每次请求都要复制请求头、重新拼接全部签名内容、调用
+`locale.setlocale` 生成 Date，并在 SDK 内部最多重试 10 次，连接复用和超时也不受
+sink 控制。启用 native_transport 后，已编码（已压缩）的 LogGroup 请求体直接由这里发送：
+
+- `PutLogsSigner` 预先生成不变的请求头、资源路径和签名片段，HMAC 密钥只初始化一次，
+  Date 按秒缓存；签名规则与 SDK 的 AuthV1 相同，AuthV4 等其他鉴权方式交给 SDK 签名
+- `PutLogsTransport` 按 endpoint 维护 keep-alive 连接池，建立连接和每次读写都受
+  timeout 限制；只在复用的空闲连接已被服务端关闭时换新连接重发一次，其余重试交给
+  sink 的重试调度
+- 失败时抛出与 SDK 相同的 `LogException`，重试、熔断按相同的错误码分类
+"""
+
+import base64
+import hashlib
+import hmac
+import http.client
+import json
+import ssl
+import threading
+import time
+from email.utils import formatdate
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+try:
+    from aliyun.log.auth import AuthV1  # type: ignore
+    from aliyun.log.logexception import LogException  # type: ignore
+    from aliyun.log.util import Util  # type: ignore
+    HAS_ALIYUN_SDK = True
+except ImportError:
+    HAS_ALIYUN_SDK = False
+    AuthV1 = None
+    LogException = None
+    Util = None
+
+
+# 与 SDK 相同的 API 版本
+API_VERSION = '0.6.0'
+USER_AGENT = 'yai-loguru-sinks'
+CONTENT_TYPE = 'application/x-protobuf'
+
+# 复用的连接已被服务端关闭时可能出现的异常，换新连接重发一次
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+def parse_endpoint(endpoint: str) -> Tuple[bool, str, int]:
+    """解析 endpoint，规则与 SDK 相同
+
+    Returns:
+        (是否 https, 主机名, 端口)
+    """
+    endpoint = endpoint.strip()
+    secure = False
+    pos = endpoint.find('://')
+    if pos != -1:
+        secure = endpoint[:pos].lower() == 'https'
+        endpoint = endpoint[pos + 3:]
+    endpoint = endpoint.split('/', 1)[0]
+    port = 443 if secure else 80
+    if ':' in endpoint:
+        endpoint, port_text = endpoint.split(':', 1)
+        port = int(port_text)
+    return secure, endpoint, port
+
+
+def request_host(endpoint_host: str, project: str) -> str:
+    """请求的 Host，与 SDK 相同：endpoint 为 IP 时不在域名前加项目名"""
+    if Util is not None and Util.is_row_ip(endpoint_host):
+        return endpoint_host
+    return f"{project}.{endpoint_host}"
+
+
+class HttpResponse:
+    """HTTP 响应，请求头名称为小写"""
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes) -> None:
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+def response_error(response: HttpResponse) -> Exception:
+    """把错误响应转换为与 SDK 相同的 LogException"""
+    request_id = response.headers.get('x-log-requestid', '')
+    try:
+        detail = json.loads(response.body.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        detail = None
+    if isinstance(detail, dict) and 'errorCode' in detail and 'errorMessage' in detail:
+        return LogException(
+            detail['errorCode'], detail['errorMessage'], request_id,
+            response.status, response.headers, response.body,
+        )
+    return LogException(
+        'LogRequestError', f'Request is failed. Http code is {response.status}.',
+        request_id, response.status, response.headers, response.body,
+    )
+
+
+class PutLogsSigner:
+    """生成带签名的 PutLogs 请求路径和请求头，缓存不变的部分
+
+    可在多个线程中同时调用。
+    """
+
+    def __init__(self, auth: Any, logstore: str, host: str, user_agent: str = USER_AGENT) -> None:
+        """初始化
+
+        Args:
+            auth: SDK 的鉴权对象（`LogClient._auth`）
+            logstore: 日志库
+            host: 请求的 Host
+            user_agent: User-Agent 请求头
+        """
+        self.auth = auth
+        # 只有 AuthV1 使用缓存的签名，其他鉴权方式调用 SDK 的 sign_request
+        self.cached = AuthV1 is not None and type(auth) is AuthV1
+        self.logstore = logstore
+        # 日志库 -> (负载均衡资源路径, 按 hashKey 路由的资源路径)
+        self._resources: Dict[str, Tuple[str, str]] = {}
+        self._static_headers = {
+            'Content-Type': CONTENT_TYPE,
+            'x-log-apiversion': API_VERSION,
+            'Host': host,
+        }
+        self.user_agent = user_agent
+        # (密钥, 用该密钥初始化的 HMAC 对象)，每次签名复制一份
+        self._mac: Optional[Tuple[str, Any]] = None
+        # (秒, Date 请求头)
+        self._date: Tuple[int, str] = (-1, '')
+
+    def prepare(
+        self,
+        raw_size: int,
+        compress_type: Optional[str],
+        body: bytes,
+        hash_key: Optional[str] = None,
+        logstore: Optional[str] = None,
+    ) -> Tuple[str, Dict[str, str]]:
+        """生成带签名的请求路径和请求头
+
+        计算 Content-MD5 和 HMAC 签名，请求体较大时不应在事件循环上调用。
+        logstore 为 None 时写入初始化时的日志库。
+
+        Returns:
+            (带查询参数的请求路径, 请求头)
+        """
+        headers = dict(self._static_headers)
+        headers['Content-Length'] = str(len(body))
+        headers['x-log-bodyrawsize'] = str(raw_size)
+        if compress_type is not None:
+            headers['x-log-compresstype'] = compress_type
+
+        lb_resource, route_resource = self._resources_of(logstore or self.logstore)
+        if hash_key is not None:
+            resource = route_resource
+            params = {'key': hash_key}
+            path = resource + '?key=' + quote(hash_key, safe='')
+        else:
+            resource = path = lb_resource
+            params = {}
+
+        if self.cached:
+            self._sign(resource, params, headers, body)
+        else:
+            self.auth.sign_request('POST', resource, params, headers, body)
+        headers['User-Agent'] = self.user_agent
+        return path, headers
+
+    def _resources_of(self, logstore: str) -> Tuple[str, str]:
+        resources = self._resources.get(logstore)
+        if resources is None:
+            prefix = '/logstores/' + logstore + '/shards/'
+            resources = self._resources[logstore] = (prefix + 'lb', prefix + 'route')
+        return resources
+
+    def _sign(self, resource: str, params: Dict[str, str], headers: Dict[str, str], body: bytes) -> None:
+        """按 AuthV1 的规则签名"""
+        credentials = self.auth.credentials_provider.get_credentials()
+        token = credentials.get_security_token()
+        if token:
+            headers['x-acs-security-token'] = token
+        headers['x-log-signaturemethod'] = 'hmac-sha1'
+        date = self._gmt()
+        headers['Date'] = date
+
+        content_md5 = ''
+        if body:
+            content_md5 = hashlib.md5(body).hexdigest().upper()
+            headers['Content-MD5'] = content_md5
+
+        secret = credentials.get_access_key_secret()
+        if not secret:
+            return
+        content = (
+            'POST\n' + content_md5 + '\n' + CONTENT_TYPE + '\n' + date + '\n'
+            + Util.canonicalized_log_headers(headers)
+            + Util.canonicalized_resource(resource, params)
+        )
+        mac = self._hmac(secret)
+        mac.update(content.encode('utf-8'))
+        signature = base64.b64encode(mac.digest()).decode('ascii')
+        headers['Authorization'] = 'LOG ' + credentials.get_access_key_id() + ':' + signature
+        # 与 SDK 相同，绕过部分代理不允许 Date 请求头的问题，不参与签名
+        headers['x-log-date'] = date
+
+    def _hmac(self, secret: str) -> Any:
+        """返回用密钥初始化好的 HMAC 对象副本，密钥变化（如 STS 轮换）时重新初始化"""
+        cached = self._mac
+        if cached is None or cached[0] != secret:
+            cached = (secret, hmac.new(secret.encode('utf-8'), digestmod=hashlib.sha1))
+            self._mac = cached
+        return cached[1].copy()
+
+    def _gmt(self) -> str:
+        """RFC 1123 格式的当前时间，同一秒内复用"""
+        now = int(time.time())
+        cached = self._date
+        if cached[0] != now:
+            cached = (now, formatdate(now, usegmt=True))
+            self._date = cached
+        return cached[1]
+
+
+class PutLogsTransport:
+    """通过 keep-alive 连接池同步发送 PutLogs 请求，可在多个发送线程中同时调用"""
+
+    def __init__(
+        self,
+        endpoint: str,
+        project: str,
+        logstore: str,
+        auth: Any,
+        timeout: float = 30.0,
+        pool_size: int = 4,
+        user_agent: str = USER_AGENT,
+    ) -> None:
+        """初始化
+
+        Args:
+            endpoint: SLS endpoint，如 https://cn-hangzhou.log.aliyuncs.com
+            project / logstore: 写入的项目和日志库
+            auth: SDK 的鉴权对象（`LogClient._auth`）
+            timeout: 建立连接和每次读写的超时（秒）
+            pool_size: 保留的空闲连接数上限
+            user_agent: User-Agent 请求头
+        """
+        self.secure, endpoint_host, self.port = parse_endpoint(endpoint)
+        self.host = request_host(endpoint_host, project)
+        self.signer = PutLogsSigner(auth, logstore, self.host, user_agent)
+        self.timeout = timeout
+        self.pool_size = max(1, pool_size)
+        self._ssl: Optional[ssl.SSLContext] = ssl.create_default_context() if self.secure else None
+        self._idle: List[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self.connections_opened = 0
+
+    @classmethod
+    def from_config(cls, config: Any, auth: Any) -> "PutLogsTransport":
+        """按 SlsConfig 创建，连接池大小与在途请求数上限相同"""
+        return cls(
+            config.endpoint,
+            config.project,
+            config.logstore,
+            auth,
+            timeout=config.timeout,
+            pool_size=config.max_in_flight,
+        )
+
+    def prepare(
+        self,
+        raw_size: int,
+        compress_type: Optional[str],
+        body: bytes,
+        hash_key: Optional[str] = None,
+        logstore: Optional[str] = None,
+    ) -> Tuple[str, Dict[str, str]]:
+        """生成带签名的请求路径和请求头，见 `PutLogsSigner.prepare`"""
+        return self.signer.prepare(raw_size, compress_type, body, hash_key, logstore)
+
+    def post(
+        self,
+        raw_size: int,
+        compress_type: Optional[str],
+        body: bytes,
+        hash_key: Optional[str] = None,
+        logstore: Optional[str] = None,
+    ) -> HttpResponse:
+        """签名并发送请求，logstore 为 None 时写入初始化时的日志库
+
+        Raises:
+            LogException: 网络错误、超时（LogRequestError）或服务端返回错误
+        """
+        path, headers = self.signer.prepare(raw_size, compress_type, body, hash_key, logstore)
+        return self.send(path, headers, body)
+
+    def send(self, path: str, headers: Dict[str, str], body: bytes) -> HttpResponse:
+        """发送已签名的请求"""
+        try:
+            response = self._request(path, headers, body)
+        except TimeoutError:
+            raise LogException('LogRequestError', f'request timed out after {self.timeout}s')
+        except (OSError, http.client.HTTPException) as e:
+            raise LogException('LogRequestError', str(e) or type(e).__name__)
+
+        if response.status == 200:
+            return response
+        raise response_error(response)
+
+    def _request(self, path: str, headers: Dict[str, str], body: bytes) -> HttpResponse:
+        connection, reused = self._acquire()
+        try:
+            try:
+                response, will_close = self._exchange(connection, path, headers, body)
+            except _STALE_CONNECTION_ERRORS:
+                if not reused:
+                    raise
+                # 空闲连接可能已被服务端关闭，换一个新连接重发一次
+                connection.close()
+                connection = self._open()
+                response, will_close = self._exchange(connection, path, headers, body)
+        except BaseException:
+            connection.close()
+            raise
+
+        if will_close:
+            connection.close()
+        else:
+            self._release(connection)
+        return response
+
+    @staticmethod
+    def _exchange(
+        connection: http.client.HTTPConnection,
+        path: str,
+        headers: Dict[str, str],
+        body: bytes,
+    ) -> Tuple[HttpResponse, bool]:
+        connection.putrequest('POST', path, skip_host=True, skip_accept_encoding=True)
+        for key, value in headers.items():
+            connection.putheader(key, value)
+        connection.endheaders(body)
+        resp = connection.getresponse()
+        data = resp.read()
+        response = HttpResponse(resp.status, {k.lower(): v for k, v in resp.getheaders()}, data)
+        return response, resp.will_close
+
+    def _acquire(self) -> Tuple[http.client.HTTPConnection, bool]:
+        """取一个空闲连接，没有时新建
+
+        Returns:
+            (连接, 是否为复用的连接)
+        """
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._open(), False
+
+    def _open(self) -> http.client.HTTPConnection:
+        if self.secure:
+            connection: http.client.HTTPConnection = http.client.HTTPSConnection(
+                self.host, self.port, timeout=self.timeout, context=self._ssl
+            )
+        else:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        self.connections_opened += 1
+        return connection
+
+    def _release(self, connection: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if not self._closed and len(self._idle) < self.pool_size:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def close(self) -> None:
+        """关闭所有空闲连接"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
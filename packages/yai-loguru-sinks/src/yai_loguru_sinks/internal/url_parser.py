@@ -8,6 +8,45 @@ from typing import Any, Dict
 from urllib.parse import urlparse, parse_qs
 
 
+# 可选参数及其类型
+INT_PARAMS = {
+    'batch_size', 'queue_max_size', 'queue_max_bytes', 'staging_chunk_size',
+    'category_cache_size', 'max_in_flight', 'batch_max_bytes', 'record_max_bytes',
+    'max_retries', 'breaker_failure_threshold', 'spool_segment_bytes', 'spool_max_bytes',
+    'spool_replay_concurrency', 'compress_min_bytes', 'compress_sample_interval',
+    'encode_workers', 'hash_key_partitions', 'metrics_port',
+}
+FLOAT_PARAMS = {
+    'flush_interval', 'host_metadata_ttl', 'queue_block_timeout',
+    'linger_time', 'max_linger_time', 'timeout', 'retry_base_delay', 'retry_max_delay',
+    'retry_budget_ratio', 'breaker_reset_timeout', 'spool_max_age',
+    'compress_bandwidth', 'compress_cpu_budget', 'shutdown_timeout',
+    'collector_retry_interval',
+}
+BOOL_PARAMS = {
+    'compress', 'staging', 'deferred_enrichment', 'flatten_extra',
+    'adaptive_concurrency', 'ordered_delivery', 'adaptive_linger', 'circuit_breaker',
+    'native_encoder', 'native_transport', 'drain_on_exit',
+}
+LIST_PARAMS = {
+    'include_fields',
+}
+MAPPING_PARAMS = {
+    'field_rename', 'constant_fields',
+}
+STR_PARAMS = {
+    'access_key_id', 'access_key_secret', 'topic', 'source',
+    'queue_full_policy', 'queue_drop_level', 'extra_prefix', 'json_encoder',
+    'oversize_policy', 'breaker_fallback', 'spool_dir', 'compress_codec',
+    'hash_key_field', 'shutdown_priority_level', 'collector_socket', 'collector_ring',
+    'collector_ring_policy',
+    'metrics_host', 'metrics_socket',
+}
+OPTIONAL_PARAMS = (
+    INT_PARAMS | FLOAT_PARAMS | BOOL_PARAMS | LIST_PARAMS | MAPPING_PARAMS | STR_PARAMS
+)
+
+
 def resolve_sls_credentials(
     access_key_id: str | None = None,
     access_key_secret: str | None = None
@@ -64,6 +103,61 @@ def parse_sls_url(url: str) -> Dict[str, Any]:
         - batch_size: 批量发送大小，默认 100
         - flush_interval: 刷新间隔（秒），默认 5.0
         - compress: 是否压缩，默认 true
+        - host_metadata_ttl: 主机元数据刷新间隔（秒），默认 300
+        - queue_max_size / queue_max_bytes: 队列上限（记录数 / 估算字节数）
+        - queue_full_policy: 队列满时的背压策略，默认 drop_oldest
+        - queue_block_timeout: block 策略的最长等待时间（秒）
+        - queue_drop_level: drop_below_level 策略保留的最低级别
+        - staging: 是否启用分线程暂存缓冲，默认 false
+        - staging_chunk_size: 暂存缓冲整块移交的大小，默认 64
+        - deferred_enrichment: 是否把字段映射移到后台线程，默认 false
+        - include_fields: 写入的内置字段，逗号分隔
+        - field_rename: 字段重命名，如 message:msg,module:logger
+        - constant_fields: 常量字段，如 team:infra,cluster:hz-1
+        - flatten_extra: 是否把 extra 展开为独立字段，默认 false
+        - extra_prefix: 展开 extra 时的字段名前缀
+        - json_encoder: extra 的 JSON 编码器，auto / stdlib / orjson，默认 auto
+        - category_cache_size: 按调用点缓存分类结果的条目数，默认 4096
+        - batch_max_bytes: 每批最大估算字节数，默认 3MB
+        - record_max_bytes: 单条日志的最大估算字节数，默认 1MB
+        - oversize_policy: 超大日志的处理策略，truncate / split / drop，默认 truncate
+        - linger_time: 批次第一条记录到达后最多再等待的时间（秒），默认 0
+        - adaptive_linger: 是否根据到达速率自适应选择等待时间，默认 false
+        - max_linger_time: 自适应等待时间的上限（秒），默认 1.0
+        - max_in_flight: 同时在途的 PutLogs 请求数上限，默认 4
+        - adaptive_concurrency: 是否自适应调整在途请求数，默认 true
+        - ordered_delivery: 相同 hash_key 的批次是否按顺序发送，默认 false
+        - hash_key_field: 按该字段计算 hashKey 路由到 shard，同一取值的批次按顺序发送，默认不路由
+        - hash_key_partitions: 路由字段映射到的分区（hashKey）数，默认 16
+        - max_retries: 可重试错误的最大重试次数，默认 3
+        - timeout: 请求超时及批次允许重试的时长（秒），默认 30
+        - retry_base_delay / retry_max_delay: 重试退避的初始上限和最大值（秒），默认 0.5 / 10
+        - retry_budget_ratio: 重试请求最多占首次请求的比例，默认 0.2
+        - circuit_breaker: 是否在连续失败后熔断，默认 true
+        - breaker_failure_threshold: 连续失败多少次后熔断，默认 5
+        - breaker_reset_timeout: 熔断后多久发送探测批次（秒），默认 30
+        - breaker_fallback: 熔断期间的降级策略，drop / spool / sink，默认 drop
+        - spool_dir: 磁盘暂存目录，默认不启用
+        - spool_segment_bytes / spool_max_bytes: 段文件大小和暂存总大小上限，默认 16MB / 256MB
+        - spool_max_age: 暂存段文件的最长保留时间（秒），默认 3 天
+        - spool_replay_concurrency: 补发时并发发送的批次数，默认 2
+        - shutdown_timeout: 关闭时排空剩余日志的截止时间（秒），默认 10
+        - shutdown_priority_level: 关闭时优先发送的最低级别，默认 ERROR
+        - drain_on_exit: 进程退出时是否自动关闭并排空，默认 true
+        - native_encoder: 是否直接编码 LogGroup protobuf，默认 true
+        - compress_codec: 压缩方式，none / deflate / lz4 / zstd / auto，默认 lz4
+        - compress_min_bytes: 小于该字节数的请求体不压缩，默认 512
+        - compress_bandwidth / compress_cpu_budget: auto 模式使用的上行带宽（MB/秒）和压缩 CPU 预算（核数），默认 10 / 0.5
+        - compress_sample_interval: auto 模式重新采样的批次间隔，默认 100
+        - encode_workers: 编码和压缩使用的进程数，默认 0（在发送线程中完成）
+        - native_transport: 是否使用内置的 keep-alive HTTP 传输，默认 false
+        - collector_socket: 本机采集进程的 Unix socket 路径，配置后批次交给采集进程上传，默认不启用
+        - collector_ring: 采集进程共享内存环形缓冲区的文件路径，配置后代替 collector_socket，默认不启用
+        - collector_ring_policy: 共享内存缓冲区满时的策略：block（等待最长 timeout 秒）/ drop_newest（不等待，直接上传），默认 block
+        - collector_retry_interval: 连接采集进程失败后多久（秒）再尝试，期间直接上传，默认 5
+        - metrics_port: 以 Prometheus 文本格式导出指标的本机端口，默认 0（不导出）
+        - metrics_host: 指标导出监听的地址，默认 127.0.0.1
+        - metrics_socket: 指标导出监听的 Unix socket 路径，优先于 metrics_port，默认不启用
     
     Args:
         url: SLS URL 字符串
@@ -104,22 +198,33 @@ def parse_sls_url(url: str) -> Dict[str, Any]:
     }
     
     # 提取可选参数
-    optional_params = [
-        'access_key_id', 'access_key_secret', 'topic', 'source',
-        'batch_size', 'flush_interval', 'compress'
-    ]
-    
-    for param in optional_params:
+    for param in OPTIONAL_PARAMS:
         if param in query_params:
-            raw_value = query_params[param][0]
-            # 类型转换
-            if param in ['batch_size']:
-                config[param] = int(raw_value)
-            elif param in ['flush_interval']:
-                config[param] = float(raw_value)
-            elif param in ['compress']:
-                config[param] = raw_value.lower() in ('true', '1', 'yes')
-            else:
-                config[param] = raw_value
-    
-    return config
\ No newline at end of file
+            config[param] = _convert_param(param, query_params[param][0])
+    
+    return config
+
+
+def _convert_param(param: str, raw_value: str) -> Any:
+    """按参数类型转换 URL 查询参数"""
+    if param in INT_PARAMS:
+        return int(raw_value)
+    if param in FLOAT_PARAMS:
+        return float(raw_value)
+    if param in BOOL_PARAMS:
+        return raw_value.lower() in ('true', '1', 'yes')
+    if param in LIST_PARAMS:
+        # 逗号分隔，如 include_fields=level,message,module
+        return [item.strip() for item in raw_value.split(',') if item.strip()]
+    if param in MAPPING_PARAMS:
+        # 逗号分隔的 key:value，如 field_rename=message:msg,module:logger
+        mapping = {}
+        for pair in raw_value.split(','):
+            if not pair.strip():
+                continue
+            if ':' not in pair:
+                raise ValueError(f"SLS URL 参数 {param} 格式错误，应为 key:value 列表: {pair}")
+            key, value = pair.split(':', 1)
+            mapping[key.strip()] = value.strip()
+        return mapping
+    return raw_value
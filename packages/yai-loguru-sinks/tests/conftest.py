@@ -33,7 +33,7 @@ def mock_loguru_record():
     """模拟loguru日志记录"""
     return {
         'time': SimpleNamespace(timestamp=lambda: time.time()),
-        'level': SimpleNamespace(name='INFO'),
+        'level': SimpleNamespace(name='INFO', no=20),
         'message': '测试日志消息',
         'name': 'test_module',
         'function': 'test_function',
@@ -61,6 +61,8 @@ def mock_aliyun_sdk():
     """模拟阿里云SDK"""
     with patch('yai_loguru_sinks.internal.core.HAS_ALIYUN_SDK', True):
         mock_client = MagicMock()
+        # LogGroup 编码器直接调用底层发送方法，返回 (响应体, 响应头)
+        mock_client._send.return_value = ({}, {})
         mock_log_item = MagicMock()
         mock_put_logs_request = MagicMock()
         
@@ -0,0 +1,416 @@
+"""测试 asyncio 版本的 SLS Sink 和传输
+
+使用本地的 asyncio HTTP 服务代替 SLS 服务端。
+"""
+
+import asyncio
+import json
+import socket
+import threading
+
+import pytest
+from loguru import logger
+
+from aliyun.log.auth import AuthV1
+from aliyun.log.compress import CompressType, Compressor
+from aliyun.log.credentials import StaticCredentialsProvider
+from aliyun.log.log_logs_pb2 import LogGroup
+from aliyun.log.logexception import LogException
+from aliyun.log.util import Util
+
+from yai_loguru_sinks.internal.aio_sink import AsyncSlsSink
+from yai_loguru_sinks.internal.aio_transport import AsyncPutLogsTransport
+from yai_loguru_sinks.internal.data import SlsConfig
+
+
+ACCESS_KEY_ID = "test-key"
+ACCESS_KEY_SECRET = "test-secret"
+
+
+class StandInServer:
+    """按脚本返回响应的本地 PutLogs 服务"""
+
+    def __init__(self, responses=None):
+        # 每个元素为 (状态码, JSON 响应体或 None)，用完后返回 200
+        self.responses = list(responses or [])
+        self.requests = []
+        self.connections = 0
+        self.server = None
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.server.close()
+        await self.server.wait_closed()
+
+    @property
+    def endpoint(self):
+        return f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode().split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line == b'\r\n':
+                        break
+                    key, _, value = line.decode().partition(':')
+                    headers[key.strip()] = value.strip()
+                body = await reader.readexactly(int(headers['Content-Length']))
+                self.requests.append((method, path, headers, body))
+
+                status, payload = self.responses.pop(0) if self.responses else (200, None)
+                data = json.dumps(payload).encode() if payload is not None else b''
+                writer.write(
+                    f'HTTP/1.1 {status} X\r\nx-log-requestid: req-{len(self.requests)}\r\n'
+                    f'Content-Length: {len(data)}\r\n\r\n'.encode() + data
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def expected_signature(method, path, headers):
+    """按 SLS 的规则在服务端重新计算签名"""
+    resource, _, query = path.partition('?')
+    params = dict(item.split('=', 1) for item in query.split('&')) if query else {}
+    lower = {key.lower(): value for key, value in headers.items()}
+    content = (
+        method + '\n' + lower.get('content-md5', '') + '\n' + lower.get('content-type', '') + '\n'
+        + lower['date'] + '\n'
+        # x-log-date 由 SDK 在签名之后添加，不参与签名
+        + Util.canonicalized_log_headers(
+            {k: v for k, v in headers.items() if k.startswith('x-') and k != 'x-log-date'}
+        )
+        + Util.canonicalized_resource(resource, params)
+    )
+    return 'LOG ' + ACCESS_KEY_ID + ':' + Util.hmac_sha1(content, ACCESS_KEY_SECRET)
+
+
+def decode_body(headers, body):
+    """解压并解析请求体"""
+    raw_size = int(headers['x-log-bodyrawsize'])
+    if headers.get('x-log-compresstype') == 'lz4':
+        body = Compressor.decompress(body, raw_size, CompressType.LZ4)
+    group = LogGroup()
+    group.ParseFromString(body)
+    return group
+
+
+def make_config(endpoint, **kwargs):
+    return SlsConfig(
+        endpoint=endpoint,
+        access_key_id=ACCESS_KEY_ID,
+        access_key_secret=ACCESS_KEY_SECRET,
+        project="proj",
+        logstore="store",
+        host_metadata_ttl=0,
+        **kwargs,
+    )
+
+
+def make_transport(endpoint, **kwargs):
+    auth = AuthV1(StaticCredentialsProvider(ACCESS_KEY_ID, ACCESS_KEY_SECRET, None))
+    return AsyncPutLogsTransport(endpoint, "proj", "store", auth, **kwargs)
+
+
+class TestAsyncPutLogsTransport:
+    """测试 AsyncPutLogsTransport"""
+
+    @pytest.mark.unit
+    def test_signed_requests_reuse_connection(self):
+        """测试请求签名正确、按 hash key 路由，并复用 keep-alive 连接"""
+        async def scenario():
+            async with StandInServer() as server:
+                transport = make_transport(server.endpoint)
+                await transport.post(3, None, b'abc')
+                response = await transport.post(3, 'lz4', b'xyz', hash_key='a1b2')
+                await transport.aclose()
+                return server, response
+
+        server, response = asyncio.run(scenario())
+
+        assert server.connections == 1
+        assert response.headers['x-log-requestid'] == 'req-2'
+        (_, path1, headers1, body1), (method, path2, headers2, body2) = server.requests
+        assert path1 == '/logstores/store/shards/lb'
+        assert path2 == '/logstores/store/shards/route?key=a1b2'
+        assert headers2['x-log-compresstype'] == 'lz4'
+        assert headers2['x-log-bodyrawsize'] == '3'
+        assert headers2['Content-MD5'] == Util.cal_md5(b'xyz')
+        assert headers2['Authorization'] == expected_signature(method, path2, headers2)
+        assert headers1['Authorization'] == expected_signature('POST', path1, headers1)
+
+    @pytest.mark.unit
+    def test_error_response_raises_log_exception(self):
+        """测试错误响应转换为与 SDK 相同的 LogException"""
+        async def scenario():
+            responses = [
+                (401, {'errorCode': 'Unauthorized', 'errorMessage': 'bad key'}),
+                (502, None),
+            ]
+            async with StandInServer(responses) as server:
+                transport = make_transport(server.endpoint)
+                errors = []
+                for _ in range(2):
+                    try:
+                        await transport.post(1, None, b'x')
+                    except LogException as e:
+                        errors.append(e)
+                await transport.aclose()
+                return errors
+
+        unauthorized, bad_gateway = asyncio.run(scenario())
+        assert unauthorized.get_error_code() == 'Unauthorized'
+        assert unauthorized.resp_status == 401
+        assert bad_gateway.get_error_code() == 'LogRequestError'
+        assert bad_gateway.resp_status == 502
+
+    @pytest.mark.unit
+    def test_connection_refused(self):
+        """测试无法连接时抛出 LogRequestError"""
+        async def scenario():
+            async with StandInServer() as server:
+                endpoint = server.endpoint
+            transport = make_transport(endpoint, timeout=2.0)
+            with pytest.raises(LogException) as excinfo:
+                await transport.post(1, None, b'x')
+            return excinfo.value
+
+        assert asyncio.run(scenario()).get_error_code() == 'LogRequestError'
+
+
+class TestAsyncSlsSink:
+    """测试 AsyncSlsSink"""
+
+    @pytest.mark.unit
+    def test_batches_on_loop_and_flushes(self):
+        """测试同一轮事件循环中的记录合为一批，aflush 等待上传完成"""
+        async def scenario():
+            async with StandInServer() as server:
+                sink = AsyncSlsSink(make_config(server.endpoint))
+                handler_id = logger.add(sink, format="{message}")
+                try:
+                    for i in range(5):
+                        logger.info("请求 {} 完成", i)
+                    await logger.complete()
+                    await sink.aflush()
+                finally:
+                    logger.remove(handler_id)
+                    await sink.aclose()
+                return sink, server
+
+        sink, server = asyncio.run(scenario())
+
+        assert len(server.requests) == 1
+        _, path, headers, body = server.requests[0]
+        group = decode_body(headers, body)
+        messages = [dict((c.Key, c.Value) for c in log.Contents)['message'] for log in group.Logs]
+        assert messages == [f"请求 {i} 完成" for i in range(5)]
+        assert group.Topic == "python-app"
+        assert group.LogTags[0].Key == '__pack_id__'
+        assert sink.sent_batches == 1
+
+    @pytest.mark.unit
+    def test_batch_size_seals_immediately(self):
+        """测试达到 batch_size 时立即封批"""
+        async def scenario():
+            async with StandInServer() as server:
+                sink = AsyncSlsSink(make_config(server.endpoint, batch_size=2, linger_time=60.0))
+                handler_id = logger.add(sink, format="{message}")
+                try:
+                    for i in range(5):
+                        logger.info("message {}", i)
+                    await logger.complete()
+                    assert sink.pending_logs == 1
+                    await sink.aclose()
+                finally:
+                    logger.remove(handler_id)
+                return server
+
+        server = asyncio.run(scenario())
+        assert sorted(len(decode_body(h, b).Logs) for _, _, h, b in server.requests) == [1, 2, 2]
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('schema', [
+        {'include_fields': ['level', 'module']},
+        {'field_rename': {'message': 'msg'}},
+    ])
+    def test_schema_without_message_field(self, schema):
+        """测试字段配置中没有 message 时仍能估算大小并发送"""
+        async def scenario():
+            async with StandInServer() as server:
+                sink = AsyncSlsSink(make_config(server.endpoint, **schema))
+                handler_id = logger.add(sink, format="{message}")
+                try:
+                    logger.info("没有 message 字段")
+                    await logger.complete()
+                    assert sink.pending_logs == 1
+                    assert sink._pending_bytes > 0
+                    await sink.aclose()
+                finally:
+                    logger.remove(handler_id)
+                return server
+
+        server = asyncio.run(scenario())
+        assert len(server.requests) == 1
+        _, _, headers, body = server.requests[0]
+        keys = {c.Key for c in decode_body(headers, body).Logs[0].Contents}
+        assert 'message' not in keys
+
+    @pytest.mark.unit
+    def test_buffered_records_are_capped(self):
+        """测试未上传完成的记录达到 queue_max_size 时丢弃新记录并计数"""
+        async def scenario():
+            async with StandInServer() as server:
+                sink = AsyncSlsSink(make_config(server.endpoint, batch_size=2, queue_max_size=5))
+                handler_id = logger.add(sink, format="{message}")
+                try:
+                    for i in range(10):
+                        logger.info("message {}", i)
+                    await logger.complete()
+                    assert sink.buffered_logs == 5
+                    await sink.aclose()
+                finally:
+                    logger.remove(handler_id)
+                return sink, server
+
+        sink, server = asyncio.run(scenario())
+        assert sink.dropped == 5
+        assert sink.dropped_bytes > 0
+        assert sink.buffered_logs == 0
+        assert sum(len(decode_body(h, b).Logs) for _, _, h, b in server.requests) == 5
+
+    @pytest.mark.unit
+    def test_encoding_runs_off_loop(self):
+        """测试编码和签名不在事件循环线程上执行"""
+        threads = []
+
+        async def scenario():
+            async with StandInServer() as server:
+                sink = AsyncSlsSink(make_config(server.endpoint))
+                prepare = sink.transport.prepare
+
+                def recording_prepare(*args, **kwargs):
+                    threads.append(threading.get_ident())
+                    return prepare(*args, **kwargs)
+
+                sink.transport.prepare = recording_prepare
+                handler_id = logger.add(sink, format="{message}")
+                logger.info("hello")
+                await logger.complete()
+                logger.remove(handler_id)
+                await sink.aclose()
+                return threading.get_ident()
+
+        loop_thread = asyncio.run(scenario())
+        assert threads and loop_thread not in threads
+
+    @pytest.mark.unit
+    def test_retries_retryable_errors(self):
+        """测试服务端 5xx 时退避后重新签名重试"""
+        async def scenario():
+            responses = [(503, {'errorCode': 'ServerBusy', 'errorMessage': 'busy'})]
+            async with StandInServer(responses) as server:
+                sink = AsyncSlsSink(make_config(
+                    server.endpoint, retry_base_delay=0.01, retry_max_delay=0.01,
+                ))
+                handler_id = logger.add(sink, format="{message}")
+                logger.info("hello")
+                await logger.complete()
+                logger.remove(handler_id)
+                await sink.aclose()
+                return sink, server
+
+        sink, server = asyncio.run(scenario())
+        assert len(server.requests) == 2
+        assert sink.sent_batches == 1
+        assert sink.failed_batches == 0
+
+    @pytest.mark.unit
+    def test_stats(self):
+        """测试 stats() 记录写入、发送、重试、丢弃和请求耗时"""
+        async def scenario():
+            responses = [(503, {'errorCode': 'ServerBusy', 'errorMessage': 'busy'})]
+            async with StandInServer(responses) as server:
+                sink = AsyncSlsSink(make_config(
+                    server.endpoint, batch_size=2, queue_max_size=3,
+                    retry_base_delay=0.01, retry_max_delay=0.01,
+                ))
+                handler_id = logger.add(sink, format="{message}")
+                try:
+                    for i in range(5):
+                        logger.info("message {}", i)
+                    await logger.complete()
+                    assert sink.stats()['queue_depth_records'] == 3
+                    await sink.aclose()
+                finally:
+                    logger.remove(handler_id)
+                return sink
+
+        sink = asyncio.run(scenario())
+        stats = sink.stats()
+        assert stats['enqueued_records'] == 5
+        assert stats['sent_records'] == 3
+        assert stats['sent_bytes'] > 0
+        assert stats['retried_records'] == 2
+        assert stats['dropped_records'] == 2
+        assert stats['dropped_records'] == sink.dropped
+        assert stats['queue_depth_records'] == 0
+        assert stats['in_flight_requests'] == 0
+        assert stats['retry_waiting_batches'] == 0
+        assert stats['request_duration_seconds']['count'] == 3
+        assert 'fallback' in stats and 'compression' in stats
+
+    @pytest.mark.unit
+    @pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="需要 Unix socket")
+    def test_exports_metrics(self, tmp_path):
+        """测试配置 metrics_socket 后导出 Prometheus 指标，aclose 时停止导出"""
+        path = str(tmp_path / "metrics.sock")
+
+        async def scenario():
+            sink = AsyncSlsSink(make_config("http://127.0.0.1:1", metrics_socket=path))
+            assert sink.metrics_exporter is not None
+            text = sink.render_metrics()
+            await sink.aclose()
+            return sink, text
+
+        sink, text = asyncio.run(scenario())
+        assert 'yai_sls_enqueued_records_total{project="proj",logstore="store"} 0' in text
+        assert sink.metrics_exporter is None
+        assert not (tmp_path / "metrics.sock").exists()
+
+    @pytest.mark.unit
+    def test_non_retryable_error_is_not_retried(self, capsys):
+        """测试鉴权失败不重试"""
+        async def scenario():
+            responses = [(401, {'errorCode': 'Unauthorized', 'errorMessage': 'bad key'})]
+            async with StandInServer(responses) as server:
+                sink = AsyncSlsSink(make_config(server.endpoint))
+                handler_id = logger.add(sink, format="{message}")
+                logger.info("hello")
+                await logger.complete()
+                logger.remove(handler_id)
+                await sink.aclose()
+                return sink, server
+
+        sink, server = asyncio.run(scenario())
+        assert len(server.requests) == 1
+        assert sink.failed_batches == 1
+        assert "SLS消息发送错误" in capsys.readouterr().out
+
+    @pytest.mark.unit
+    def test_spool_fallback_not_supported(self):
+        """测试不支持磁盘暂存降级"""
+        with pytest.raises(ValueError):
+            AsyncSlsSink(make_config("http://127.0.0.1:1", breaker_fallback='spool'))
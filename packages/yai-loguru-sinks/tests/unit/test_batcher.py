@@ -0,0 +1,140 @@
+"""测试按字节大小组批"""
+
+import pytest
+
+from yai_loguru_sinks.internal.batcher import (
+    SLS_MAX_LOGS_PER_REQUEST,
+    SLS_MAX_REQUEST_BYTES,
+    SPLIT_PART_KEY,
+    LogBatcher,
+    estimate_contents_size,
+    truncate_utf8,
+    utf8_len,
+)
+
+
+def to_contents(log_data):
+    """测试用的字段转换：除 timestamp 外的字段按原样输出"""
+    return [(key, str(value)) for key, value in log_data.items() if key != 'timestamp']
+
+
+def log(message, **fields):
+    """创建日志数据"""
+    return {'timestamp': 1700000000.9, 'message': message, **fields}
+
+
+class TestSizeHelpers:
+    """测试大小估算辅助函数"""
+
+    @pytest.mark.unit
+    def test_utf8_len_and_truncate(self):
+        """测试 UTF-8 字节数和截断"""
+        assert utf8_len('abc') == 3
+        assert utf8_len('日志') == 6
+        assert truncate_utf8('日志abc', 4) == '日'
+        assert truncate_utf8('abc', 10) == 'abc'
+
+    @pytest.mark.unit
+    def test_estimate_contents_size(self):
+        """测试估算值随内容增长"""
+        small = estimate_contents_size([('message', 'a')])
+        large = estimate_contents_size([('message', 'a' * 1001)])
+        assert large - small == 1000
+
+
+class TestLogBatcher:
+    """测试 LogBatcher"""
+
+    @pytest.mark.unit
+    def test_seal_by_count(self):
+        """测试达到记录数上限时封批"""
+        batcher = LogBatcher(to_contents, max_logs=3)
+
+        sealed = []
+        for i in range(7):
+            sealed.extend(batcher.add(log(f"m{i}")))
+
+        assert [len(batch.logs) for batch in sealed] == [3, 3]
+        assert batcher.pending_logs == 1
+        last = batcher.flush()
+        assert last.logs == [(1700000000, [('message', 'm6')])]
+        assert batcher.flush() is None
+
+    @pytest.mark.unit
+    def test_seal_by_bytes(self):
+        """测试达到字节预算时封批，且批次不超过预算"""
+        batcher = LogBatcher(to_contents, max_logs=1000, max_bytes=4096)
+
+        sealed = []
+        for i in range(20):
+            sealed.extend(batcher.add(log('x' * 1000)))
+        sealed.append(batcher.flush())
+
+        assert sum(len(batch.logs) for batch in sealed) == 20
+        assert all(batch.nbytes <= 4096 for batch in sealed)
+        assert len(sealed) > 1
+
+    @pytest.mark.unit
+    def test_limits_are_capped(self):
+        """测试配置值不超过 SLS 的请求限制"""
+        batcher = LogBatcher(to_contents, max_logs=100000, max_bytes=100 * 1024 * 1024)
+
+        assert batcher.max_logs == SLS_MAX_LOGS_PER_REQUEST
+        assert batcher.max_bytes == SLS_MAX_REQUEST_BYTES
+
+    @pytest.mark.unit
+    def test_oversize_truncate(self):
+        """测试截断超大记录"""
+        batcher = LogBatcher(to_contents, max_bytes=4096, record_max_bytes=1024)
+
+        batcher.add(log('日' * 2000, module='app'))
+        batch = batcher.flush()
+
+        contents = dict(batch.logs[0][1])
+        assert contents['module'] == 'app'
+        assert contents['message'].startswith('日')
+        assert 'truncated' in contents['message']
+        assert estimate_contents_size(batch.logs[0][1]) <= 1024
+        assert batcher.truncated == 1
+
+    @pytest.mark.unit
+    def test_oversize_split(self):
+        """测试把超大字段切分到多条日志"""
+        batcher = LogBatcher(
+            to_contents, max_bytes=4096, record_max_bytes=1024, oversize_policy='split'
+        )
+        message = ''.join(chr(0x4e00 + i % 100) for i in range(1500))
+
+        batches = batcher.add(log(message, module='app')) + [batcher.flush()]
+        logs = [entry for batch in batches for entry in batch.logs]
+
+        assert len(logs) > 1
+        parts = [dict(contents) for _, contents in logs]
+        assert ''.join(part['message'] for part in parts) == message
+        assert [part[SPLIT_PART_KEY] for part in parts] == [
+            f"{i}/{len(parts)}" for i in range(1, len(parts) + 1)
+        ]
+        assert all(part['module'] == 'app' for part in parts)
+        assert all(estimate_contents_size(contents) <= 1024 for _, contents in logs)
+        assert batcher.split == 1
+
+    @pytest.mark.unit
+    def test_oversize_drop(self):
+        """测试丢弃超大记录，不影响同批的其他记录"""
+        batcher = LogBatcher(
+            to_contents, max_bytes=4096, record_max_bytes=1024, oversize_policy='drop'
+        )
+
+        batcher.add(log('ok'))
+        batcher.add(log('x' * 5000))
+        batcher.add(log('ok2'))
+
+        assert [dict(c)['message'] for _, c in batcher.flush().logs] == ['ok', 'ok2']
+        assert batcher.dropped == 1
+        assert batcher.dropped_bytes > 5000
+
+    @pytest.mark.unit
+    def test_unknown_policy(self):
+        """测试未知的超大记录处理策略"""
+        with pytest.raises(ValueError, match="未知的超大记录处理策略"):
+            LogBatcher(to_contents, oversize_policy='ignore')
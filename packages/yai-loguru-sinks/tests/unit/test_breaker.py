@@ -0,0 +1,161 @@
+"""测试 SLS 客户端熔断器"""
+
+import pytest
+import threading
+
+from aliyun.log.logexception import LogException
+
+from yai_loguru_sinks.internal.breaker import (
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    BatchFallback,
+    CircuitBreaker,
+)
+from yai_loguru_sinks.internal.data import LogBatch
+from yai_loguru_sinks.internal.sender import AdaptiveConcurrencyLimiter, BatchSender
+
+
+class TestCircuitBreaker:
+    """测试 CircuitBreaker"""
+
+    @pytest.mark.unit
+    def test_opens_after_consecutive_failures(self):
+        """测试连续失败达到阈值后打开，成功会重置计数"""
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10.0)
+        breaker.record_failure(now=0.0)
+        breaker.record_failure(now=0.0)
+        breaker.record_success()
+        breaker.record_failure(now=0.0)
+        breaker.record_failure(now=0.0)
+        assert breaker.state == STATE_CLOSED
+
+        breaker.record_failure(now=1.0)
+        assert breaker.state == STATE_OPEN
+        assert not breaker.allow_request(now=5.0)
+        assert breaker.rejected == 1
+
+    @pytest.mark.unit
+    def test_half_open_probe_closes(self):
+        """测试 reset_timeout 后只放行一个探测批次，探测成功后关闭"""
+        changes = []
+        breaker = CircuitBreaker(
+            failure_threshold=1, reset_timeout=10.0,
+            on_state_change=lambda old, new: changes.append((old, new)),
+        )
+        breaker.record_failure(now=0.0)
+
+        assert breaker.allow_request(now=10.0)
+        assert breaker.state == STATE_HALF_OPEN
+        assert not breaker.allow_request(now=10.0)
+
+        breaker.record_success()
+        assert breaker.state == STATE_CLOSED
+        assert breaker.allow_request(now=10.0)
+        assert changes == [
+            (STATE_CLOSED, STATE_OPEN),
+            (STATE_OPEN, STATE_HALF_OPEN),
+            (STATE_HALF_OPEN, STATE_CLOSED),
+        ]
+        metrics = breaker.metrics()
+        assert metrics['opened'] == 1
+        assert metrics['half_opened'] == 1
+        assert metrics['closed'] == 1
+        assert metrics['rejected'] == 1
+
+    @pytest.mark.unit
+    def test_half_open_probe_failure_reopens(self):
+        """测试探测失败后重新打开并重新计时"""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10.0)
+        breaker.record_failure(now=0.0)
+        assert breaker.allow_request(now=10.0)
+        breaker.record_failure(now=10.0)
+
+        assert breaker.state == STATE_OPEN
+        assert not breaker.allow_request(now=15.0)
+        assert breaker.allow_request(now=20.0)
+        assert breaker.metrics()['opened'] == 2
+
+    @pytest.mark.unit
+    def test_record_error_classifies(self):
+        """测试鉴权等不可重试错误说明服务端可达，不计为失败"""
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_error(LogException('Unauthorized', 'bad key', resp_status=401))
+        breaker.record_error(LogException('Unauthorized', 'bad key', resp_status=401))
+        assert breaker.state == STATE_CLOSED
+
+        breaker.record_error(LogException('LogRequestError', 'connection refused'))
+        breaker.record_error(ConnectionError("refused"))
+        assert breaker.state == STATE_OPEN
+
+
+class TestBatchFallback:
+    """测试熔断期间的降级处理"""
+
+    @pytest.mark.unit
+    def test_drop_with_accounting(self):
+        """测试丢弃策略计数"""
+        fallback = BatchFallback()
+        fallback(LogBatch([(0, []), (0, [])]))
+        assert fallback.metrics() == {
+            'dropped_batches': 1, 'dropped_logs': 2, 'forwarded_batches': 0,
+            'spooled_batches': 0,
+        }
+
+    @pytest.mark.unit
+    def test_secondary_sink(self):
+        """测试交给备用 sink，备用 sink 失败时按丢弃计数"""
+        received = []
+        fallback = BatchFallback('sink', sink=received.append)
+        batch = LogBatch([(0, [])])
+        fallback(batch)
+        assert received == [batch]
+        assert fallback.forwarded_batches == 1
+
+        def broken(batch):
+            raise IOError("disk full")
+
+        fallback = BatchFallback('sink', sink=broken)
+        fallback(batch)
+        assert fallback.dropped_batches == 1
+
+    @pytest.mark.unit
+    def test_invalid_policy(self):
+        """测试无效策略"""
+        with pytest.raises(ValueError):
+            BatchFallback('bogus')
+        with pytest.raises(ValueError):
+            BatchFallback('sink')
+
+
+class TestSenderWithBreaker:
+    """测试 BatchSender 与熔断器的配合"""
+
+    @pytest.mark.unit
+    def test_open_breaker_skips_requests(self):
+        """测试熔断打开后批次不再发送，直接降级"""
+        calls = []
+        lock = threading.Lock()
+
+        def send(batch):
+            with lock:
+                calls.append(batch)
+            raise LogException('LogRequestError', 'connection timed out')
+
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60.0)
+        fallback = BatchFallback()
+        sender = BatchSender(
+            send,
+            AdaptiveConcurrencyLimiter(max_limit=1, adaptive=False),
+            on_error=lambda batch, e: None,
+            breaker=breaker,
+            fallback=fallback,
+        )
+        for i in range(5):
+            sender.submit(LogBatch([(0, i)]))
+
+        assert sender.close(timeout=5.0)
+        assert len(calls) == 2
+        assert breaker.state == STATE_OPEN
+        assert fallback.dropped_batches == 3
+        assert sender.limiter.in_flight == 0
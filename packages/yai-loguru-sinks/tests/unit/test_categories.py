@@ -0,0 +1,129 @@
+"""测试日志分类规则引擎"""
+
+import pytest
+from types import SimpleNamespace
+
+from yai_loguru_sinks.internal.categories import (
+    DEFAULT_CATEGORY_RULES,
+    CategoryMatcher,
+    CategoryRule,
+)
+from yai_loguru_sinks.internal.data import SlsConfig
+
+
+def make_record(name='app.main', level='INFO', message='hello', extra=None,
+                function='handle', line=10):
+    """创建 loguru 风格的记录"""
+    return {
+        'name': name,
+        'function': function,
+        'line': line,
+        'level': SimpleNamespace(name=level, no=20),
+        'message': message,
+        'extra': extra or {},
+    }
+
+
+class TestCategoryRule:
+    """测试单条规则"""
+
+    @pytest.mark.unit
+    def test_from_dict_normalizes_values(self):
+        """测试字符串和列表条件都能被接受"""
+        rule = CategoryRule.from_dict({
+            'category': 'db',
+            'module_prefix': 'app.db',
+            'levels': ['warning', 'ERROR'],
+            'extra_keys': 'sql',
+        })
+
+        assert rule.module_prefix == ('app.db',)
+        assert rule.levels == frozenset({'WARNING', 'ERROR'})
+        assert rule.extra_keys == ('sql',)
+        assert rule.is_dynamic
+
+    @pytest.mark.unit
+    def test_invalid_rules(self):
+        """测试无效规则"""
+        with pytest.raises(ValueError, match="未知的分类规则字段"):
+            CategoryRule.from_dict({'category': 'x', 'module': 'app'})
+        with pytest.raises(ValueError, match="缺少 category"):
+            CategoryRule.from_dict({'levels': ['ERROR']})
+        with pytest.raises(ValueError, match="正则无效"):
+            CategoryRule.from_dict({'category': 'x', 'message_regex': '('})
+
+
+class TestCategoryMatcher:
+    """测试编译后的匹配器"""
+
+    @pytest.mark.unit
+    def test_default_rules(self):
+        """测试默认规则与旧的硬编码分类一致"""
+        matcher = CategoryMatcher(DEFAULT_CATEGORY_RULES, 'application')
+
+        assert matcher(make_record(level='ERROR')) == 'error'
+        assert matcher(make_record(message='Unhandled Exception in worker')) == 'error'
+        assert matcher(make_record(name='shop.API.views')) == 'api'
+        assert matcher(make_record(name='business.order')) == 'business'
+        assert matcher(make_record()) == 'application'
+
+    @pytest.mark.unit
+    def test_first_match_wins_and_conditions_are_anded(self):
+        """测试规则按顺序匹配，条件之间是与关系"""
+        matcher = CategoryMatcher([
+            {'category': 'slow-sql', 'module_prefix': 'app.db', 'levels': ['WARNING'],
+             'message_regex': r'took \d+ms'},
+            {'category': 'db', 'module_prefix': ('app.db', 'app.cache')},
+            {'category': 'payment', 'extra_keys': ['order_id', 'amount']},
+        ], 'application')
+
+        assert matcher(make_record('app.db.pool', 'WARNING', 'query took 120ms')) == 'slow-sql'
+        assert matcher(make_record('app.db.pool', 'INFO', 'query took 120ms')) == 'db'
+        assert matcher(make_record('app.cache', 'WARNING', 'miss')) == 'db'
+        assert matcher(make_record(extra={'extra': {'order_id': 1, 'amount': 2}})) == 'payment'
+        assert matcher(make_record(extra={'order_id': 1, 'extra': {'amount': 2}})) == 'payment'
+        assert matcher(make_record(extra={'extra': {'order_id': 1}})) == 'application'
+
+    @pytest.mark.unit
+    def test_call_site_memoization(self):
+        """测试同一调用点只解析一次规则"""
+        matcher = CategoryMatcher([{'category': 'api', 'module_prefix': 'api'}], 'application')
+
+        for _ in range(100):
+            assert matcher(make_record('api.user', line=5)) == 'api'
+        matcher(make_record('api.user', line=6))
+
+        info = matcher.cache_info()
+        assert info.misses == 2
+        assert info.hits == 99
+
+    @pytest.mark.unit
+    def test_dynamic_rules_evaluated_per_record(self):
+        """测试依赖消息的规则在缓存命中后仍按记录检查"""
+        matcher = CategoryMatcher([{'category': 'audit', 'message_regex': '^AUDIT'}], 'application')
+
+        assert matcher(make_record(message='AUDIT login')) == 'audit'
+        assert matcher(make_record(message='plain login')) == 'application'
+        assert matcher.cache_info().hits == 1
+
+    @pytest.mark.unit
+    def test_cache_disabled(self):
+        """测试关闭调用点缓存"""
+        matcher = CategoryMatcher(DEFAULT_CATEGORY_RULES, 'application', cache_size=0)
+
+        assert matcher(make_record(level='ERROR')) == 'error'
+        assert matcher.cache_info() is None
+
+    @pytest.mark.unit
+    def test_from_config(self):
+        """测试从配置创建匹配器，自定义规则替换内置规则"""
+        config = SlsConfig(
+            endpoint='e', access_key_id='k', access_key_secret='s',
+            project='p', logstore='l',
+            category_rules=[{'category': 'db', 'module_prefix': 'app.db'}],
+        )
+
+        matcher = CategoryMatcher.from_config(config)
+
+        assert matcher(make_record('app.db')) == 'db'
+        assert matcher(make_record(level='ERROR')) == 'application'
@@ -0,0 +1,265 @@
+"""测试本机采集进程"""
+
+import os
+import socket
+import time
+
+import pytest
+from loguru import logger
+
+from aliyun.log.log_logs_pb2 import LogGroup
+
+from yai_loguru_sinks.internal import shm_ring
+from yai_loguru_sinks.internal.async_handler import AsyncHandler
+from yai_loguru_sinks.internal.collector import FRAME_HEADER, CollectorClient, encode_frame
+from yai_loguru_sinks.internal.collector_server import CollectorServer, CollectorSink
+from yai_loguru_sinks.internal.core import SlsSink
+from yai_loguru_sinks.internal.data import LogBatch, SlsConfig
+from yai_loguru_sinks.internal.spool import decode_batch
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="需要 Unix socket")
+
+
+def make_config(**kwargs):
+    kwargs.setdefault('compress_codec', 'none')
+    kwargs.setdefault('host_metadata_ttl', 0)
+    kwargs.setdefault('flush_interval', 0.05)
+    return SlsConfig(
+        endpoint="cn-hangzhou.log.aliyuncs.com",
+        access_key_id="test-access-key",
+        access_key_secret="test-access-secret",
+        project="test-project",
+        logstore="test-logstore",
+        **kwargs,
+    )
+
+
+def received_requests(client):
+    """按请求解析 mock 客户端收到的 (日志库, Topic, 消息列表)"""
+    requests = []
+    for call in client._send.call_args_list:
+        _, _, body, resource, _, _ = call.args
+        group = LogGroup()
+        group.ParseFromString(body)
+        messages = [dict((c.Key, c.Value) for c in log.Contents)['message'] for log in group.Logs]
+        requests.append((resource.split('/')[2], group.Topic, messages))
+    return requests
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return str(tmp_path / "collector.sock")
+
+
+class TestFrames:
+    """测试线路格式"""
+
+    @pytest.mark.unit
+    def test_frame_names_destination(self):
+        """测试帧总是带有写入目标，未路由的批次使用 worker 的日志库和 Topic"""
+        frame = encode_frame(LogBatch([(1, [('message', 'a')])], hash_key='k'), 'app-log', 'web')
+        (length,) = FRAME_HEADER.unpack(frame[:FRAME_HEADER.size])
+        batch = decode_batch(frame[FRAME_HEADER.size:])
+        assert length == len(frame) - FRAME_HEADER.size
+        assert (batch.logstore, batch.topic, batch.hash_key) == ('app-log', 'web', 'k')
+        assert batch.logs == [(1, [('message', 'a')])]
+
+        routed = decode_batch(encode_frame(LogBatch([(1, [])], logstore='audit', topic=''), 'app-log', 'web')[4:])
+        assert (routed.logstore, routed.topic) == ('audit', '')
+
+
+class TestCollectorClient:
+    """测试 worker 一侧的客户端"""
+
+    @pytest.mark.unit
+    def test_returns_false_without_collector(self, socket_path):
+        """测试采集进程未运行时返回 False，retry_interval 内不再尝试连接"""
+        client = CollectorClient(socket_path, 'app-log', 'web', retry_interval=60.0)
+        batch = LogBatch([(1, [('message', 'a')])])
+        assert not client.send(batch)
+        assert client._retry_at > time.monotonic()
+
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(socket_path)
+        listener.listen(1)
+        try:
+            assert not client.send(batch)  # 仍在重试间隔内
+            client._retry_at = 0.0
+            assert client.send(batch)
+            assert client.connected
+        finally:
+            client.close()
+            listener.close()
+
+    @pytest.mark.unit
+    def test_write_timeout_raises(self, socket_path):
+        """测试采集进程不读取时写入超时抛出 OSError 并断开连接，批次交给重试"""
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(socket_path)
+        listener.listen(1)
+        client = CollectorClient(socket_path, 'app-log', 'web', timeout=0.2)
+        big = LogBatch([(1, [('message', 'x' * 65536)]) for _ in range(64)])
+        try:
+            with pytest.raises(OSError):
+                for _ in range(10):
+                    client.send(big)
+            assert not client.connected
+        finally:
+            client.close()
+            listener.close()
+
+
+class TestCollectorServer:
+    """测试采集进程"""
+
+    @pytest.mark.unit
+    def test_merges_batches_from_workers(self, mock_aliyun_sdk, socket_path):
+        """测试多个 worker 的小批次在采集进程中合并为一个请求，写入目标保持不变"""
+        server = CollectorServer.from_config(make_config(batch_size=100, linger_time=0.3), socket_path)
+        server.start()
+        workers = [
+            CollectorClient(socket_path, 'app-log', 'web'),
+            CollectorClient(socket_path, 'app-log', 'web'),
+            CollectorClient(socket_path, 'audit-log', 'web'),
+        ]
+        try:
+            for index, worker in enumerate(workers):
+                assert worker.send(LogBatch([(1, [('message', f'w{index}-{i}')]) for i in range(3)]))
+            assert wait_until(lambda: server.received_logs == 9)
+            assert wait_until(lambda: mock_aliyun_sdk['client']._send.call_count == 2)
+        finally:
+            for worker in workers:
+                worker.close()
+            report = server.close()
+
+        # 不同连接由不同线程读取，连接之间的先后顺序不确定
+        requests = {
+            (logstore, topic): sorted(messages)
+            for logstore, topic, messages in received_requests(mock_aliyun_sdk['client'])
+        }
+        assert requests == {
+            ('app-log', 'web'): sorted(f'w{w}-{i}' for w in range(2) for i in range(3)),
+            ('audit-log', 'web'): ['w2-0', 'w2-1', 'w2-2'],
+        }
+        assert report.dropped == 0
+        assert not os.path.exists(socket_path)
+
+    @pytest.mark.unit
+    def test_backpressure_blocks_workers(self, mock_aliyun_sdk, socket_path, monkeypatch):
+        """测试采集进程队列满时一直等待、停止读取，worker 写入超时；关闭时仍在等待的记录计入丢弃"""
+        monkeypatch.setattr(AsyncHandler, 'flush_worker', lambda self: None)
+        server = CollectorServer.from_config(make_config(queue_max_size=1, timeout=0.2), socket_path)
+        server.start()
+        client = CollectorClient(socket_path, 'app-log', 'web', timeout=0.2)
+        batch = LogBatch([(1, [('message', 'x' * 4096)]) for _ in range(16)])
+        try:
+            with pytest.raises(OSError):
+                for _ in range(200):
+                    client.send(batch)
+            # 超过采集进程的 timeout 后仍在等待，不会拒绝 worker 已写入的记录
+            time.sleep(0.5)
+            assert server.rejected_logs == 0
+        finally:
+            client.close()
+            server.close()
+        assert server.rejected_logs > 0
+        assert server.sink.stats()['dropped_records'] >= server.rejected_logs
+
+    @pytest.mark.unit
+    def test_partial_frame_discarded(self, mock_aliyun_sdk, socket_path):
+        """测试连接在帧中间断开时丢弃写了一半的帧"""
+        server = CollectorServer.from_config(make_config(), socket_path)
+        server.start()
+        frame = encode_frame(LogBatch([(1, [('message', 'half')])]), 'app-log', 'web')
+        try:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.connect(socket_path)
+            conn.sendall(frame[:-3])
+            conn.close()
+            assert wait_until(lambda: not server._connections)
+            assert server.received_frames == 0
+        finally:
+            server.close()
+
+    @pytest.mark.unit
+    def test_refuses_second_collector(self, mock_aliyun_sdk, socket_path):
+        """测试同一路径已有采集进程在监听时报错，残留的 socket 文件会被清理"""
+        server = CollectorServer.from_config(make_config(), socket_path)
+        server.start()
+        second = CollectorServer.from_config(make_config(), socket_path)
+        try:
+            with pytest.raises(RuntimeError):
+                second.start()
+        finally:
+            second.sink.close()
+            server.close()
+
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(socket_path)
+        stale.close()
+        server = CollectorServer.from_config(make_config(), socket_path)
+        server.start()
+        server.close()
+
+    @pytest.mark.unit
+    def test_collector_config(self):
+        """测试采集进程的队列使用 block 策略，不再转发"""
+        config = CollectorSink.collector_config(
+            make_config(collector_socket='/tmp/x.sock', collector_ring='/dev/shm/x.ring', staging=True)
+        )
+        assert (config.queue_full_policy, config.queue_block_timeout) == ('block', config.timeout)
+        assert config.collector_socket is None
+        assert config.collector_ring is None
+        assert not config.staging
+
+    @pytest.mark.unit
+    @pytest.mark.skipif(not (shm_ring.HAS_FCNTL and shm_ring.HAS_TSO), reason="需要 fcntl 和 x86 的写入顺序")
+    def test_collector_does_not_forward_to_ring(self, mock_aliyun_sdk, socket_path, tmp_path):
+        """测试 worker 的配置中带有 collector_ring 时，采集进程自己仍直接上传"""
+        server = CollectorServer.from_config(
+            make_config(collector_ring=str(tmp_path / 'ring')), socket_path, ring_path=str(tmp_path / 'ring')
+        )
+        try:
+            assert server.sink.async_handler.collector is None
+        finally:
+            server.close()
+
+
+class TestSlsSinkCollectorMode:
+    """测试 SlsSink 的采集模式"""
+
+    @pytest.mark.unit
+    def test_sink_writes_through_collector(self, mock_aliyun_sdk, socket_path):
+        """测试配置 collector_socket 后 worker 不直接上传，由采集进程上传"""
+        server = CollectorServer.from_config(make_config(), socket_path)
+        server.start()
+        sink = SlsSink(make_config(collector_socket=socket_path, topic='app'))
+        handler_id = logger.add(sink, format="{message}")
+        try:
+            logger.info("经采集进程")
+            assert wait_until(lambda: server.received_logs == 1)
+            assert wait_until(lambda: mock_aliyun_sdk['client']._send.call_count == 1)
+        finally:
+            logger.remove(handler_id)
+            server.close()
+        assert received_requests(mock_aliyun_sdk['client']) == [('test-logstore', 'app', ["经采集进程"])]
+
+    @pytest.mark.unit
+    def test_falls_back_to_direct_upload(self, mock_aliyun_sdk, socket_path):
+        """测试采集进程未运行时直接上传"""
+        sink = SlsSink(make_config(collector_socket=socket_path))
+        handler_id = logger.add(sink, format="{message}")
+        try:
+            logger.info("直接上传")
+            assert wait_until(lambda: mock_aliyun_sdk['client']._send.call_count == 1)
+        finally:
+            logger.remove(handler_id)
+        assert received_requests(mock_aliyun_sdk['client'])[0][2] == ["直接上传"]
+        assert not sink.async_handler.collector.connected
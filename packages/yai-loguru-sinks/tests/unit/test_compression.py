@@ -0,0 +1,158 @@
+"""测试 PutLogs 请求体压缩"""
+
+import zlib
+
+import pytest
+
+from aliyun.log.compress import CompressType, Compressor
+
+from yai_loguru_sinks.internal.compression import (
+    HAS_ZSTD,
+    CompressionSelector,
+    available_codecs,
+    create_codec,
+)
+from yai_loguru_sinks.internal.data import SlsConfig
+
+
+BODY = b''.join(
+    b'\x0a\x30\x08\x80\xe2\xcf\xaa\x06\x12\x0d\x0a\x05level\x12\x04INFO'
+    b'\x12\x15\x0a\x07message\x12\x0arequest %d' % i
+    for i in range(200)
+)
+
+
+def decompress(header, data, raw_size):
+    """按 SLS 服务端的方式解压"""
+    if header is None:
+        return data
+    if header == 'deflate':
+        return zlib.decompress(data)
+    compress_type = CompressType.LZ4 if header == 'lz4' else CompressType.ZSTD
+    return Compressor.decompress(data, raw_size, compress_type)
+
+
+class TestCodecs:
+    """测试各编码器"""
+
+    @pytest.mark.unit
+    def test_available(self):
+        """测试 none / deflate / lz4 始终可用"""
+        codecs = available_codecs()
+        assert {'none', 'deflate', 'lz4'} <= set(codecs)
+        assert ('zstd' in codecs) == HAS_ZSTD
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('name', ['none', 'deflate', 'lz4', 'zstd'])
+    def test_roundtrip(self, name):
+        """测试压缩结果可以按请求头声明的方式解压"""
+        if name == 'zstd' and not HAS_ZSTD:
+            pytest.skip("zstandard 未安装")
+        codec = create_codec(name)
+        data = codec.compress(BODY)
+        assert decompress(codec.header, data, len(BODY)) == BODY
+        if name != 'none':
+            assert len(data) < len(BODY)
+
+    @pytest.mark.unit
+    def test_unknown_codec(self):
+        """测试未知编码器"""
+        with pytest.raises(ValueError):
+            create_codec('brotli')
+
+    @pytest.mark.unit
+    @pytest.mark.skipif(HAS_ZSTD, reason="zstandard 已安装")
+    def test_missing_dependency(self):
+        """测试依赖未安装时显式指定编码器报错"""
+        with pytest.raises(ImportError):
+            create_codec('zstd')
+
+
+class TestCompressionSelector:
+    """测试 CompressionSelector"""
+
+    @pytest.mark.unit
+    def test_small_batches_skip_compression(self):
+        """测试小于 min_bytes 的请求体不压缩"""
+        selector = CompressionSelector('lz4', min_bytes=len(BODY) + 1)
+        assert selector.compress(BODY) == (None, BODY)
+        assert selector.metrics()['skipped_batches'] == 1
+
+        selector = CompressionSelector('lz4', min_bytes=len(BODY))
+        header, data = selector.compress(BODY)
+        assert header == 'lz4'
+        assert decompress(header, data, len(BODY)) == BODY
+
+    @pytest.mark.unit
+    def test_metrics(self):
+        """测试统计每个编码器的压缩率和耗时"""
+        selector = CompressionSelector('deflate', min_bytes=0)
+        selector.compress(BODY)
+        selector.compress(BODY)
+
+        stats = selector.metrics()['codecs']['deflate']
+        assert stats['batches'] == 2
+        assert stats['raw_bytes'] == 2 * len(BODY)
+        assert 0 < stats['ratio'] < 1
+        assert stats['seconds'] > 0
+
+    @pytest.mark.unit
+    def test_auto_prefers_no_compression_with_ample_bandwidth(self):
+        """测试带宽充裕而 CPU 预算极小时不压缩"""
+        selector = CompressionSelector('auto', min_bytes=0, bandwidth=1e6, cpu_budget=1e-6)
+        header, data = selector.compress(BODY)
+
+        assert selector.codec_name == 'none'
+        assert (header, data) == (None, BODY)
+        sampled = selector.metrics()['codecs']
+        assert all(sampled[name]['sampled_ratio'] is not None for name in available_codecs() if name != 'none')
+
+    @pytest.mark.unit
+    def test_auto_prefers_best_ratio_with_scarce_bandwidth(self):
+        """测试带宽紧张而 CPU 充足时选择压缩率最高的编码器"""
+        selector = CompressionSelector('auto', min_bytes=0, bandwidth=1e-6, cpu_budget=1e6)
+        header, data = selector.compress(BODY)
+
+        stats = selector.metrics()['codecs']
+        best = min(
+            (name for name in stats if name != 'none'),
+            key=lambda name: stats[name]['sampled_ratio'],
+        )
+        assert selector.codec_name == best
+        assert header == best
+        assert decompress(header, data, len(BODY)) == BODY
+
+    @pytest.mark.unit
+    def test_auto_resamples_periodically(self):
+        """测试每隔 sample_interval 个批次重新采样，其余批次只用选中的编码器"""
+        selector = CompressionSelector(
+            'auto', min_bytes=0, bandwidth=1e-6, cpu_budget=1e6, sample_interval=3
+        )
+        for _ in range(4):
+            selector.compress(BODY)
+
+        stats = selector.metrics()['codecs']
+        chosen = selector.codec_name
+        assert stats[chosen]['batches'] == 4
+        for name, codec_stats in stats.items():
+            if name != 'none':
+                assert codec_stats['samples'] == 2
+            if name not in (chosen, 'none'):
+                assert codec_stats['batches'] == 0
+
+    @pytest.mark.unit
+    def test_from_config(self):
+        """测试 compress=False 时不压缩"""
+        config = SlsConfig(
+            endpoint="https://cn-hangzhou.log.aliyuncs.com",
+            access_key_id="key",
+            access_key_secret="secret",
+            project="proj",
+            logstore="store",
+            compress=False,
+            compress_codec='deflate',
+        )
+        assert CompressionSelector.from_config(config).codec_name == 'none'
+
+        config.compress = True
+        assert CompressionSelector.from_config(config).codec_name == 'deflate'
@@ -5,9 +5,11 @@
 
 import pytest
 import threading
+import time
 from unittest.mock import patch, MagicMock
 from yai_loguru_sinks.internal.core import SlsSink
 from yai_loguru_sinks.internal.data import SlsConfig
+from yai_loguru_sinks.internal import shutdown
 
 
 class TestSlsSink:
@@ -86,6 +88,21 @@ class TestSlsSink:
             
             assert host_ip == "unknown-ip"
     
+    @pytest.mark.unit
+    def test_call_method_uses_cached_host_metadata(self, sls_config, mock_aliyun_sdk,
+                                                   mock_socket, mock_loguru_message):
+        """测试热路径读取缓存的主机元数据，不再发起 socket 调用"""
+        sink = SlsSink(sls_config)
+        
+        with patch('socket.socket', side_effect=AssertionError("socket on hot path")), \
+             patch('socket.gethostname', side_effect=AssertionError("gethostname on hot path")), \
+             patch.object(sink.log_queue, 'put') as mock_put:
+            sink(mock_loguru_message)
+            
+            call_args = mock_put.call_args[0][0]
+            assert call_args['hostname'] == 'test-hostname'
+            assert call_args['host_ip'] == '192.168.1.100'
+    
     @pytest.mark.unit
     def test_get_thread_info(self, sls_config, mock_aliyun_sdk, mock_loguru_record):
         """测试获取线程信息"""
@@ -260,29 +277,190 @@ class TestSlsSink:
             mock_print.assert_called_once()
             assert "SLS日志处理错误" in str(mock_print.call_args)
     
+    @pytest.mark.unit
+    def test_bounded_queue_and_congestion(self, sls_config, mock_aliyun_sdk, mock_loguru_message):
+        """测试队列有界、丢弃计数和拥塞检测"""
+        sls_config.queue_max_size = 5
+        sls_config.queue_full_policy = 'drop_newest'
+        sls_config.flush_interval = 0.05
+        sink = SlsSink(sls_config)
+        sink.stop_event.set()
+        sink.flush_thread.join(timeout=10.0)
+        
+        for _ in range(8):
+            sink(mock_loguru_message)
+        
+        assert sink.log_queue.qsize() == 5
+        assert sink.log_queue.dropped == 3
+        assert sink.is_congested() is True
+    
+    @pytest.mark.unit
+    @pytest.mark.parametrize('schema', [
+        {'include_fields': ['level', 'module']},
+        {'field_rename': {'message': 'msg'}},
+    ])
+    def test_record_size_without_message_field(self, sls_config, mock_aliyun_sdk, mock_loguru_message, schema):
+        """测试字段配置中没有 message 时按原始记录估算大小"""
+        for key, value in schema.items():
+            setattr(sls_config, key, value)
+        sink = SlsSink(sls_config)
+        sink.stop_event.set()
+        sink.flush_thread.join(timeout=10.0)
+        
+        sink(mock_loguru_message)
+        
+        assert sink.log_queue.qsize() == 1
+        assert sink.log_queue.qbytes() > len(mock_loguru_message.record['message'])
+    
+    @pytest.mark.unit
+    def test_staging_queue(self, sls_config, mock_aliyun_sdk, mock_loguru_message):
+        """测试启用分线程暂存缓冲"""
+        from yai_loguru_sinks.internal.staging import StagedLogQueue
+        
+        sls_config.staging = True
+        sls_config.flush_interval = 0.05
+        sink = SlsSink(sls_config)
+        sink.stop_event.set()
+        sink.flush_thread.join(timeout=10.0)
+        
+        sink(mock_loguru_message)
+        
+        assert isinstance(sink.log_queue, StagedLogQueue)
+        assert sink.log_queue.drain(10)[0]['message'] == '测试日志消息'
+    
+    @pytest.mark.unit
+    def test_deferred_enrichment(self, sls_config, mock_aliyun_sdk, mock_loguru_message):
+        """测试调用方只捕获原始字段，由后台线程补充完整数据"""
+        sls_config.deferred_enrichment = True
+        sls_config.flush_interval = 0.05
+        sink = SlsSink(sls_config)
+        sink.stop_event.set()
+        sink.flush_thread.join(timeout=10.0)
+        
+        with patch.object(sink, 'build_log_data') as mock_build:
+            sink(mock_loguru_message)
+            mock_build.assert_not_called()
+        
+        captured = sink.log_queue.drain(10)
+        assert isinstance(captured[0], tuple)
+        
+        log_data = sink.async_handler.prepare_messages(captured)[0]
+        assert log_data['message'] == '测试日志消息'
+        assert log_data['module'] == 'test_module'
+        assert log_data['app_name'] == 'test-app'
+        assert log_data['extra'] == {'user_id': '12345', 'action': 'test'}
+    
+    @pytest.mark.unit
+    def test_deferred_enrichment_keeps_caller_thread(self, sls_config, mock_aliyun_sdk):
+        """测试后台补充的线程信息来自调用方线程"""
+        from loguru import logger
+        
+        sls_config.deferred_enrichment = True
+        sls_config.flush_interval = 0.05
+        sink = SlsSink(sls_config)
+        sink.stop_event.set()
+        sink.flush_thread.join(timeout=10.0)
+        
+        handler_id = logger.add(sink, format="{message}")
+        try:
+            logger.info("来自调用方线程")
+            # logger.remove() 会关闭 sink 并排空队列，在此之前取出记录
+            items = sink.log_queue.drain(10)
+        finally:
+            logger.remove(handler_id)
+        
+        log_data = sink.async_handler.prepare_messages(items)[0]
+        current = threading.current_thread()
+        assert log_data['thread'] == f"{current.name}({current.ident})"
+    
+    @pytest.mark.unit
+    def test_flush_worker_sends_through_sender(self, sls_config, mock_aliyun_sdk, mock_loguru_message):
+        """测试 flush worker 把批次交给并发发送阶段"""
+        sls_config.flush_interval = 0.05
+        sls_config.batch_size = 2
+        sink = SlsSink(sls_config)
+        
+        for _ in range(6):
+            sink(mock_loguru_message)
+        
+        deadline = time.monotonic() + 5.0
+        while not sink.log_queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        sink.stop_event.set()
+        sink.flush_thread.join(timeout=10.0)
+        assert sink.sender.close(timeout=5.0)
+        
+        assert mock_aliyun_sdk['client']._send.call_count == 3
+        assert mock_aliyun_sdk['client'].put_logs.call_count == 0
+        assert sink.sender.limiter.in_flight == 0
+    
+    @pytest.mark.unit
+    def test_linger_merges_records_into_one_batch(self, sls_config, mock_aliyun_sdk, mock_loguru_message):
+        """测试 linger 时间内陆续到达的记录合入同一批次"""
+        sls_config.flush_interval = 0.05
+        sls_config.linger_time = 0.3
+        sink = SlsSink(sls_config)
+        sink.stop_event.set()
+        sink.flush_thread.join(timeout=10.0)
+        submitted = []
+        sink.sender.submit = submitted.append
+        
+        sink(mock_loguru_message)
+        sink.async_handler.flush_once()
+        sink(mock_loguru_message)
+        sink.async_handler.flush_once()
+        assert submitted == []
+        
+        time.sleep(0.3)
+        sink.async_handler.flush_once()
+        assert [len(batch.logs) for batch in submitted] == [2]
+    
+    @pytest.mark.unit
+    def test_failed_batches_go_to_spool(self, sls_config, mock_aliyun_sdk, tmp_path):
+        """测试服务不可用类的最终失败写入磁盘暂存，其他错误不写入"""
+        from aliyun.log.logexception import LogException
+        from yai_loguru_sinks.internal.data import LogBatch
+        
+        sls_config.spool_dir = str(tmp_path)
+        sls_config.flush_interval = 0.05
+        sink = SlsSink(sls_config)
+        sink.spool_replayer.close()
+        
+        sink.handle_failed_batch(LogBatch([(0, [('message', 'a')])]), LogException('Unauthorized', 'bad key', resp_status=401))
+        assert not sink.spool.has_pending
+        
+        sink.handle_failed_batch(LogBatch([(0, [('message', 'b')])]), LogException('LogRequestError', 'refused'))
+        frames = sink.spool.read(10)
+        assert [batch.logs for _, batch in frames] == [[(0, [('message', 'b')])]]
+        sink.close()
+    
     @pytest.mark.unit
     def test_close_method(self, sls_config, mock_aliyun_sdk):
-        """测试关闭方法"""
+        """测试关闭方法：停止 worker，在截止时间内排空，重复关闭返回同一结果"""
         sink = SlsSink(sls_config)
         
-        with patch.object(sink.stop_event, 'set') as mock_set, \
-             patch.object(sink.flush_thread, 'join') as mock_join, \
-             patch.object(sink.async_handler, 'flush_remaining_logs') as mock_flush:
+        with patch.object(sink.stop_event, 'set', wraps=sink.stop_event.set) as mock_set, \
+             patch.object(sink.flush_thread, 'join') as mock_join:
             
-            sink.close()
+            report = sink.close()
             
             mock_set.assert_called_once()
-            mock_join.assert_called_once_with(timeout=5.0)
-            mock_flush.assert_called_once()
+            # 只用截止时间的一小部分等待 worker
+            mock_join.assert_called_once_with(timeout=min(
+                sls_config.shutdown_timeout * shutdown.FLUSH_JOIN_SHARE, shutdown.FLUSH_JOIN_MAX_WAIT
+            ))
+        
+        assert report.sent == report.spooled == report.dropped == 0
+        assert sink.close() is report
     
     @pytest.mark.unit
     def test_close_method_thread_timeout(self, sls_config, mock_aliyun_sdk):
-        """测试关闭方法中线程超时的情况"""
+        """测试 worker 未退出时不接管其未封存的批次"""
         sink = SlsSink(sls_config)
         
-        with patch.object(sink.flush_thread, 'is_alive', return_value=False), \
-             patch.object(sink.async_handler, 'flush_remaining_logs') as mock_flush:
+        with patch.object(sink.flush_thread, 'is_alive', return_value=True), \
+             patch.object(sink.async_handler.batcher, 'flush_all') as mock_flush:
             
             sink.close()
             
-            mock_flush.assert_called_once()
\ No newline at end of file
+            mock_flush.assert_not_called()
\ No newline at end of file
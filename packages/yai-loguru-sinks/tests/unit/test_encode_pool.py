@@ -0,0 +1,115 @@
+"""测试多进程编码阶段"""
+
+import zlib
+from unittest.mock import MagicMock
+
+import pytest
+
+from aliyun.log import LogClient
+from aliyun.log.compress import CompressType, Compressor
+
+from yai_loguru_sinks.internal.async_handler import AsyncHandler
+from yai_loguru_sinks.internal.compression import CompressionSelector
+from yai_loguru_sinks.internal.data import LogBatch, SlsConfig
+from yai_loguru_sinks.internal.encode_pool import EncodingPool
+from yai_loguru_sinks.internal.log_group import LogGroupEncoder
+
+
+LOGS = [
+    (1700000000 + i, [('level', 'INFO'), ('message', f'请求 {i} 完成'), ('module', 'app.api')])
+    for i in range(200)
+]
+LOGTAGS = [('__pack_id__', 'ABCDEF-1')]
+
+
+@pytest.fixture(scope='module')
+def pool():
+    pool = EncodingPool(2, topic='python-app', source='yai-loguru', slots=2, slot_bytes=64 * 1024)
+    yield pool
+    pool.close()
+
+
+def expected_body():
+    return LogGroupEncoder(topic='python-app', source='yai-loguru').encode(LOGS, LOGTAGS)
+
+
+class TestEncodingPool:
+    """测试 EncodingPool"""
+
+    @pytest.mark.unit
+    def test_encodes_and_compresses(self, pool):
+        """测试编码进程的结果与当前线程编码并压缩的结果相同"""
+        selector = CompressionSelector('lz4', min_bytes=0)
+        compress_type, raw_size, body = pool.encode(LOGS, LOGTAGS, selector)
+
+        expected = expected_body()
+        assert compress_type == 'lz4'
+        assert raw_size == len(expected)
+        assert Compressor.decompress(body, raw_size, CompressType.LZ4) == expected
+        assert selector.metrics()['codecs']['lz4']['batches'] == 1
+
+    @pytest.mark.unit
+    def test_small_batch_not_compressed(self, pool):
+        """测试小于 min_bytes 的请求体不压缩"""
+        selector = CompressionSelector('lz4', min_bytes=1 << 20)
+        assert pool.encode(LOGS, LOGTAGS, selector) == (None, len(expected_body()), expected_body())
+        assert selector.metrics()['skipped_batches'] == 1
+
+    @pytest.mark.unit
+    def test_auto_sampling(self, pool):
+        """测试 auto 模式的采样在编码进程中完成，选择由本进程记录"""
+        selector = CompressionSelector('auto', min_bytes=0, bandwidth=1e-6, cpu_budget=1e6)
+        compress_type, raw_size, body = pool.encode(LOGS, LOGTAGS, selector)
+
+        assert compress_type == selector.codec_name
+        if compress_type == 'deflate':
+            assert zlib.decompress(body) == expected_body()
+        assert selector.metrics()['codecs']['deflate']['samples'] == 1
+
+    @pytest.mark.unit
+    def test_oversized_batch_returns_none(self, pool):
+        """测试超过槽位大小的批次交回调用方编码"""
+        logs = [(1700000000, [('message', 'x' * (128 * 1024))])]
+        assert pool.encode(logs, None, CompressionSelector()) is None
+
+    @pytest.mark.unit
+    def test_encode_error_raises(self, pool):
+        """测试非字符串的值在编码进程中失败并抛出异常"""
+        with pytest.raises(TypeError):
+            pool.encode([(1700000000, [('count', 1)])], None, CompressionSelector())
+
+
+class TestHandlerWithPool:
+    """测试 AsyncHandler 使用编码进程池发送"""
+
+    @pytest.mark.unit
+    def test_same_request_as_thread_encoding(self):
+        """测试经编码进程池发送的请求与在当前线程编码的请求相同"""
+        config = SlsConfig(
+            endpoint="https://cn-hangzhou.log.aliyuncs.com",
+            access_key_id="key",
+            access_key_secret="secret",
+            project="proj",
+            logstore="store",
+            encode_workers=1,
+        )
+        sink = MagicMock()
+        sink.config = config
+        sink.client = LogClient(config.endpoint, config.access_key_id, config.access_key_secret)
+        sink.client._send = MagicMock(return_value=({}, {}))
+        sink.pack_id_manager.get_batch_pack_id.return_value = 'PACK-1'
+        sink.compression = CompressionSelector.from_config(config)
+        handler = AsyncHandler(sink)
+
+        try:
+            assert handler.encoding_pool is not None
+            batch = LogBatch(LOGS, hash_key='abc')
+            handler.send_batch(batch)
+            pooled = sink.client._send.call_args
+            pool, handler.encoding_pool = handler.encoding_pool, None
+            handler.send_batch(batch)
+            handler.encoding_pool = pool
+            assert sink.client._send.call_args == pooled
+        finally:
+            handler.close()
+        assert handler.encoding_pool is None
@@ -0,0 +1,120 @@
+"""测试 extra 字段的 JSON 编码器"""
+
+import json
+import pytest
+from datetime import datetime, timezone
+from decimal import Decimal
+from enum import Enum
+from uuid import UUID
+
+from yai_loguru_sinks.internal.encoders import (
+    HAS_ORJSON,
+    JsonEncoder,
+    OrjsonEncoder,
+    StdlibJsonEncoder,
+    create_json_encoder,
+    json_default,
+)
+
+
+class Color(Enum):
+    RED = 'red'
+
+
+RICH_EXTRA = {
+    'when': datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+    'amount': Decimal('12.50'),
+    'request_id': UUID('12345678-1234-5678-1234-567812345678'),
+    'payload': b'ok',
+    'blob': b'\xff\xfe',
+    'color': Color.RED,
+    'tags': {'a'},
+    'name': '订单',
+}
+
+
+class TestJsonDefault:
+    """测试不可序列化类型的转换"""
+
+    @pytest.mark.unit
+    def test_conversions(self):
+        """测试各类型的转换结果"""
+        assert json_default(RICH_EXTRA['when']) == '2024-01-02T03:04:05+00:00'
+        assert json_default(Decimal('12.50')) == '12.50'
+        assert json_default(RICH_EXTRA['request_id']) == '12345678-1234-5678-1234-567812345678'
+        assert json_default(b'ok') == 'ok'
+        assert json_default(b'\xff\xfe') == 'base64://4='
+        assert json_default(Color.RED) == 'red'
+        assert json_default(('a', 1)) == ['a', 1]
+        assert json_default(object()).startswith('<object object')
+
+
+class TestEncoders:
+    """测试编码器实现"""
+
+    @pytest.mark.unit
+    def test_stdlib_encoder(self):
+        """测试标准库编码器"""
+        encoder = StdlibJsonEncoder()
+
+        assert encoder.dumps({'name': '订单', 'n': 1}) == '{"name": "订单", "n": 1}'
+        decoded = json.loads(encoder.dumps(RICH_EXTRA))
+        assert decoded['amount'] == '12.50'
+        assert decoded['payload'] == 'ok'
+        assert decoded['tags'] == ['a']
+
+    @pytest.mark.unit
+    @pytest.mark.skipif(not HAS_ORJSON, reason="orjson 未安装")
+    def test_orjson_encoder(self):
+        """测试 orjson 编码器与标准库结果一致"""
+        encoder = OrjsonEncoder()
+
+        assert encoder.dumps({'name': '订单', 1: 'x'}) == '{"name":"订单","1":"x"}'
+        decoded = json.loads(encoder.dumps(RICH_EXTRA))
+        assert decoded['amount'] == '12.50'
+        assert decoded['request_id'] == '12345678-1234-5678-1234-567812345678'
+        assert decoded['blob'] == 'base64://4='
+        assert decoded['color'] == 'red'
+
+    @pytest.mark.unit
+    def test_fallback_never_raises(self):
+        """测试编码失败时回退而不是抛出异常"""
+        circular = {}
+        circular['self'] = circular
+
+        for name in ('stdlib', 'auto'):
+            encoder = create_json_encoder(name)
+            assert isinstance(json.loads(encoder.dumps(circular)), str)
+            # 超过 64 位的整数 orjson 无法处理，回退到标准库
+            assert encoder.dumps({'big': 2 ** 70}) == '{"big": 1180591620717411303424}'
+
+    @pytest.mark.unit
+    def test_encoder_must_implement_encode(self):
+        """测试基类不能实例化，子类实现 encode 后即可使用回退链"""
+        with pytest.raises(TypeError):
+            JsonEncoder()
+
+        class Failing(JsonEncoder):
+            name = "failing"
+
+            def encode(self, value):
+                raise TypeError("unsupported")
+
+        assert Failing().dumps({'a': 1}) == '{"a": 1}'
+
+    @pytest.mark.unit
+    def test_create_json_encoder(self):
+        """测试按名称创建编码器"""
+        expected = 'orjson' if HAS_ORJSON else 'stdlib'
+        assert create_json_encoder('auto').name == expected
+        assert create_json_encoder('stdlib').name == 'stdlib'
+
+        with pytest.raises(ValueError, match="未知的 JSON 编码器"):
+            create_json_encoder('simdjson')
+
+    @pytest.mark.unit
+    @pytest.mark.skipif(HAS_ORJSON, reason="orjson 已安装")
+    def test_orjson_missing(self):
+        """测试未安装 orjson 时显式指定会报错"""
+        with pytest.raises(ImportError, match="orjson 未安装"):
+            create_json_encoder('orjson')
@@ -0,0 +1,212 @@
+"""测试字段映射计划
+
+测试 FieldSchema 的字段解析和 FieldPlan 编译出的转换函数。
+"""
+
+import pytest
+from types import SimpleNamespace
+
+from yai_loguru_sinks.internal.data import SlsConfig
+from yai_loguru_sinks.internal.field_plan import CONTEXT_KEY, FieldPlan, FieldSchema, lookup_extra
+from yai_loguru_sinks.internal.host_metadata import HostMetadata
+from yai_loguru_sinks.internal.url_parser import parse_sls_url
+
+
+@pytest.fixture
+def record():
+    """loguru 记录"""
+    return {
+        'time': SimpleNamespace(timestamp=lambda: 1700000000.5),
+        'level': SimpleNamespace(name='INFO', no=20),
+        'message': '下单成功',
+        'name': 'shop.order',
+        'function': 'create_order',
+        'line': 42,
+        'extra': {'extra': {'order_id': 'O-1', 'amount': 12.5}},
+    }
+
+
+@pytest.fixture
+def host_metadata():
+    """主机元数据快照"""
+    return HostMetadata(hostname='web-1', host_ip='10.0.0.1', pod_name='web-1-abc')
+
+
+def make_plan(schema, **kwargs):
+    """创建使用固定分类和线程信息的字段映射计划"""
+    return FieldPlan(
+        schema,
+        category=lambda r: 'business',
+        thread_info=lambda r: 'MainThread(1)',
+        app_name='shop',
+        app_version='2.0.0',
+        environment='prod',
+        **kwargs
+    )
+
+
+class TestFieldSchema:
+    """测试 FieldSchema"""
+
+    @pytest.mark.unit
+    def test_from_config_defaults(self):
+        """测试默认配置下的字段集合"""
+        config = SlsConfig(
+            endpoint='e', access_key_id='k', access_key_secret='s',
+            project='p', logstore='l',
+        )
+        fields = FieldSchema.from_config(config).resolved_fields()
+
+        assert fields[:5] == ['level', 'message', 'module', 'function', 'line']
+        assert 'hostname' in fields and 'host_ip' in fields
+        assert 'thread' not in fields
+        assert fields[-1] == 'extra'
+
+    @pytest.mark.unit
+    def test_from_config_include_fields(self):
+        """测试显式指定字段"""
+        config = SlsConfig(
+            endpoint='e', access_key_id='k', access_key_secret='s',
+            project='p', logstore='l',
+            include_fields=['message', 'level'],
+        )
+        # 按内置顺序排列
+        assert FieldSchema.from_config(config).resolved_fields() == ['level', 'message']
+
+    @pytest.mark.unit
+    def test_unknown_field(self):
+        """测试未知字段"""
+        with pytest.raises(ValueError, match="未知的字段"):
+            FieldSchema(include=['level', 'nope']).resolved_fields()
+
+
+class TestFieldPlan:
+    """测试 FieldPlan 编译结果"""
+
+    @pytest.mark.unit
+    def test_default_mapping(self, record, host_metadata):
+        """测试全部内置字段的映射"""
+        plan = make_plan(FieldSchema())
+        log_data = plan.build_log_data(record, host_metadata)
+
+        assert log_data['timestamp'] == 1700000000.5
+        assert log_data['level'] == 'INFO'
+        assert log_data['module'] == 'shop.order'
+        assert log_data['app_name'] == 'shop'
+        assert log_data['category'] == 'business'
+        assert log_data['pod_name'] == 'web-1-abc'
+        # 空的容器字段不写入
+        assert 'namespace' not in log_data
+        assert log_data['extra'] == {'order_id': 'O-1', 'amount': 12.5}
+
+        contents = plan.to_contents(log_data)
+        assert contents[:5] == [
+            ('level', 'INFO'),
+            ('message', '下单成功'),
+            ('module', 'shop.order'),
+            ('function', 'create_order'),
+            ('line', '42'),
+        ]
+        assert ('pod_name', 'web-1-abc') in contents
+        assert contents[-1] == ('extra', '{"order_id": "O-1", "amount": 12.5}')
+
+    @pytest.mark.unit
+    def test_disabled_fields_are_not_computed(self, record, host_metadata):
+        """测试未启用的字段不参与计算"""
+        calls = []
+        plan = FieldPlan(
+            FieldSchema(include=['level', 'message']),
+            category=lambda r: calls.append('category') or 'x',
+            thread_info=lambda r: calls.append('thread') or 'x',
+        )
+
+        log_data = plan.build_log_data(record, host_metadata)
+
+        assert set(log_data) == {'timestamp', 'level', 'message'}
+        assert plan.to_contents(log_data) == [('level', 'INFO'), ('message', '下单成功')]
+        assert calls == []
+        assert 'function' not in plan.build_source
+        assert 'line' not in plan.contents_source
+
+    @pytest.mark.unit
+    def test_rename_and_constants(self, record, host_metadata):
+        """测试重命名和常量字段"""
+        plan = make_plan(FieldSchema(
+            include=['level', 'message', 'extra'],
+            rename={'message': 'msg', 'extra': 'ctx'},
+            constants={'team': 'infra', 'shard': 3},
+        ))
+        contents = plan.to_contents(plan.build_log_data(record, host_metadata))
+
+        assert contents == [
+            ('level', 'INFO'),
+            ('msg', '下单成功'),
+            ('team', 'infra'),
+            ('shard', '3'),
+            ('ctx', '{"order_id": "O-1", "amount": 12.5}'),
+        ]
+
+    @pytest.mark.unit
+    def test_flatten_extra(self, record, host_metadata):
+        """测试展开 extra 字段"""
+        plan = make_plan(FieldSchema(
+            include=['message', 'extra'], flatten_extra=True, extra_prefix='x_',
+        ))
+        contents = plan.to_contents(plan.build_log_data(record, host_metadata))
+
+        assert contents == [
+            ('message', '下单成功'),
+            ('x_order_id', 'O-1'),
+            ('x_amount', '12.5'),
+        ]
+
+    @pytest.mark.unit
+    def test_no_extra(self, record, host_metadata):
+        """测试没有 extra 的记录"""
+        record['extra'] = {}
+        plan = make_plan(FieldSchema(include=['message', 'extra']))
+        log_data = plan.build_log_data(record, host_metadata)
+
+        assert 'extra' not in log_data
+        assert plan.to_contents(log_data) == [('message', '下单成功')]
+
+    @pytest.mark.unit
+    def test_keep_context_for_routing(self, record, host_metadata):
+        """测试保留整个 extra 供分区和路由查找，不写入 SLS"""
+        record['extra']['trace_id'] = 'T-1'
+        plan = make_plan(FieldSchema(include=['message']), keep_context=True)
+        log_data = plan.build_log_data(record, host_metadata)
+
+        assert log_data[CONTEXT_KEY] is record['extra']
+        assert plan.to_contents(log_data) == [('message', '下单成功')]
+        assert lookup_extra(log_data, 'trace_id') == 'T-1'
+        assert lookup_extra(log_data, 'order_id') == 'O-1'
+        assert lookup_extra(log_data, 'missing', 'x') == 'x'
+        assert CONTEXT_KEY not in make_plan(FieldSchema()).build_log_data(record, host_metadata)
+
+
+class TestFieldUrlParams:
+    """测试字段映射相关的 URL 参数"""
+
+    @pytest.mark.unit
+    def test_parse_field_params(self):
+        """测试列表和映射类型参数的解析"""
+        config = parse_sls_url(
+            "sls://p/l?region=cn-hangzhou"
+            "&include_fields=level,message,extra"
+            "&field_rename=message:msg,module:logger"
+            "&constant_fields=team:infra"
+            "&flatten_extra=true&extra_prefix=x_"
+        )
+
+        assert config['include_fields'] == ['level', 'message', 'extra']
+        assert config['field_rename'] == {'message': 'msg', 'module': 'logger'}
+        assert config['constant_fields'] == {'team': 'infra'}
+        assert config['flatten_extra'] is True
+        assert config['extra_prefix'] == 'x_'
+
+    @pytest.mark.unit
+    def test_parse_invalid_mapping(self):
+        """测试映射参数格式错误"""
+        with pytest.raises(ValueError, match="格式错误"):
+            parse_sls_url("sls://p/l?region=cn-hangzhou&field_rename=message")
@@ -0,0 +1,198 @@
+"""测试 fork 后在子进程中重建 sink"""
+
+import json
+import os
+import time
+
+import pytest
+from loguru import logger
+
+from aliyun.log.log_logs_pb2 import LogGroup
+
+from yai_loguru_sinks.internal import core, forking
+from yai_loguru_sinks.internal.async_handler import AsyncHandler
+from yai_loguru_sinks.internal.core import SlsSink
+from yai_loguru_sinks.internal.data import LogBatch, SlsConfig
+from yai_loguru_sinks.internal.spool import DiskSpool
+
+
+def make_config(**kwargs):
+    kwargs.setdefault('compress_codec', 'none')
+    kwargs.setdefault('host_metadata_ttl', 0)
+    kwargs.setdefault('flush_interval', 0.05)
+    return SlsConfig(
+        endpoint="cn-hangzhou.log.aliyuncs.com",
+        access_key_id="test-access-key",
+        access_key_secret="test-access-secret",
+        project="test-project",
+        logstore="test-logstore",
+        **kwargs,
+    )
+
+
+def sent_messages(client):
+    """解析 mock 客户端收到的全部消息"""
+    messages = []
+    for call in client._send.call_args_list:
+        group = LogGroup()
+        group.ParseFromString(call.args[2])
+        messages.extend(dict((c.Key, c.Value) for c in log.Contents)['message'] for log in group.Logs)
+    return messages
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def dead_pid():
+    """一个刚退出并已回收的进程的 pid"""
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0)
+    os.waitpid(pid, 0)
+    return pid
+
+
+class TestForkReset:
+    """测试 fork 标记和延迟重建"""
+
+    @pytest.mark.unit
+    def test_child_starts_with_empty_queue(self, mock_aliyun_sdk, monkeypatch):
+        """测试子进程重建队列、线程和连接，父进程缓冲的记录不会带入子进程"""
+        monkeypatch.setattr(AsyncHandler, 'flush_worker', lambda self: None)
+        sink = SlsSink(make_config())
+        handler_id = logger.add(sink, format="{message}")
+        try:
+            logger.info("parent")
+            inherited = (sink.log_queue, sink.flush_thread, sink.async_handler, sink.pack_id_manager)
+
+            sink._mark_forked()
+            assert sink._forked
+            assert sink.log_queue is inherited[0]  # 标记时不重建
+
+            logger.info("child")
+            assert not sink._forked
+            current = (sink.log_queue, sink.flush_thread, sink.async_handler, sink.pack_id_manager)
+            assert all(new is not old for new, old in zip(current, inherited))
+            assert core.LogClient.call_count == 2  # 子进程创建新的客户端连接
+            assert [item['message'] for item in sink.log_queue.drain(10, 0)] == ["child"]
+            assert [item['message'] for item in inherited[0].drain(10, 0)] == ["parent"]
+        finally:
+            logger.remove(handler_id)
+
+    @pytest.mark.unit
+    def test_close_unused_child_sink(self, mock_aliyun_sdk):
+        """测试子进程没有写过日志时关闭不启动线程，也不发送继承的记录"""
+        sink = SlsSink(make_config())
+        flush_thread = sink.flush_thread
+        sink._mark_forked()
+        assert not sink.is_congested()
+
+        report = sink.close()
+        assert (report.sent, report.spooled, report.dropped, report.in_flight) == (0, 0, 0, 0)
+        assert sink.flush_thread is flush_thread
+        assert sink.close() is report
+
+        # 父进程中的 sink 正常关闭
+        sink.stop_event.set()
+        sink.log_queue.close()
+
+    @pytest.mark.unit
+    def test_closed_sink_not_marked(self, mock_aliyun_sdk):
+        """测试 fork 前已关闭的 sink 在子进程中保持关闭"""
+        sink = SlsSink(make_config())
+        sink.close()
+        forking._after_fork_in_child()
+        assert not sink._forked
+
+    @pytest.mark.unit
+    def test_fork_spool_dir(self, tmp_path):
+        """测试子进程的磁盘暂存目录按 pid 区分"""
+        assert forking.fork_spool_dir(str(tmp_path), pid=123) == os.path.join(str(tmp_path), "fork-123")
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="需要 os.fork")
+class TestRealFork:
+    """测试真实的 fork"""
+
+    @pytest.mark.unit
+    def test_orphaned_fork_spool_dirs(self, tmp_path):
+        """测试只返回进程已退出的 fork-<pid> 目录"""
+        pid = dead_pid()
+        for name in (f"fork-{pid}", f"fork-{os.getpid()}", "fork-x", "other"):
+            (tmp_path / name).mkdir()
+        (tmp_path / "fork-1.seg").write_bytes(b"")
+
+        assert forking.orphaned_fork_spool_dirs(str(tmp_path)) == [str(tmp_path / f"fork-{pid}")]
+
+    @pytest.mark.unit
+    def test_parent_replays_dead_child_spool(self, mock_aliyun_sdk, tmp_path):
+        """测试父进程补发已退出子进程的暂存并删除其目录，子进程的 sink 不并入其他目录"""
+        orphan_dir = forking.fork_spool_dir(str(tmp_path), pid=dead_pid())
+        orphan = DiskSpool(orphan_dir)
+        for i in range(3):
+            orphan.append(LogBatch([(1700000000, [('message', f'orphan {i}')])]))
+        orphan.close()
+
+        sink = SlsSink(make_config(spool_dir=str(tmp_path)))
+        try:
+            assert wait_until(lambda: not os.path.exists(orphan_dir))
+            assert wait_until(lambda: len(sent_messages(mock_aliyun_sdk['client'])) == 3)
+            assert sorted(sent_messages(mock_aliyun_sdk['client'])) == [f'orphan {i}' for i in range(3)]
+            assert sink.spool_replayer.adopted_batches == 3
+            assert sink.spool_replayer._orphans is not None
+            sink._mark_forked()
+            sink._reinit_after_fork()
+            assert sink.spool_replayer._orphans is None
+        finally:
+            sink.close()
+
+    @pytest.mark.unit
+    def test_forked_child_ships_only_its_own_records(self, mock_aliyun_sdk):
+        """测试子进程重新启动发送，只发送自己的记录，PackId 前缀与父进程不同"""
+        sink = SlsSink(make_config())
+        handler_id = logger.add(sink, format="{message}")
+        parent_prefix = sink.pack_id_manager.get_context_prefix()
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            # 子进程：任何情况下都用 os._exit 退出，不回到 pytest
+            code = 1
+            try:
+                os.close(read_fd)
+                client = mock_aliyun_sdk['client']
+                client._send.reset_mock()
+                logger.info("child")
+                logger.remove(handler_id)
+                result = {
+                    'messages': sent_messages(client),
+                    'sent': sink.drain_report.sent,
+                    'prefix': sink.pack_id_manager.get_context_prefix(),
+                    'worker_started': sink.flush_thread.ident is not None,
+                }
+                os.write(write_fd, json.dumps(result).encode())
+                code = 0
+            finally:
+                os._exit(code)
+
+        os.close(write_fd)
+        try:
+            chunks = []
+            while True:
+                chunk = os.read(read_fd, 65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            _, status = os.waitpid(pid, 0)
+        finally:
+            os.close(read_fd)
+            logger.remove(handler_id)
+        assert os.WEXITSTATUS(status) == 0
+        result = json.loads(b''.join(chunks))
+        assert result['worker_started']
+        assert result['messages'] == ["child"]
+        assert "child" not in sent_messages(mock_aliyun_sdk['client'])
+        assert result['prefix'] != parent_prefix
@@ -0,0 +1,135 @@
+"""测试主机元数据解析
+
+测试 HostMetadata 各字段的解析逻辑和 HostMetadataResolver 的缓存/刷新行为。
+"""
+
+import pytest
+import time
+from unittest.mock import patch
+
+from yai_loguru_sinks.internal.host_metadata import (
+    HostMetadata,
+    HostMetadataResolver,
+    resolve_container_id,
+    resolve_host_ip,
+    resolve_namespace,
+    resolve_pod_name,
+)
+
+
+class TestResolveFunctions:
+    """测试各字段的解析函数"""
+
+    @pytest.mark.unit
+    def test_host_ip_from_env(self, monkeypatch):
+        """测试优先使用环境变量中的 IP"""
+        monkeypatch.setenv('POD_IP', '10.0.0.8')
+
+        with patch('socket.socket') as mock_sock:
+            assert resolve_host_ip() == '10.0.0.8'
+            mock_sock.assert_not_called()
+
+    @pytest.mark.unit
+    def test_host_ip_error(self, monkeypatch):
+        """测试获取 IP 失败时的默认值"""
+        monkeypatch.delenv('POD_IP', raising=False)
+        monkeypatch.delenv('HOST_IP', raising=False)
+
+        with patch('socket.socket', side_effect=Exception("Network error")):
+            assert resolve_host_ip() == 'unknown-ip'
+
+    @pytest.mark.unit
+    def test_pod_name(self, monkeypatch):
+        """测试 Pod 名称解析"""
+        monkeypatch.delenv('POD_NAME', raising=False)
+        monkeypatch.delenv('KUBERNETES_SERVICE_HOST', raising=False)
+        assert resolve_pod_name('my-host') == ''
+
+        monkeypatch.setenv('KUBERNETES_SERVICE_HOST', '10.96.0.1')
+        assert resolve_pod_name('web-7d9f-abcde') == 'web-7d9f-abcde'
+
+        monkeypatch.setenv('POD_NAME', 'explicit-pod')
+        assert resolve_pod_name('web-7d9f-abcde') == 'explicit-pod'
+
+    @pytest.mark.unit
+    def test_namespace_from_file(self, monkeypatch, temp_dir):
+        """测试从 ServiceAccount 文件读取命名空间"""
+        monkeypatch.delenv('POD_NAMESPACE', raising=False)
+        namespace_file = temp_dir / 'namespace'
+        namespace_file.write_text('production\n')
+
+        assert resolve_namespace(str(namespace_file)) == 'production'
+        assert resolve_namespace(str(temp_dir / 'missing')) == ''
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('cgroup_line', [
+        '12:memory:/docker/{cid}\n',
+        '0::/kubepods.slice/kubepods-pod1.slice/cri-containerd-{cid}.scope\n',
+    ])
+    def test_container_id(self, temp_dir, cgroup_line):
+        """测试从 cgroup 文件解析容器 ID"""
+        container_id = 'a' * 32 + '0123456789abcdef' * 2
+        cgroup_file = temp_dir / 'cgroup'
+        cgroup_file.write_text('1:name=systemd:/\n' + cgroup_line.format(cid=container_id))
+
+        assert resolve_container_id(str(cgroup_file)) == container_id
+
+    @pytest.mark.unit
+    def test_container_id_not_in_container(self, temp_dir):
+        """测试非容器环境返回空字符串"""
+        cgroup_file = temp_dir / 'cgroup'
+        cgroup_file.write_text('0::/user.slice/user-1000.slice\n')
+
+        assert resolve_container_id(str(cgroup_file)) == ''
+        assert resolve_container_id(str(temp_dir / 'missing')) == ''
+
+
+class TestHostMetadataResolver:
+    """测试 HostMetadataResolver"""
+
+    @pytest.mark.unit
+    def test_resolves_once_at_construction(self):
+        """测试构造时解析一次，读取不再触发解析"""
+        calls = []
+
+        def resolver():
+            calls.append(1)
+            return HostMetadata(hostname='h', host_ip='1.1.1.1')
+
+        metadata_resolver = HostMetadataResolver(ttl=0, resolver=resolver)
+        for _ in range(100):
+            assert metadata_resolver.current.hostname == 'h'
+
+        assert len(calls) == 1
+
+    @pytest.mark.unit
+    def test_background_refresh(self):
+        """测试后台按 TTL 刷新"""
+        ips = iter(['1.1.1.1', '2.2.2.2', '2.2.2.2', '2.2.2.2'])
+
+        metadata_resolver = HostMetadataResolver(
+            ttl=0.05,
+            resolver=lambda: HostMetadata(hostname='h', host_ip=next(ips, '2.2.2.2')),
+        )
+        assert metadata_resolver.current.host_ip == '1.1.1.1'
+
+        time.sleep(0.2)
+        metadata_resolver.close()
+
+        assert metadata_resolver.current.host_ip == '2.2.2.2'
+
+    @pytest.mark.unit
+    def test_refresh_failure_keeps_snapshot(self):
+        """测试刷新失败时保留旧快照"""
+        results = [HostMetadata(hostname='h', host_ip='1.1.1.1')]
+
+        def resolver():
+            if results:
+                return results.pop()
+            raise RuntimeError("resolve failed")
+
+        metadata_resolver = HostMetadataResolver(ttl=0, resolver=resolver)
+        with patch('builtins.print'):
+            snapshot = metadata_resolver.refresh()
+
+        assert snapshot.host_ip == '1.1.1.1'
@@ -0,0 +1,66 @@
+"""测试批次等待时间控制"""
+
+import pytest
+
+from yai_loguru_sinks.internal.linger import LingerController
+
+
+class TestLingerController:
+    """测试 LingerController"""
+
+    @pytest.mark.unit
+    def test_fixed_linger(self):
+        """测试固定模式"""
+        linger = LingerController(linger_time=0.2)
+        linger.observe(1000, now=0.0)
+        linger.observe(1000, now=1.0)
+
+        assert linger.current() == 0.2
+        assert linger.arrival_rate == 0.0
+
+    @pytest.mark.unit
+    def test_adaptive_starts_without_waiting(self):
+        """测试没有速率数据时不等待"""
+        linger = LingerController(adaptive=True)
+        assert linger.current() == 0.0
+
+    @pytest.mark.unit
+    def test_adaptive_low_rate(self):
+        """测试上限时间内预计不足一条记录时不等待"""
+        linger = LingerController(adaptive=True, max_linger_time=1.0, smoothing=1.0)
+        linger.observe(0, now=0.0)
+        linger.observe(1, now=2.0)
+
+        assert linger.arrival_rate == pytest.approx(0.5)
+        assert linger.current() == 0.0
+
+    @pytest.mark.unit
+    def test_adaptive_mid_rate(self):
+        """测试中等速率时等待到延迟上限"""
+        linger = LingerController(adaptive=True, max_linger_time=1.0, batch_size=100, smoothing=1.0)
+        linger.observe(0, now=0.0)
+        linger.observe(20, now=1.0)
+
+        assert linger.current() == 1.0
+
+    @pytest.mark.unit
+    def test_adaptive_high_rate(self):
+        """测试高速率时只等待到批次预计装满"""
+        linger = LingerController(adaptive=True, max_linger_time=1.0, batch_size=100, smoothing=1.0)
+        linger.observe(0, now=0.0)
+        linger.observe(1000, now=1.0)
+
+        assert linger.current() == pytest.approx(0.1)
+
+    @pytest.mark.unit
+    def test_rate_is_smoothed(self):
+        """测试到达速率按窗口平滑"""
+        linger = LingerController(adaptive=True, window=1.0, smoothing=0.5)
+        linger.observe(0, now=0.0)
+        linger.observe(100, now=0.5)
+        assert linger.arrival_rate == 0.0
+
+        linger.observe(100, now=1.0)
+        assert linger.arrival_rate == pytest.approx(100.0)
+        linger.observe(0, now=2.0)
+        assert linger.arrival_rate == pytest.approx(50.0)
@@ -0,0 +1,160 @@
+"""测试 LogGroup protobuf 编码器
+
+与 SDK 的 protobuf 实现逐字节对比。
+"""
+
+import zlib
+
+import pytest
+from unittest.mock import MagicMock
+
+from aliyun.log import LogClient
+from aliyun.log.compress import CompressType, Compressor
+from aliyun.log.log_logs_pb2 import LogGroup
+
+from yai_loguru_sinks.internal.async_handler import AsyncHandler
+from yai_loguru_sinks.internal.compression import CompressionSelector
+from yai_loguru_sinks.internal.data import LogBatch, SlsConfig
+from yai_loguru_sinks.internal.log_group import LogGroupEncoder, encode_varint
+
+
+def sdk_log_group(logs, topic, source, logtags=None):
+    """按 LogClient.put_logs 的方式构造 LogGroup（不设置 Time_ns）"""
+    group = LogGroup()
+    group.Topic = topic
+    if source:
+        group.Source = source
+    for timestamp, contents in logs:
+        log = group.Logs.add()
+        log.Time = timestamp
+        for key, value in contents:
+            content = log.Contents.add()
+            content.Key = key
+            content.Value = value.encode('utf-8')
+    for key, value in logtags or []:
+        tag = group.LogTags.add()
+        tag.Key = key
+        tag.Value = value
+    return group
+
+
+SAMPLE_LOGS = [
+    (1700000000, [('level', 'INFO'), ('message', 'hello'), ('module', 'app.api')]),
+    (1700000001, [('level', 'ERROR'), ('message', '中文日志 🚀'), ('extra', '{"k": 1}')]),
+    (1700000002, [('message', ''), ('', 'empty key')]),
+    (4294967295, [('message', 'x' * 20000), ('long_value', 'y' * 200)]),
+    (1700000003, []),
+]
+
+
+class TestLogGroupEncoder:
+    """测试 LogGroupEncoder"""
+
+    @pytest.mark.unit
+    def test_varint(self):
+        """测试 varint 编码"""
+        assert encode_varint(0) == b'\x00'
+        assert encode_varint(127) == b'\x7f'
+        assert encode_varint(128) == b'\x80\x01'
+        assert encode_varint(300) == b'\xac\x02'
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('topic,source,logtags', [
+        ('python-app', 'yai-loguru', [('__pack_id__', 'ABCDEF0123456789-1')]),
+        ('', 'yai-loguru', None),
+        ('主题', '', [('a', '1'), ('b', '')]),
+    ])
+    def test_matches_sdk_bytes(self, topic, source, logtags):
+        """测试与 SDK 序列化结果逐字节一致"""
+        encoder = LogGroupEncoder(topic=topic, source=source)
+        expected = sdk_log_group(SAMPLE_LOGS, topic, source, logtags).SerializeToString()
+
+        assert encoder.encode(SAMPLE_LOGS, logtags) == expected
+        # 缓冲复用后结果不变
+        assert encoder.encode(SAMPLE_LOGS, logtags) == expected
+
+    @pytest.mark.unit
+    def test_empty_batch(self):
+        """测试空批次"""
+        encoder = LogGroupEncoder(topic='t', source='s')
+        assert encoder.encode([]) == sdk_log_group([], 't', 's').SerializeToString()
+
+    @pytest.mark.unit
+    def test_non_string_value_raises(self):
+        """测试非字符串的值抛出 TypeError"""
+        encoder = LogGroupEncoder(topic='t')
+        with pytest.raises(TypeError):
+            encoder.encode([(1700000000, [('count', 1)])])
+
+
+class TestNativeSendPath:
+    """测试直接编码的发送路径与 SDK put_logs 的请求一致"""
+
+    @pytest.fixture
+    def handler(self):
+        config = SlsConfig(
+            endpoint="https://cn-hangzhou.log.aliyuncs.com",
+            access_key_id="key",
+            access_key_secret="secret",
+            project="proj",
+            logstore="store",
+        )
+        sink = MagicMock()
+        sink.config = config
+        sink.client = LogClient(config.endpoint, config.access_key_id, config.access_key_secret)
+        sink.client._send = MagicMock(return_value=({}, {}))
+        sink.pack_id_manager.get_batch_pack_id.return_value = 'PACK-1'
+        sink.compression = CompressionSelector.from_config(config)
+        return AsyncHandler(sink)
+
+    @staticmethod
+    def decoded_body(call):
+        """从 _send 的调用参数中解压并解析 LogGroup，清除 SDK 额外写入的 Time_ns"""
+        method, project, body, resource, params, headers = call.args
+        raw_size = int(headers['x-log-bodyrawsize'])
+        raw = Compressor.decompress(body, raw_size, CompressType.LZ4)
+        group = LogGroup()
+        group.ParseFromString(raw)
+        for log in group.Logs:
+            log.ClearField('Time_ns')
+        return (method, project, resource, params, sorted(headers)), group
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('hash_key', [None, 'a1b2c3'])
+    def test_same_request_as_put_logs(self, handler, hash_key):
+        """测试请求头、路由、压缩和请求体与 SDK 路径相同"""
+        batch = LogBatch(SAMPLE_LOGS, hash_key=hash_key)
+        client = handler.sink.client
+
+        assert handler.log_group_encoder is not None
+        handler.send_batch(batch)
+        native_call = client._send.call_args
+
+        handler.log_group_encoder = None
+        handler.send_batch(batch)
+        sdk_call = client._send.call_args
+
+        assert self.decoded_body(native_call) == self.decoded_body(sdk_call)
+
+    @pytest.mark.unit
+    def test_falls_back_to_sdk(self, handler):
+        """测试编码失败时回退到 SDK 路径"""
+        client = handler.sink.client
+        client.put_logs = MagicMock()
+
+        handler.send_batch(LogBatch([(1700000000, [('count', 1)])]))
+
+        assert client.put_logs.call_count == 1
+        assert client._send.call_count == 0
+
+    @pytest.mark.unit
+    def test_uses_selected_codec(self, handler):
+        """测试请求体按 sink.compression 选择的编码器压缩"""
+        handler.sink.compression = CompressionSelector('deflate', min_bytes=0)
+        handler.send_batch(LogBatch(SAMPLE_LOGS))
+
+        method, project, body, resource, params, headers = handler.sink.client._send.call_args.args
+        assert headers['x-log-compresstype'] == 'deflate'
+        group = LogGroup()
+        group.ParseFromString(zlib.decompress(body))
+        assert len(group.Logs) == len(SAMPLE_LOGS)
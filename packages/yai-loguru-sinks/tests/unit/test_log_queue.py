@@ -0,0 +1,226 @@
+"""测试有界日志队列
+
+测试 BoundedLogQueue 的容量限制、各背压策略和拥塞检测。
+"""
+
+import math
+import pytest
+import threading
+import time
+from queue import Empty
+
+from yai_loguru_sinks.internal.log_queue import (
+    BoundedLogQueue,
+    estimate_record_size,
+    resolve_level_no,
+)
+
+
+def drain(log_queue):
+    """取出队列中的全部记录"""
+    items = []
+    while not log_queue.empty():
+        items.append(log_queue.get_nowait())
+    return items
+
+
+class TestBoundedLogQueue:
+    """测试 BoundedLogQueue"""
+
+    @pytest.mark.unit
+    def test_queue_interface(self):
+        """测试与 queue.Queue 兼容的接口"""
+        log_queue = BoundedLogQueue(max_size=10)
+        assert log_queue.empty()
+
+        log_queue.put('a')
+        log_queue.put('b')
+        assert log_queue.qsize() == 2
+        assert log_queue.get(timeout=0.1) == 'a'
+        assert log_queue.get_nowait() == 'b'
+
+        with pytest.raises(Empty):
+            log_queue.get_nowait()
+        with pytest.raises(Empty):
+            log_queue.get(timeout=0.01)
+
+    @pytest.mark.unit
+    def test_invalid_policy(self):
+        """测试无效的背压策略"""
+        with pytest.raises(ValueError, match="无效的队列背压策略"):
+            BoundedLogQueue(policy='drop_everything')
+
+    @pytest.mark.unit
+    def test_drop_newest(self):
+        """测试 drop_newest 策略"""
+        log_queue = BoundedLogQueue(max_size=3, policy='drop_newest')
+        results = [log_queue.put(i) for i in range(5)]
+
+        assert results == [True, True, True, False, False]
+        assert drain(log_queue) == [0, 1, 2]
+        assert log_queue.dropped == 2
+
+    @pytest.mark.unit
+    def test_drop_oldest(self):
+        """测试 drop_oldest 策略"""
+        log_queue = BoundedLogQueue(max_size=3, policy='drop_oldest')
+        for i in range(5):
+            log_queue.put(i)
+
+        assert drain(log_queue) == [2, 3, 4]
+        assert log_queue.dropped == 2
+
+    @pytest.mark.unit
+    def test_drop_below_level(self):
+        """测试 drop_below_level 策略"""
+        log_queue = BoundedLogQueue(max_size=3, policy='drop_below_level', drop_level_no=30)
+        log_queue.put('error-1', level_no=40)
+        log_queue.put('info-1', level_no=20)
+        log_queue.put('info-2', level_no=20)
+
+        # 低级别记录直接丢弃
+        assert log_queue.put('info-3', level_no=20) is False
+        # 高级别记录驱逐最旧的低级别记录
+        assert log_queue.put('error-2', level_no=40) is True
+
+        assert drain(log_queue) == ['error-1', 'info-2', 'error-2']
+        assert log_queue.dropped == 2
+
+    @pytest.mark.unit
+    def test_drop_below_level_keeps_high_level_records(self):
+        """测试队列中只有高级别记录时丢弃新记录，不驱逐已有的高级别记录"""
+        log_queue = BoundedLogQueue(max_size=2, policy='drop_below_level', drop_level_no=30)
+        log_queue.put('warning-1', level_no=30)
+        log_queue.put('error-1', level_no=40)
+
+        assert log_queue.put('error-2', level_no=40) is False
+        assert log_queue.put('info-1', level_no=20) is False
+
+        assert drain(log_queue) == ['warning-1', 'error-1']
+        assert log_queue.dropped == 2
+
+    @pytest.mark.unit
+    def test_drop_below_level_does_not_evict_when_space_is_insufficient(self):
+        """测试驱逐全部低级别记录仍放不下时，不驱逐任何记录"""
+        log_queue = BoundedLogQueue(max_size=0, max_bytes=1000, policy='drop_below_level', drop_level_no=30)
+        log_queue.put('error-1', nbytes=700, level_no=40)
+        log_queue.put('info-1', nbytes=200, level_no=20)
+
+        assert log_queue.put('error-2', nbytes=500, level_no=40) is False
+        assert log_queue.put('error-3', nbytes=250, level_no=40) is True
+
+        assert drain(log_queue) == ['error-1', 'error-3']
+        assert log_queue.dropped == 2
+        assert log_queue.dropped_bytes == 700
+
+    @pytest.mark.unit
+    def test_block_timeout(self):
+        """测试 block 策略超时后丢弃"""
+        log_queue = BoundedLogQueue(max_size=1, policy='block', block_timeout=0.05)
+        log_queue.put('a')
+
+        start = time.monotonic()
+        assert log_queue.put('b') is False
+        assert time.monotonic() - start >= 0.04
+        assert log_queue.dropped == 1
+
+    @pytest.mark.unit
+    def test_block_until_space(self):
+        """测试 block 策略在消费者取走记录后继续入队"""
+        log_queue = BoundedLogQueue(max_size=1, policy='block', block_timeout=2.0)
+        log_queue.put('a')
+
+        consumer = threading.Timer(0.05, log_queue.get)
+        consumer.start()
+        assert log_queue.put('b') is True
+        consumer.join()
+
+        assert drain(log_queue) == ['b']
+        assert log_queue.dropped == 0
+
+    @pytest.mark.unit
+    def test_block_until_cancelled(self):
+        """测试 block 策略不限时等待，cancel 被设置后剩余记录计入丢弃"""
+        log_queue = BoundedLogQueue(max_size=1, policy='block', block_timeout=0.01)
+        log_queue.put('a')
+        cancel = threading.Event()
+
+        canceller = threading.Timer(0.3, cancel.set)
+        canceller.start()
+        start = time.monotonic()
+        accepted = log_queue.put_many([('b', 0, 0), ('c', 0, 0)], timeout=math.inf, cancel=cancel)
+        canceller.join()
+
+        assert accepted == 0
+        assert time.monotonic() - start >= 0.25
+        assert log_queue.dropped == 2
+
+    @pytest.mark.unit
+    def test_max_bytes(self):
+        """测试按字节数限制"""
+        log_queue = BoundedLogQueue(max_size=0, max_bytes=1000, policy='drop_newest')
+        assert log_queue.put('a', nbytes=600)
+        assert log_queue.put('b', nbytes=600) is False
+        assert log_queue.put('c', nbytes=400)
+
+        assert log_queue.qbytes() == 1000
+        assert log_queue.dropped_bytes == 600
+
+        log_queue.get_nowait()
+        assert log_queue.qbytes() == 400
+
+    @pytest.mark.unit
+    def test_oversized_record_into_empty_queue(self):
+        """测试空队列总是接收超过字节上限的单条记录"""
+        log_queue = BoundedLogQueue(max_bytes=100, policy='drop_newest')
+        assert log_queue.put('huge', nbytes=1000)
+
+    @pytest.mark.unit
+    def test_is_congested(self):
+        """测试拥塞检测"""
+        log_queue = BoundedLogQueue(max_size=10, congestion_ratio=0.8)
+        for i in range(7):
+            log_queue.put(i)
+        assert log_queue.is_congested() is False
+
+        log_queue.put(7)
+        assert log_queue.is_congested() is True
+
+    @pytest.mark.unit
+    def test_close_wakes_drain_and_drain_entries(self):
+        """测试 close 唤醒等待中的 drain，drain_entries 取出记录及其字节数和级别"""
+        log_queue = BoundedLogQueue(max_size=10)
+        closer = threading.Timer(0.05, log_queue.close)
+        closer.start()
+        start = time.monotonic()
+        assert log_queue.drain(10, timeout=5.0) == []
+        assert time.monotonic() - start < 1.0
+        closer.join()
+
+        log_queue.put('a', nbytes=3, level_no=20)
+        log_queue.put('b', nbytes=4, level_no=40)
+        assert log_queue.drain_entries() == [('a', 3, 20), ('b', 4, 40)]
+        assert log_queue.empty() and log_queue.qbytes() == 0
+
+
+class TestHelpers:
+    """测试辅助函数"""
+
+    @pytest.mark.unit
+    def test_resolve_level_no(self):
+        """测试级别名称解析"""
+        assert resolve_level_no('WARNING') == 30
+        assert resolve_level_no('error') == 40
+        assert resolve_level_no(25) == 25
+
+        with pytest.raises(ValueError, match="未知的日志级别"):
+            resolve_level_no('NOT_A_LEVEL')
+
+    @pytest.mark.unit
+    def test_estimate_record_size(self):
+        """测试记录大小估算"""
+        small = estimate_record_size('hello')
+        with_extra = estimate_record_size('hello', {'a': 1, 'b': 2})
+
+        assert small > len('hello')
+        assert with_extra > small
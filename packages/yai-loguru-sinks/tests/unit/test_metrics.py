@@ -0,0 +1,303 @@
+"""测试 sink 的运行指标"""
+
+import socket
+import threading
+import time
+import urllib.request
+
+import pytest
+from loguru import logger
+
+from yai_loguru_sinks.internal.async_handler import AsyncHandler
+from yai_loguru_sinks.internal.core import SlsSink
+from yai_loguru_sinks.internal.data import LogBatch, SlsConfig
+from yai_loguru_sinks.internal.metrics import (
+    Histogram,
+    MetricsExporter,
+    MetricsRegistry,
+    StripedCounter,
+)
+
+
+def make_config(**kwargs):
+    kwargs.setdefault('compress_codec', 'none')
+    kwargs.setdefault('host_metadata_ttl', 0)
+    kwargs.setdefault('flush_interval', 0.05)
+    return SlsConfig(
+        endpoint="cn-hangzhou.log.aliyuncs.com",
+        access_key_id="test-access-key",
+        access_key_secret="test-access-secret",
+        project="test-project",
+        logstore="test-logstore",
+        **kwargs,
+    )
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class TestStripedCounter:
+    """测试按线程分片的计数器"""
+
+    @pytest.mark.unit
+    def test_threads_add_to_own_cells(self):
+        """测试多个线程并发累加不丢失，已退出线程的计数保留"""
+        counter = StripedCounter()
+
+        def work():
+            for _ in range(10000):
+                counter.add()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counter.add(5)
+
+        assert counter.value == 80005
+        assert len(counter._cells) == 1  # 只剩当前线程的格子
+        assert counter.value == 80005
+
+    @pytest.mark.unit
+    def test_sources_added_on_read(self):
+        """测试其他组件维护的计数在读取时累加"""
+        external = [3]
+        counter = StripedCounter(sources=(lambda: external[0],))
+        counter.add(2)
+        external[0] = 10
+        assert counter.value == 12
+
+
+class TestHistogram:
+    """测试分布"""
+
+    @pytest.mark.unit
+    def test_cumulative_buckets(self):
+        """测试分桶按上限（包含）累计，超过最大上限的只计入总数"""
+        histogram = Histogram([1, 5, 10])
+        for value in (0.5, 1, 3, 10, 50):
+            histogram.observe(value)
+        assert histogram.value == {
+            'buckets': [(1, 2), (5, 3), (10, 4)],
+            'sum': 64.5,
+            'count': 5,
+        }
+
+
+class TestMetricsRegistry:
+    """测试 Prometheus 文本格式"""
+
+    @pytest.mark.unit
+    def test_render_prometheus(self):
+        """测试计数器加 _total 后缀，样本带有标签，分布输出 bucket / sum / count"""
+        registry = MetricsRegistry(labels={'logstore': 'app"log'})
+        registry.counter("sent_records", "发送成功的日志条数").add(3)
+        registry.gauge("queue_depth_records", "队列中的日志条数", lambda: 7)
+        registry.histogram("request_duration_seconds", "耗时", [0.1, 1.0]).observe(0.5)
+        registry.gauge("broken", "读取失败", lambda: 1 / 0)
+
+        text = registry.render_prometheus()
+        assert text.splitlines() == [
+            '# HELP yai_sls_sent_records_total 发送成功的日志条数',
+            '# TYPE yai_sls_sent_records_total counter',
+            'yai_sls_sent_records_total{logstore="app\\"log"} 3',
+            '# HELP yai_sls_queue_depth_records 队列中的日志条数',
+            '# TYPE yai_sls_queue_depth_records gauge',
+            'yai_sls_queue_depth_records{logstore="app\\"log"} 7',
+            '# HELP yai_sls_request_duration_seconds 耗时',
+            '# TYPE yai_sls_request_duration_seconds histogram',
+            'yai_sls_request_duration_seconds_bucket{logstore="app\\"log",le="0.1"} 0',
+            'yai_sls_request_duration_seconds_bucket{logstore="app\\"log",le="1.0"} 1',
+            'yai_sls_request_duration_seconds_bucket{logstore="app\\"log",le="+Inf"} 1',
+            'yai_sls_request_duration_seconds_sum{logstore="app\\"log"} 0.5',
+            'yai_sls_request_duration_seconds_count{logstore="app\\"log"} 1',
+        ]
+        assert registry.snapshot()['broken'] is None
+
+    @pytest.mark.unit
+    def test_duplicate_name_rejected(self):
+        """测试同名指标不能重复登记"""
+        registry = MetricsRegistry()
+        registry.counter("sent_records", "")
+        with pytest.raises(ValueError):
+            registry.gauge("sent_records", "", lambda: 0)
+
+
+class TestMetricsExporter:
+    """测试指标导出"""
+
+    @pytest.mark.unit
+    def test_serves_on_tcp_port(self):
+        """测试在本机端口上以 Prometheus 文本格式提供指标"""
+        exporter = MetricsExporter(lambda: "yai_sls_up 1\n", port=0)
+        try:
+            host, port = exporter.address
+            with urllib.request.urlopen(f"http://{host}:{port}/metrics", timeout=5) as response:
+                assert response.headers['Content-Type'].startswith("text/plain; version=0.0.4")
+                assert response.read() == b"yai_sls_up 1\n"
+            with pytest.raises(urllib.error.HTTPError):
+                urllib.request.urlopen(f"http://{host}:{port}/other", timeout=5)
+        finally:
+            exporter.close()
+
+    @pytest.mark.unit
+    @pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="需要 Unix socket")
+    def test_serves_on_unix_socket(self, tmp_path):
+        """测试在 Unix socket 上提供指标，关闭后删除 socket 文件"""
+        path = str(tmp_path / "metrics.sock")
+        exporter = MetricsExporter(lambda: "yai_sls_up 1\n", path=path)
+        try:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.settimeout(5)
+            conn.connect(path)
+            conn.sendall(b"GET /metrics HTTP/1.0\r\n\r\n")
+            response = b""
+            while True:
+                chunk = conn.recv(65536)
+                if not chunk:
+                    break
+                response += chunk
+            conn.close()
+        finally:
+            exporter.close()
+        assert response.startswith(b"HTTP/1.0 200")
+        assert response.endswith(b"\r\n\r\nyai_sls_up 1\n")
+        assert not (tmp_path / "metrics.sock").exists()
+
+    @pytest.mark.unit
+    @pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="需要 Unix socket")
+    def test_socket_path_checks(self, tmp_path):
+        """测试只删除残留的 socket 文件，不删除普通文件，也不抢占正在监听的 socket"""
+        path = tmp_path / "metrics.sock"
+        path.write_text("data")
+        with pytest.raises(FileExistsError):
+            MetricsExporter(lambda: "", path=str(path))
+        assert path.read_text() == "data"
+        path.unlink()
+
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(str(path))
+        stale.close()
+        exporter = MetricsExporter(lambda: "", path=str(path))
+        try:
+            with pytest.raises(FileExistsError):
+                MetricsExporter(lambda: "", path=str(path))
+        finally:
+            exporter.close()
+
+
+class TestSinkStats:
+    """测试 SlsSink.stats()"""
+
+    @pytest.mark.unit
+    def test_counts_sent_records(self, mock_aliyun_sdk):
+        """测试写入和发送成功的条数、请求耗时和批次条数"""
+        sink = SlsSink(make_config())
+        handler_id = logger.add(sink, format="{message}")
+        try:
+            for i in range(3):
+                logger.info(f"第 {i} 条")
+            assert wait_until(lambda: sink.stats()['sent_records'] == 3)
+            stats = sink.stats()
+        finally:
+            logger.remove(handler_id)
+
+        assert stats['enqueued_records'] == 3
+        assert stats['enqueued_bytes'] > 0
+        assert stats['sent_bytes'] > 0
+        assert stats['dropped_records'] == 0
+        assert stats['queue_depth_records'] == 0
+        assert stats['request_duration_seconds']['count'] == stats['batch_size_records']['count'] >= 1
+        assert stats['batch_size_records']['sum'] == 3
+        assert stats['compression']['codec'] == 'none'
+
+    @pytest.mark.unit
+    def test_queue_depth_and_oldest_age(self, mock_aliyun_sdk, monkeypatch):
+        """测试队列满丢弃计入 dropped，队列水位和最早记录的等待时间"""
+        monkeypatch.setattr(AsyncHandler, 'flush_worker', lambda self: None)
+        sink = SlsSink(make_config(queue_max_size=2, queue_full_policy='drop_newest'))
+        handler_id = logger.add(sink, format="{message}")
+        try:
+            for i in range(3):
+                logger.info(f"第 {i} 条")
+            time.sleep(0.05)
+            stats = sink.stats()
+        finally:
+            logger.remove(handler_id)
+
+        assert stats['enqueued_records'] == 3
+        assert stats['dropped_records'] == 1
+        assert stats['dropped_bytes'] > 0
+        assert stats['queue_depth_records'] == 2
+        assert stats['queue_depth_bytes'] > 0
+        assert 0.05 <= stats['oldest_record_age_seconds'] < 5
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('routing', [{}, {'hash_key_field': 'tenant'}])
+    def test_oversize_drops_counted(self, mock_aliyun_sdk, routing):
+        """测试组批时按 oversize_policy=drop 丢弃的超大记录计入 dropped"""
+        sink = SlsSink(make_config(record_max_bytes=1024, oversize_policy='drop', **routing))
+        handler_id = logger.add(sink, format="{message}")
+        try:
+            logger.info("x" * 5000)
+            logger.info("ok")
+            assert wait_until(lambda: sink.stats()['sent_records'] == 1)
+            assert wait_until(lambda: sink.stats()['dropped_records'] == 1)
+            stats = sink.stats()
+        finally:
+            logger.remove(handler_id)
+            sink.close()
+        assert stats['dropped_bytes'] > 5000
+
+    @pytest.mark.unit
+    def test_counts_failed_and_retried_batches(self, mock_aliyun_sdk):
+        """测试最终发送失败的批次计入 dropped，重新提交的批次计入 retried"""
+        sink = SlsSink(make_config(max_retries=0))
+        mock_aliyun_sdk['client']._send.side_effect = ValueError("bad request")
+        try:
+            sink.handle_failed_batch(LogBatch([(1, [('message', 'a')])] * 2, nbytes=100), ValueError("x"))
+            sink._resubmit(LogBatch([(1, [('message', 'b')])], nbytes=50))
+            assert wait_until(lambda: sink.stats()['dropped_records'] == 3)
+            stats = sink.stats()
+        finally:
+            sink.close()
+
+        assert stats['retried_records'] == 1
+        assert stats['retried_bytes'] == 50
+        assert stats['dropped_bytes'] == 150
+        assert stats['sent_records'] == 0
+        assert stats['request_duration_seconds']['count'] == 1
+
+    @pytest.mark.unit
+    def test_spooled_records(self, mock_aliyun_sdk, tmp_path):
+        """测试写入磁盘暂存的条数和字节数"""
+        sink = SlsSink(make_config(spool_dir=str(tmp_path / "spool")))
+        try:
+            sink.spool_replayer.close(timeout=1.0)
+            assert sink.spill_batch(LogBatch([(1, [('message', 'a')])] * 4))
+            stats = sink.stats()
+        finally:
+            sink.close()
+        assert stats['spooled_records'] == 4
+        assert stats['spooled_bytes'] > 0
+        assert stats['spool']['appended_logs'] == 4
+
+    @pytest.mark.unit
+    @pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="需要 Unix socket")
+    def test_sink_exports_metrics(self, mock_aliyun_sdk, tmp_path):
+        """测试配置 metrics_socket 后 sink 导出 Prometheus 指标，关闭 sink 时停止导出"""
+        path = str(tmp_path / "metrics.sock")
+        sink = SlsSink(make_config(metrics_socket=path))
+        try:
+            assert sink.metrics_exporter is not None
+            text = sink.render_metrics()
+        finally:
+            sink.close()
+        assert 'yai_sls_enqueued_records_total{project="test-project",logstore="test-logstore"} 0' in text
+        assert '# TYPE yai_sls_oldest_record_age_seconds gauge' in text
+        assert not (tmp_path / "metrics.sock").exists()
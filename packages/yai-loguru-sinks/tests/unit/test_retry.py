@@ -0,0 +1,212 @@
+"""测试失败批次的重试调度"""
+
+import pytest
+import threading
+import time
+
+from aliyun.log.logexception import LogException
+
+from yai_loguru_sinks.internal.data import LogBatch
+from yai_loguru_sinks.internal.retry import (
+    RetryBudget,
+    RetryScheduler,
+    is_retryable_error,
+)
+from yai_loguru_sinks.internal.sender import AdaptiveConcurrencyLimiter, BatchSender
+
+
+class TestRetryableError:
+    """测试错误分类"""
+
+    @pytest.mark.unit
+    def test_retryable(self):
+        """测试限流、5xx 和网络错误可重试"""
+        assert is_retryable_error(LogException('WriteQuotaExceed', 'quota', resp_status=403))
+        assert is_retryable_error(LogException('InternalServerError', 'oops', resp_status=500))
+        assert is_retryable_error(LogException('Unknown', 'bad gateway', resp_status=502))
+        assert is_retryable_error(LogException('LogRequestError', 'connection reset'))
+        assert is_retryable_error(ConnectionError("reset"))
+        assert is_retryable_error(TimeoutError("timed out"))
+
+    @pytest.mark.unit
+    def test_not_retryable(self):
+        """测试鉴权和请求格式错误不重试"""
+        assert not is_retryable_error(LogException('Unauthorized', 'bad key', resp_status=401))
+        assert not is_retryable_error(LogException('SignatureNotMatch', 'sig', resp_status=403))
+        assert not is_retryable_error(LogException('PostBodyInvalid', 'body', resp_status=400))
+        assert not is_retryable_error(LogException('LogStoreNotExist', 'none', resp_status=404))
+        assert not is_retryable_error(ValueError("bug"))
+
+
+class TestRetryBudget:
+    """测试全局重试预算"""
+
+    @pytest.mark.unit
+    def test_budget_limits_retries(self):
+        """测试令牌耗尽后拒绝重试，首次请求按比例补充"""
+        budget = RetryBudget(ratio=0.5, min_per_second=0.0, max_tokens=2)
+        assert budget.try_withdraw(now=0.0)
+        assert budget.try_withdraw(now=0.0)
+        assert not budget.try_withdraw(now=0.0)
+
+        budget.deposit()
+        assert not budget.try_withdraw(now=0.0)
+        budget.deposit()
+        assert budget.try_withdraw(now=0.0)
+
+    @pytest.mark.unit
+    def test_min_per_second_refill(self):
+        """测试按时间保底补充"""
+        budget = RetryBudget(ratio=0.0, min_per_second=2.0, max_tokens=1)
+        start = time.monotonic()
+        assert budget.try_withdraw(now=start)
+        assert not budget.try_withdraw(now=start + 0.1)
+        assert budget.try_withdraw(now=start + 0.6)
+
+
+class TestRetryScheduler:
+    """测试 RetryScheduler"""
+
+    @pytest.mark.unit
+    def test_backoff_grows_and_is_capped(self):
+        """测试退避上限按指数增长且不超过 max_delay"""
+        scheduler = RetryScheduler(lambda batch: None, base_delay=0.1, max_delay=0.5)
+        try:
+            for _ in range(50):
+                assert 0.0 <= scheduler.backoff(1) <= 0.1
+                assert 0.0 <= scheduler.backoff(3) <= 0.4
+                assert 0.0 <= scheduler.backoff(10) <= 0.5
+        finally:
+            scheduler.close()
+
+    @pytest.mark.unit
+    def test_resubmits_until_max_retries(self):
+        """测试可重试错误最多重试 max_retries 次"""
+        resubmitted = []
+        scheduler = RetryScheduler(resubmitted.append, max_retries=2, base_delay=0.0)
+        error = LogException('ServerBusy', 'busy', resp_status=503)
+        batch = LogBatch([(0, [])])
+        try:
+            assert scheduler.schedule(batch, error)
+            assert scheduler.schedule(batch, error)
+            assert not scheduler.schedule(batch, error)
+
+            deadline = time.monotonic() + 5.0
+            while len(resubmitted) < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert resubmitted == [batch, batch]
+            assert batch.attempt == 2
+        finally:
+            scheduler.close()
+
+    @pytest.mark.unit
+    def test_rejects_fatal_errors_expired_batches_and_empty_budget(self):
+        """测试不可重试错误、超过 timeout 的批次和预算耗尽时不重试"""
+        budget = RetryBudget(ratio=0.0, min_per_second=0.0, max_tokens=1)
+        scheduler = RetryScheduler(lambda batch: None, timeout=10.0, base_delay=0.0, budget=budget)
+        busy = LogException('ServerBusy', 'busy', resp_status=503)
+        try:
+            assert not scheduler.schedule(
+                LogBatch([]), LogException('Unauthorized', 'bad key', resp_status=401)
+            )
+            assert not scheduler.schedule(
+                LogBatch([], created_at=time.monotonic() - 11.0), busy
+            )
+            assert scheduler.schedule(LogBatch([]), busy)
+            assert not scheduler.schedule(LogBatch([]), busy)
+        finally:
+            scheduler.close()
+
+    @pytest.mark.unit
+    def test_close_resubmits_waiting_batches(self):
+        """测试关闭时等待中的批次立即重新提交"""
+        resubmitted = []
+        scheduler = RetryScheduler(resubmitted.append, base_delay=60.0, max_delay=60.0, timeout=0)
+        batch = LogBatch([])
+        scheduler.backoff = lambda attempt: 60.0
+
+        assert scheduler.schedule(batch, ConnectionError("reset"))
+        assert scheduler.waiting == 1
+        scheduler.close()
+
+        assert resubmitted == [batch]
+        assert not scheduler.schedule(LogBatch([]), ConnectionError("reset"))
+
+    @pytest.mark.unit
+    def test_sender_retries_without_blocking_fresh_batches(self):
+        """测试失败批次等待退避时，新批次照常发送"""
+        sent = []
+        failures = {'first': 1}
+        lock = threading.Lock()
+
+        def send(batch):
+            name = batch.logs[0][1]
+            with lock:
+                if failures.get(name):
+                    failures[name] -= 1
+                    raise LogException('ShardWriteQuotaExceed', 'slow down', resp_status=403)
+                sent.append(name)
+
+        errors = []
+        sender = BatchSender(
+            send,
+            AdaptiveConcurrencyLimiter(max_limit=1, adaptive=False),
+            on_error=lambda batch, e: errors.append(batch),
+        )
+        scheduler = RetryScheduler(sender.submit, base_delay=0.2, max_delay=0.2)
+        scheduler.backoff = lambda attempt: 0.2
+        sender.retry = scheduler
+
+        sender.submit(LogBatch([(0, 'first')]))
+        assert sender.wait_idle(timeout=5.0)
+        sender.submit(LogBatch([(0, 'second')]))
+        assert sender.wait_idle(timeout=5.0)
+        assert sent == ['second']
+
+        deadline = time.monotonic() + 5.0
+        while len(sent) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        scheduler.close()
+        assert sender.close(timeout=5.0)
+        assert sent == ['second', 'first']
+        assert errors == []
+
+    @pytest.mark.unit
+    def test_ordered_retry_keeps_position_in_lane(self):
+        """测试顺序通道中的失败批次重试时仍排在同一 hash_key 的后续批次之前"""
+        sent = []
+        failures = {0: 2}
+        lock = threading.Lock()
+        started = threading.Event()
+
+        def send(batch):
+            name = batch.logs[0][1]
+            started.set()
+            with lock:
+                if failures.get(name):
+                    failures[name] -= 1
+                    raise LogException('InternalServerError', 'boom', resp_status=500)
+                sent.append((batch.hash_key, name))
+
+        sender = BatchSender(
+            send, AdaptiveConcurrencyLimiter(max_limit=2, adaptive=False), ordered=True,
+            on_error=lambda batch, e: None,
+        )
+        scheduler = RetryScheduler(sender.submit, max_retries=3)
+        scheduler.backoff = lambda attempt: 0.05
+        sender.retry = scheduler
+
+        sender.submit(LogBatch([(0, 0)], hash_key='a'))
+        started.wait(5.0)
+        for i in range(1, 4):
+            sender.submit(LogBatch([(0, i)], hash_key='a'))
+        sender.submit(LogBatch([(0, 9)], hash_key='b'))
+
+        deadline = time.monotonic() + 5.0
+        while len(sent) < 5 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        scheduler.close()
+        assert sender.close(timeout=5.0)
+        assert [i for k, i in sent if k == 'a'] == [0, 1, 2, 3]
+        # 其他通道不受影响，不必等待重试
+        assert sent.index(('b', 9)) < sent.index(('a', 0))
@@ -0,0 +1,199 @@
+"""测试多日志库路由"""
+
+import time
+
+import pytest
+from loguru import logger
+
+from aliyun.log.log_logs_pb2 import LogGroup
+
+from yai_loguru_sinks.internal.batcher import LogBatcher
+from yai_loguru_sinks.internal.core import SlsSink
+from yai_loguru_sinks.internal.data import LogBatch, SlsConfig
+from yai_loguru_sinks.internal.field_plan import CONTEXT_KEY
+from yai_loguru_sinks.internal.log_group import LogGroupEncoder
+from yai_loguru_sinks.internal.routing import Destination, RouteRule, RouteTable
+from yai_loguru_sinks.internal.sharding import PartitionedBatcher, create_batcher
+from yai_loguru_sinks.internal.spool import decode_batch, encode_batch
+
+
+ROUTES = [
+    {'logstore': 'audit-logs', 'extra_keys': 'audit'},
+    {'logstore': 'error-logs', 'levels': ['error', 'critical']},
+    {'topic': 'payment', 'module_prefix': ('app.pay', 'app.billing')},
+]
+
+
+def to_contents(log_data):
+    """测试用的字段转换：只输出 message"""
+    return [('message', log_data['message'])]
+
+
+def make_config(**kwargs):
+    return SlsConfig(
+        endpoint="cn-hangzhou.log.aliyuncs.com",
+        access_key_id="test-access-key",
+        access_key_secret="test-access-secret",
+        project="test-project",
+        logstore="test-logstore",
+        **kwargs,
+    )
+
+
+def log(message, level='INFO', module='app.web', category='', **extra):
+    return {
+        'timestamp': 1700000000, 'message': message, 'level': level,
+        'module': module, 'category': category, 'extra': extra,
+    }
+
+
+class TestRouteTable:
+    """测试 RouteRule 和 RouteTable"""
+
+    @pytest.mark.unit
+    def test_first_matching_rule_wins(self):
+        """测试按顺序匹配，extra 规则优先于后面的级别规则，都不命中时返回 None"""
+        table = RouteTable(ROUTES)
+        assert table.resolve(log('a', level='ERROR', audit=1)) == Destination('audit-logs', None)
+        assert table.resolve(log('b', level='ERROR')) == Destination('error-logs', None)
+        assert table.resolve(log('c', module='app.billing.invoice')) == Destination(None, 'payment')
+        assert table.resolve(log('d')) is None
+        assert table.resolve({'message': 'no fields'}) is None
+        assert table.logstores == ['audit-logs', 'error-logs']
+
+    @pytest.mark.unit
+    def test_extra_keys_match_bound_context(self):
+        """测试 extra_keys 同时匹配 bind() / contextualize() 的值和 extra 参数"""
+        table = RouteTable(ROUTES)
+        bound = log('a')
+        bound[CONTEXT_KEY] = {'audit': None, 'extra': {}}
+        nested = log('b')
+        nested[CONTEXT_KEY] = {'extra': {'audit': 'login'}}
+        assert table.resolve(bound) == Destination('audit-logs', None)
+        assert table.resolve(nested) == Destination('audit-logs', None)
+        assert table.resolve(log('c', audit='login')) == Destination('audit-logs', None)
+        plain = log('d')
+        plain[CONTEXT_KEY] = {'other': 1}
+        assert table.resolve(plain) is None
+
+    @pytest.mark.unit
+    def test_categories_and_cache(self):
+        """测试分类条件，调用点计划被缓存"""
+        table = RouteTable([{'logstore': 'db-logs', 'categories': 'database'}], cache_size=16)
+        assert table.resolve(log('a', category='database')) == Destination('db-logs', None)
+        assert table.resolve(log('b', category='database')) == Destination('db-logs', None)
+        assert table.resolve(log('c', category='http')) is None
+        assert table._call_site_plan.cache_info().hits == 1
+
+        uncached = RouteTable([{'logstore': 'db-logs', 'categories': 'database'}], cache_size=0)
+        assert uncached.resolve(log('a', category='database')) == Destination('db-logs', None)
+
+    @pytest.mark.unit
+    def test_invalid_rules(self):
+        """测试未知字段和没有目标的规则"""
+        with pytest.raises(ValueError):
+            RouteRule.from_dict({'logstore': 'x', 'level': 'ERROR'})
+        with pytest.raises(ValueError):
+            RouteRule(levels=frozenset({'ERROR'}))
+        with pytest.raises(ValueError):
+            SlsSink(make_config(routes=[{'levels': ['ERROR']}]))
+
+    @pytest.mark.unit
+    def test_from_config(self):
+        """测试未配置路由规则时不创建路由表"""
+        assert RouteTable.from_config(make_config()) is None
+        assert len(RouteTable.from_config(make_config(routes=ROUTES)).rules) == 3
+
+
+class TestRoutedBatches:
+    """测试按写入目标组批"""
+
+    @pytest.mark.unit
+    def test_batches_per_destination(self):
+        """测试每个目标单独组批，批次带有日志库和 Topic"""
+        batcher = PartitionedBatcher(lambda: LogBatcher(to_contents, max_logs=10), routes=RouteTable(ROUTES))
+        for i in range(3):
+            batcher.add(log(f'info{i}'))
+            batcher.add(log(f'error{i}', level='ERROR'))
+        batcher.add(log('audit', audit=True))
+        batcher.add(log('pay', module='app.pay.api'))
+
+        batches = {(b.logstore, b.topic): [c[0][1] for _, c in b.logs] for b in batcher.flush_all()}
+        assert batches == {
+            (None, None): ['info0', 'info1', 'info2'],
+            ('error-logs', None): ['error0', 'error1', 'error2'],
+            ('audit-logs', None): ['audit'],
+            (None, 'payment'): ['pay'],
+        }
+
+    @pytest.mark.unit
+    def test_create_batcher_with_routes_and_hash_key(self):
+        """测试路由和 hashKey 分区可以同时使用"""
+        batcher = create_batcher(make_config(routes=ROUTES, hash_key_field='tenant'), to_contents)
+        assert isinstance(batcher, PartitionedBatcher)
+        batcher.add(log('a', level='ERROR', tenant='t1'))
+        batcher.add(log('b', level='ERROR', tenant='t2'))
+        batches = batcher.flush_all()
+        assert {b.logstore for b in batches} == {'error-logs'}
+        assert {b.hash_key for b in batches} == {
+            batcher.router.hash_key({'tenant': 't1'}), batcher.router.hash_key({'tenant': 't2'})
+        }
+
+    @pytest.mark.unit
+    def test_topic_override_and_spool_round_trip(self):
+        """测试编码器按批次覆盖 Topic，暂存后保留写入目标"""
+        encoder = LogGroupEncoder(topic='default', source='host-1')
+        group = LogGroup()
+        group.ParseFromString(encoder.encode([(1, [('k', 'v')])], topic='payment'))
+        assert (group.Topic, group.Source) == ('payment', 'host-1')
+        group.ParseFromString(encoder.encode([(1, [('k', 'v')])]))
+        assert group.Topic == 'default'
+
+        batch = decode_batch(encode_batch(LogBatch([(1, [('k', 'v')])], logstore='audit-logs', topic='t')))
+        assert (batch.logstore, batch.topic) == ('audit-logs', 't')
+        batch = decode_batch(encode_batch(LogBatch([(1, [('k', 'v')])])))
+        assert (batch.logstore, batch.topic) == (None, None)
+
+
+class TestSlsSinkRouting:
+    """测试 SlsSink 按规则写入多个日志库"""
+
+    @pytest.mark.unit
+    def test_sink_writes_each_destination(self, mock_aliyun_sdk):
+        """测试一个 sink 按路由规则写入不同日志库和 Topic"""
+        config = make_config(
+            routes=ROUTES,
+            topic='app',
+            flush_interval=0.05,
+            compress_codec='none',
+            host_metadata_ttl=0,
+        )
+        sink = SlsSink(config)
+        handler_id = logger.add(sink, format="{message}")
+        try:
+            logger.info("普通")
+            logger.error("出错")
+            logger.bind(extra={'audit': 'login'}).info("审计")
+            logger.bind(audit='logout').info("绑定审计")
+            deadline = time.monotonic() + 5.0
+            while not sink.log_queue.empty() and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            logger.remove(handler_id)
+            sink.close()
+
+        received = {}
+        for call in mock_aliyun_sdk['client']._send.call_args_list:
+            _, _, body, resource, _, _ = call.args
+            group = LogGroup()
+            group.ParseFromString(body)
+            logstore = resource.split('/')[2]
+            for item in group.Logs:
+                message = dict((c.Key, c.Value) for c in item.Contents)['message']
+                received[message] = (logstore, group.Topic)
+        assert received == {
+            "普通": ('test-logstore', 'app'),
+            "出错": ('error-logs', 'app'),
+            "审计": ('audit-logs', 'app'),
+            "绑定审计": ('audit-logs', 'app'),
+        }
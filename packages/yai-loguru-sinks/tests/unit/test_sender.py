@@ -0,0 +1,223 @@
+"""测试并发发送阶段"""
+
+import pytest
+import threading
+import time
+
+from aliyun.log.logexception import LogException
+
+from yai_loguru_sinks.internal.data import LogBatch
+from yai_loguru_sinks.internal.sender import (
+    OUTCOME_ERROR,
+    OUTCOME_THROTTLED,
+    AdaptiveConcurrencyLimiter,
+    BatchSender,
+    is_throttling_error,
+)
+
+
+class TestAdaptiveConcurrencyLimiter:
+    """测试 AIMD 并发限制器"""
+
+    @pytest.mark.unit
+    def test_additive_increase(self):
+        """测试请求成功时并发上限逐步增加，不超过最大值"""
+        limiter = AdaptiveConcurrencyLimiter(max_limit=4)
+        assert limiter.limit == 1
+
+        for _ in range(20):
+            assert limiter.acquire(timeout=0)
+            limiter.release(0.04)
+
+        assert limiter.limit == 4
+        assert limiter.baseline_latency == pytest.approx(0.04)
+
+    @pytest.mark.unit
+    def test_throttling_halves_limit(self):
+        """测试限流时并发上限乘性减小"""
+        limiter = AdaptiveConcurrencyLimiter(max_limit=8, initial_limit=8)
+
+        limiter.acquire()
+        limiter.release(0.04, OUTCOME_THROTTLED)
+        assert limiter.limit == 4
+
+        for _ in range(5):
+            limiter.acquire()
+            limiter.release(0.04, OUTCOME_THROTTLED)
+        assert limiter.limit == 1
+
+    @pytest.mark.unit
+    def test_latency_increase_shrinks_limit(self):
+        """测试延迟显著高于基线时收缩"""
+        limiter = AdaptiveConcurrencyLimiter(max_limit=8, initial_limit=8)
+        limiter.acquire()
+        limiter.release(0.04)
+
+        limiter.acquire()
+        limiter.release(0.5)
+        assert limiter.limit == 7
+
+    @pytest.mark.unit
+    def test_other_errors_do_not_change_limit(self):
+        """测试非限流错误不影响并发上限"""
+        limiter = AdaptiveConcurrencyLimiter(max_limit=8, initial_limit=3)
+        limiter.acquire()
+        limiter.release(0.04, OUTCOME_ERROR)
+        assert limiter.limit == 3
+
+    @pytest.mark.unit
+    def test_fixed_limit(self):
+        """测试关闭自适应时固定为最大值"""
+        limiter = AdaptiveConcurrencyLimiter(max_limit=3, adaptive=False)
+        assert limiter.limit == 3
+
+        for _ in range(3):
+            assert limiter.acquire(timeout=0)
+        assert not limiter.acquire(timeout=0.01)
+        limiter.release(10.0, OUTCOME_THROTTLED)
+        assert limiter.limit == 3
+        assert limiter.in_flight == 2
+
+
+class TestThrottlingError:
+    """测试限流错误识别"""
+
+    @pytest.mark.unit
+    def test_is_throttling_error(self):
+        """测试错误码和 HTTP 状态码"""
+        assert is_throttling_error(LogException('WriteQuotaExceed', 'quota', resp_status=403))
+        assert is_throttling_error(LogException('Unknown', 'busy', resp_status=503))
+        assert not is_throttling_error(LogException('Unauthorized', 'bad key', resp_status=401))
+        assert not is_throttling_error(ConnectionError("reset"))
+
+
+class TestBatchSender:
+    """测试 BatchSender"""
+
+    @pytest.mark.unit
+    def test_requests_run_concurrently(self):
+        """测试多个请求同时在途"""
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def send(batch):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.05)
+            with lock:
+                active -= 1
+
+        sender = BatchSender(send, AdaptiveConcurrencyLimiter(max_limit=4, adaptive=False))
+        for i in range(8):
+            sender.submit(LogBatch([(0, i)]))
+
+        assert sender.close(timeout=5.0)
+        assert peak == 4
+
+    @pytest.mark.unit
+    def test_ordered_delivery_per_hash_key(self):
+        """测试相同 hash_key 的批次按提交顺序发送"""
+        sent = []
+        lock = threading.Lock()
+
+        def send(batch):
+            time.sleep(0.01 if batch.logs[0][1] % 2 == 0 else 0)
+            with lock:
+                sent.append((batch.hash_key, batch.logs[0][1]))
+
+        sender = BatchSender(
+            send, AdaptiveConcurrencyLimiter(max_limit=4, adaptive=False), ordered=True
+        )
+        for i in range(12):
+            sender.submit(LogBatch([(0, i)], hash_key='a' if i % 3 else 'b'))
+
+        assert sender.close(timeout=5.0)
+        for key in ('a', 'b'):
+            order = [i for k, i in sent if k == key]
+            assert order == sorted(order)
+        assert len(sent) == 12
+
+    @pytest.mark.unit
+    def test_take_queued_leaves_in_flight_batches(self):
+        """测试 take_queued 取出通道中排队的批次，在途的批次照常完成"""
+        release = threading.Event()
+        sent = []
+
+        def send(batch):
+            release.wait(5.0)
+            sent.append(batch.logs[0][1])
+
+        sender = BatchSender(
+            send, AdaptiveConcurrencyLimiter(max_limit=2, adaptive=False), ordered=True
+        )
+        for i in range(3):
+            sender.submit(LogBatch([(0, i), (0, i)], hash_key='a'))
+        assert sender.pending_logs == 6
+
+        taken = sender.take_queued()
+        assert [batch.logs[0][1] for batch in taken] == [1, 2]
+        assert sender.pending == 1 and sender.pending_logs == 2
+        release.set()
+        assert sender.close(timeout=5.0)
+        assert sent == [0]
+        assert sender.pending_logs == 0
+
+    @pytest.mark.unit
+    def test_errors_are_reported_and_shrink_limit(self):
+        """测试发送失败时调用回调并根据限流收缩并发"""
+        errors = []
+
+        def send(batch):
+            raise LogException('ShardWriteQuotaExceed', 'slow down', resp_status=403)
+
+        limiter = AdaptiveConcurrencyLimiter(max_limit=4, initial_limit=4)
+        sender = BatchSender(send, limiter, on_error=lambda batch, e: errors.append(batch))
+        sender.submit(LogBatch([(0, 1)]))
+
+        assert sender.close(timeout=5.0)
+        assert len(errors) == 1
+        assert limiter.limit == 2
+        assert sender.pending == 0
+
+    @pytest.mark.unit
+    def test_lanes_do_not_deadlock_after_limit_shrinks(self):
+        """测试并发上限收缩到 1 后，通道的后续批次不占住线程池，flush worker 提交的批次照常执行"""
+        release = threading.Event()
+        sent = []
+        lock = threading.Lock()
+
+        def send(batch):
+            if batch.logs[0][1] == 0 and batch.hash_key in ('a', 'b'):
+                release.wait(5.0)
+            with lock:
+                sent.append((batch.hash_key, batch.logs[0][1]))
+
+        limiter = AdaptiveConcurrencyLimiter(max_limit=2, adaptive=False)
+        sender = BatchSender(send, limiter, ordered=True)
+        sender._max_pending = 100
+        # 两个线程都在发送，两条通道各排着一个后续批次
+        for i in range(2):
+            for key in ('a', 'b'):
+                sender.submit(LogBatch([(0, i)], hash_key=key))
+        # flush worker 等待名额
+        producer = threading.Thread(
+            target=sender.submit, args=(LogBatch([(0, 0)], hash_key='c'),), daemon=True
+        )
+        producer.start()
+        time.sleep(0.1)
+        # 相当于限流后 AIMD 把上限降到 1
+        limiter._limit = 1.0
+
+        # 两个线程发送完成、准备继续各自的通道时，名额先被 flush worker 拿到
+        with sender._lanes_lock:
+            release.set()
+            producer.join(timeout=5.0)
+            assert not producer.is_alive()
+
+        assert sender.close(timeout=5.0)
+        assert len(sent) == 5
+        for key in ('a', 'b'):
+            assert [i for k, i in sent if k == key] == [0, 1]
@@ -0,0 +1,206 @@
+"""测试按记录字段路由到 SLS shard"""
+
+import time
+
+import pytest
+from loguru import logger
+
+from aliyun.log.log_logs_pb2 import LogGroup
+
+from yai_loguru_sinks.internal.batcher import LogBatcher
+from yai_loguru_sinks.internal.core import SlsSink
+from yai_loguru_sinks.internal.data import SlsConfig
+from yai_loguru_sinks.internal.field_plan import CONTEXT_KEY
+from yai_loguru_sinks.internal.sharding import (
+    PartitionedBatcher,
+    ShardRouter,
+    create_batcher,
+    partition_hash_keys,
+)
+
+
+def to_contents(log_data):
+    """测试用的字段转换：只输出 message"""
+    return [('message', log_data['message'])]
+
+
+def make_config(**kwargs):
+    return SlsConfig(
+        endpoint="cn-hangzhou.log.aliyuncs.com",
+        access_key_id="test-access-key",
+        access_key_secret="test-access-secret",
+        project="test-project",
+        logstore="test-logstore",
+        **kwargs,
+    )
+
+
+def log(message, **extra):
+    """创建日志数据，路由字段放在 extra 中"""
+    return {'timestamp': 1700000000, 'message': message, 'extra': extra}
+
+
+class TestShardRouter:
+    """测试 ShardRouter"""
+
+    @pytest.mark.unit
+    def test_partition_hash_keys_spread_over_md5_space(self):
+        """测试分区 hashKey 为 32 位十六进制，均匀分布在 MD5 空间"""
+        keys = partition_hash_keys(4)
+        assert keys == sorted(keys)
+        assert all(len(key) == 32 for key in keys)
+        assert keys[0] == '2' + '0' * 31
+        assert keys[3] == 'e' + '0' * 31
+
+    @pytest.mark.unit
+    def test_same_value_same_hash_key(self):
+        """测试相同取值总是映射到相同的 hashKey，取值先查记录字段再查 extra"""
+        router = ShardRouter('tenant', partitions=8)
+        key = router.hash_key(log('a', tenant='t-1'))
+        assert key in router.hash_keys
+        assert router.hash_key({'tenant': 't-1', 'message': 'b'}) == key
+        assert router.hash_key(log('c', tenant=42)) == router.hash_key(log('d', tenant='42'))
+        assert len({router.hash_key(log('x', tenant=f't-{i}')) for i in range(200)}) == 8
+
+    @pytest.mark.unit
+    def test_missing_field(self):
+        """测试没有路由字段的记录不带 hashKey"""
+        router = ShardRouter('tenant')
+        assert router.hash_key(log('a')) is None
+        assert router.hash_key({'message': 'a', 'extra': 'not-a-dict'}) is None
+
+    @pytest.mark.unit
+    def test_bound_context(self):
+        """测试 bind() / contextualize() 的值（loguru extra 顶层）也参与路由"""
+        router = ShardRouter('trace_id', partitions=8)
+        bound = {'message': 'a', CONTEXT_KEY: {'trace_id': 'T-1', 'extra': {}}}
+        nested = {'message': 'b', CONTEXT_KEY: {'extra': {'trace_id': 'T-1'}}}
+        assert router.hash_key(bound) is not None
+        assert router.hash_key(bound) == router.hash_key(nested) == router.hash_key(log('c', trace_id='T-1'))
+
+    @pytest.mark.unit
+    def test_invalid_arguments(self):
+        """测试空字段和非法分区数"""
+        with pytest.raises(ValueError):
+            ShardRouter('')
+        with pytest.raises(ValueError):
+            ShardRouter('tenant', partitions=0)
+
+
+class TestPartitionedBatcher:
+    """测试 PartitionedBatcher"""
+
+    @pytest.mark.unit
+    def test_batches_per_partition(self):
+        """测试每个分区单独组批，批次带有分区的 hashKey 且分区内保持顺序"""
+        router = ShardRouter('tenant', partitions=4)
+        batcher = PartitionedBatcher(lambda: LogBatcher(to_contents, max_logs=3), router)
+
+        sealed = []
+        for i in range(10):
+            sealed.extend(batcher.add(log(f'a{i}', tenant='a')))
+            sealed.extend(batcher.add(log(f'b{i}', tenant='b')))
+        sealed.extend(batcher.add(log('none')))
+        assert batcher.pending_logs == 3
+        assert batcher.opened_at > 0
+        sealed.extend(batcher.flush_all())
+        assert batcher.pending_logs == 0
+        assert batcher.flush_all() == []
+
+        by_key = {}
+        for batch in sealed:
+            by_key.setdefault(batch.hash_key, []).extend(c[0][1] for _, c in batch.logs)
+        assert by_key[router.hash_key(log('', tenant='a'))] == [f'a{i}' for i in range(10)]
+        assert by_key[router.hash_key(log('', tenant='b'))] == [f'b{i}' for i in range(10)]
+        assert by_key[None] == ['none']
+
+    @pytest.mark.unit
+    def test_create_batcher_from_config(self):
+        """测试未配置 hash_key_field 时使用普通组批器"""
+        assert isinstance(create_batcher(make_config(), to_contents), LogBatcher)
+        batcher = create_batcher(make_config(hash_key_field='tenant', hash_key_partitions=2), to_contents)
+        assert isinstance(batcher, PartitionedBatcher)
+        assert batcher.router.partitions == 2
+
+
+class TestSlsSinkSharding:
+    """测试 SlsSink 按字段路由"""
+
+    @pytest.mark.unit
+    def test_routes_batches_by_field(self, mock_aliyun_sdk):
+        """测试批次按路由字段带上 hashKey 发送，同一取值的记录保持顺序"""
+        config = make_config(
+            hash_key_field='tenant',
+            hash_key_partitions=4,
+            flush_interval=0.05,
+            batch_size=5,
+            compress_codec='none',
+            host_metadata_ttl=0,
+        )
+        sink = SlsSink(config)
+        assert sink.sender.ordered
+        handler_id = logger.add(sink, format="{message}")
+        try:
+            for i in range(20):
+                logger.bind(extra={'tenant': f't{i % 3}'}).info("{}", i)
+            deadline = time.monotonic() + 5.0
+            while not sink.log_queue.empty() and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            logger.remove(handler_id)
+            sink.close()
+
+        router = sink.async_handler.batcher.router
+        received = {}
+        for call in mock_aliyun_sdk['client']._send.call_args_list:
+            _, _, body, resource, params, _ = call.args
+            assert resource.endswith('/shards/route')
+            group = LogGroup()
+            group.ParseFromString(body)
+            messages = [dict((c.Key, c.Value) for c in item.Contents)['message'] for item in group.Logs]
+            received.setdefault(params['key'], []).extend(int(m) for m in messages)
+
+        for tenant in range(3):
+            expected = [i for i in range(20) if i % 3 == tenant]
+            key = router.hash_key({'tenant': f't{tenant}'})
+            assert [i for i in received[key] if i % 3 == tenant] == expected
+        assert sorted(i for values in received.values() for i in values) == list(range(20))
+
+    @pytest.mark.unit
+    def test_routes_by_bound_field(self, mock_aliyun_sdk):
+        """测试 logger.bind() 绑定的路由字段带上 hashKey，不写入 extra 字段的记录同样路由"""
+        sink = SlsSink(make_config(
+            hash_key_field='trace_id',
+            hash_key_partitions=4,
+            flush_interval=0.05,
+            compress_codec='none',
+            host_metadata_ttl=0,
+            include_fields=['message'],
+        ))
+        handler_id = logger.add(sink, format="{message}")
+        try:
+            logger.bind(trace_id='T-1').info("bound")
+            with logger.contextualize(trace_id='T-2'):
+                logger.info("contextualized")
+            logger.info("plain")
+            deadline = time.monotonic() + 5.0
+            while not sink.log_queue.empty() and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            logger.remove(handler_id)
+            sink.close()
+
+        router = sink.async_handler.batcher.router
+        received = {}
+        for call in mock_aliyun_sdk['client']._send.call_args_list:
+            _, _, body, resource, params, _ = call.args
+            group = LogGroup()
+            group.ParseFromString(body)
+            for item in group.Logs:
+                contents = dict((c.Key, c.Value) for c in item.Contents)
+                assert set(contents) == {'message'}
+                received[contents['message']] = params.get('key')
+
+        assert received['bound'] == router.hash_key({'trace_id': 'T-1'})
+        assert received['contextualized'] == router.hash_key({'trace_id': 'T-2'})
+        assert received['plain'] is None
@@ -0,0 +1,338 @@
+"""测试共享内存环形缓冲区"""
+
+import os
+import struct
+import time
+
+import pytest
+from loguru import logger
+
+from yai_loguru_sinks.internal import shm_ring
+from yai_loguru_sinks.internal.collector import RingCollectorClient
+from yai_loguru_sinks.internal.collector_server import CollectorServer, create_collector_ring
+from yai_loguru_sinks.internal.core import SlsSink
+from yai_loguru_sinks.internal.data import LogBatch, SlsConfig
+from yai_loguru_sinks.internal.shm_ring import SharedRingBuffer
+
+pytestmark = pytest.mark.skipif(
+    not (shm_ring.HAS_FCNTL and shm_ring.HAS_TSO), reason="需要 fcntl 和 x86 的写入顺序"
+)
+
+
+def make_config(**kwargs):
+    kwargs.setdefault('compress_codec', 'none')
+    kwargs.setdefault('host_metadata_ttl', 0)
+    kwargs.setdefault('flush_interval', 0.05)
+    return SlsConfig(
+        endpoint="cn-hangzhou.log.aliyuncs.com",
+        access_key_id="test-access-key",
+        access_key_secret="test-access-secret",
+        project="test-project",
+        logstore="test-logstore",
+        **kwargs,
+    )
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def dead_pid():
+    """一个刚退出并已回收的进程的 pid"""
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0)
+    os.waitpid(pid, 0)
+    return pid
+
+
+@pytest.fixture
+def ring_path(tmp_path):
+    return str(tmp_path / "ring")
+
+
+class TestSharedRingBuffer:
+    """测试单进程内的读写"""
+
+    @pytest.mark.unit
+    def test_put_and_drain(self, ring_path):
+        """测试记录按写入顺序取出，取出后释放空间"""
+        ring = SharedRingBuffer.create(ring_path, capacity=4096)
+        writer = SharedRingBuffer.attach(ring_path)
+        try:
+            for i in range(5):
+                assert writer.put(f"record-{i}".encode())
+            assert ring.used_bytes > 0
+            assert ring.drain(3) == [b"record-0", b"record-1", b"record-2"]
+            assert ring.drain(10) == [b"record-3", b"record-4"]
+            assert ring.used_bytes == 0
+            assert ring.drain(10, timeout=0.05) == []
+        finally:
+            writer.close()
+            ring.close()
+
+    @pytest.mark.unit
+    def test_wraps_around_with_padding(self, ring_path):
+        """测试尾部放不下时写入填充记录，从数据区开头继续"""
+        ring = SharedRingBuffer.create(ring_path, capacity=256)
+        try:
+            payloads = [bytes([i]) * 50 for i in range(40)]
+            received = []
+            for payload in payloads:
+                assert ring.put(payload, timeout=0)
+                received.extend(ring.drain(1))
+            assert received == payloads
+            assert ring.used_bytes == 0
+        finally:
+            ring.close()
+
+    @pytest.mark.unit
+    def test_drop_newest_when_full(self, ring_path):
+        """测试 drop_newest 策略下缓冲区满时丢弃新记录并计数"""
+        ring = SharedRingBuffer.create(ring_path, capacity=256)
+        writer = SharedRingBuffer.attach(ring_path, policy='drop_newest')
+        try:
+            written = 0
+            while writer.put(b"x" * 48):
+                written += 1
+            assert written == 4
+            assert not writer.put(b"x" * 48)
+            assert ring.dropped == 2
+            assert len(ring.drain(10)) == 4
+            assert writer.put(b"x" * 48)
+        finally:
+            writer.close()
+            ring.close()
+
+    @pytest.mark.unit
+    def test_block_waits_for_space(self, ring_path):
+        """测试 block 策略下等待读方释放空间，超时后丢弃"""
+        ring = SharedRingBuffer.create(ring_path, capacity=128)
+        try:
+            assert ring.put(b"x" * 48)
+            assert ring.put(b"x" * 48)
+            start = time.monotonic()
+            assert not ring.put(b"x" * 48, timeout=0.1)
+            assert time.monotonic() - start >= 0.1
+            assert ring.dropped == 1
+        finally:
+            ring.close()
+
+    @pytest.mark.unit
+    def test_skips_stalled_reservation(self, ring_path):
+        """测试写方预留后未提交时读方等待，超过 stall_timeout 且写方已退出时跳过"""
+        ring = SharedRingBuffer.create(ring_path, capacity=4096, stall_timeout=0.1)
+        try:
+            offset = ring._reserve(8, shm_ring._align(shm_ring.RECORD_HEADER.size + 8), timeout=0)
+            # 模拟写方预留后崩溃：记录头中的进程号改为已退出的进程
+            shm_ring.RECORD_HEADER.pack_into(
+                ring._map, shm_ring.DATA_OFFSET + offset, 8, shm_ring.STATE_RESERVED, dead_pid()
+            )
+            assert ring.put(b"after")
+            assert ring.drain(10) == []
+            time.sleep(0.15)
+            assert ring.drain(10) == [b"after"]
+            assert ring.stalled == 1
+        finally:
+            ring.close()
+
+    @pytest.mark.unit
+    def test_waits_for_slow_live_writer(self, ring_path):
+        """测试写方进程仍存活时超过 stall_timeout 也不跳过，提交后按顺序取出"""
+        ring = SharedRingBuffer.create(ring_path, capacity=4096, stall_timeout=0.05)
+        try:
+            # 本进程预留后还没复制完
+            offset = ring._reserve(4, shm_ring._align(shm_ring.RECORD_HEADER.size + 4), timeout=0)
+            assert ring.put(b"after")
+            assert ring.drain(10) == []
+            time.sleep(0.1)
+            assert ring.drain(10) == []
+            assert ring.stalled == 0
+
+            start = shm_ring.DATA_OFFSET + offset + shm_ring.RECORD_HEADER.size
+            ring._map[start:start + 4] = b"slow"
+            shm_ring.RECORD_HEADER.pack_into(
+                ring._map, shm_ring.DATA_OFFSET + offset, 4, shm_ring.STATE_COMMITTED, 0
+            )
+            assert ring.drain(10) == [b"slow", b"after"]
+        finally:
+            ring.close()
+
+    @pytest.mark.unit
+    def test_rejects_invalid_input(self, ring_path, tmp_path):
+        """测试超过容量的记录、未知策略和无效文件"""
+        ring = SharedRingBuffer.create(ring_path, capacity=64)
+        try:
+            with pytest.raises(ValueError):
+                ring.put(b"x" * 64)
+            with pytest.raises(ValueError):
+                SharedRingBuffer.attach(ring_path, policy='drop_oldest')
+        finally:
+            ring.close()
+
+        invalid = tmp_path / "invalid"
+        invalid.write_bytes(b"\0" * 256)
+        with pytest.raises(ValueError):
+            SharedRingBuffer.attach(str(invalid))
+        with pytest.raises(FileNotFoundError):
+            SharedRingBuffer.attach(str(tmp_path / "missing"))
+
+    @pytest.mark.unit
+    def test_refuses_weakly_ordered_platform(self, ring_path, monkeypatch):
+        """测试写入顺序不保证的平台上拒绝创建和打开缓冲区"""
+        ring = SharedRingBuffer.create(ring_path, capacity=256)
+        monkeypatch.setattr(shm_ring, 'HAS_TSO', False)
+        try:
+            with pytest.raises(OSError):
+                SharedRingBuffer.create(ring_path + '.arm', capacity=256)
+            with pytest.raises(OSError):
+                SharedRingBuffer.attach(ring_path)
+            # worker 打开失败时直接上传
+            assert RingCollectorClient(ring_path, 'app-log', 'web').send(LogBatch([(1, [('message', 'a')])])) is False
+        finally:
+            ring.close()
+        assert not os.path.exists(ring_path + '.arm')
+
+    @pytest.mark.unit
+    def test_consumer_state(self, ring_path):
+        """测试读方进程号和退出标记"""
+        ring = SharedRingBuffer.create(ring_path, capacity=256)
+        writer = SharedRingBuffer.attach(ring_path)
+        try:
+            assert writer.consumer_pid == os.getpid()
+            assert writer.consumer_alive()
+            ring.mark_closed()
+            assert not writer.consumer_alive()
+        finally:
+            writer.close()
+            ring.close()
+        ring.unlink()
+        assert not os.path.exists(ring_path)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="需要 os.fork")
+class TestMultiProcess:
+    """测试多个写方进程"""
+
+    @pytest.mark.unit
+    def test_producers_in_many_processes(self, ring_path):
+        """测试多个进程同时写入小缓冲区，记录不丢失、不交错，每个进程内保持顺序"""
+        ring = SharedRingBuffer.create(ring_path, capacity=1024)
+        processes, records = 4, 300
+        pids = []
+        for producer in range(processes):
+            pid = os.fork()
+            if pid == 0:
+                code = 1
+                try:
+                    writer = SharedRingBuffer.attach(ring_path, block_timeout=30.0)
+                    for i in range(records):
+                        if not writer.put(struct.pack('<II', producer, i) + b"p" * (i % 40)):
+                            break
+                    else:
+                        code = 0
+                finally:
+                    os._exit(code)
+            pids.append(pid)
+
+        received = []
+        try:
+            deadline = time.monotonic() + 30
+            while len(received) < processes * records and time.monotonic() < deadline:
+                received.extend(ring.drain(64, timeout=0.1))
+        finally:
+            statuses = [os.waitpid(pid, 0)[1] for pid in pids]
+            dropped = ring.dropped
+            ring.close()
+
+        assert all(os.WEXITSTATUS(status) == 0 for status in statuses)
+        assert dropped == 0
+        sequences = {producer: [] for producer in range(processes)}
+        for item in received:
+            producer, i = struct.unpack_from('<II', item)
+            assert item[8:] == b"p" * (i % 40)
+            sequences[producer].append(i)
+        assert all(seq == list(range(records)) for seq in sequences.values())
+
+
+class TestRingCollector:
+    """测试经共享内存缓冲区写入采集进程"""
+
+    @pytest.mark.unit
+    def test_client_falls_back_without_ring(self, ring_path):
+        """测试缓冲区不存在或读方已退出时返回 False"""
+        client = RingCollectorClient(ring_path, 'app-log', 'web', retry_interval=60.0)
+        batch = LogBatch([(1, [('message', 'a')])])
+        assert not client.send(batch)
+
+        ring = SharedRingBuffer.create(ring_path, capacity=4096)
+        try:
+            client._retry_at = 0.0
+            assert client.send(batch)
+            assert client.connected
+            ring.mark_closed()
+            assert not client.send(batch)
+            assert not client.connected
+        finally:
+            client.close()
+            ring.close()
+
+    @pytest.mark.unit
+    def test_client_ring_policy(self, ring_path):
+        """测试 collector_ring_policy=drop_newest 时缓冲区满不等待，批次交给调用方直接上传"""
+        with pytest.raises(ValueError):
+            RingCollectorClient(ring_path, 'app-log', 'web', policy='drop_oldest')
+        ring = SharedRingBuffer.create(ring_path, capacity=256)
+        client = RingCollectorClient.from_config(
+            make_config(collector_ring=ring_path, collector_ring_policy='drop_newest', timeout=5.0)
+        )
+        batch = LogBatch([(1, [('message', 'x' * 100)])])
+        try:
+            assert client.send(batch)
+            start = time.monotonic()
+            assert not client.send(batch)
+            assert time.monotonic() - start < 1.0
+            assert client.connected
+            assert ring.dropped == 1
+        finally:
+            client.close()
+            ring.close()
+
+    @pytest.mark.unit
+    def test_refuses_second_collector(self, ring_path):
+        """测试已有存活的读方时不重建缓冲区，读方已退出时重建"""
+        ring = create_collector_ring(ring_path, 4096)
+        ring.put(b"pending")
+        try:
+            existing = SharedRingBuffer.attach(ring_path)
+            # 模拟另一个存活的采集进程
+            shm_ring.U64.pack_into(existing._map, shm_ring.CONSUMER_PID_OFFSET, os.getppid())
+            existing.close()
+            with pytest.raises(RuntimeError):
+                create_collector_ring(ring_path, 4096)
+            ring.mark_closed()
+            rebuilt = create_collector_ring(ring_path, 4096)
+            assert rebuilt.drain(10) == []
+            rebuilt.close()
+        finally:
+            ring.close()
+
+    @pytest.mark.unit
+    def test_sink_writes_through_ring(self, mock_aliyun_sdk, ring_path, tmp_path):
+        """测试配置 collector_ring 后 worker 的记录经缓冲区由采集进程上传"""
+        server = CollectorServer.from_config(make_config(), str(tmp_path / "collector.sock"), ring_path=ring_path)
+        server.start()
+        sink = SlsSink(make_config(collector_ring=ring_path))
+        handler_id = logger.add(sink, format="{message}")
+        try:
+            logger.info("经共享内存")
+            assert wait_until(lambda: server.received_logs == 1)
+            assert wait_until(lambda: mock_aliyun_sdk['client']._send.call_count == 1)
+            assert sink.async_handler.collector.connected
+        finally:
+            logger.remove(handler_id)
+            server.close()
+        assert not os.path.exists(ring_path)
@@ -0,0 +1,226 @@
+"""测试关闭时按截止时间排空 sink"""
+
+import threading
+import time
+import weakref
+from unittest.mock import Mock
+
+import pytest
+from loguru import logger
+
+from aliyun.log.log_logs_pb2 import LogGroup
+
+from yai_loguru_sinks.internal import shutdown
+from yai_loguru_sinks.internal.async_handler import AsyncHandler
+from yai_loguru_sinks.internal.core import SlsSink
+from yai_loguru_sinks.internal.data import LogBatch, SlsConfig
+from yai_loguru_sinks.internal.spool import DiskSpool
+
+
+def make_config(**kwargs):
+    kwargs.setdefault('compress_codec', 'none')
+    kwargs.setdefault('host_metadata_ttl', 0)
+    return SlsConfig(
+        endpoint="cn-hangzhou.log.aliyuncs.com",
+        access_key_id="test-access-key",
+        access_key_secret="test-access-secret",
+        project="test-project",
+        logstore="test-logstore",
+        **kwargs,
+    )
+
+
+@pytest.fixture
+def idle_worker(monkeypatch):
+    """flush worker 立即退出，记录留在队列中等待关闭时排空"""
+    monkeypatch.setattr(AsyncHandler, 'flush_worker', lambda self: None)
+
+
+def sent_messages(client):
+    """按请求顺序解析 mock 客户端收到的消息"""
+    requests = []
+    for call in client._send.call_args_list:
+        group = LogGroup()
+        group.ParseFromString(call.args[2])
+        requests.append([dict((c.Key, c.Value) for c in log.Contents)['message'] for log in group.Logs])
+    return requests
+
+
+class TestShutdownDrain:
+    """测试 ShutdownDrain"""
+
+    @pytest.mark.unit
+    def test_priority_records_sent_first(self, mock_aliyun_sdk, idle_worker):
+        """测试 ERROR 及以上的记录先发送，其余记录随后发送"""
+        sink = SlsSink(make_config(max_in_flight=1, adaptive_concurrency=False, batch_size=2))
+        handler_id = logger.add(sink, format="{message}")
+        try:
+            logger.info("i1")
+            logger.error("e1")
+            logger.info("i2")
+            logger.critical("c1")
+            logger.info("i3")
+            report = sink.close()
+        finally:
+            logger.remove(handler_id)
+
+        assert sent_messages(mock_aliyun_sdk['client']) == [['e1', 'c1'], ['i1', 'i2'], ['i3']]
+        assert (report.sent, report.spooled, report.dropped, report.in_flight) == (5, 0, 0, 0)
+
+    @pytest.mark.unit
+    def test_takes_over_waiting_retries(self, mock_aliyun_sdk, idle_worker):
+        """测试等待重试的批次由排空流程接管发送，不等到重试时间"""
+        sink = SlsSink(make_config())
+        sink.retry_scheduler.backoff = lambda attempt: 20.0
+        batch = LogBatch([(1700000000, [('message', 'retry')])])
+        assert sink.retry_scheduler.schedule(batch, ConnectionError("reset"))
+
+        report = sink.close()
+        assert sent_messages(mock_aliyun_sdk['client']) == [['retry']]
+        assert report.sent == 1
+        assert sink.retry_scheduler.waiting == 0
+
+    @pytest.mark.unit
+    def test_deadline_spools_unsent_batches(self, mock_aliyun_sdk, idle_worker, tmp_path):
+        """测试截止时间到达后剩余批次写入磁盘暂存"""
+        mock_aliyun_sdk['client']._send.side_effect = lambda *args: (time.sleep(0.2), ({}, {}))[1]
+        config = make_config(
+            max_in_flight=1,
+            adaptive_concurrency=False,
+            batch_size=1,
+            shutdown_timeout=0.5,
+            spool_dir=str(tmp_path),
+        )
+        sink = SlsSink(config)
+        handler_id = logger.add(sink, format="{message}")
+        try:
+            for i in range(10):
+                logger.info("{}", i)
+            start = time.monotonic()
+            report = sink.close()
+            elapsed = time.monotonic() - start
+        finally:
+            logger.remove(handler_id)
+
+        assert elapsed < 1.5
+        assert 1 <= report.sent <= 3
+        assert report.spooled >= 6
+        assert report.dropped == 0
+        assert report.sent + report.spooled + report.in_flight == 10
+
+        time.sleep(0.3)  # 等待截止时仍在发送的批次完成
+        spool = DiskSpool(str(tmp_path))
+        try:
+            assert len(spool.read(100)) == report.spooled
+        finally:
+            spool.close()
+
+    @pytest.mark.unit
+    def test_failures_without_spool_are_dropped(self, mock_aliyun_sdk, idle_worker):
+        """测试未配置磁盘暂存时失败的批次计为丢弃"""
+        mock_aliyun_sdk['client']._send.side_effect = ConnectionError("down")
+        sink = SlsSink(make_config(batch_size=1))
+        handler_id = logger.add(sink, format="{message}")
+        try:
+            for i in range(3):
+                logger.info("{}", i)
+            report = sink.close()
+        finally:
+            logger.remove(handler_id)
+
+        assert (report.sent, report.spooled, report.dropped) == (0, 0, 3)
+
+
+class TestSlsSinkShutdown:
+    """测试 SlsSink 的关闭集成"""
+
+    @pytest.mark.unit
+    def test_logger_remove_drains_sink(self, mock_aliyun_sdk, idle_worker):
+        """测试 logger.remove() 关闭 sink 并排空剩余日志"""
+        sink = SlsSink(make_config())
+        handler_id = logger.add(sink, format="{message}")
+        for i in range(3):
+            logger.info("{}", i)
+        logger.remove(handler_id)
+
+        assert sink.drain_report is not None
+        assert sink.drain_report.sent == 3
+        assert sink.close() is sink.drain_report
+
+    @pytest.mark.unit
+    def test_close_interrupts_flush_wait(self, mock_aliyun_sdk):
+        """测试关闭时不等满 flush_interval"""
+        sink = SlsSink(make_config(flush_interval=5.0))
+        time.sleep(0.05)
+        start = time.monotonic()
+        sink.close()
+        assert time.monotonic() - start < 1.0
+        assert not sink.flush_thread.is_alive()
+
+    @pytest.mark.unit
+    def test_exit_hook_closes_live_sinks(self, mock_aliyun_sdk):
+        """测试退出钩子关闭未关闭的 sink，已关闭或未启用的 sink 不再处理"""
+        sink = SlsSink(make_config())
+        opted_out = SlsSink(make_config(drain_on_exit=False))
+        assert sink in shutdown._live_sinks
+        assert opted_out not in shutdown._live_sinks
+
+        closed = [item for item, _ in shutdown.drain_live_sinks()]
+        assert sink in closed
+        assert sink.drain_report is not None
+        assert sink not in shutdown._live_sinks
+        opted_out.close()
+
+    @pytest.mark.unit
+    def test_busy_flush_worker_does_not_use_up_deadline(self, mock_aliyun_sdk, monkeypatch):
+        """测试 flush worker 未退出时只等待截止时间的一小部分"""
+        release = threading.Event()
+        monkeypatch.setattr(AsyncHandler, 'flush_worker', lambda self: release.wait(10))
+        sink = SlsSink(make_config(shutdown_timeout=5.0, drain_on_exit=False))
+        try:
+            start = time.monotonic()
+            sink.close()
+            assert time.monotonic() - start < 5.0 * shutdown.FLUSH_JOIN_SHARE + 0.5
+        finally:
+            release.set()
+            sink.flush_thread.join(timeout=5)
+
+
+class TestExitHookRegistration:
+    """测试退出钩子的注册方式"""
+
+    @pytest.fixture
+    def fresh_hook(self, monkeypatch):
+        monkeypatch.setattr(shutdown, '_exit_hook_registered', False)
+        monkeypatch.setattr(shutdown, '_live_sinks', weakref.WeakSet())
+        registered = []
+        monkeypatch.setattr(shutdown.atexit, 'register', lambda func: registered.append(('atexit', func)))
+        return registered
+
+    @pytest.mark.unit
+    def test_prefers_threading_exit_hook(self, fresh_hook, monkeypatch):
+        """测试可用时注册在 threading 的退出钩子上，只注册一次"""
+        monkeypatch.setattr(
+            threading, '_register_atexit', lambda func: fresh_hook.append(('threading', func)), raising=False
+        )
+        sink = Mock()
+        shutdown.register_exit_drain(sink)
+        shutdown.register_exit_drain(Mock())
+        assert fresh_hook == [('threading', shutdown.drain_live_sinks)]
+        assert sink in shutdown._live_sinks
+
+    @pytest.mark.unit
+    def test_falls_back_to_atexit(self, fresh_hook, monkeypatch):
+        """测试私有接口不存在或解释器已开始退出时退回 atexit"""
+        monkeypatch.delattr(threading, '_register_atexit', raising=False)
+        shutdown.register_exit_drain(Mock())
+        assert fresh_hook == [('atexit', shutdown.drain_live_sinks)]
+
+        def shutting_down(func):
+            raise RuntimeError("can't register atexit after shutdown")
+
+        fresh_hook.clear()
+        monkeypatch.setattr(shutdown, '_exit_hook_registered', False)
+        monkeypatch.setattr(threading, '_register_atexit', shutting_down, raising=False)
+        shutdown.register_exit_drain(Mock())
+        assert fresh_hook == [('atexit', shutdown.drain_live_sinks)]
@@ -0,0 +1,171 @@
+"""测试只发送一次请求的 SLS 客户端"""
+
+import inspect
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from unittest.mock import patch
+
+import pytest
+
+from aliyun.log import LogClient as SdkLogClient
+from aliyun.log.logexception import LogException
+
+from yai_loguru_sinks.internal.breaker import STATE_OPEN
+from yai_loguru_sinks.internal.core import SlsSink
+from yai_loguru_sinks.internal.data import LogBatch, SlsConfig
+from yai_loguru_sinks.internal.sls_client import SingleAttemptLogClient
+
+
+def make_config(endpoint, **kwargs):
+    kwargs.setdefault('compress_codec', 'none')
+    kwargs.setdefault('host_metadata_ttl', 0)
+    kwargs.setdefault('flush_interval', 0.05)
+    kwargs.setdefault('drain_on_exit', False)
+    kwargs.setdefault('shutdown_timeout', 1.0)
+    return SlsConfig(
+        endpoint=endpoint,
+        access_key_id="test-access-key",
+        access_key_secret="test-access-secret",
+        project="test-project",
+        logstore="test-logstore",
+        **kwargs,
+    )
+
+
+class _FailingHandler(BaseHTTPRequestHandler):
+    """所有请求都返回 500"""
+
+    def do_POST(self):
+        self.server.requests += 1
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = json.dumps({'errorCode': 'InternalServerError', 'errorMessage': 'boom'}).encode()
+        self.send_response(500)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def failing_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _FailingHandler)
+    server.requests = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def refused_endpoint():
+    """一个没有进程监听的本机端口"""
+    probe = socket.socket()
+    probe.bind(('127.0.0.1', 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    return f"127.0.0.1:{port}"
+
+
+class TestSingleAttemptLogClient:
+    """测试客户端不在内部重试"""
+
+    @pytest.mark.unit
+    def test_send_batch_makes_one_request(self, failing_server):
+        """测试 5xx 时一次 send_batch 只发送一次 HTTP 请求并立即抛出 LogException"""
+        endpoint = f"127.0.0.1:{failing_server.server_address[1]}"
+        for native_encoder in (True, False):
+            sink = SlsSink(make_config(endpoint, native_encoder=native_encoder, source='test-host'))
+            try:
+                assert isinstance(sink.client, SingleAttemptLogClient)
+                # SDK 不把带端口的 IP 当作 IP 地址，直接连本机端口而不加 project 前缀
+                sink.client._isRowIp = True
+                failing_server.requests = 0
+                start = time.monotonic()
+                with pytest.raises(LogException) as excinfo:
+                    sink.async_handler.send_batch(LogBatch([(1700000000, [('message', 'a')])]))
+                assert time.monotonic() - start < 1.0
+                assert failing_server.requests == 1
+                assert excinfo.value.get_error_code() == 'InternalServerError'
+            finally:
+                sink.close()
+
+    @pytest.mark.unit
+    def test_connection_error_raised_once(self, refused_endpoint):
+        """测试连接被拒绝时不等待重试，直接抛出可重试的 LogRequestError"""
+        client = SingleAttemptLogClient(refused_endpoint, 'ak', 'sk')
+        client._isRowIp = True
+        start = time.monotonic()
+        with pytest.raises(LogException) as excinfo:
+            client._send('POST', 'test-project', b'x', '/logstores/l/shards/lb', {}, {})
+        assert time.monotonic() - start < 1.0
+        assert excinfo.value.get_error_code() == 'LogRequestError'
+
+
+    @pytest.mark.unit
+    def test_sdk_private_interface(self):
+        """测试挂钩依赖的 SDK 私有接口：_send 在重试循环中调用 _sendRequest，且只捕获 LogException
+
+        升级 SDK 后这里失败时，需要重新检查 SingleAttemptLogClient 的挂钩方式。
+        """
+        assert list(inspect.signature(SdkLogClient._send).parameters)[:7] == [
+            'self', 'method', 'project', 'body', 'resource', 'params', 'headers',
+        ]
+        assert list(inspect.signature(SdkLogClient._sendRequest).parameters)[:6] == [
+            'self', 'method', 'url', 'params', 'body', 'headers',
+        ]
+        source = inspect.getsource(SdkLogClient._send)
+        assert 'self._sendRequest(' in source
+        assert 'except LogException' in source
+
+    @pytest.mark.unit
+    def test_auth_error_refreshes_credentials_once(self):
+        """测试临时凭证过期时刷新一次凭证后再发送一次，仍失败时直接抛出"""
+        refreshed = []
+        client = SingleAttemptLogClient('127.0.0.1:1', 'ak', 'sk')
+        client._credentials_auto_refresher = lambda: refreshed.append(1) or ('ak2', 'sk2', 'token')
+        client._last_refresh = 0
+        expired = LogException('SecurityTokenExpired', 'expired', resp_status=401)
+        with patch.object(SdkLogClient, '_sendRequest', side_effect=expired) as send_request:
+            with pytest.raises(LogException) as excinfo:
+                client._send('POST', 'test-project', b'x', '/logstores/l/shards/lb', {}, {})
+        assert send_request.call_count == 2
+        assert refreshed == [1]
+        assert excinfo.value.get_error_code() == 'SecurityTokenExpired'
+
+
+class TestBreakerTripping:
+    """测试熔断器在服务不可用时很快打开"""
+
+    @pytest.mark.unit
+    def test_breaker_opens_quickly_against_refusing_endpoint(self, refused_endpoint):
+        """测试连接被拒绝时连续失败很快达到阈值，熔断打开后批次不再发送请求"""
+        sink = SlsSink(make_config(
+            refused_endpoint,
+            breaker_failure_threshold=3,
+            max_retries=0,
+            max_in_flight=1,
+            adaptive_concurrency=False,
+        ))
+        sink.client._isRowIp = True
+        try:
+            start = time.monotonic()
+            for i in range(5):
+                sink.sender.submit(LogBatch([(1700000000, [('message', f'm{i}')])]))
+            assert sink.sender.wait_idle(timeout=10)
+            elapsed = time.monotonic() - start
+            metrics = sink.breaker.metrics()
+        finally:
+            sink.close()
+
+        # SDK 内部重试时每次失败至少 9 秒，三次失败需要近半分钟
+        assert elapsed < 3.0
+        assert metrics['state'] == STATE_OPEN
+        assert metrics['rejected'] == 2
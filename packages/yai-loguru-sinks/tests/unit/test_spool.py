@@ -0,0 +1,257 @@
+"""测试磁盘暂存"""
+
+import os
+import pytest
+
+from aliyun.log.logexception import LogException
+
+from yai_loguru_sinks.internal.breaker import BatchFallback, CircuitBreaker
+from yai_loguru_sinks.internal.data import LogBatch
+from yai_loguru_sinks.internal.spool import (
+    CHECKPOINT_FILE,
+    SEGMENT_SUFFIX,
+    DiskSpool,
+    SpoolReplayer,
+    decode_batch,
+    encode_batch,
+)
+
+
+def make_batch(i, hash_key=None):
+    return LogBatch([(1700000000 + i, [('message', f'log {i}'), ('level', 'INFO')])], hash_key=hash_key)
+
+
+def segment_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX))
+
+
+class TestDiskSpool:
+    """测试 DiskSpool"""
+
+    @pytest.mark.unit
+    def test_encode_roundtrip(self):
+        """测试批次编码往返"""
+        batch = make_batch(1, hash_key='abc')
+        decoded = decode_batch(encode_batch(batch))
+        assert decoded.logs == batch.logs
+        assert decoded.hash_key == 'abc'
+
+    @pytest.mark.unit
+    def test_append_read_commit_in_order(self, tmp_path):
+        """测试按写入顺序读取，确认后删除已送达的段"""
+        spool = DiskSpool(str(tmp_path), segment_bytes=256)
+        for i in range(6):
+            assert spool.append(make_batch(i))
+        assert len(segment_files(tmp_path)) > 1
+
+        frames = spool.read(4)
+        assert [batch.logs[0][1][0][1] for _, batch in frames] == [f'log {i}' for i in range(4)]
+        spool.commit(frames[-1][0], count=4)
+
+        frames = spool.read(10)
+        assert [batch.logs[0][1][0][1] for _, batch in frames] == ['log 4', 'log 5']
+        spool.commit(frames[-1][0], count=2)
+
+        assert not spool.has_pending
+        assert segment_files(tmp_path) == []
+        assert spool.metrics()['replayed_batches'] == 6
+
+    @pytest.mark.unit
+    def test_rewind_rereads_unacknowledged(self, tmp_path):
+        """测试未确认的帧在 rewind 后重新读取"""
+        spool = DiskSpool(str(tmp_path))
+        for i in range(3):
+            spool.append(make_batch(i))
+
+        frames = spool.read(3)
+        spool.commit(frames[0][0], count=1)
+        spool.rewind()
+
+        frames = spool.read(3)
+        assert [batch.logs[0][0] for _, batch in frames] == [1700000001, 1700000002]
+
+    @pytest.mark.unit
+    def test_checkpoint_survives_restart(self, tmp_path):
+        """测试重启后从检查点继续，已确认的帧不再补发"""
+        spool = DiskSpool(str(tmp_path))
+        for i in range(4):
+            spool.append(make_batch(i))
+        frames = spool.read(2)
+        spool.commit(frames[-1][0], count=2)
+        spool.close()
+        assert os.path.exists(tmp_path / CHECKPOINT_FILE)
+
+        reopened = DiskSpool(str(tmp_path))
+        assert reopened.has_pending
+        frames = reopened.read(10)
+        assert [batch.logs[0][0] for _, batch in frames] == [1700000002, 1700000003]
+
+    @pytest.mark.unit
+    def test_torn_frame_is_ignored(self, tmp_path):
+        """测试写了一半的帧（CRC 不匹配）及之后的内容被忽略"""
+        spool = DiskSpool(str(tmp_path))
+        spool.append(make_batch(0))
+        spool.append(make_batch(1))
+        spool.close()
+
+        path = tmp_path / segment_files(tmp_path)[0]
+        data = bytearray(path.read_bytes())
+        data[-3] ^= 0xFF
+        path.write_bytes(bytes(data))
+
+        frames = DiskSpool(str(tmp_path)).read(10)
+        assert [batch.logs[0][0] for _, batch in frames] == [1700000000]
+
+    @pytest.mark.unit
+    def test_unsealed_segment_after_crash(self, tmp_path):
+        """测试进程被杀时未封存的预分配段可以读取"""
+        spool = DiskSpool(str(tmp_path), segment_bytes=4096)
+        spool.append(make_batch(0))
+        spool._active._map.flush()
+        # 模拟进程被杀：不调用 close，文件仍是预分配的大小
+        assert os.path.getsize(tmp_path / segment_files(tmp_path)[0]) == 4096
+
+        reopened = DiskSpool(str(tmp_path))
+        frame_size = len(encode_batch(make_batch(0))) + 8
+        # 截断到最后一个有效帧的结尾，不再按预分配大小计入总大小
+        assert os.path.getsize(tmp_path / segment_files(tmp_path)[0]) == frame_size
+        assert reopened.metrics()['bytes'] == frame_size
+        frames = reopened.read(10)
+        assert len(frames) == 1
+        reopened.commit(frames[-1][0], count=1)
+        assert segment_files(tmp_path) == []
+
+    @pytest.mark.unit
+    def test_empty_unsealed_segment_is_removed(self, tmp_path):
+        """测试进程被杀时没有有效帧的预分配段在重新打开时删除"""
+        spool = DiskSpool(str(tmp_path), segment_bytes=4096)
+        spool.append(make_batch(0))
+        spool._active._map[:] = bytes(4096)
+        spool._active._map.flush()
+
+        reopened = DiskSpool(str(tmp_path))
+        assert segment_files(tmp_path) == []
+        assert reopened.metrics()['bytes'] == 0
+
+    @pytest.mark.unit
+    def test_read_does_not_seal_active_segment(self, tmp_path):
+        """测试补发轮询直接读取活动段，不为每次读取封存出新的小段"""
+        spool = DiskSpool(str(tmp_path), segment_bytes=4096)
+        for i in range(3):
+            spool.append(make_batch(i))
+            frames = spool.read(10)
+            assert [batch.logs[0][0] for _, batch in frames] == [1700000000 + i]
+            assert spool.read(10) == []
+        assert len(segment_files(tmp_path)) == 1
+        assert spool._active is not None
+
+        spool.commit(frames[-1][0], count=3)
+        # 活动段全部确认后删除，之后的写入使用新段
+        assert segment_files(tmp_path) == []
+        spool.append(make_batch(3))
+        assert [batch.logs[0][0] for _, batch in spool.read(10)] == [1700000003]
+
+    @pytest.mark.unit
+    def test_size_retention_drops_oldest(self, tmp_path):
+        """测试超过总大小上限时删除最旧的段"""
+        frame_size = len(encode_batch(make_batch(0))) + 8
+        spool = DiskSpool(str(tmp_path), segment_bytes=frame_size, max_bytes=frame_size * 3)
+        for i in range(5):
+            assert spool.append(make_batch(i))
+
+        metrics = spool.metrics()
+        assert metrics['expired_segments'] == 2
+        assert metrics['bytes'] <= frame_size * 3
+        frames = spool.read(10)
+        assert [batch.logs[0][0] for _, batch in frames] == [1700000002, 1700000003, 1700000004]
+
+    @pytest.mark.unit
+    def test_age_retention(self, tmp_path):
+        """测试超过保留时间的段被删除"""
+        spool = DiskSpool(str(tmp_path), max_age=60.0)
+        spool.append(make_batch(0))
+        spool.close()
+        path = tmp_path / segment_files(tmp_path)[0]
+        os.utime(path, (0, 0))
+
+        reopened = DiskSpool(str(tmp_path), max_age=60.0)
+        assert reopened.read(10) == []
+        assert reopened.metrics()['expired_segments'] == 1
+
+
+class TestSpoolReplayer:
+    """测试 SpoolReplayer"""
+
+    @pytest.mark.unit
+    def test_replay_commits_successful_prefix(self, tmp_path):
+        """测试补发失败时只确认成功的前缀"""
+        spool = DiskSpool(str(tmp_path))
+        for i in range(4):
+            spool.append(make_batch(i))
+        sent = []
+
+        def send(batch):
+            if batch.logs[0][0] == 1700000002 and not sent.count(1700000002):
+                sent.append(batch.logs[0][0])
+                raise LogException('LogRequestError', 'connection refused')
+            sent.append(batch.logs[0][0])
+
+        replayer = SpoolReplayer(spool, send, concurrency=4, background=False)
+
+        assert not replayer.replay_once()
+        assert replayer.replay_once()
+        assert not spool.has_pending
+        assert spool.metrics()['replayed_batches'] == 4
+        # 失败帧之后已送达的帧不会重复发送
+        assert sorted(sent) == [1700000000, 1700000001, 1700000002, 1700000002, 1700000003]
+
+    @pytest.mark.unit
+    def test_non_retryable_error_drops_frame(self, tmp_path):
+        """测试不可重试的错误不阻塞之后的帧，丢弃的批次交给 on_drop"""
+        spool = DiskSpool(str(tmp_path))
+        for i in range(3):
+            spool.append(make_batch(i))
+        sent = []
+        dropped = []
+
+        def send(batch):
+            sent.append(batch.logs[0][0])
+            if batch.logs[0][0] == 1700000000:
+                raise LogException('Unauthorized', 'access key disabled')
+
+        replayer = SpoolReplayer(spool, send, concurrency=1, background=False, on_drop=dropped.append)
+
+        for _ in range(3):
+            assert replayer.replay_once()
+        assert not spool.has_pending
+        assert sent == [1700000000, 1700000001, 1700000002]
+        assert [batch.logs[0][0] for batch in dropped] == [1700000000]
+        assert replayer.dropped_batches == 1
+        assert spool.metrics()['replayed_batches'] == 2
+
+    @pytest.mark.unit
+    def test_open_breaker_pauses_replay(self, tmp_path):
+        """测试熔断打开期间不补发"""
+        spool = DiskSpool(str(tmp_path))
+        spool.append(make_batch(0))
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60.0)
+        breaker.record_failure()
+        sent = []
+
+        replayer = SpoolReplayer(spool, sent.append, breaker=breaker, background=False)
+
+        assert not replayer.replay_once()
+        assert sent == []
+        assert spool.has_pending
+
+    @pytest.mark.unit
+    def test_fallback_to_spool(self, tmp_path):
+        """测试熔断降级写入磁盘暂存"""
+        spool = DiskSpool(str(tmp_path))
+        fallback = BatchFallback('spool', spool=spool)
+        fallback(make_batch(0))
+
+        assert fallback.spooled_batches == 1
+        assert spool.has_pending
+        with pytest.raises(ValueError):
+            BatchFallback('spool')
@@ -0,0 +1,148 @@
+"""测试分线程暂存缓冲
+
+测试 StagedLogQueue 的本地暂存、整块移交、worker 窃取和背压行为。
+"""
+
+import pytest
+import threading
+import time
+from queue import Empty
+
+from yai_loguru_sinks.internal.log_queue import BoundedLogQueue
+from yai_loguru_sinks.internal.staging import StagedLogQueue
+
+
+class TestStagedLogQueue:
+    """测试 StagedLogQueue"""
+
+    @pytest.mark.unit
+    def test_partial_chunk_is_stolen(self):
+        """测试未攒满的本地缓冲被 worker 窃取"""
+        backend = BoundedLogQueue(max_size=100)
+        staged = StagedLogQueue(backend, chunk_size=10)
+
+        for i in range(3):
+            staged.put(i)
+
+        # 未攒满，后端队列仍为空
+        assert backend.qsize() == 0
+        assert staged.qsize() == 3
+        assert staged.drain(100) == [0, 1, 2]
+        assert staged.empty()
+
+    @pytest.mark.unit
+    def test_full_chunk_hand_off(self):
+        """测试攒满一块后整块移交后端队列"""
+        backend = BoundedLogQueue(max_size=100)
+        staged = StagedLogQueue(backend, chunk_size=4)
+
+        for i in range(6):
+            staged.put(i)
+
+        assert backend.qsize() == 4
+        assert staged.drain(100) == [0, 1, 2, 3, 4, 5]
+
+    @pytest.mark.unit
+    def test_drain_respects_max_items(self):
+        """测试 drain 的数量上限"""
+        staged = StagedLogQueue(BoundedLogQueue(max_size=100), chunk_size=4)
+        for i in range(10):
+            staged.put(i)
+
+        first = staged.drain(6)
+        rest = staged.drain(100)
+
+        assert len(first) == 6
+        assert sorted(first + rest) == list(range(10))
+
+    @pytest.mark.unit
+    def test_drain_timeout_and_wakeup(self):
+        """测试 drain 在无数据时等待，并被生产者唤醒"""
+        staged = StagedLogQueue(BoundedLogQueue(max_size=100), chunk_size=64)
+
+        start = time.monotonic()
+        assert staged.drain(10, timeout=0.05) == []
+        assert time.monotonic() - start >= 0.04
+
+        producer = threading.Timer(0.05, staged.put, args=('late',))
+        producer.start()
+        assert staged.drain(10, timeout=2.0) == ['late']
+        producer.join()
+
+    @pytest.mark.unit
+    def test_close_and_drain_entries(self):
+        """测试 close 后 drain 不再等待，drain_entries 同时取出各线程暂存的记录"""
+        staged = StagedLogQueue(BoundedLogQueue(max_size=100), chunk_size=2)
+        for i in range(3):
+            staged.put(i, nbytes=1, level_no=20 + i)
+        staged.close()
+
+        start = time.monotonic()
+        assert staged.drain_entries() == [(0, 1, 20), (1, 1, 21), (2, 1, 22)]
+        assert staged.drain(10, timeout=5.0) == []
+        assert time.monotonic() - start < 1.0
+
+    @pytest.mark.unit
+    def test_get_nowait(self):
+        """测试兼容接口 get_nowait"""
+        staged = StagedLogQueue(BoundedLogQueue(max_size=100))
+        staged.put('a')
+
+        assert staged.get_nowait() == 'a'
+        with pytest.raises(Empty):
+            staged.get_nowait()
+
+    @pytest.mark.unit
+    def test_backpressure_applies_per_chunk(self):
+        """测试整块移交时应用后端队列的背压策略"""
+        backend = BoundedLogQueue(max_size=5, policy='drop_newest')
+        staged = StagedLogQueue(backend, chunk_size=4)
+
+        for i in range(8):
+            staged.put(i)
+
+        assert backend.qsize() == 5
+        assert staged.dropped == 3
+
+    @pytest.mark.unit
+    def test_many_producers_no_loss(self):
+        """测试多线程并发写入时记录不丢失"""
+        staged = StagedLogQueue(BoundedLogQueue(max_size=0), chunk_size=16)
+        per_thread = 500
+        received = []
+        done = threading.Event()
+
+        def consumer():
+            while not done.is_set() or not staged.empty():
+                received.extend(staged.drain(256, timeout=0.01))
+
+        def producer(tid):
+            for i in range(per_thread):
+                staged.put((tid, i))
+
+        consumer_thread = threading.Thread(target=consumer)
+        consumer_thread.start()
+        producers = [threading.Thread(target=producer, args=(t,)) for t in range(8)]
+        for t in producers:
+            t.start()
+        for t in producers:
+            t.join()
+        done.set()
+        consumer_thread.join()
+
+        assert len(received) == 8 * per_thread
+        assert len(set(received)) == 8 * per_thread
+
+    @pytest.mark.unit
+    def test_dead_thread_buffers_are_released(self):
+        """测试已退出线程的缓冲在清空后被注销"""
+        staged = StagedLogQueue(BoundedLogQueue(max_size=100), chunk_size=64)
+
+        worker = threading.Thread(target=staged.put, args=('from-thread',))
+        worker.start()
+        worker.join()
+        del worker
+
+        assert staged.drain(10) == ['from-thread']
+        staged.drain(10)
+        assert staged._buffers == []
@@ -0,0 +1,271 @@
+"""测试内置的 PutLogs HTTP 传输
+
+使用本地线程 HTTP 服务代替 SLS 服务端。
+"""
+
+import json
+import socket
+import threading
+import time
+
+import pytest
+from loguru import logger
+
+from aliyun.log.auth import AuthV1, AuthV4
+from aliyun.log.compress import CompressType, Compressor
+from aliyun.log.credentials import StaticCredentialsProvider
+from aliyun.log.log_logs_pb2 import LogGroup
+from aliyun.log.logexception import LogException
+from aliyun.log.util import Util
+
+from yai_loguru_sinks.internal.core import SlsSink
+from yai_loguru_sinks.internal.data import SlsConfig
+from yai_loguru_sinks.internal.transport import PutLogsSigner, PutLogsTransport
+
+
+ACCESS_KEY_ID = "test-key"
+ACCESS_KEY_SECRET = "test-secret"
+
+
+class StandInServer:
+    """按脚本返回响应的本地 PutLogs 服务（每个连接一个线程）"""
+
+    def __init__(self, responses=None, delay=0.0, close_after_response=False):
+        # 每个元素为 (状态码, JSON 响应体或 None)，用完后返回 200
+        self.responses = list(responses or [])
+        self.delay = delay
+        # 响应后直接断开连接，但不发送 Connection: close
+        self.close_after_response = close_after_response
+        self.requests = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.listener = socket.socket()
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen()
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.listener.close()
+
+    @property
+    def endpoint(self):
+        return f"http://127.0.0.1:{self.listener.getsockname()[1]}"
+
+    def serve(self):
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                return
+            with self.lock:
+                self.connections += 1
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+    def handle(self, conn):
+        reader = conn.makefile('rb')
+        try:
+            while True:
+                request_line = reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode().split(' ', 2)
+                headers = {}
+                while True:
+                    line = reader.readline()
+                    if line == b'\r\n':
+                        break
+                    key, _, value = line.decode().partition(':')
+                    headers[key.strip()] = value.strip()
+                body = reader.read(int(headers['Content-Length']))
+                with self.lock:
+                    self.requests.append((method, path, headers, body))
+                    status, payload = self.responses.pop(0) if self.responses else (200, None)
+                    count = len(self.requests)
+                if self.delay:
+                    time.sleep(self.delay)
+                data = json.dumps(payload).encode() if payload is not None else b''
+                conn.sendall(
+                    f'HTTP/1.1 {status} X\r\nx-log-requestid: req-{count}\r\n'
+                    f'Content-Length: {len(data)}\r\n\r\n'.encode() + data
+                )
+                if self.close_after_response:
+                    break
+        except OSError:
+            pass
+        finally:
+            reader.close()
+            conn.close()
+
+
+def expected_signature(method, path, headers):
+    """按 SLS 的规则在服务端重新计算签名"""
+    resource, _, query = path.partition('?')
+    params = dict(item.split('=', 1) for item in query.split('&')) if query else {}
+    lower = {key.lower(): value for key, value in headers.items()}
+    content = (
+        method + '\n' + lower.get('content-md5', '') + '\n' + lower.get('content-type', '') + '\n'
+        + lower['date'] + '\n'
+        # x-log-date 由 SDK 在签名之后添加，不参与签名
+        + Util.canonicalized_log_headers(
+            {k: v for k, v in headers.items() if k.startswith('x-') and k != 'x-log-date'}
+        )
+        + Util.canonicalized_resource(resource, params)
+    )
+    return 'LOG ' + ACCESS_KEY_ID + ':' + Util.hmac_sha1(content, ACCESS_KEY_SECRET)
+
+
+def make_auth(token=None):
+    return AuthV1(StaticCredentialsProvider(ACCESS_KEY_ID, ACCESS_KEY_SECRET, token))
+
+
+def make_transport(endpoint, **kwargs):
+    return PutLogsTransport(endpoint, "proj", "store", make_auth(), **kwargs)
+
+
+class TestPutLogsSigner:
+    """测试 PutLogsSigner"""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("token", [None, "sts-token"])
+    @pytest.mark.parametrize("compress_type, hash_key", [(None, None), ('lz4', 'a1b2')])
+    def test_matches_sdk_signature(self, monkeypatch, token, compress_type, hash_key):
+        """测试请求头和签名与 SDK 的 AuthV1 相同"""
+        signer = PutLogsSigner(make_auth(token), "store", "proj.cn-hangzhou.log.aliyuncs.com")
+        path, headers = signer.prepare(11, compress_type, b'hello world', hash_key)
+
+        # 用相同的 Date 让 SDK 对未签名的请求头签名
+        monkeypatch.setattr(AuthV1, '_getGMT', staticmethod(lambda: headers['Date']))
+        sdk_headers = {
+            key: value for key, value in headers.items()
+            if key in ('Content-Type', 'Content-Length', 'Host', 'x-log-apiversion',
+                       'x-log-bodyrawsize', 'x-log-compresstype')
+        }
+        resource, _, query = path.partition('?')
+        params = dict([query.split('=', 1)]) if query else {}
+        make_auth(token).sign_request('POST', resource, params, sdk_headers, b'hello world')
+
+        sdk_headers['User-Agent'] = signer.user_agent
+        assert headers == sdk_headers
+        assert signer.cached
+
+    @pytest.mark.unit
+    def test_other_auth_versions_use_sdk(self):
+        """测试 AuthV4 交给 SDK 签名"""
+        auth = AuthV4(StaticCredentialsProvider(ACCESS_KEY_ID, ACCESS_KEY_SECRET, None), 'cn-hangzhou')
+        signer = PutLogsSigner(auth, "store", "proj.cn-hangzhou.log.aliyuncs.com")
+        _, headers = signer.prepare(3, None, b'abc')
+        assert not signer.cached
+        assert headers['Authorization'].startswith('SLS4-HMAC-SHA256 ')
+
+
+class TestPutLogsTransport:
+    """测试 PutLogsTransport"""
+
+    @pytest.mark.unit
+    def test_signed_requests_reuse_connection(self):
+        """测试请求签名正确、按 hash key 路由，并复用 keep-alive 连接"""
+        with StandInServer() as server:
+            transport = make_transport(server.endpoint)
+            transport.post(3, None, b'abc')
+            transport.post(3, 'lz4', b'xyz', hash_key='a1b2')
+            response = transport.post(3, None, b'abc')
+            transport.close()
+
+        assert server.connections == 1
+        assert transport.connections_opened == 1
+        assert response.headers['x-log-requestid'] == 'req-3'
+        (_, path1, headers1, _), (method, path2, headers2, _), _ = server.requests
+        assert path1 == '/logstores/store/shards/lb'
+        assert path2 == '/logstores/store/shards/route?key=a1b2'
+        assert headers2['Host'] == '127.0.0.1'
+        assert headers2['x-log-compresstype'] == 'lz4'
+        assert headers2['Authorization'] == expected_signature(method, path2, headers2)
+        assert headers1['Authorization'] == expected_signature('POST', path1, headers1)
+
+    @pytest.mark.unit
+    def test_reconnects_when_idle_connection_closed(self):
+        """测试空闲连接被服务端关闭后换新连接重发"""
+        with StandInServer(close_after_response=True) as server:
+            transport = make_transport(server.endpoint)
+            transport.post(1, None, b'x')
+            time.sleep(0.05)
+            transport.post(1, None, b'y')
+            transport.close()
+
+        assert [body for _, _, _, body in server.requests] == [b'x', b'y']
+        assert transport.connections_opened == 2
+
+    @pytest.mark.unit
+    def test_timeout(self):
+        """测试服务端无响应时按 timeout 抛出 LogRequestError"""
+        with StandInServer(delay=1.0) as server:
+            transport = make_transport(server.endpoint, timeout=0.2)
+            start = time.monotonic()
+            with pytest.raises(LogException) as excinfo:
+                transport.post(1, None, b'x')
+            elapsed = time.monotonic() - start
+            transport.close()
+
+        assert excinfo.value.get_error_code() == 'LogRequestError'
+        assert elapsed < 0.9
+
+    @pytest.mark.unit
+    def test_error_response_raises_log_exception(self):
+        """测试错误响应转换为与 SDK 相同的 LogException，连接继续复用"""
+        responses = [(401, {'errorCode': 'Unauthorized', 'errorMessage': 'bad key'})]
+        with StandInServer(responses) as server:
+            transport = make_transport(server.endpoint)
+            with pytest.raises(LogException) as excinfo:
+                transport.post(1, None, b'x')
+            transport.post(1, None, b'x')
+            transport.close()
+
+        assert excinfo.value.get_error_code() == 'Unauthorized'
+        assert excinfo.value.resp_status == 401
+        assert server.connections == 1
+
+
+class TestSlsSinkNativeTransport:
+    """测试 SlsSink 使用内置传输发送"""
+
+    @pytest.mark.unit
+    def test_sink_posts_through_transport(self):
+        """测试启用 native_transport 后批次通过内置传输发送"""
+        with StandInServer() as server:
+            config = SlsConfig(
+                endpoint=server.endpoint,
+                access_key_id=ACCESS_KEY_ID,
+                access_key_secret=ACCESS_KEY_SECRET,
+                project="proj",
+                logstore="store",
+                native_transport=True,
+                flush_interval=0.05,
+                compress_min_bytes=0,
+                host_metadata_ttl=0,
+            )
+            sink = SlsSink(config)
+            handler_id = logger.add(sink, format="{message}")
+            try:
+                for i in range(3):
+                    logger.info("请求 {} 完成", i)
+                deadline = time.monotonic() + 5.0
+                while not sink.log_queue.empty() and time.monotonic() < deadline:
+                    time.sleep(0.01)
+            finally:
+                logger.remove(handler_id)
+                sink.close()
+
+        assert sink.async_handler.transport is not None
+        assert server.requests
+        messages = []
+        for method, path, headers, body in server.requests:
+            assert headers['Authorization'] == expected_signature(method, path, headers)
+            raw = Compressor.decompress(body, int(headers['x-log-bodyrawsize']), CompressType.LZ4)
+            group = LogGroup()
+            group.ParseFromString(raw)
+            messages.extend(dict((c.Key, c.Value) for c in log.Contents)['message'] for log in group.Logs)
+        assert messages == [f"请求 {i} 完成" for i in range(3)]